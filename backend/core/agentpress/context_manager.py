@@ -5,15 +5,18 @@ This module handles token counting and thread summarization to prevent
 reaching the context window limitations of LLM models.
 """
 
+import asyncio
 import json
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional, Union, Tuple
 
-from litellm.utils import token_counter
 from core.services.supabase import DBConnection
 from core.utils.logger import logger
 from core.ai_models import model_manager
 from core.services.llm import make_llm_api_call
+from core.agentpress.token_cache import count_message_tokens, count_messages_tokens
+from core.agentpress.summary_cache import summary_cache, summary_digest
+from core.utils.config import config
 
 
 @dataclass
@@ -111,6 +114,7 @@ class CompressionReport:
 
 DEFAULT_TOKEN_THRESHOLD = 70_000
 SUMMARIZATION_TOKEN_THRESHOLD = 40_000  # Trigger summarization once context crosses ~40k tokens
+SUMMARY_MODEL = "gemini/gemini-2.5-flash-lite"
 
 class ContextManager:
     """Manages thread context including token counting and summarization."""
@@ -204,20 +208,8 @@ class ContextManager:
         """Check if message contains any tool-related data (calls or results) that must be preserved."""
         return self.has_tool_calls(msg) or self.is_tool_result_message(msg)
     
-    async def summarize_message(
-        self, 
-        message: Dict[str, Any], 
-        max_summary_tokens: int = 150
-    ) -> str:
-        """Summarize a message using Gemini 2.5 Flash Lite, preserving key information.
-        
-        Args:
-            message: The message dict to summarize
-            max_summary_tokens: Maximum tokens for the summary (default 150 to allow 4-5 lines)
-            
-        Returns:
-            Summary string
-        """
+    def _summary_input(self, message: Dict[str, Any]) -> Tuple[str, str]:
+        """Return the role and (truncated) text that would be summarized for a message."""
         content = message.get('content', '')
         role = message.get('role', 'unknown')
         
@@ -235,14 +227,81 @@ class ContextManager:
         else:
             text = str(content)
         
-        if not text or len(text.strip()) < 30:
-            return text  # Too short to summarize
-        
         # Truncate very long content to avoid API limits
         max_input_length = 8000
         if len(text) > max_input_length:
             text = text[:max_input_length] + "... [truncated for summarization]"
+        return role, text
+
+    async def summarize_message(
+        self, 
+        message: Dict[str, Any], 
+        max_summary_tokens: int = 150
+    ) -> str:
+        """Summarize a message using Gemini 2.5 Flash Lite, preserving key information.
+        
+        Args:
+            message: The message dict to summarize
+            max_summary_tokens: Maximum tokens for the summary (default 150 to allow 4-5 lines)
+            
+        Returns:
+            Summary string
+        """
+        role, text = self._summary_input(message)
+        if not text or len(text.strip()) < 30:
+            return text  # Too short to summarize
+        summary = await self._request_summary(role, text, max_summary_tokens)
+        return summary if summary is not None else text
+
+    async def summarize_messages(
+        self,
+        messages: List[Dict[str, Any]],
+        max_summary_tokens: int = 150,
+        concurrency: Optional[int] = None,
+    ) -> List[Optional[str]]:
+        """Summarize several messages concurrently, reusing cached summaries.
         
+        Summaries are looked up by content hash first (one Redis round trip for
+        the whole batch); the remaining messages are summarized with at most
+        ``concurrency`` LLM calls in flight and identical messages share one call.
+        
+        Returns:
+            One summary per message, or None where summarization failed
+        """
+        inputs = [self._summary_input(message) for message in messages]
+        digests = [summary_digest(SUMMARY_MODEL, role, text, max_summary_tokens) for role, text in inputs]
+        summaries: Dict[str, Optional[str]] = dict(await summary_cache.get_many(digests))
+
+        pending = {}
+        for digest, (role, text) in zip(digests, inputs):
+            if digest in summaries or digest in pending:
+                continue
+            if not text or len(text.strip()) < 30:
+                summaries[digest] = text  # Too short to summarize
+                continue
+            pending[digest] = (role, text)
+
+        if pending:
+            semaphore = asyncio.Semaphore(max(1, concurrency or config.CONTEXT_SUMMARY_CONCURRENCY))
+
+            async def summarize(digest: str, role: str, text: str) -> None:
+                async with semaphore:
+                    summary = await self._request_summary(role, text, max_summary_tokens)
+                summaries[digest] = summary
+                if summary:
+                    await summary_cache.set(digest, summary)
+
+            await asyncio.gather(*(summarize(digest, role, text) for digest, (role, text) in pending.items()))
+            logger.debug(
+                "Summarized %s messages with the LLM (%s cached or duplicate)",
+                len(pending),
+                len(messages) - len(pending),
+            )
+
+        return [summaries.get(digest) for digest in digests]
+
+    async def _request_summary(self, role: str, text: str, max_summary_tokens: int) -> Optional[str]:
+        """Call the summarization model; returns None when no summary could be produced."""
         prompt = f"""Summarize this {role} message in 4-5 lines (max 150 tokens total). Preserve:
 - Main intent, request, or key question
 - Important context or information shared
@@ -259,7 +318,7 @@ Message:
             # Use Gemini 2.5 Flash Lite for fast, cheap summarization
             response = await make_llm_api_call(
                 messages=[{"role": "user", "content": prompt}],
-                model_name="gemini/gemini-2.5-flash-lite",
+                model_name=SUMMARY_MODEL,
                 temperature=0.1,
                 max_tokens=max_summary_tokens,
                 stream=False  # Non-streaming for summarization
@@ -267,7 +326,7 @@ Message:
             
             # Handle different response formats
             if isinstance(response, str):
-                return response.strip()
+                return response.strip() or None
             elif isinstance(response, dict):
                 # Extract content from response
                 if 'choices' in response and response['choices']:
@@ -275,7 +334,7 @@ Message:
                     if content:
                         return content.strip()
                 # Fallback to direct content field
-                return response.get('content', text).strip()
+                return (response.get('content') or '').strip() or None
             else:
                 # Handle LiteLLM ModelResponse object
                 try:
@@ -298,10 +357,10 @@ Message:
                             return str(content).strip()
                 except Exception as e:
                     logger.debug(f"Failed to extract content from response object: {e}")
-                return text
+                return None
         except Exception as e:
             logger.warning(f"Summarization failed for message: {e}, using original text")
-            return text
+            return None
     
     def compress_message(self, msg_content: Union[str, dict], message_id: Optional[str] = None, max_length: int = 3000) -> Union[str, dict]:
         """Compress the message content."""
@@ -356,7 +415,7 @@ Message:
         This allows prompt caching (applied later) to produce cache hits on identical compressed content.
         """
         if uncompressed_total_token_count is None:
-            uncompressed_total_token_count = token_counter(model=llm_model, messages=messages)
+            uncompressed_total_token_count = count_messages_tokens(llm_model, messages)
 
         max_tokens_value = max_tokens or (100 * 1000)
         truncated_count = 0
@@ -367,7 +426,7 @@ Message:
                     continue  # Skip non-dict messages
                 if self.is_tool_result_message(msg):  # Only compress ToolResult messages
                     _i += 1  # Count the number of ToolResult messages
-                    msg_token_count = token_counter(model=llm_model, messages=[msg])  # Count the number of tokens in the message
+                    msg_token_count = count_message_tokens(llm_model, msg)  # Count the number of tokens in the message
                     if msg_token_count > token_threshold:  # If the message is too long
                         modified = False
                         if _i > 1:  # If this is not the most recent ToolResult message
@@ -403,7 +462,7 @@ Message:
         This allows prompt caching (applied later) to produce cache hits on identical compressed content.
         """
         if uncompressed_total_token_count is None:
-            uncompressed_total_token_count = token_counter(model=llm_model, messages=messages)
+            uncompressed_total_token_count = count_messages_tokens(llm_model, messages)
 
         max_tokens_value = max_tokens or (100 * 1000)
         truncated_count = 0
@@ -414,7 +473,7 @@ Message:
                     continue  # Skip non-dict messages
                 if msg.get('role') == 'user':  # Only compress User messages
                     _i += 1  # Count the number of User messages
-                    msg_token_count = token_counter(model=llm_model, messages=[msg])  # Count the number of tokens in the message
+                    msg_token_count = count_message_tokens(llm_model, msg)  # Count the number of tokens in the message
                     if msg_token_count > token_threshold:  # If the message is too long
                         modified = False
                         if _i > 1:  # If this is not the most recent User message
@@ -450,7 +509,7 @@ Message:
         This allows prompt caching (applied later) to produce cache hits on identical compressed content.
         """
         if uncompressed_total_token_count is None:
-            uncompressed_total_token_count = token_counter(model=llm_model, messages=messages)
+            uncompressed_total_token_count = count_messages_tokens(llm_model, messages)
 
         max_tokens_value = max_tokens or (100 * 1000)
         truncated_count = 0
@@ -461,7 +520,7 @@ Message:
                     continue  # Skip non-dict messages
                 if msg.get('role') == 'assistant':  # Only compress Assistant messages
                     _i += 1  # Count the number of Assistant messages
-                    msg_token_count = token_counter(model=llm_model, messages=[msg])  # Count the number of tokens in the message
+                    msg_token_count = count_message_tokens(llm_model, msg)  # Count the number of tokens in the message
                     if msg_token_count > token_threshold:  # If the message is too long
                         modified = False
                         if _i > 1:  # If this is not the most recent Assistant message
@@ -551,12 +610,7 @@ Message:
         if actual_total_tokens is not None:
             uncompressed_total_token_count = actual_total_tokens
         else:
-            if system_prompt:
-                uncompressed_total_token_count = token_counter(
-                    model=llm_model, messages=[system_prompt] + result
-                )
-            else:
-                uncompressed_total_token_count = token_counter(model=llm_model, messages=result)
+            uncompressed_total_token_count = count_messages_tokens(llm_model, result, system_prompt)
 
         if report is None:
             report = CompressionReport(model=llm_model, initial_tokens=uncompressed_total_token_count)
@@ -609,17 +663,20 @@ Message:
             total_tokens_saved = 0
             failed_count = 0
 
-            for idx in messages_to_summarize:
+            pending_indices = [idx for idx in messages_to_summarize if not result[idx].get('_summarized')]
+            try:
+                summaries = await self.summarize_messages([result[idx] for idx in pending_indices])
+            except Exception as exc:
+                logger.error("Failed to summarize messages: %s", exc, exc_info=True)
+                summaries = [None] * len(pending_indices)
+
+            for idx, summary in zip(pending_indices, summaries):
                 msg = result[idx]
                 original_role = msg.get('role', 'user')
 
-                if msg.get('_summarized'):
-                    continue
-
-                original_tokens = token_counter(model=llm_model, messages=[msg])
+                original_tokens = count_message_tokens(llm_model, msg)
 
                 try:
-                    summary = await self.summarize_message(msg)
                     if not summary or len(summary.strip()) < 10:
                         logger.warning(
                             "Summary too short for message %s (%s), keeping original",
@@ -644,7 +701,7 @@ Message:
                     self._mark_message(msg_copy, "summarized")
                     result[idx] = msg_copy
 
-                    new_tokens = token_counter(model=llm_model, messages=[msg_copy])
+                    new_tokens = count_message_tokens(llm_model, msg_copy)
                     tokens_saved = max(0, original_tokens - new_tokens)
                     total_tokens_saved += tokens_saved
                     summarized_count += 1
@@ -668,10 +725,7 @@ Message:
                     failed_count += 1
                     continue
 
-            if system_prompt:
-                new_token_count = token_counter(model=llm_model, messages=[system_prompt] + result)
-            else:
-                new_token_count = token_counter(model=llm_model, messages=result)
+            new_token_count = count_messages_tokens(llm_model, result, system_prompt)
 
             logger.info(
                 "✅ Summarization complete: summarized=%s, failures=%s, tokens %s -> %s (Δ ~%s)",
@@ -732,10 +786,7 @@ Message:
 
         truncated_now = tool_truncated + user_truncated + assistant_truncated
 
-        if system_prompt:
-            compressed_total = token_counter(model=llm_model, messages=[system_prompt] + result)
-        else:
-            compressed_total = token_counter(model=llm_model, messages=result)
+        compressed_total = count_messages_tokens(llm_model, result, system_prompt)
 
         logger.info(
             "Deterministic truncation: tokens %s -> %s (tool=%s, user=%s, assistant=%s)",
@@ -803,27 +854,18 @@ Message:
             )
             result = recursive_result
             report = recursive_report
-            if system_prompt:
-                final_total = token_counter(model=llm_model, messages=[system_prompt] + result)
-            else:
-                final_total = token_counter(model=llm_model, messages=result)
+            final_total = count_messages_tokens(llm_model, result, system_prompt)
         else:
             final_total = uncompressed_total_token_count
 
         capped_before_messages = len(result)
         if capped_before_messages > 320:
-            if system_prompt:
-                tokens_before_cap = token_counter(model=llm_model, messages=[system_prompt] + result)
-            else:
-                tokens_before_cap = token_counter(model=llm_model, messages=result)
+            tokens_before_cap = count_messages_tokens(llm_model, result, system_prompt)
             capped_result = self.middle_out_messages(result)
             removed = capped_before_messages - len(capped_result)
             if removed > 0:
                 report.removed_messages += removed
-                if system_prompt:
-                    tokens_after_cap = token_counter(model=llm_model, messages=[system_prompt] + capped_result)
-                else:
-                    tokens_after_cap = token_counter(model=llm_model, messages=capped_result)
+                tokens_after_cap = count_messages_tokens(llm_model, capped_result, system_prompt)
                 report.add_phase(
                     "middle_out_cap",
                     tokens_before=tokens_before_cap,
@@ -869,10 +911,7 @@ Message:
         result = self.remove_meta_messages(result)
 
         # Early exit if no compression needed
-        if system_prompt:
-            initial_token_count = token_counter(model=llm_model, messages=[system_prompt] + result)
-        else:
-            initial_token_count = token_counter(model=llm_model, messages=result)
+        initial_token_count = count_messages_tokens(llm_model, result, system_prompt)
         
         max_allowed_tokens = max_tokens or (100 * 1000)
         
@@ -909,17 +948,13 @@ Message:
                     break
 
             # Recalculate token count
-            messages_to_count = ([system_message] + conversation_messages) if system_message else conversation_messages
-            current_token_count = token_counter(model=llm_model, messages=messages_to_count)
+            current_token_count = count_messages_tokens(llm_model, conversation_messages, system_message)
 
         # Prepare final result - return only conversation messages (matches compress_messages pattern)
         final_messages = conversation_messages
         
         # Log with system prompt included for accurate token reporting
-        if system_message:
-            final_token_count = token_counter(model=llm_model, messages=[system_message] + final_messages)
-        else:
-            final_token_count = token_counter(model=llm_model, messages=final_messages)
+        final_token_count = count_messages_tokens(llm_model, final_messages, system_message)
         
         logger.info(f"Context compression (omit): {initial_token_count} -> {final_token_count} tokens ({len(messages)} -> {len(final_messages)} messages)")
             
@@ -0,0 +1,194 @@
+"""
+Per-thread cache of parsed LLM messages for AgentPress.
+
+Every auto-continue iteration used to re-page the whole ``messages`` table for
+the thread and ``json.loads`` every row, even though only a handful of rows were
+appended since the previous iteration. ``ThreadMessageCache`` keeps the parsed
+messages of a thread together with a ``created_at`` high-water mark and only
+fetches rows at or after that mark on subsequent calls.
+
+Coherence:
+- Rows inserted through ``ThreadManager.add_message`` are recorded directly.
+- Rows updated or deleted in place (summary rewrites, message deletion) must
+  call ``invalidate`` locally or ``invalidate_thread_messages`` from another
+  process; the latter bumps a Redis version key that every cache checks.
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+
+from core.services import redis
+from core.utils.logger import logger
+
+MESSAGE_CACHE_VERSION_KEY = "thread_messages_version:{thread_id}"
+MESSAGE_CACHE_VERSION_TTL = 3600 * 24
+
+# Rows committed slightly out of created_at order are still picked up by
+# re-reading a small window before the high-water mark (deduped by message_id).
+HIGH_WATER_MARK_OVERLAP = timedelta(seconds=5)
+
+FETCH_BATCH_SIZE = 1000
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_message_row(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Convert a ``messages`` row into the LLM message dict used by the thread manager."""
+    content = item.get('content')
+    if isinstance(content, str):
+        try:
+            parsed_item = json.loads(content)
+        except json.JSONDecodeError:
+            logger.error(f"Failed to parse message: {content}")
+            return None
+    elif isinstance(content, dict):
+        parsed_item = dict(content)
+    else:
+        return None
+    parsed_item['message_id'] = item['message_id']
+    return parsed_item
+
+
+@dataclass
+class _ThreadEntry:
+    version: Optional[str]
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    created_at: List[Optional[datetime]] = field(default_factory=list)
+    message_ids: Set[str] = field(default_factory=set)
+    high_water_mark: Optional[datetime] = None
+
+    def add(self, row: Dict[str, Any]) -> bool:
+        """Add a row, keeping created_at order. Returns False for duplicates."""
+        message_id = row.get('message_id')
+        if not message_id or message_id in self.message_ids:
+            return False
+        parsed = parse_message_row(row)
+        if parsed is None:
+            return False
+
+        created_at = _parse_timestamp(row.get('created_at'))
+        self.message_ids.add(message_id)
+
+        if created_at is None or not self.created_at or self.created_at[-1] is None or created_at >= self.created_at[-1]:
+            self.messages.append(parsed)
+            self.created_at.append(created_at)
+        else:
+            # Late-committed row: insert at its created_at position
+            index = len(self.created_at)
+            while index > 0 and self.created_at[index - 1] is not None and self.created_at[index - 1] > created_at:
+                index -= 1
+            self.messages.insert(index, parsed)
+            self.created_at.insert(index, created_at)
+
+        if created_at and (self.high_water_mark is None or created_at > self.high_water_mark):
+            self.high_water_mark = created_at
+        return True
+
+
+class ThreadMessageCache:
+    """Incrementally refreshed cache of LLM messages, keyed by thread.
+
+    One instance lives on each ``ThreadManager`` (i.e. per agent run).
+    ``get_messages`` returns shallow copies of the cached messages so callers
+    can reassign message fields (context compression does) without corrupting
+    the cache.
+    """
+
+    def __init__(self, use_redis_version: bool = True):
+        self.use_redis_version = use_redis_version
+        self._entries: Dict[str, _ThreadEntry] = {}
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        self.rows_fetched = 0
+
+    async def _remote_version(self, thread_id: str) -> Optional[str]:
+        if not self.use_redis_version:
+            return None
+        try:
+            return await redis.get(MESSAGE_CACHE_VERSION_KEY.format(thread_id=thread_id))
+        except Exception as e:
+            logger.warning(f"Failed to read message cache version for thread {thread_id}: {e}")
+            return None
+
+    async def _fetch_rows(self, client, thread_id: str, since: Optional[datetime]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        offset = 0
+        while True:
+            query = client.table('messages').select('message_id, type, content, created_at').eq('thread_id', thread_id).eq('is_llm_message', True)
+            if since is not None:
+                query = query.gte('created_at', (since - HIGH_WATER_MARK_OVERLAP).isoformat())
+            result = await query.order('created_at').range(offset, offset + FETCH_BATCH_SIZE - 1).execute()
+
+            if not result.data:
+                break
+
+            rows.extend(result.data)
+            if len(result.data) < FETCH_BATCH_SIZE:
+                break
+            offset += FETCH_BATCH_SIZE
+        self.rows_fetched += len(rows)
+        return rows
+
+    async def get_messages(self, client, thread_id: str) -> List[Dict[str, Any]]:
+        """Return all LLM messages for the thread, fetching only rows newer than the cached ones."""
+        version = await self._remote_version(thread_id)
+        entry = self._entries.get(thread_id)
+
+        if entry is None or entry.version != version:
+            entry = _ThreadEntry(version=version)
+            rows = await self._fetch_rows(client, thread_id, since=None)
+            self.full_fetches += 1
+        else:
+            rows = await self._fetch_rows(client, thread_id, since=entry.high_water_mark)
+            self.incremental_fetches += 1
+
+        added = sum(1 for row in rows if entry.add(row))
+        self._entries[thread_id] = entry
+        logger.debug(f"Message cache for thread {thread_id}: {len(rows)} rows fetched, {added} new, {len(entry.messages)} total")
+
+        return [dict(message) for message in entry.messages]
+
+    def record_message(self, thread_id: str, saved_message: Dict[str, Any]) -> None:
+        """Record a row just inserted by this process so it is not fetched and parsed again."""
+        entry = self._entries.get(thread_id)
+        if entry is None or not saved_message or not saved_message.get('is_llm_message'):
+            return
+        entry.add(saved_message)
+
+    def invalidate(self, thread_id: Optional[str] = None) -> None:
+        """Drop cached messages for one thread (or all threads)."""
+        if thread_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(thread_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "threads": len(self._entries),
+            "full_fetches": self.full_fetches,
+            "incremental_fetches": self.incremental_fetches,
+            "rows_fetched": self.rows_fetched,
+        }
+
+
+async def invalidate_thread_messages(thread_id: str) -> None:
+    """Invalidate every process' cached messages for a thread.
+
+    Used when rows are updated or deleted outside the running ``ThreadManager``.
+    """
+    try:
+        redis_client = await redis.get_client()
+        key = MESSAGE_CACHE_VERSION_KEY.format(thread_id=thread_id)
+        await redis_client.incr(key)
+        await redis_client.expire(key, MESSAGE_CACHE_VERSION_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to invalidate message cache for thread {thread_id}: {e}")
@@ -0,0 +1,131 @@
+"""
+Precompiled system-prompt artifacts.
+
+Every agent run used to reassemble its system prompt from scratch, including a
+``json.dumps(..., indent=2)`` of every registered tool schema, and put the
+current date in the middle of it, which changed the prompt prefix and defeated
+provider-side prefix caching.
+
+The static part of the prompt (base prompt, builder prompt, knowledge base,
+MCP instructions, tool schemas, adaptive input guidance) is rendered once per
+``(agent version, tool set, MCP config, knowledge base, model)`` and kept in an
+in-process LRU. Volatile content is appended after it, so the prefix sent to
+the provider stays byte-identical between runs. Each artifact carries a hash
+of its prefix so provider cache hit rates can be correlated per agent.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional
+
+from core.utils.logger import logger
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+def content_hash(payload: str) -> str:
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def mcp_config_hash(agent_config: Optional[Dict[str, Any]], mcp_function_names: Iterable[str] = ()) -> str:
+    if not agent_config:
+        return "none"
+    payload = json.dumps(
+        {
+            "configured": agent_config.get("configured_mcps") or [],
+            "custom": agent_config.get("custom_mcps") or [],
+            "tools": sorted(mcp_function_names),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return content_hash(payload)
+
+
+def agent_version_key(agent_config: Optional[Dict[str, Any]]) -> str:
+    """Agent version id, or a hash of the inputs for agents without versions."""
+    if not agent_config:
+        return "default"
+    version_id = agent_config.get("current_version_id")
+    if version_id:
+        return str(version_id)
+    payload = json.dumps(
+        {
+            "system_prompt": agent_config.get("system_prompt") or "",
+            "agentpress_tools": agent_config.get("agentpress_tools") or {},
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return f"unversioned:{content_hash(payload)}"
+
+
+@dataclass(frozen=True)
+class PromptArtifact:
+    key: str
+    prefix: str
+    prefix_hash: str
+    built_at: float
+
+
+class PromptArtifactCache:
+    """In-process LRU of rendered static prompt prefixes with per-agent hit counters."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._artifacts: "OrderedDict[str, PromptArtifact]" = OrderedDict()
+        self._agent_stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def artifact_key(
+        agent_version: str,
+        tools_hash: str,
+        mcp_hash: str,
+        model_name: str,
+        knowledge_base_hash: str = "none",
+    ) -> str:
+        return "|".join([agent_version, tools_hash, mcp_hash, knowledge_base_hash, model_name])
+
+    def get(self, key: str, agent_id: Optional[str] = None) -> Optional[PromptArtifact]:
+        artifact = self._artifacts.get(key)
+        counters = self._agent_stats.setdefault(agent_id or "default", {"hits": 0, "misses": 0})
+        if artifact is None:
+            counters["misses"] += 1
+            return None
+        self._artifacts.move_to_end(key)
+        counters["hits"] += 1
+        return artifact
+
+    def put(self, key: str, prefix: str) -> PromptArtifact:
+        artifact = PromptArtifact(key=key, prefix=prefix, prefix_hash=content_hash(prefix), built_at=time.time())
+        self._artifacts[key] = artifact
+        self._artifacts.move_to_end(key)
+        while len(self._artifacts) > self.max_entries:
+            evicted, _ = self._artifacts.popitem(last=False)
+            logger.debug(f"Evicted prompt artifact {evicted}")
+        return artifact
+
+    def clear(self) -> None:
+        self._artifacts.clear()
+        self._agent_stats.clear()
+
+    def stats(self, agent_id: Optional[str] = None) -> Dict[str, Any]:
+        if agent_id is not None:
+            counters = self._agent_stats.get(agent_id, {"hits": 0, "misses": 0})
+            total = counters["hits"] + counters["misses"]
+            return {**counters, "hit_rate": round(counters["hits"] / total, 4) if total else 0.0}
+        hits = sum(c["hits"] for c in self._agent_stats.values())
+        misses = sum(c["misses"] for c in self._agent_stats.values())
+        total = hits + misses
+        return {
+            "entries": len(self._artifacts),
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+
+prompt_artifacts = PromptArtifactCache()
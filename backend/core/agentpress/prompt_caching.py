@@ -10,16 +10,19 @@ from __future__ import annotations
 
 import copy
 import hashlib
+import json
 import math
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 from core.utils.logger import logger
 
-try:  # Import lazily so unit tests can stub token counting
-    from litellm import token_counter  # type: ignore
-except Exception:  # pragma: no cover - LiteLLM may be unavailable in tests
-    token_counter = None  # type: ignore
+from core.agentpress.token_cache import (
+    count_messages_tokens,
+    count_text_tokens,
+    message_digest,
+    token_count_cache,
+)
 
 
 @dataclass
@@ -48,6 +51,7 @@ class GeminiCacheReport:
     cached_token_estimate: int
     final_prompt_tokens: int
     estimated_prompt_tokens_after_cache: int
+    reused_blocks: int = 0
     notes: List[str] = field(default_factory=list)
     chunks: List[CacheChunkDiagnostics] = field(default_factory=list)
 
@@ -77,6 +81,7 @@ class GeminiCacheReport:
             "cached_token_estimate": self.cached_token_estimate,
             "final_prompt_tokens": self.final_prompt_tokens,
             "estimated_prompt_tokens_after_cache": self.estimated_prompt_tokens_after_cache,
+            "reused_blocks": self.reused_blocks,
             "notes": self.notes,
             "chunks": [
                 {
@@ -110,6 +115,57 @@ class CacheBlockPlan:
     ttl_seconds: int
 
 
+@dataclass
+class FrozenCacheBlock:
+    message_ids: List[str]
+    fingerprint: str
+    token_count: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "message_ids": self.message_ids,
+            "fingerprint": self.fingerprint,
+            "token_count": self.token_count,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FrozenCacheBlock":
+        return cls(
+            message_ids=list(data.get("message_ids") or []),
+            fingerprint=str(data.get("fingerprint") or ""),
+            token_count=int(data.get("token_count") or 0),
+        )
+
+
+@dataclass
+class CacheBlockLayout:
+    """Cache blocks already emitted for a thread, kept stable across turns.
+
+    Frozen blocks are replayed verbatim while their messages are still present
+    and unchanged, so the provider keeps seeing the same prefix. New blocks are
+    only appended once enough fresh historical tokens have accumulated.
+    """
+
+    model: str
+    blocks: List[FrozenCacheBlock] = field(default_factory=list)
+    revision: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "revision": self.revision,
+            "blocks": [block.to_dict() for block in self.blocks],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CacheBlockLayout":
+        return cls(
+            model=str(data.get("model") or ""),
+            revision=int(data.get("revision") or 0),
+            blocks=[FrozenCacheBlock.from_dict(block) for block in data.get("blocks") or []],
+        )
+
+
 def get_resolved_model_id(model_name: str) -> str:
     """Resolve model name to canonical ID through the registry."""
     try:
@@ -136,18 +192,10 @@ def is_gemini_model(model_name: str) -> bool:
 
 
 def _safe_token_count(model: str, messages: Optional[List[Dict[str, Any]]] = None, text: Optional[str] = None) -> int:
-    if token_counter is None:
-        source = text if text is not None else str(messages)
-        return int(len(source.split()) * 1.3)
-    try:
-        if messages is not None:
-            return token_counter(model=model, messages=messages)
-        if text is not None:
-            return token_counter(model=model, text=text)
-    except Exception as exc:  # pragma: no cover - fallback path when LiteLLM misbehaves
-        logger.warning("Token counting failed for model %s (%s). Falling back to estimate.", model, exc)
-        source = text if text is not None else str(messages)
-        return int(len(source.split()) * 1.3)
+    if messages is not None:
+        return count_messages_tokens(model, messages)
+    if text is not None:
+        return count_text_tokens(model, text)
     return 0
 
 
@@ -157,7 +205,7 @@ def _estimate_token_count(text: str, model: str) -> int:
     return _safe_token_count(model=model, text=text)
 
 
-def get_message_token_count(message: Dict[str, Any], model: str) -> int:
+def _count_content_tokens(message: Dict[str, Any], model: str) -> int:
     content = message.get("content", "")
 
     if isinstance(content, list):
@@ -182,6 +230,13 @@ def get_message_token_count(message: Dict[str, Any], model: str) -> int:
     return _estimate_token_count(str(content), model)
 
 
+def get_message_token_count(message: Dict[str, Any], model: str) -> int:
+    return token_count_cache.get_or_compute(
+        "content", model, message_digest(message),
+        lambda: _count_content_tokens(message, model),
+    )
+
+
 def _extract_plain_text(message: Dict[str, Any]) -> str:
     content = message.get("content", "")
 
@@ -252,6 +307,13 @@ def _fingerprint_payload(base_text: str) -> str:
     return digest[:12]
 
 
+def _message_identity(message: Dict[str, Any]) -> str:
+    message_id = message.get("message_id")
+    if message_id:
+        return str(message_id)
+    return f"sha:{message_digest(message)[:16]}"
+
+
 class GeminiPromptCachePlanner:
     MIN_SYSTEM_CACHE_TOKENS = 512
     MAX_CONVERSATION_CACHE_BLOCKS = 3
@@ -265,12 +327,23 @@ class GeminiPromptCachePlanner:
         self.live_context_max_tokens = max(12_000, int(self.context_window * 0.03))
         self.min_live_messages = 4
         self.max_chunk_tokens = max(8_000, int(self.context_window * 0.04))
+        # Fresh historical tokens required before a new frozen block is appended
+        self.min_append_tokens = max(self.MIN_CHUNK_TOKENS, self.max_chunk_tokens // 4)
+        # Past this size the newest block stops absorbing new messages
+        self.max_block_tokens = self.max_chunk_tokens * 4
 
     def assemble(
         self,
         system_prompt: Dict[str, Any],
         conversation_messages: List[Dict[str, Any]],
+        layout: Optional[CacheBlockLayout] = None,
     ) -> PreparedPrompt:
+        """Build the cached prompt.
+
+        When ``layout`` is given the planner runs in append-only mode: blocks
+        recorded in the layout are reused as-is and the layout is updated in
+        place with the blocks emitted for this turn.
+        """
         if not conversation_messages:
             tokens = get_message_token_count(system_prompt, self.model_name)
             report = GeminiCacheReport(
@@ -336,7 +409,16 @@ class GeminiPromptCachePlanner:
             logger.debug("Gemini caching diagnostics: %s", report.to_dict())
             return PreparedPrompt(messages=prepared, report=report)
 
-        plans = self._build_chunk_plans(historical)
+        uncached_history: List[Dict[str, Any]] = []
+        if layout is not None:
+            plans, uncached_history, reused = self._build_stable_chunk_plans(historical, layout)
+            report.reused_blocks = reused
+            report.notes.append(
+                f"Stable layout: reused {reused} frozen block(s), {len(plans) - reused} new/extended, "
+                f"{len(uncached_history)} historical message(s) waiting for the next block."
+            )
+        else:
+            plans = self._build_chunk_plans(historical)
         report.cached_blocks += len(plans)
         if small_history and plans:
             report.notes.append(
@@ -377,6 +459,7 @@ class GeminiPromptCachePlanner:
             report.notes.append(
                 f"Historical context cached into {len(plans)} block(s) (~{report.cached_token_estimate:,} cached tokens)."
             )
+            prepared.extend(uncached_history)
 
         prepared.extend(copy.deepcopy(live))
 
@@ -480,6 +563,78 @@ class GeminiPromptCachePlanner:
 
         return chunk_plans[:available_blocks]
 
+    def _build_stable_chunk_plans(
+        self,
+        messages: List[Dict[str, Any]],
+        layout: CacheBlockLayout,
+    ) -> Tuple[List[CacheBlockPlan], List[Dict[str, Any]], int]:
+        """Reuse frozen blocks and append new ones without moving existing boundaries.
+
+        Returns (plans, uncached_history, reused_block_count). Historical messages
+        after the last block stay uncached until they reach ``min_append_tokens``.
+        When the block limit is reached the new messages are merged into the
+        newest block, so every older block keeps its fingerprint. Once that
+        would take the newest block past ``max_block_tokens`` the two oldest
+        blocks are merged instead and the new messages start a fresh block, so
+        every block but the oldest keeps its bytes and stays within the cap.
+        """
+        if layout.model != self.model_name:
+            layout.model = self.model_name
+            layout.blocks = []
+
+        identities = [_message_identity(message) for message in messages]
+        plans: List[CacheBlockPlan] = []
+        position = 0
+
+        for block in layout.blocks:
+            end = position + len(block.message_ids)
+            if not block.message_ids or identities[position:end] != block.message_ids:
+                break
+            plan = self._create_chunk_plan(messages[position:end])
+            if plan.fingerprint != block.fingerprint:
+                break
+            plans.append(plan)
+            position = end
+
+        reused = len(plans)
+        tail = messages[position:]
+        uncached: List[Dict[str, Any]] = []
+
+        if tail:
+            if not plans:
+                plans = self._build_chunk_plans(tail)
+            else:
+                tail_tokens = sum(max(1, get_message_token_count(m, self.model_name)) for m in tail)
+                if tail_tokens < self.min_append_tokens:
+                    uncached = tail
+                elif len(plans) < self.MAX_CONVERSATION_CACHE_BLOCKS:
+                    plans.append(self._create_chunk_plan(tail))
+                elif len(plans) == 1 or plans[-1].token_count + tail_tokens <= self.max_block_tokens:
+                    reused -= 1
+                    plans[-1] = self._create_chunk_plan(plans[-1].messages + tail)
+                else:
+                    reused -= 2
+                    # Roll the boundary forward: the two oldest blocks become one, the rest keep their bytes
+                    plans = [
+                        self._create_chunk_plan(plans[0].messages + plans[1].messages),
+                        *plans[2:],
+                        self._create_chunk_plan(tail),
+                    ]
+
+        new_blocks = [
+            FrozenCacheBlock(
+                message_ids=[_message_identity(m) for m in plan.messages],
+                fingerprint=plan.fingerprint,
+                token_count=plan.token_count,
+            )
+            for plan in plans
+        ]
+        if [b.fingerprint for b in new_blocks] != [b.fingerprint for b in layout.blocks]:
+            layout.blocks = new_blocks
+            layout.revision += 1
+
+        return plans, uncached, max(0, reused)
+
     def _create_chunk_plan(self, messages: List[Dict[str, Any]]) -> CacheBlockPlan:
         token_count = sum(max(1, get_message_token_count(m, self.model_name)) for m in messages)
         payload, fingerprint = self._render_chunk_text(messages)
@@ -546,6 +701,7 @@ def apply_prompt_caching_strategy(
     context_window_tokens: Optional[int] = None,
     cache_threshold_tokens: Optional[int] = None,
     return_report: bool = False,
+    block_layout: Optional[CacheBlockLayout] = None,
 ) -> Union[List[Dict[str, Any]], Tuple[List[Dict[str, Any]], GeminiCacheReport]]:
     del cache_threshold_tokens
 
@@ -602,7 +758,7 @@ def apply_prompt_caching_strategy(
                 context_window_tokens = 1_000_000
 
         planner = GeminiPromptCachePlanner(model_name, context_window_tokens)
-        prepared = planner.assemble(working_system_prompt, conversation_messages)
+        prepared = planner.assemble(working_system_prompt, conversation_messages, layout=block_layout)
         prepared_messages = prepared.messages
         report = prepared.report
 
@@ -628,6 +784,39 @@ def apply_prompt_caching_strategy(
     return prepared_messages
 
 
+CACHE_LAYOUT_KEY = "prompt_cache_layout:{thread_id}"
+CACHE_LAYOUT_TTL_SECONDS = 6 * 60 * 60
+
+
+async def load_cache_block_layout(thread_id: str, model_name: str) -> CacheBlockLayout:
+    """Load the frozen cache block layout for a thread (empty layout if none)."""
+    try:
+        from core.services import redis
+
+        raw = await redis.get(CACHE_LAYOUT_KEY.format(thread_id=thread_id))
+        if raw:
+            layout = CacheBlockLayout.from_dict(json.loads(raw))
+            if layout.model == model_name:
+                return layout
+    except Exception as exc:
+        logger.warning("Failed to load cache block layout for thread %s: %s", thread_id, exc)
+    return CacheBlockLayout(model=model_name)
+
+
+async def save_cache_block_layout(thread_id: str, layout: CacheBlockLayout) -> None:
+    """Persist the frozen cache block layout so later runs reuse the same blocks."""
+    try:
+        from core.services import redis
+
+        await redis.set(
+            CACHE_LAYOUT_KEY.format(thread_id=thread_id),
+            json.dumps(layout.to_dict()),
+            ex=CACHE_LAYOUT_TTL_SECONDS,
+        )
+    except Exception as exc:
+        logger.warning("Failed to save cache block layout for thread %s: %s", thread_id, exc)
+
+
 def validate_cache_blocks(
     messages: List[Dict[str, Any]],
     model_name: str,
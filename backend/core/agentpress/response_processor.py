@@ -19,6 +19,7 @@ from core.utils.logger import logger
 from core.agentpress.tool import ToolResult
 from core.agentpress.tool_registry import ToolRegistry
 from core.agentpress.xml_tool_parser import XMLToolParser
+from core.agentpress.xml_stream_scanner import XMLToolCallScanner
 from core.agentpress.error_processor import ErrorProcessor
 from langfuse.client import StatefulTraceClient
 from core.services.langfuse import langfuse
@@ -27,6 +28,7 @@ from core.utils.json_helpers import (
     to_json_string, format_for_yield
 )
 from litellm import token_counter
+from core.agentpress.token_cache import count_messages_tokens
 
 # Type alias for XML result adding strategy
 XmlAddingStrategy = Literal["user_message", "assistant_message", "inline_edit"]
@@ -124,7 +126,7 @@ class ResponseProcessor:
         This is critical for billing on timeouts, crashes, disconnects, etc.
         """
         try:
-            prompt_tokens = token_counter(model=llm_model, messages=prompt_messages)
+            prompt_tokens = count_messages_tokens(llm_model, prompt_messages)
             completion_tokens = token_counter(model=llm_model, text=accumulated_content) if accumulated_content else 0
             
             logger.warning(f"⚠️ ESTIMATED TOKEN USAGE (no exact data): prompt={prompt_tokens}, completion={completion_tokens}")
@@ -256,7 +258,7 @@ class ResponseProcessor:
         continuous_state = continuous_state or {}
         accumulated_content = continuous_state.get('accumulated_content', "")
         tool_calls_buffer = {}
-        current_xml_content = accumulated_content   # equal to accumulated_content if auto-continuing, else blank
+        xml_scanner = XMLToolCallScanner(accumulated_content)   # seeded with accumulated_content if auto-continuing
         xml_chunks_buffer = []
         pending_tool_executions = []
         yielded_tool_indices = set() # Stores indices of tools whose *status* has been yielded
@@ -370,8 +372,6 @@ class ResponseProcessor:
                         # print(chunk_content, end='', flush=True)
                         # logger.debug(f"About to concatenate chunk_content (type={type(chunk_content)}) to accumulated_content (type={type(accumulated_content)})")
                         accumulated_content += chunk_content
-                        # logger.debug(f"About to concatenate chunk_content (type={type(chunk_content)}) to current_xml_content (type={type(current_xml_content)})")
-                        current_xml_content += chunk_content
 
                         if not (config.max_xml_tool_calls > 0 and xml_tool_call_count >= config.max_xml_tool_calls):
                             # Yield ONLY content chunk (don't save)
@@ -391,9 +391,8 @@ class ResponseProcessor:
 
                         # --- Process XML Tool Calls (if enabled and limit not reached) ---
                         if config.xml_tool_calling and not (config.max_xml_tool_calls > 0 and xml_tool_call_count >= config.max_xml_tool_calls):
-                            xml_chunks = self._extract_xml_chunks(current_xml_content)
+                            xml_chunks = xml_scanner.feed(chunk_content)
                             for xml_chunk in xml_chunks:
-                                current_xml_content = current_xml_content.replace(xml_chunk, "", 1)
                                 xml_chunks_buffer.append(xml_chunk)
                                 result = self._parse_xml_tool_call(xml_chunk)
                                 if result:
@@ -646,9 +645,7 @@ class ResponseProcessor:
                  # Gather XML tool calls from buffer (up to limit)
                 parsed_xml_data = []
                 if config.xml_tool_calling:
-                    # Reparse remaining content just in case (should be empty if processed correctly)
-                    xml_chunks = self._extract_xml_chunks(current_xml_content)
-                    xml_chunks_buffer.extend(xml_chunks)
+                    # The incremental scanner already emitted every complete block during the stream
                     # Process only chunks not already handled in the stream loop
                     remaining_limit = config.max_xml_tool_calls - xml_tool_call_count if config.max_xml_tool_calls > 0 else len(xml_chunks_buffer)
                     xml_chunks_to_process = xml_chunks_buffer[:remaining_limit] # Ensure limit is respected
@@ -1269,17 +1266,15 @@ class ResponseProcessor:
             # If no new format found, fall back to old format for backwards compatibility
             if not chunks:
                 pos = 0
+                # Function names as potential tag names (underscore to dash), precomputed by the registry
+                tag_names = self.tool_registry.get_xml_tag_names()
                 while pos < len(content):
                     # Find the next tool tag
                     next_tag_start = -1
                     current_tag = None
                     
                     # Find the earliest occurrence of any registered tool function name
-                    # Check for available function names
-                    available_functions = self.tool_registry.get_available_functions()
-                    for func_name in available_functions.keys():
-                        # Convert function name to potential tag name (underscore to dash)
-                        tag_name = func_name.replace('_', '-')
+                    for tag_name in tag_names:
                         start_pattern = f'<{tag_name}'
                         tag_pos = content.find(start_pattern, pos)
                         
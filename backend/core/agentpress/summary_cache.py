@@ -0,0 +1,82 @@
+"""
+Content-addressed cache of message summaries for context compression.
+
+Summaries produced by ``ContextManager`` are keyed by a hash of everything that
+goes into the summarization prompt (model, role, text, token budget), so the
+same message or tool output is summarized at most once: across iterations of a
+run through the in-process LRU, and across runs and workers through Redis.
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from core.services import redis
+from core.utils.config import config
+from core.utils.logger import logger
+
+SUMMARY_CACHE_KEY = "context_summary:{digest}"
+DEFAULT_MAX_ENTRIES = 4096
+
+
+def summary_digest(model: str, role: str, text: str, max_tokens: int) -> str:
+    payload = f"{model}\x00{role}\x00{max_tokens}\x00{text}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """Two-level (process LRU + Redis) cache of summaries keyed by digest."""
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, digest: str, summary: str) -> None:
+        self._local[digest] = summary
+        self._local.move_to_end(digest)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get_many(self, digests: Iterable[str]) -> Dict[str, str]:
+        """Return cached summaries for ``digests``, reading Redis once for local misses."""
+        unique = list(dict.fromkeys(digests))
+        found: Dict[str, str] = {}
+        missing = []
+        for digest in unique:
+            summary = self._local.get(digest)
+            if summary is not None:
+                self._local.move_to_end(digest)
+                found[digest] = summary
+            else:
+                missing.append(digest)
+
+        if missing:
+            try:
+                values = await redis.mget([SUMMARY_CACHE_KEY.format(digest=d) for d in missing])
+            except Exception as e:
+                logger.warning(f"Failed to read summary cache: {e}")
+                values = [None] * len(missing)
+            for digest, summary in zip(missing, values):
+                if summary is not None:
+                    self._remember(digest, summary)
+                    found[digest] = summary
+
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    async def set(self, digest: str, summary: str) -> None:
+        self._remember(digest, summary)
+        try:
+            await redis.set(SUMMARY_CACHE_KEY.format(digest=digest), summary, ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write summary cache: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._local), "hits": self.hits, "misses": self.misses}
+
+
+summary_cache = SummaryCache(ttl=config.CONTEXT_SUMMARY_CACHE_TTL)
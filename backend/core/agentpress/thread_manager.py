@@ -7,10 +7,18 @@ import time
 from collections import deque
 from typing import List, Dict, Any, Optional, Type, Union, AsyncGenerator, Literal, cast
 from core.services.llm import make_llm_api_call, LLMError
-from core.agentpress.prompt_caching import apply_prompt_caching_strategy, validate_cache_blocks
+from core.agentpress.prompt_caching import (
+    CacheBlockLayout,
+    apply_prompt_caching_strategy,
+    load_cache_block_layout,
+    save_cache_block_layout,
+    validate_cache_blocks,
+)
 from core.agentpress.tool import Tool
 from core.agentpress.tool_registry import ToolRegistry
 from core.agentpress.context_manager import ContextManager
+from core.agentpress.message_cache import ThreadMessageCache
+from core.agentpress.token_cache import count_messages_tokens, token_count_cache
 from core.agentpress.response_processor import ResponseProcessor, ProcessorConfig
 from core.agentpress.error_processor import ErrorProcessor
 from core.services.supabase import DBConnection
@@ -19,7 +27,6 @@ from langfuse.client import StatefulGenerationClient, StatefulTraceClient
 from core.services.langfuse import langfuse
 from datetime import datetime, timezone
 from core.billing.billing_integration import billing_integration
-from litellm.utils import token_counter
 
 ToolChoice = Literal["auto", "required", "none"]
 
@@ -89,6 +96,15 @@ class ThreadManager:
         self.boundary_message_id = None  # Message ID of first message kept fresh (not summarized) - persisted in DB
         self.current_summary = None  # Cache for current summary (loaded from DB when needed)
 
+        # Parsed LLM messages per thread, refreshed incrementally between iterations
+        self.message_cache = ThreadMessageCache()
+
+        # Frozen Gemini cache block layouts per thread (persisted in Redis between runs)
+        self.cache_block_layouts: Dict[str, CacheBlockLayout] = {}
+
+        # Billing account per thread (a thread's account never changes)
+        self._thread_accounts: Dict[str, str] = {}
+
     def add_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
         """Add a tool to the ThreadManager."""
         self.tool_registry.register_tool(tool_class, function_names, **kwargs)
@@ -160,6 +176,7 @@ class ThreadManager:
 
             if result.data and len(result.data) > 0 and 'message_id' in result.data[0]:
                 saved_message = result.data[0]
+                self.message_cache.record_message(thread_id, saved_message)
                 
                 if type == "llm_response_end" and isinstance(content, dict):
                     await self._handle_billing(thread_id, content, saved_message)
@@ -204,9 +221,13 @@ class ThreadManager:
                 cache_creation_tokens,
             )
             
-            client = await self.db.client
-            thread_row = await client.table('threads').select('account_id').eq('thread_id', thread_id).limit(1).execute()
-            user_id = thread_row.data[0]['account_id'] if thread_row.data and len(thread_row.data) > 0 else None
+            user_id = self._thread_accounts.get(thread_id)
+            if user_id is None:
+                client = await self.db.client
+                thread_row = await client.table('threads').select('account_id').eq('thread_id', thread_id).limit(1).execute()
+                user_id = thread_row.data[0]['account_id'] if thread_row.data and len(thread_row.data) > 0 else None
+                if user_id:
+                    self._thread_accounts[thread_id] = user_id
             
             if user_id and (prompt_tokens > 0 or completion_tokens > 0):
 
@@ -253,47 +274,19 @@ class ThreadManager:
             logger.error(f"Error handling billing: {str(e)}", exc_info=True)
 
     async def get_llm_messages(self, thread_id: str) -> List[Dict[str, Any]]:
-        """Get all messages for a thread."""
+        """Get all messages for a thread.
+
+        Served from the per-run message cache, which only fetches rows newer
+        than the ones already parsed.
+        """
         logger.debug(f"Getting messages for thread {thread_id}")
         client = await self.db.client
 
         try:
-            all_messages = []
-            batch_size = 1000
-            offset = 0
-            
-            while True:
-                result = await client.table('messages').select('message_id, type, content').eq('thread_id', thread_id).eq('is_llm_message', True).order('created_at').range(offset, offset + batch_size - 1).execute()
-                
-                if not result.data:
-                    break
-                    
-                all_messages.extend(result.data)
-                if len(result.data) < batch_size:
-                    break
-                offset += batch_size
-
-            if not all_messages:
-                return []
-
-            messages = []
-            for item in all_messages:
-                if isinstance(item['content'], str):
-                    try:
-                        parsed_item = json.loads(item['content'])
-                        parsed_item['message_id'] = item['message_id']
-                        messages.append(parsed_item)
-                    except json.JSONDecodeError:
-                        logger.error(f"Failed to parse message: {item['content']}")
-                else:
-                    content = item['content']
-                    content['message_id'] = item['message_id']
-                    messages.append(content)
-
-            return messages
-
+            return await self.message_cache.get_messages(client, thread_id)
         except Exception as e:
             logger.error(f"Failed to get messages for thread {thread_id}: {str(e)}", exc_info=True)
+            self.message_cache.invalidate(thread_id)
             return []
     
     def _is_summary_message(self, msg: Dict[str, Any]) -> bool:
@@ -727,6 +720,8 @@ Conversation context to summarize:
                 
                 if update_result.data:
                     logger.info(f"Updated existing summary message {existing_summary_id} for thread {thread_id} (version {metadata['version']})")
+                    # The summary row was rewritten in place, so cached content is stale
+                    self.message_cache.invalidate(thread_id)
                     self.boundary_message_id = boundary_message_id
                     # Update cache with new summary content
                     self.current_summary = summary_content
@@ -886,6 +881,7 @@ Conversation context to summarize:
             # ===== CENTRAL CONFIGURATION =====
             ENABLE_CONTEXT_MANAGER = True   # Set to False to disable context compression
             ENABLE_PROMPT_CACHING = True    # Set to False to disable prompt caching
+            ENABLE_STABLE_CACHE_BLOCKS = True  # Set to False to recompute cache block boundaries every turn
             # ==================================
 
             # Apply context compression
@@ -912,12 +908,23 @@ Conversation context to summarize:
             # Apply caching
             cache_report = None
             if ENABLE_PROMPT_CACHING:
+                block_layout = None
+                if ENABLE_STABLE_CACHE_BLOCKS:
+                    block_layout = self.cache_block_layouts.get(thread_id)
+                    if block_layout is None or block_layout.model != llm_model:
+                        block_layout = await load_cache_block_layout(thread_id, llm_model)
+                        self.cache_block_layouts[thread_id] = block_layout
+                layout_revision = block_layout.revision if block_layout else None
+
                 prepared_messages, cache_report = apply_prompt_caching_strategy(
                     system_prompt,
                     messages,
                     llm_model,
                     return_report=True,
+                    block_layout=block_layout,
                 )
+                if block_layout is not None and block_layout.revision != layout_revision:
+                    await save_cache_block_layout(thread_id, block_layout)
                 prepared_messages = validate_cache_blocks(prepared_messages, llm_model)
                 if cache_report:
                     logger.info(f"🧊 Gemini caching summary: {cache_report.summary_line()}")
@@ -957,8 +964,9 @@ Conversation context to summarize:
                     logger.warning(f"Failed to update Langfuse generation: {e}")
 
             # Log final prepared messages token count
-            final_prepared_tokens = token_counter(model=llm_model, messages=prepared_messages)
+            final_prepared_tokens = count_messages_tokens(llm_model, prepared_messages)
             logger.info(f"📤 Final prepared messages being sent to LLM: {final_prepared_tokens} tokens")
+            logger.debug(f"Token count cache: {token_count_cache.stats()}")
             if cache_report:
                 logger.info(
                     "📉 Estimated fresh tokens after cache reuse: ~%s (raw input %s)",
@@ -0,0 +1,148 @@
+"""
+Memoized token counting for AgentPress.
+
+A single turn counts tokens for the same messages many times (context
+compression, prompt cache planning, final prompt logging). Tokenizing is by far
+the most expensive part of that work, so counts are cached per message keyed by
+(tokenizer, content hash) and list counts are the sum of per-message counts
+instead of re-tokenizing the concatenated list.
+
+The model name is used as the tokenizer key: LiteLLM selects the tokenizer
+from it, so equal keys always produce equal counts.
+"""
+
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.utils.logger import logger
+
+try:  # Import lazily so unit tests can stub token counting
+    from litellm import token_counter  # type: ignore
+except Exception:  # pragma: no cover - LiteLLM may be unavailable in tests
+    token_counter = None  # type: ignore
+
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+def _estimate_without_tokenizer(source: str) -> int:
+    return int(len(source.split()) * 1.3)
+
+
+def message_digest(message: Dict[str, Any]) -> str:
+    """Stable content hash of a message, ignoring fields that never reach the tokenizer."""
+    hashable = {
+        key: value
+        for key, value in message.items()
+        if key != "message_id" and not key.startswith("_")
+    }
+    payload = json.dumps(hashable, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TokenCountCache:
+    """Bounded LRU cache of token counts with hit/miss counters."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[Tuple[str, str, str], int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, kind: str, model: str, digest: str, compute: Callable[[], int]) -> int:
+        key = (kind, model, digest)
+        cached = self._counts.get(key)
+        if cached is not None:
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return cached
+
+        self.misses += 1
+        count = compute()
+        self._counts[key] = count
+        if len(self._counts) > self.max_entries:
+            self._counts.popitem(last=False)
+        return count
+
+    def count_message(self, model: str, message: Dict[str, Any]) -> int:
+        if not isinstance(message, dict):
+            return self.count_text(model, str(message))
+        return self.get_or_compute(
+            "message", model, message_digest(message),
+            lambda: _count_single_message(model, message),
+        )
+
+    def count_messages(self, model: str, messages: List[Dict[str, Any]]) -> int:
+        return sum(self.count_message(model, message) for message in messages if message is not None)
+
+    def count_text(self, model: str, text: str) -> int:
+        if not text:
+            return 0
+        return self.get_or_compute("text", model, _hash_text(text), lambda: _count_text(model, text))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._counts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        self._counts.clear()
+        self.reset_stats()
+
+
+def _count_single_message(model: str, message: Dict[str, Any]) -> int:
+    if token_counter is None:
+        return _estimate_without_tokenizer(str(message))
+    try:
+        return token_counter(model=model, messages=[message])
+    except Exception as exc:
+        logger.warning("Token counting failed for model %s (%s). Falling back to estimate.", model, exc)
+        return _estimate_without_tokenizer(str(message))
+
+
+def _count_text(model: str, text: str) -> int:
+    if token_counter is None:
+        return _estimate_without_tokenizer(text)
+    try:
+        return token_counter(model=model, text=text)
+    except Exception as exc:
+        logger.warning("Token counting failed for model %s (%s). Falling back to estimate.", model, exc)
+        return _estimate_without_tokenizer(text)
+
+
+token_count_cache = TokenCountCache()
+
+
+def count_message_tokens(model: str, message: Dict[str, Any]) -> int:
+    """Token count of a single message (memoized)."""
+    return token_count_cache.count_message(model, message)
+
+
+def count_messages_tokens(
+    model: str,
+    messages: List[Dict[str, Any]],
+    system_prompt: Optional[Dict[str, Any]] = None,
+) -> int:
+    """Token count of a message list, summed from memoized per-message counts."""
+    total = token_count_cache.count_messages(model, messages)
+    if system_prompt:
+        total += token_count_cache.count_message(model, system_prompt)
+    return total
+
+
+def count_text_tokens(model: str, text: str) -> int:
+    """Token count of a plain string (memoized)."""
+    return token_count_cache.count_text(model, text)
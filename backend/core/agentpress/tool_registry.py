@@ -1,105 +1,169 @@
-from typing import Dict, Type, Any, List, Optional, Callable
-from core.agentpress.tool import Tool, SchemaType
+from types import MappingProxyType
+from typing import Dict, Type, Any, List, Optional, Callable, Mapping, NamedTuple, Tuple
+from core.agentpress.tool import Tool, SchemaType, ToolSchema
 from core.utils.logger import logger
+import hashlib
 import json
 
 
+class _RegistryViews(NamedTuple):
+    """Precomputed, read-only views of the registry contents."""
+    functions: Mapping[str, Callable]
+    openapi_schemas: Tuple[Dict[str, Any], ...]
+    xml_tag_names: Tuple[str, ...]
+
+
 class ToolRegistry:
     """Registry for managing and accessing tools.
-    
+
     Maintains a collection of tool instances and their schemas, allowing for
     selective registration of tool functions and easy access to tool capabilities.
-    
+
+    The function map, schema list and XML tag names are built once and reused
+    until the registry is mutated through ``register_tool``,
+    ``register_instance`` or ``remove``.
+
     Attributes:
-        tools (Dict[str, Dict[str, Any]]): OpenAPI-style tools and schemas
-        
+        tools (Mapping[str, Dict[str, Any]]): Read-only view of OpenAPI-style tools and schemas
+
     Methods:
         register_tool: Register a tool with optional function filtering
+        register_instance: Register functions of an existing tool instance
+        remove: Remove registered functions
         get_tool: Get a specific tool by name
         get_openapi_schemas: Get OpenAPI schemas for function calling
+        get_schema_hash: Get a hash identifying the registered schemas
     """
-    
+
     def __init__(self):
         """Initialize a new ToolRegistry instance."""
-        self.tools = {}
+        self._tools: Dict[str, Dict[str, Any]] = {}
+        self._views: Optional[_RegistryViews] = None
+        self._schema_hash: Optional[str] = None
+        self.version = 0
         logger.debug("Initialized new ToolRegistry instance")
-    
+
+    @property
+    def tools(self) -> Mapping[str, Dict[str, Any]]:
+        return MappingProxyType(self._tools)
+
     def register_tool(self, tool_class: Type[Tool], function_names: Optional[List[str]] = None, **kwargs):
         """Register a tool with optional function filtering.
-        
+
         Args:
             tool_class: The tool class to register
             function_names: Optional list of specific functions to register
             **kwargs: Additional arguments passed to tool initialization
-            
+
         Notes:
             - If function_names is None, all functions are registered
             - Handles OpenAPI schema registration
         """
         # logger.debug(f"Registering tool class: {tool_class.__name__}")
         tool_instance = tool_class(**kwargs)
-        schemas = tool_instance.get_schemas()
-        
-        # logger.debug(f"Available schemas for {tool_class.__name__}: {list(schemas.keys())}")
-        
+        self.register_instance(tool_instance, function_names)
+
+    def register_instance(
+        self,
+        tool_instance: Tool,
+        function_names: Optional[List[str]] = None,
+        schemas: Optional[Dict[str, List[ToolSchema]]] = None,
+    ) -> int:
+        """Register the functions of an already constructed tool (e.g. an MCP wrapper).
+
+        Args:
+            tool_instance: Tool providing the functions
+            function_names: Optional list of specific functions to register
+            schemas: Schemas to register instead of ``tool_instance.get_schemas()``
+
+        Returns:
+            Number of OpenAPI functions registered
+        """
+        if schemas is None:
+            schemas = tool_instance.get_schemas()
+
         registered_openapi = 0
-        
+
         for func_name, schema_list in schemas.items():
             if function_names is None or func_name in function_names:
                 for schema in schema_list:
                     if schema.schema_type == SchemaType.OPENAPI:
-                        self.tools[func_name] = {
+                        self._tools[func_name] = {
                             "instance": tool_instance,
                             "schema": schema
                         }
                         registered_openapi += 1
-                        # logger.debug(f"Registered OpenAPI function {func_name} from {tool_class.__name__}")
-        
-        # logger.debug(f"Tool registration complete for {tool_class.__name__}: {registered_openapi} OpenAPI functions")
+                        # logger.debug(f"Registered OpenAPI function {func_name} from {tool_instance.__class__.__name__}")
+
+        if registered_openapi:
+            self._invalidate()
+        return registered_openapi
+
+    def remove(self, *function_names: str) -> int:
+        """Remove registered functions; returns how many were removed."""
+        removed = sum(1 for name in function_names if self._tools.pop(name, None) is not None)
+        if removed:
+            self._invalidate()
+        return removed
 
-    def get_available_functions(self) -> Dict[str, Callable]:
+    def _invalidate(self) -> None:
+        self._views = None
+        self._schema_hash = None
+        self.version += 1
+
+    def _get_views(self) -> _RegistryViews:
+        if self._views is None:
+            functions = {}
+            openapi_schemas = []
+            for function_name, tool_info in self._tools.items():
+                functions[function_name] = getattr(tool_info['instance'], function_name)
+                if tool_info['schema'].schema_type == SchemaType.OPENAPI:
+                    openapi_schemas.append(tool_info['schema'].schema)
+            self._views = _RegistryViews(
+                functions=MappingProxyType(functions),
+                openapi_schemas=tuple(openapi_schemas),
+                xml_tag_names=tuple(name.replace('_', '-') for name in functions),
+            )
+        return self._views
+
+    def get_available_functions(self) -> Mapping[str, Callable]:
         """Get all available tool functions.
-        
+
         Returns:
-            Dict mapping function names to their implementations
+            Read-only mapping of function names to their implementations
         """
-        available_functions = {}
-        
-        # Get OpenAPI tool functions
-        for tool_name, tool_info in self.tools.items():
-            tool_instance = tool_info['instance']
-            function_name = tool_name
-            function = getattr(tool_instance, function_name)
-            available_functions[function_name] = function
-            
-        # logger.debug(f"Retrieved {len(available_functions)} available functions")
-        return available_functions
+        return self._get_views().functions
 
     def get_tool(self, tool_name: str) -> Dict[str, Any]:
         """Get a specific tool by name.
-        
+
         Args:
             tool_name: Name of the tool function
-            
+
         Returns:
             Dict containing tool instance and schema, or empty dict if not found
         """
-        tool = self.tools.get(tool_name, {})
+        tool = self._tools.get(tool_name, {})
         if not tool:
             logger.warning(f"Tool not found: {tool_name}")
         return tool
 
     def get_openapi_schemas(self) -> List[Dict[str, Any]]:
         """Get OpenAPI schemas for function calling.
-        
+
         Returns:
             List of OpenAPI-compatible schema definitions
         """
-        schemas = [
-            tool_info['schema'].schema 
-            for tool_info in self.tools.values()
-            if tool_info['schema'].schema_type == SchemaType.OPENAPI
-        ]
-        # logger.debug(f"Retrieved {len(schemas)} OpenAPI schemas")
-        return schemas
+        # Fresh list so callers cannot mutate the cached view
+        return list(self._get_views().openapi_schemas)
+
+    def get_xml_tag_names(self) -> Tuple[str, ...]:
+        """Get the legacy XML tag names (function names with dashes) of all functions."""
+        return self._get_views().xml_tag_names
 
+    def get_schema_hash(self) -> str:
+        """Get a stable hash of the registered OpenAPI schemas."""
+        if self._schema_hash is None:
+            payload = json.dumps(self._get_views().openapi_schemas, sort_keys=True, default=str)
+            self._schema_hash = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+        return self._schema_hash
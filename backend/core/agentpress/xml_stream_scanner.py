@@ -0,0 +1,95 @@
+"""
+Incremental XML tool-call scanner for streaming LLM responses.
+
+The streaming path used to rescan the whole accumulated response on every
+content delta and then rebuild the buffer with ``str.replace``, which is
+quadratic in response length. ``XMLToolCallScanner`` keeps the scan state
+between deltas so every character is inspected a constant number of times and
+each complete ``<function_calls>`` block is emitted exactly once.
+"""
+
+from typing import List
+
+
+class XMLToolCallScanner:
+    """Stateful, linear-time detector for ``<function_calls>`` blocks.
+
+    One scanner is created per LLM call. Feed it content deltas as they arrive;
+    ``feed`` returns the blocks completed by that delta, in order.
+
+    Outside a block only the last ``len(START_TAG) - 1`` characters are kept so a
+    start tag split across deltas is still found. Inside a block the pieces are
+    collected in a list and joined once the end tag shows up, so long payloads
+    (e.g. ``create_file`` contents) are never copied per delta.
+    """
+
+    START_TAG = "<function_calls>"
+    END_TAG = "</function_calls>"
+
+    def __init__(self, initial_content: str = ""):
+        """Initialize the scanner.
+
+        Args:
+            initial_content: Content carried over from a previous LLM call
+                (auto-continue). It is scanned together with the first delta.
+        """
+        self._pending = initial_content
+        self._in_block = False
+        self._block_parts: List[str] = []
+        self._tail = ""
+
+        # Counters used by tests/benchmarks to verify linear behaviour
+        self.chars_fed = len(initial_content)
+        self.chars_scanned = 0
+        self.blocks_emitted = 0
+
+    @property
+    def in_block(self) -> bool:
+        """Whether a ``<function_calls>`` block is currently open."""
+        return self._in_block
+
+    def feed(self, delta: str) -> List[str]:
+        """Consume a content delta and return any blocks it completed."""
+        if not delta:
+            return []
+
+        self.chars_fed += len(delta)
+        blocks: List[str] = []
+        text = delta
+
+        while text:
+            if not self._in_block:
+                window = self._pending + text
+                self.chars_scanned += len(window)
+                start = window.find(self.START_TAG)
+                if start == -1:
+                    # Keep just enough to detect a start tag split across deltas
+                    self._pending = window[-(len(self.START_TAG) - 1):]
+                    break
+
+                self._pending = ""
+                self._in_block = True
+                self._block_parts = []
+                self._tail = ""
+                text = window[start:]
+
+            # Only the tail of the open block plus the new text can contain the end tag
+            search = self._tail + text
+            self.chars_scanned += len(search)
+            end = search.find(self.END_TAG)
+            if end == -1:
+                self._block_parts.append(text)
+                self._tail = search[-(len(self.END_TAG) - 1):]
+                break
+
+            cut = end + len(self.END_TAG) - len(self._tail)
+            self._block_parts.append(text[:cut])
+            blocks.append("".join(self._block_parts))
+            self.blocks_emitted += 1
+
+            self._in_block = False
+            self._block_parts = []
+            self._tail = ""
+            text = text[cut:]
+
+        return blocks
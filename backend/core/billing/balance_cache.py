@@ -0,0 +1,144 @@
+"""
+Cached balance gating for agent runs.
+
+``check_and_reserve_credits`` runs before every agent iteration and used to
+read ``credit_accounts`` each time. The gate answers from the usage ledger's
+Redis running balance instead (``snapshot - pending``), which the ledger keeps
+current: the flusher writes the balance returned by each deduction through,
+and credit grants / Stripe webhook changes invalidate it. Only a missing or
+expired snapshot reads the database.
+
+Each successful check reserves the estimated cost of one iteration until it is
+released (or expires), so concurrent runs of the same account cannot all pass
+the gate on the same remaining credit. The check and the reservation are one
+WATCH/MULTI transaction on the account's reservations: a check that raced
+another reservation is retried against it.
+
+Hit/miss counters are kept in process and in a Redis hash so the hit rate can
+be read across workers.
+"""
+
+import time
+import uuid
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+
+from redis.exceptions import WatchError
+
+from core.billing.usage_ledger import (
+    BALANCE_SNAPSHOT_KEY,
+    PENDING_KEY,
+    from_micros,
+    to_micros,
+    usage_ledger,
+)
+from core.services import redis
+from core.utils.logger import logger
+
+RESERVATIONS_KEY = "credit_reservations:{account_id}"
+STATS_KEY = "credit_balance_cache:stats"
+RESERVATION_TTL = 600
+RESERVE_ATTEMPTS = 5
+STATS_LOG_EVERY = 200
+
+
+class BalanceGate:
+    def __init__(self, reservation_ttl: int = RESERVATION_TTL):
+        self.reservation_ttl = reservation_ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def check_and_reserve(
+        self,
+        account_id: str,
+        amount: Decimal,
+        reserve: bool = True,
+    ) -> Tuple[bool, Decimal, Optional[str]]:
+        """Return (allowed, available balance, reservation id) for a charge of ``amount``."""
+        client = await redis.get_client()
+        keys = [BALANCE_SNAPSHOT_KEY.format(account_id=account_id), PENDING_KEY.format(account_id=account_id)]
+        reservations_key = RESERVATIONS_KEY.format(account_id=account_id)
+        available = Decimal("0")
+        for _ in range(RESERVE_ATTEMPTS):
+            async with client.pipeline(transaction=True) as pipe:
+                # A reservation made by a concurrent check aborts this one, which then runs again and sees it
+                await pipe.watch(reservations_key)
+                snapshot, pending = await pipe.mget(keys)
+                reservations = await pipe.hgetall(reservations_key)
+
+                hit = snapshot is not None
+                if hit:
+                    running = from_micros(int(snapshot) - int(pending or 0))
+                else:
+                    running = await usage_ledger.get_running_balance(account_id)
+
+                now = time.time()
+                reserved = 0
+                expired = []
+                for reservation_id, value in (reservations or {}).items():
+                    micros, _, expires_at = value.partition(":")
+                    if float(expires_at or 0) < now:
+                        expired.append(reservation_id)
+                    else:
+                        reserved += int(micros)
+                available = running - from_micros(reserved)
+                allowed = available >= amount
+
+                reservation_id = None
+                pipe.multi()
+                if allowed and reserve:
+                    reservation_id = uuid.uuid4().hex
+                    pipe.hset(reservations_key, reservation_id, f"{to_micros(amount)}:{now + self.reservation_ttl}")
+                    pipe.expire(reservations_key, self.reservation_ttl)
+                if expired:
+                    pipe.hdel(reservations_key, *expired)
+                pipe.hincrby(STATS_KEY, "hits" if hit else "misses", 1)
+                try:
+                    await pipe.execute()
+                except WatchError:
+                    continue
+
+            self._count(hit)
+            return allowed, available, reservation_id
+
+        # Refusing is the safe answer when the reservations of this account keep changing
+        logger.warning(f"Credit reservations of {account_id} kept changing; refusing the check")
+        return False, available, None
+
+    async def release(self, account_id: str, reservation_id: Optional[str]) -> None:
+        if not reservation_id:
+            return
+        try:
+            client = await redis.get_client()
+            await client.hdel(RESERVATIONS_KEY.format(account_id=account_id), reservation_id)
+        except Exception as e:
+            # The reservation expires on its own
+            logger.warning(f"Failed to release credit reservation for {account_id}: {e}")
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        total = self.hits + self.misses
+        if total % STATS_LOG_EVERY == 0:
+            logger.info(f"[BILLING] Balance cache: {self.stats()}")
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    async def fleet_stats(self) -> Dict[str, float]:
+        """Hit/miss counters summed over all processes."""
+        client = await redis.get_client()
+        raw = await client.hgetall(STATS_KEY) or {}
+        hits, misses = int(raw.get("hits", 0)), int(raw.get("misses", 0))
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else 0.0}
+
+
+balance_gate = BalanceGate()
@@ -2,25 +2,33 @@ from decimal import Decimal
 from typing import Optional, Dict, Tuple, List
 from core.billing.api import calculate_token_cost
 from core.billing.credit_manager import credit_manager
+from core.billing.usage_ledger import usage_ledger
+from core.billing.balance_cache import balance_gate
 from core.utils.config import config, EnvMode
 from core.utils.logger import logger
 from core.services.supabase import DBConnection
 
 class BillingIntegration:
     @staticmethod
-    async def check_and_reserve_credits(account_id: str, estimated_tokens: int = 10000) -> Tuple[bool, str, Optional[str]]:
+    async def check_and_reserve_credits(account_id: str, estimated_tokens: int = 10000, reserve: bool = True) -> Tuple[bool, str, Optional[str]]:
         if config.ENV_MODE == EnvMode.LOCAL:
             return True, "Local mode", None
         
-        balance_info = await credit_manager.get_balance(account_id)
-        balance = Decimal(str(balance_info.get('total', 0)))
-        
         estimated_cost = Decimal('0.10')
         
-        if balance < estimated_cost:
+        # Cached running balance (Redis); the database is only read when no snapshot is cached
+        allowed, balance, reservation_id = await balance_gate.check_and_reserve(account_id, estimated_cost, reserve=reserve)
+        
+        if not allowed:
             return False, f"Insufficient credits. Balance: ${balance:.2f}, Required: ~${estimated_cost:.2f}", None
         
-        return True, f"Credits available: ${balance:.2f}", None
+        return True, f"Credits available: ${balance:.2f}", reservation_id
+    
+    @staticmethod
+    async def release_credits(account_id: str, reservation_id: Optional[str]) -> None:
+        if config.ENV_MODE == EnvMode.LOCAL:
+            return
+        await balance_gate.release(account_id, reservation_id)
     
     @staticmethod
     async def deduct_usage(
@@ -62,26 +70,27 @@ class BillingIntegration:
         
         logger.info(f"[BILLING] Calculated cost: ${cost:.6f} for {model}")
         
-        result = await credit_manager.use_credits(
-            account_id=account_id,
-            amount=cost,
-            description=f"{model} usage",
-            thread_id=None,
-            message_id=message_id
-        )
+        # Queued on the usage ledger; applied to credit_accounts by its background flusher
+        try:
+            running_balance = await usage_ledger.record(
+                account_id=account_id,
+                amount=cost,
+                description=f"{model} usage",
+                message_id=message_id
+            )
+        except Exception as e:
+            logger.error(f"[BILLING] Failed to record usage for user {account_id}: {e}")
+            return {'success': False, 'cost': float(cost), 'error': str(e)}
         
-        if result.get('success'):
-            logger.info(f"[BILLING] Successfully deducted ${cost:.6f} from user {account_id}. New balance: ${result.get('new_total', 0):.2f} (expiring: ${result.get('from_expiring', 0):.2f}, non-expiring: ${result.get('from_non_expiring', 0):.2f})")
+        if running_balance is not None:
+            logger.info(f"[BILLING] Recorded ${cost:.6f} usage for user {account_id}. Running balance: ${running_balance:.2f}")
         else:
-            logger.error(f"[BILLING] Failed to deduct credits for user {account_id}: {result.get('error')}")
+            logger.info(f"[BILLING] Recorded ${cost:.6f} usage for user {account_id}")
         
         return {
-            'success': result.get('success', False),
+            'success': True,
             'cost': float(cost),
-            'new_balance': result.get('new_total', 0),
-            'from_expiring': result.get('from_expiring', 0),
-            'from_non_expiring': result.get('from_non_expiring', 0),
-            'transaction_id': result.get('transaction_id')
+            'new_balance': float(running_balance) if running_balance is not None else None
         }
 
     @staticmethod
@@ -125,7 +134,7 @@ class BillingIntegration:
                 }
             
             # Check billing/credits
-            can_run, message, reservation_id = await BillingIntegration.check_and_reserve_credits(account_id)
+            can_run, message, reservation_id = await BillingIntegration.check_and_reserve_credits(account_id, reserve=False)
             if not can_run:
                 return False, f"Billing check failed: {message}", {
                     "tier_info": tier_info,
@@ -1,9 +1,11 @@
+import uuid
 from typing import Dict, Optional, Tuple
 from decimal import Decimal
 from datetime import datetime, timezone, timedelta
 from core.services.supabase import DBConnection
 from core.utils.logger import logger
 from core.utils.cache import Cache
+from core.billing.usage_ledger import usage_ledger
 
 
 class CreditManager:
@@ -113,6 +115,7 @@ class CreditManager:
         
         await Cache.invalidate(f"credit_balance:{account_id}")
         await Cache.invalidate(f"credit_summary:{account_id}")
+        await usage_ledger.invalidate_balance(account_id)
         
         return {
             'success': True,
@@ -129,89 +132,39 @@ class CreditManager:
         thread_id: Optional[str] = None,
         message_id: Optional[str] = None
     ) -> Dict:
-        client = await self.db.client
-        
-        result = await client.from_('credit_accounts').select(
-            'expiring_credits, non_expiring_credits, balance'
-        ).eq('account_id', account_id).execute()
-        
-        if not result.data:
-            return {
-                'success': False,
-                'error': 'No credit account found',
-                'required': float(amount),
-                'available': 0
-            }
-        
-        current = result.data[0]
-        current_expiring = Decimal(str(current.get('expiring_credits', 0)))
-        current_non_expiring = Decimal(str(current.get('non_expiring_credits', 0)))
-        current_total = Decimal(str(current.get('balance', 0)))
-        
-        credit_sum = current_expiring + current_non_expiring
-        if abs(credit_sum - current_total) > Decimal('0.01'):
-            difference = current_total - credit_sum
-            if difference > 0:
-                current_non_expiring += difference
-            else:
-                if current_expiring >= abs(difference):
-                    current_expiring -= abs(difference)
-                else:
-                    remainder = abs(difference) - current_expiring
-                    current_expiring = Decimal('0')
-                    current_non_expiring = max(Decimal('0'), current_non_expiring - remainder)
+        amount = Decimal(str(amount))
+        # Checked and deducted atomically in the database (apply_credit_usage)
+        result = await usage_ledger.apply_usage(
+            account_id,
+            [{
+                'id': str(uuid.uuid4()),
+                'amount': str(amount),
+                'thread_id': thread_id,
+                'message_id': message_id
+            }],
+            description or 'Usage',
+            allow_partial=False
+        )
         
-        if current_total < amount:
+        if not result.get('success'):
             return {
                 'success': False,
-                'error': 'Insufficient credits',
+                'error': result.get('error', 'Failed to deduct credits'),
                 'required': float(amount),
-                'available': float(current_total)
+                'available': float(result.get('available', 0))
             }
         
-        if current_expiring >= amount:
-            amount_from_expiring = amount
-            amount_from_non_expiring = Decimal('0')
-        else:
-            amount_from_expiring = current_expiring
-            amount_from_non_expiring = amount - current_expiring
-        
-        new_expiring = current_expiring - amount_from_expiring
-        new_non_expiring = current_non_expiring - amount_from_non_expiring
-        new_total = new_expiring + new_non_expiring
-        
-        await client.from_('credit_accounts').update({
-            'expiring_credits': float(new_expiring),
-            'non_expiring_credits': float(new_non_expiring),
-            'balance': float(new_total),
-            'updated_at': datetime.now(timezone.utc).isoformat()
-        }).eq('account_id', account_id).execute()
-        
-        await client.from_('credit_ledger').insert({
-            'account_id': account_id,
-            'amount': float(-amount),
-            'balance_after': float(new_total),
-            'type': 'usage',
-            'description': description,
-            'reference_id': thread_id or message_id,
-            'metadata': {
-                'thread_id': thread_id,
-                'message_id': message_id,
-                'from_expiring': float(amount_from_expiring),
-                'from_non_expiring': float(amount_from_non_expiring)
-            }
-        }).execute()
-        
         await Cache.invalidate(f"credit_balance:{account_id}")
+        await usage_ledger.invalidate_balance(account_id)
         
         return {
             'success': True,
-            'amount_deducted': float(amount),
-            'from_expiring': float(amount_from_expiring),
-            'from_non_expiring': float(amount_from_non_expiring),
-            'new_expiring': float(new_expiring),
-            'new_non_expiring': float(new_non_expiring),
-            'new_total': float(new_total)
+            'amount_deducted': float(result.get('amount_deducted', amount)),
+            'from_expiring': float(result.get('from_expiring', 0)),
+            'from_non_expiring': float(result.get('from_non_expiring', 0)),
+            'new_expiring': float(result.get('new_expiring', 0)),
+            'new_non_expiring': float(result.get('new_non_expiring', 0)),
+            'new_total': float(result.get('new_total', 0))
         }
     
     async def reset_expiring_credits(
@@ -269,6 +222,7 @@ class CreditManager:
         
         await Cache.invalidate(f"credit_balance:{account_id}")
         await Cache.invalidate(f"credit_summary:{account_id}")
+        await usage_ledger.invalidate_balance(account_id)
         
         return {
             'success': True,
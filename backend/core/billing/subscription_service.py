@@ -18,6 +18,7 @@ from .config import (
     get_price_type
 )
 from .credit_manager import credit_manager
+from .usage_ledger import usage_ledger
 
 class SubscriptionService:
     def __init__(self):
@@ -286,6 +287,7 @@ class SubscriptionService:
             await Cache.invalidate(f"subscription_tier:{account_id}")
             await Cache.invalidate(f"credit_balance:{account_id}")
             await Cache.invalidate(f"credit_summary:{account_id}")
+            await usage_ledger.invalidate_balance(account_id)
             
             old_price_id = subscription['items']['data'][0].price.id
             old_tier = get_tier_by_price_id(old_price_id)
@@ -352,6 +354,7 @@ class SubscriptionService:
             await Cache.invalidate(f"subscription_tier:{account_id}")
             await Cache.invalidate(f"credit_balance:{account_id}")
             await Cache.invalidate(f"credit_summary:{account_id}")
+            await usage_ledger.invalidate_balance(account_id)
             
             return {
                 'success': True,
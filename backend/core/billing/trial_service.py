@@ -12,6 +12,7 @@ from .config import (
     TRIAL_CREDITS,
 )
 from .credit_manager import credit_manager
+from .usage_ledger import usage_ledger
 
 class TrialService:
     def __init__(self):
@@ -108,6 +109,7 @@ class TrialService:
                 'balance': 0.00,
                 'stripe_subscription_id': None
             }).eq('account_id', account_id).execute()
+            await usage_ledger.invalidate_balance(account_id)
             
             await client.from_('trial_history').upsert({
                 'account_id': account_id,
@@ -0,0 +1,294 @@
+"""
+Write-behind ledger for LLM usage charges.
+
+Billing every ``llm_response_end`` with a read-modify-write of
+``credit_accounts`` cost several serial DB round trips per LLM call and lost
+updates when two runs of the same account finished together. Instead:
+
+- ``record`` appends a usage event to the ``credit_usage:events`` Redis stream
+  and adds its amount to the account's pending counter in one MULTI/EXEC round
+  trip.
+- A background flusher reads the stream through a consumer group, aggregates
+  events per account and applies each account's batch with the atomic
+  ``apply_credit_usage`` RPC. Event ids are deduplicated in the database, so a
+  batch that is retried after a crash is never charged twice.
+- The running balance used for gating is ``snapshot - pending``: the last
+  balance returned by the database minus usage that has not been flushed yet.
+  The flusher refreshes the snapshot and settles the pending counter in the
+  same transaction. The database bumps ``credit_accounts.balance_version`` on
+  every balance change; a snapshot is only written (by a compare-and-set
+  script) if its version is newer than the last one stored, so a settle or
+  read that finishes late never overwrites a newer balance.
+
+Amounts are tracked in Redis as integer micro-credits to avoid float drift.
+"""
+
+import asyncio
+import uuid
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.services import redis
+from core.services.supabase import DBConnection
+from core.utils.cache import Cache
+from core.utils.logger import logger
+
+USAGE_STREAM_KEY = "credit_usage:events"
+USAGE_CONSUMER_GROUP = "credit-ledger"
+PENDING_KEY = "credit_usage_pending:{account_id}"
+BALANCE_SNAPSHOT_KEY = "credit_balance_snapshot:{account_id}"
+BALANCE_VERSION_KEY = "credit_balance_version:{account_id}"
+
+BALANCE_SNAPSHOT_TTL = 60
+BALANCE_VERSION_TTL = 24 * 3600
+FLUSH_INTERVAL_SECONDS = 1.0
+FLUSH_BATCH_SIZE = 500
+# Entries a consumer read but never acknowledged (crashed worker) are reclaimed after this long
+CLAIM_IDLE_MS = 60_000
+CLAIM_EVERY_FLUSHES = 30
+
+MICROS = Decimal("1000000")
+
+# Store a balance snapshot unless a newer one (by database balance_version) was stored.
+# The same version may be stored again once its snapshot has expired.
+_STORE_SNAPSHOT = """
+local current = redis.call('GET', KEYS[2])
+if current then
+    local version, stored = tonumber(ARGV[1]), tonumber(current)
+    if version < stored or (version == stored and redis.call('EXISTS', KEYS[1]) == 1) then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[4])
+return 1
+"""
+
+
+def to_micros(amount: Decimal) -> int:
+    return int((Decimal(str(amount)) * MICROS).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_micros(value: int) -> Decimal:
+    return Decimal(value) / MICROS
+
+
+class UsageLedger:
+    def __init__(
+        self,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+        batch_size: int = FLUSH_BATCH_SIZE,
+        claim_idle_ms: int = CLAIM_IDLE_MS,
+    ):
+        self.db = DBConnection()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.claim_idle_ms = claim_idle_ms
+        self.consumer = f"ledger-{uuid.uuid4().hex[:8]}"
+        self.events_recorded = 0
+        self.events_applied = 0
+        self.flushes = 0
+        self._group_ready = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def record(
+        self,
+        account_id: str,
+        amount: Decimal,
+        description: Optional[str] = None,
+        message_id: Optional[str] = None,
+    ) -> Optional[Decimal]:
+        """Queue a usage charge and return the account's running balance (if known)."""
+        micros = to_micros(amount)
+        client = await redis.get_client()
+        pipe = client.pipeline(transaction=True)
+        pipe.xadd(USAGE_STREAM_KEY, {
+            "account_id": account_id,
+            "amount": str(amount),
+            "description": description or "",
+            "message_id": message_id or "",
+        })
+        pipe.incrby(PENDING_KEY.format(account_id=account_id), micros)
+        pipe.get(BALANCE_SNAPSHOT_KEY.format(account_id=account_id))
+        _, pending, snapshot = await pipe.execute()
+        self.events_recorded += 1
+        self.start()
+
+        if snapshot is None:
+            return None
+        return from_micros(int(snapshot) - int(pending))
+
+    async def get_running_balance(self, account_id: str) -> Decimal:
+        """Balance including usage that has not been written to the database yet."""
+        client = await redis.get_client()
+        keys = [BALANCE_SNAPSHOT_KEY.format(account_id=account_id), PENDING_KEY.format(account_id=account_id)]
+        snapshot, pending = await client.mget(keys)
+        if snapshot is None:
+            db_balance = await self._seed_snapshot(client, account_id)
+            snapshot, pending = await client.mget(keys)
+            if snapshot is None:
+                snapshot = db_balance
+        return from_micros(int(snapshot) - int(pending or 0))
+
+    async def _seed_snapshot(self, client, account_id: str) -> int:
+        """Store the database balance as the snapshot unless a newer balance was stored meanwhile."""
+        balance, version = await self._load_balance(account_id)
+        db_balance = to_micros(balance)
+        await client.eval(_STORE_SNAPSHOT, *self._snapshot_args(account_id, version, db_balance))
+        return db_balance
+
+    async def invalidate_balance(self, account_id: str) -> None:
+        """Refresh the balance snapshot after credits were changed outside the ledger."""
+        client = await redis.get_client()
+        try:
+            await self._seed_snapshot(client, account_id)
+        except Exception as e:
+            logger.warning(f"Failed to refresh the balance snapshot of {account_id}: {e}")
+            await client.delete(BALANCE_SNAPSHOT_KEY.format(account_id=account_id))
+
+    @staticmethod
+    def _snapshot_args(account_id: str, version: int, micros: int) -> List[Any]:
+        return [
+            2, BALANCE_SNAPSHOT_KEY.format(account_id=account_id), BALANCE_VERSION_KEY.format(account_id=account_id),
+            version, micros, BALANCE_SNAPSHOT_TTL, BALANCE_VERSION_TTL,
+        ]
+
+    async def _load_balance(self, account_id: str) -> Tuple[Decimal, int]:
+        client = await self.db.client
+        result = await client.from_('credit_accounts').select('balance, balance_version').eq('account_id', account_id).execute()
+        if not result.data:
+            return Decimal('0'), 0
+        row = result.data[0]
+        return Decimal(str(row.get('balance', 0))), int(row.get('balance_version') or 0)
+
+    async def apply_usage(
+        self,
+        account_id: str,
+        events: List[Dict[str, Any]],
+        description: str,
+        allow_partial: bool = True,
+    ) -> Dict[str, Any]:
+        """Apply usage events with a single atomic DB-side deduction."""
+        client = await self.db.client
+        result = await client.rpc('apply_credit_usage', {
+            'p_account_id': account_id,
+            'p_events': events,
+            'p_description': description,
+            'p_allow_partial': allow_partial,
+        }).execute()
+        return result.data or {}
+
+    # Background flusher
+
+    def start(self) -> None:
+        """Start the flusher on the running event loop (no-op if already running)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Drain what is queued so a clean shutdown leaves nothing for reclaiming
+        while await self.flush():
+            pass
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Credit usage flush failed: {e}")
+
+    async def _ensure_group(self, client) -> None:
+        if self._group_ready:
+            return
+        try:
+            await client.xgroup_create(USAGE_STREAM_KEY, USAGE_CONSUMER_GROUP, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def _read_entries(self, client) -> List[Tuple[str, Dict[str, str]]]:
+        entries = []
+        if self.flushes % CLAIM_EVERY_FLUSHES == 0:
+            claimed = await client.xautoclaim(
+                USAGE_STREAM_KEY, USAGE_CONSUMER_GROUP, self.consumer,
+                min_idle_time=self.claim_idle_ms, start_id="0-0", count=self.batch_size,
+            )
+            entries.extend(claimed[1] if claimed else [])
+        result = await client.xreadgroup(
+            USAGE_CONSUMER_GROUP, self.consumer, {USAGE_STREAM_KEY: ">"}, count=self.batch_size,
+        )
+        if result:
+            entries.extend(result[0][1])
+        return entries
+
+    async def flush(self) -> int:
+        """Apply every queued usage event; returns the number of events applied."""
+        client = await redis.get_client()
+        await self._ensure_group(client)
+        entries = await self._read_entries(client)
+        self.flushes += 1
+        if not entries:
+            return 0
+
+        by_account: Dict[str, List[Tuple[str, Dict[str, str]]]] = defaultdict(list)
+        for entry_id, fields in entries:
+            if fields and fields.get("account_id"):
+                by_account[fields["account_id"]].append((entry_id, fields))
+            else:
+                await client.xack(USAGE_STREAM_KEY, USAGE_CONSUMER_GROUP, entry_id)
+
+        applied = 0
+        for account_id, account_entries in by_account.items():
+            try:
+                applied += await self._apply_account(client, account_id, account_entries)
+            except Exception as e:
+                # Left unacknowledged; reclaimed after CLAIM_IDLE_MS
+                logger.error(f"Failed to apply {len(account_entries)} usage events for {account_id}: {e}")
+        return applied
+
+    async def _apply_account(self, client, account_id: str, entries: List[Tuple[str, Dict[str, str]]]) -> int:
+        events = [
+            {"id": entry_id, "amount": fields["amount"], "message_id": fields.get("message_id") or None}
+            for entry_id, fields in entries
+        ]
+        descriptions = {fields.get("description") for _, fields in entries}
+        description = descriptions.pop() if len(descriptions) == 1 else None
+        result = await self.apply_usage(account_id, events, description or "LLM usage")
+        if not result.get('success'):
+            # Retrying cannot succeed (e.g. no credit account); drop the events instead of redelivering them
+            logger.error(f"Credit usage for {account_id} was not applied: {result.get('error')}")
+        elif result.get('uncollected'):
+            logger.warning(f"[BILLING] {account_id} ran out of credits; ${result['uncollected']} of usage uncollected")
+
+        # Settle: pending usage is now part of the DB balance the snapshot is refreshed from
+        entry_ids = [entry_id for entry_id, _ in entries]
+        pipe = client.pipeline(transaction=True)
+        pipe.decrby(PENDING_KEY.format(account_id=account_id), sum(to_micros(Decimal(e["amount"])) for e in events))
+        if result.get('success'):
+            new_total = to_micros(Decimal(str(result.get('new_total', 0))))
+            pipe.eval(_STORE_SNAPSHOT, *self._snapshot_args(account_id, int(result.get('balance_version') or 0), new_total))
+        pipe.xack(USAGE_STREAM_KEY, USAGE_CONSUMER_GROUP, *entry_ids)
+        pipe.xdel(USAGE_STREAM_KEY, *entry_ids)
+        await pipe.execute()
+        await Cache.invalidate(f"credit_balance:{account_id}")
+
+        if not result.get('success'):
+            return 0
+        self.events_applied += len(events)
+        logger.debug(f"Applied {len(events)} usage events for {account_id}: -${result.get('amount_deducted')}")
+        return len(events)
+
+
+usage_ledger = UsageLedger()
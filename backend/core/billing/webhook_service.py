@@ -18,6 +18,7 @@ from .config import (
     get_commitment_duration_months
 )
 from .credit_manager import credit_manager
+from .usage_ledger import usage_ledger
 
 
 class WebhookService:
@@ -461,6 +462,7 @@ class WebhookService:
                         'balance': '0.00',
                         'stripe_subscription_id': None
                     }).eq('account_id', account_id).execute()
+                    await usage_ledger.invalidate_balance(account_id)
                     
                     await client.from_('trial_history').update({
                         'ended_at': datetime.now(timezone.utc).isoformat(),
@@ -519,6 +521,7 @@ class WebhookService:
                     'balance': 0.00,
                     'stripe_subscription_id': None
                 }).eq('account_id', account_id).execute()
+                await usage_ledger.invalidate_balance(account_id)
                 
                 await client.from_('trial_history').update({
                     'ended_at': datetime.now(timezone.utc).isoformat(),
@@ -694,6 +697,7 @@ class WebhookService:
                 
                 await Cache.invalidate(f"credit_balance:{account_id}")
                 await Cache.invalidate(f"credit_summary:{account_id}")
+                await usage_ledger.invalidate_balance(account_id)
                 await Cache.invalidate(f"subscription_tier:{account_id}")
                 
                 logger.info(f"✅ [RENEWAL] Renewed credits for user {account_id}: ${monthly_credits} expiring + "
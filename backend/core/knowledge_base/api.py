@@ -4,7 +4,10 @@ from pydantic import BaseModel, Field, validator
 from core.utils.auth_utils import verify_and_get_user_id_from_jwt, require_agent_access, AuthorizedAgentAccess
 from core.services.supabase import DBConnection
 from .file_processor import FileProcessor
+from . import jobs as kb_jobs
+from .retrieval import kb_retriever
 from core.utils.logger import logger
+from run_agent_background import process_knowledge_base_file
 from .validation import FileNameValidator, ValidationError, validate_folder_name_unique, validate_file_name_unique_in_folder
 
 # Constants
@@ -25,6 +28,8 @@ async def check_total_file_size_limit(account_id: str, new_file_size: int):
         ).eq('account_id', account_id).eq('is_active', True).execute()
         
         current_total_size = sum(entry['file_size'] for entry in result.data)
+        # Uploads still being processed count too
+        current_total_size += sum(job['file_size'] for job in await kb_jobs.get_pending_jobs(client, account_id))
         new_total_size = current_total_size + new_file_size
         
         if new_total_size > MAX_TOTAL_FILE_SIZE:
@@ -83,6 +88,9 @@ class EntryResponse(BaseModel):
     summary: str
     file_size: int
     created_at: str
+    status: str = kb_jobs.JOB_COMPLETED
+    job_id: Optional[str] = None
+    error: Optional[str] = None
 
 class UpdateEntryRequest(BaseModel):
     summary: str = Field(..., min_length=1, max_length=1000)
@@ -90,6 +98,18 @@ class UpdateEntryRequest(BaseModel):
 class AgentAssignmentRequest(BaseModel):
     folder_ids: List[str]
 
+class JobResponse(BaseModel):
+    job_id: str
+    entry_id: str
+    folder_id: str
+    filename: str
+    file_size: int
+    status: str
+    error: Optional[str]
+    chunk_count: Optional[int]
+    created_at: str
+    completed_at: Optional[str]
+
 db = DBConnection()
 file_processor = FileProcessor()
 
@@ -226,6 +246,7 @@ async def update_folder(
             raise HTTPException(status_code=500, detail="Failed to update folder")
         
         updated_folder = result.data[0]
+        await kb_retriever.invalidate(account_id)
         
         # Count entries in folder
         count_result = await client.table('knowledge_base_entries').select(
@@ -282,6 +303,7 @@ async def delete_folder(
         
         # Delete folder (cascade will handle entries and assignments in DB)
         await client.table('knowledge_base_folders').delete().eq('folder_id', folder_id).execute()
+        await kb_retriever.invalidate(account_id)
         
         return {"success": True}
         
@@ -292,13 +314,17 @@ async def delete_folder(
         raise HTTPException(status_code=500, detail="Failed to delete folder")
 
 # File upload
-@router.post("/folders/{folder_id}/upload")
+@router.post("/folders/{folder_id}/upload", status_code=202)
 async def upload_file(
     folder_id: str,
     file: UploadFile = File(...),
     user_id: str = Depends(verify_and_get_user_id_from_jwt)
 ):
-    """Upload a file to a knowledge base folder."""
+    """Upload a file to a knowledge base folder.
+    
+    The file is stored and queued; extraction, summarization and indexing run
+    on a worker. Poll ``/jobs/{job_id}`` for the result.
+    """
     try:
         client = await db.client
         account_id = user_id
@@ -328,8 +354,8 @@ async def upload_file(
         # Generate unique filename if there's a conflict
         final_filename = await validate_file_name_unique_in_folder(file.filename, folder_id)
         
-        # Process file
-        result = await file_processor.process_file(
+        # Store the file and queue it for processing
+        result = await file_processor.stage_file(
             account_id=account_id,
             folder_id=folder_id,
             file_content=file_content,
@@ -340,6 +366,8 @@ async def upload_file(
         if not result['success']:
             raise HTTPException(status_code=400, detail=result['error'])
         
+        process_knowledge_base_file.send(result['job_id'])
+        
         # Add info about filename changes
         if final_filename != file.filename:
             result['filename_changed'] = True
@@ -356,13 +384,70 @@ async def upload_file(
         logger.error(f"Error uploading file: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to upload file")
 
+def _job_response(job: dict) -> JobResponse:
+    return JobResponse(
+        job_id=job['job_id'],
+        entry_id=job['entry_id'],
+        folder_id=job['folder_id'],
+        filename=job['filename'],
+        file_size=job['file_size'],
+        status=job['status'],
+        error=job.get('error'),
+        chunk_count=job.get('chunk_count'),
+        created_at=job['created_at'],
+        completed_at=job.get('completed_at')
+    )
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_upload_job(
+    job_id: str,
+    user_id: str = Depends(verify_and_get_user_id_from_jwt)
+):
+    """Get the processing status of an uploaded file."""
+    try:
+        client = await db.client
+        job = await kb_jobs.get_job(client, job_id, account_id=user_id)
+        
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        return _job_response(job)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting upload job: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve job")
+
+@router.get("/folders/{folder_id}/jobs", response_model=List[JobResponse])
+async def get_folder_jobs(
+    folder_id: str,
+    user_id: str = Depends(verify_and_get_user_id_from_jwt)
+):
+    """Get recent upload jobs in a folder, newest first."""
+    try:
+        client = await db.client
+        result = await client.table('knowledge_base_jobs').select('*').eq(
+            'folder_id', folder_id
+        ).eq('account_id', user_id).order('created_at', desc=True).limit(50).execute()
+        
+        return [_job_response(job) for job in result.data]
+        
+    except Exception as e:
+        logger.error(f"Error getting folder jobs: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve jobs")
+
 # Entries
 @router.get("/folders/{folder_id}/entries", response_model=List[EntryResponse])
 async def get_folder_entries(
     folder_id: str,
     user_id: str = Depends(verify_and_get_user_id_from_jwt)
 ):
-    """Get all entries in a folder."""
+    """Get all entries in a folder.
+    
+    Uploads that are still being processed, or that failed, are listed first
+    with their job status; a failed upload stays listed until it is deleted.
+    """
     try:
         client = await db.client
         account_id = user_id
@@ -375,11 +460,28 @@ async def get_folder_entries(
         if not folder_result.data:
             raise HTTPException(status_code=404, detail="Folder not found")
         
+        # Jobs first: a job that completes in between then shows up as its entry
+        jobs = await kb_jobs.get_unfinished_jobs(client, account_id, folder_id)
         result = await client.table('knowledge_base_entries').select(
             'entry_id, filename, summary, file_size, created_at'
         ).eq('folder_id', folder_id).eq('is_active', True).order('created_at', desc=True).execute()
+        entry_ids = {entry['entry_id'] for entry in result.data}
         
-        return [
+        uploads = [
+            EntryResponse(
+                entry_id=job['entry_id'],
+                filename=job['filename'],
+                summary='',
+                file_size=job['file_size'],
+                created_at=job['created_at'],
+                status=job['status'],
+                job_id=job['job_id'],
+                error=job.get('error')
+            )
+            for job in jobs
+            if job['entry_id'] not in entry_ids
+        ]
+        return uploads + [
             EntryResponse(
                 entry_id=entry['entry_id'],
                 filename=entry['filename'],
@@ -412,6 +514,9 @@ async def delete_entry(
         ).eq('entry_id', entry_id).eq('account_id', account_id).execute()
         
         if not entry_result.data:
+            # A failed upload is listed under the entry id it would have created
+            if await kb_jobs.dismiss_failed_job(client, account_id, entry_id):
+                return {"success": True}
             raise HTTPException(status_code=404, detail="Entry not found")
         
         entry = entry_result.data[0]
@@ -424,6 +529,7 @@ async def delete_entry(
         
         # Delete from database
         await client.table('knowledge_base_entries').delete().eq('entry_id', entry_id).execute()
+        await kb_retriever.invalidate(account_id)
         
         return {"success": True}
         
@@ -460,6 +566,12 @@ async def update_entry(
         if not update_result.data:
             raise HTTPException(status_code=500, detail="Failed to update entry")
         
+        # Re-embed the summary chunk
+        try:
+            await kb_retriever.index_entry(client, entry_id, account_id, request.summary)
+        except Exception as e:
+            logger.warning(f"Failed to re-index knowledge base entry {entry_id}: {str(e)}")
+        
         # Return the updated entry
         updated_entry = update_result.data[0]
         return EntryResponse(
@@ -521,6 +633,8 @@ async def update_agent_assignments(
                 'enabled': True
             }).execute()
         
+        await kb_retriever.invalidate(account_id)
+        
         return {"success": True, "message": "Assignments updated successfully"}
         
     except Exception as e:
@@ -592,6 +706,7 @@ async def move_file(
             'folder_id': request.folder_id,
             'file_path': new_file_path
         }).eq('entry_id', entry_id).execute()
+        await kb_retriever.invalidate(account_id)
         
         return {"success": True, "message": "File moved successfully"}
         
@@ -0,0 +1,116 @@
+"""
+Text extraction for knowledge base files.
+
+Called in a separate process (see ``jobs.run_extraction``): parsing a PDF or
+DOCX is CPU bound and would otherwise block the event loop of the worker it
+runs in. Files are read incrementally - text in blocks, PDFs page by page,
+DOCX paragraph by paragraph - and reading stops once ``max_chars`` characters
+have been extracted, so very large files do not have to be parsed in full.
+
+Only standard library and parser imports here: this module is imported by
+freshly spawned processes.
+"""
+
+import codecs
+import io
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import chardet
+
+TEXT_EXTENSIONS = {'.txt', '.json', '.xml', '.csv', '.yml', '.yaml', '.md', '.log', '.ini', '.cfg', '.conf'}
+TEXT_MIME_TYPES = {'application/json', 'application/xml', 'text/xml'}
+
+# Encoding detection is slow on large inputs; a sample is as good for text files
+DETECTION_SAMPLE_BYTES = 64 * 1024
+TEXT_BLOCK_BYTES = 1024 * 1024
+
+
+def detect_encoding(sample: bytes) -> str:
+    return chardet.detect(sample[:DETECTION_SAMPLE_BYTES]).get('encoding') or 'utf-8'
+
+
+def is_likely_text(file_content: bytes) -> bool:
+    """Check if file content is likely text-based."""
+    try:
+        # Try to decode as text
+        detected = chardet.detect(file_content[:1024])  # Check first 1KB
+        if detected.get('confidence', 0) > 0.7:
+            decoded = file_content[:1024].decode(detected.get('encoding', 'utf-8'))
+            # Check if most characters are printable
+            printable_ratio = len([c for c in decoded if c.isprintable() or c.isspace()]) / len(decoded)
+            return printable_ratio > 0.8
+    except Exception:
+        pass
+    return False
+
+
+def _iter_decoded(file_content: bytes, encoding: str) -> Iterator[str]:
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for start in range(0, len(file_content), TEXT_BLOCK_BYTES):
+        yield decoder.decode(file_content[start:start + TEXT_BLOCK_BYTES])
+    yield decoder.decode(b'', final=True)
+
+
+def _iter_pdf(file_content: bytes) -> Iterator[str]:
+    import PyPDF2
+
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+    for index, page in enumerate(pdf_reader.pages):
+        yield ('\n\n' if index else '') + (page.extract_text() or '')
+
+
+def _iter_docx(file_content: bytes) -> Iterator[str]:
+    import docx
+
+    doc = docx.Document(io.BytesIO(file_content))
+    for index, paragraph in enumerate(doc.paragraphs):
+        yield ('\n' if index else '') + paragraph.text
+
+
+def iter_text(file_content: bytes, filename: str, mime_type: str) -> Iterator[str]:
+    """Yield the text of a file in pieces, in order."""
+    file_extension = Path(filename).suffix.lower()
+
+    # Handle text-based files (including JSON, XML, CSV, etc.)
+    if file_extension in TEXT_EXTENSIONS or mime_type.startswith('text/') or mime_type in TEXT_MIME_TYPES:
+        yield from _iter_decoded(file_content, detect_encoding(file_content))
+
+    elif file_extension == '.pdf':
+        yield from _iter_pdf(file_content)
+
+    elif file_extension == '.docx':
+        yield from _iter_docx(file_content)
+
+    # For any other file type, try to decode as text (fallback)
+    else:
+        try:
+            content = file_content.decode(detect_encoding(file_content))
+            # Only return if it seems to be mostly text content
+            if len([c for c in content[:1000] if c.isprintable() or c.isspace()]) > 800:
+                yield content
+                return
+        except Exception:
+            pass
+
+        # If we can't extract text content, return a placeholder
+        yield f"[Binary file: {filename}] - Content cannot be extracted as text, but file is stored and available for download."
+
+
+def extract_text(file_content: bytes, filename: str, mime_type: str, max_chars: int) -> Tuple[str, bool]:
+    """Extract up to ``max_chars`` characters of text. Returns (text, truncated)."""
+    pieces = []
+    total = 0
+    try:
+        for piece in iter_text(file_content, filename, mime_type):
+            if total + len(piece) > max_chars:
+                pieces.append(piece[:max_chars - total])
+                return ''.join(pieces), True
+            pieces.append(piece)
+            total += len(piece)
+    except Exception as e:
+        return f"[Error extracting content from {filename}] - File is stored but content extraction failed: {str(e)}", False
+    return ''.join(pieces), False
@@ -1,18 +1,17 @@
 import os
-import io
 import uuid
 import re
+import time
+from concurrent.futures.process import BrokenProcessPool
 from typing import Dict, Any
 from pathlib import Path
-import mimetypes
-import chardet
-
-import PyPDF2
-import docx
 
 from core.utils.logger import logger
 from core.services.supabase import DBConnection
 from core.services.llm import make_llm_api_call
+from . import jobs as kb_jobs
+from .extraction import is_likely_text
+from .retrieval import kb_retriever
 
 class FileProcessor:
     SUPPORTED_EXTENSIONS = {'.txt', '.pdf', '.docx'}
@@ -44,21 +43,7 @@ class FileProcessor:
         
         return f"{name}{ext}"
     
-    def _is_likely_text_file(self, file_content: bytes) -> bool:
-        """Check if file content is likely text-based."""
-        try:
-            # Try to decode as text
-            detected = chardet.detect(file_content[:1024])  # Check first 1KB
-            if detected.get('confidence', 0) > 0.7:
-                decoded = file_content[:1024].decode(detected.get('encoding', 'utf-8'))
-                # Check if most characters are printable
-                printable_ratio = len([c for c in decoded if c.isprintable() or c.isspace()]) / len(decoded)
-                return printable_ratio > 0.8
-        except:
-            pass
-        return False
-    
-    async def process_file(
+    async def stage_file(
         self, 
         account_id: str, 
         folder_id: str,
@@ -66,6 +51,11 @@ class FileProcessor:
         filename: str, 
         mime_type: str
     ) -> Dict[str, Any]:
+        """Validate and store an upload, and record a job to process it.
+        
+        Extraction, summarization and indexing happen in ``run_job`` on a
+        worker; the caller enqueues the returned job_id.
+        """
         try:
             if len(file_content) > self.MAX_FILE_SIZE:
                 raise ValueError(f"File too large: {len(file_content)} bytes")
@@ -76,7 +66,7 @@ class FileProcessor:
             is_text_based = (
                 mime_type.startswith('text/') or 
                 mime_type in ['application/json', 'application/xml', 'text/xml'] or
-                self._is_likely_text_file(file_content)
+                is_likely_text(file_content)
             )
             
             # If not text-based, check allowed extensions
@@ -97,41 +87,120 @@ class FileProcessor:
                 s3_path, file_content, {"content-type": mime_type}
             )
             
-            # Extract content for summary
-            content = self._extract_content(file_content, filename, mime_type)
-            if not content:
-                # If no content could be extracted, create a basic file info summary
-                content = f"File: {filename} ({len(file_content)} bytes, {mime_type})"
-            
-            # Generate LLM summary
-            summary = await self._generate_summary(content, filename)
-            
-            # Save to database
-            entry_data = {
-                'entry_id': entry_id,
-                'folder_id': folder_id,
-                'account_id': account_id,
-                'filename': filename,
-                'file_path': s3_path,
-                'file_size': len(file_content),
-                'mime_type': mime_type,
-                'summary': summary,
-                'is_active': True
-            }
-            
-            result = await client.table('knowledge_base_entries').insert(entry_data).execute()
+            job = await kb_jobs.create_job(
+                client,
+                account_id=account_id,
+                folder_id=folder_id,
+                entry_id=entry_id,
+                filename=filename,
+                file_path=s3_path,
+                file_size=len(file_content),
+                mime_type=mime_type,
+            )
             
             return {
                 'success': True,
+                'job_id': job['job_id'],
                 'entry_id': entry_id,
                 'filename': filename,
-                'summary_length': len(summary)
+                'status': job['status']
             }
             
         except Exception as e:
-            logger.error(f"Error processing file {filename}: {str(e)}")
+            logger.error(f"Error staging file {filename}: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    async def run_job(self, job_id: str, final_attempt: bool = True) -> bool:
+        """Process a staged upload.
+        
+        Returns False if the job was deferred because all of the account's
+        extraction slots are in use; the caller re-enqueues it. Transient
+        errors are re-raised so the caller can retry the job, unless this is
+        the ``final_attempt``; only then, or on a permanent error, is the job
+        marked failed and its file deleted.
+        """
+        client = await self.db.client
+        job = await kb_jobs.get_job(client, job_id)
+        if not job:
+            logger.warning(f"Knowledge base job {job_id} not found")
+            return True
+        if job['status'] in (kb_jobs.JOB_COMPLETED, kb_jobs.JOB_FAILED):
+            return True
+        
+        account_id = job['account_id']
+        if not await kb_jobs.acquire_slot(account_id, job_id):
+            return False
+        
+        try:
+            await kb_jobs.update_job(client, job_id, kb_jobs.JOB_PROCESSING)
+            chunk_count = await self._process_stored_file(client, job)
+            await kb_jobs.update_job(client, job_id, kb_jobs.JOB_COMPLETED, chunk_count=chunk_count)
+        except Exception as e:
+            if not (final_attempt or isinstance(e, kb_jobs.PermanentJobError)):
+                logger.warning(f"Error processing file {job['filename']} (job {job_id}), will retry: {str(e)}")
+                raise
+            logger.error(f"Error processing file {job['filename']} (job {job_id}): {str(e)}")
+            await kb_jobs.update_job(client, job_id, kb_jobs.JOB_FAILED, error=str(e)[:1000])
+            try:
+                await client.storage.from_('file-uploads').remove([job['file_path']])
+            except Exception as cleanup_error:
+                logger.warning(f"Failed to delete file from S3: {str(cleanup_error)}")
+        finally:
+            await kb_jobs.release_slot(account_id, job_id)
+        return True
+    
+    async def _process_stored_file(self, client, job: Dict[str, Any]) -> int:
+        """Extract, summarize and index a stored upload. Returns the number of chunks indexed."""
+        started = time.monotonic()
+        entry_id = job['entry_id']
+        account_id = job['account_id']
+        filename = job['filename']
+        mime_type = job['mime_type'] or 'application/octet-stream'
+        
+        file_content = await client.storage.from_('file-uploads').download(job['file_path'])
+        
+        # Extract content for summary (in the extraction process pool)
+        try:
+            content, truncated = await kb_jobs.run_extraction(file_content, filename, mime_type)
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            raise kb_jobs.PermanentJobError(f"Could not extract text from {filename}: {str(e)}") from e
+        if not content:
+            # If no content could be extracted, create a basic file info summary
+            content = f"File: {filename} ({len(file_content)} bytes, {mime_type})"
+        
+        # Generate LLM summary
+        summary = await self._generate_summary(content, filename)
+        
+        # Save to database (upsert: a redelivered job must not create a second entry)
+        entry_data = {
+            'entry_id': entry_id,
+            'folder_id': job['folder_id'],
+            'account_id': account_id,
+            'filename': filename,
+            'file_path': job['file_path'],
+            'file_size': len(file_content),
+            'mime_type': mime_type,
+            'summary': summary,
+            'is_active': True
+        }
+        
+        await client.table('knowledge_base_entries').upsert(entry_data, on_conflict='entry_id').execute()
+        
+        # Chunk and embed for retrieval; the entry stays usable (summary only) if this fails
+        chunk_count = 0
+        try:
+            chunk_count = await kb_retriever.index_entry(client, entry_id, account_id, summary, content)
+        except Exception as e:
+            logger.warning(f"Failed to index knowledge base entry {entry_id} for retrieval: {str(e)}")
+        
+        logger.info(
+            f"Processed knowledge base file {filename} ({len(file_content)} bytes"
+            f"{', text truncated' if truncated else ''}) in {time.monotonic() - started:.1f}s, {chunk_count} chunks"
+        )
+        return chunk_count
+    
     async def _generate_summary(self, content: str, filename: str) -> str:
         """Generate LLM summary of file content with smart chunking and fallbacks."""
         try:
@@ -274,47 +343,3 @@ Keep it under 200 words and make it actionable for context injection."""
         
         # Generate intelligent fallback
         return f"This {content_type} '{filename}' contains {len(content):,} characters across {len(non_empty_lines)} lines. Preview: {preview[:200]}{'...' if len(preview) > 200 else ''} This file would be useful for understanding the specific content and context it provides."
-    
-    def _extract_content(self, file_content: bytes, filename: str, mime_type: str) -> str:
-        """Extract text content from file bytes."""
-        file_extension = Path(filename).suffix.lower()
-        
-        try:
-            # Handle text-based files (including JSON, XML, CSV, etc.)
-            if (file_extension in ['.txt', '.json', '.xml', '.csv', '.yml', '.yaml', '.md', '.log', '.ini', '.cfg', '.conf'] 
-                or mime_type.startswith('text/') 
-                or mime_type in ['application/json', 'application/xml', 'text/xml']):
-                
-                detected = chardet.detect(file_content)
-                encoding = detected.get('encoding', 'utf-8')
-                try:
-                    return file_content.decode(encoding)
-                except UnicodeDecodeError:
-                    return file_content.decode('utf-8', errors='replace')
-            
-            elif file_extension == '.pdf':
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-                return '\n\n'.join(page.extract_text() for page in pdf_reader.pages)
-            
-            elif file_extension == '.docx':
-                doc = docx.Document(io.BytesIO(file_content))
-                return '\n'.join(paragraph.text for paragraph in doc.paragraphs)
-            
-            # For any other file type, try to decode as text (fallback)
-            else:
-                try:
-                    detected = chardet.detect(file_content)
-                    encoding = detected.get('encoding', 'utf-8')
-                    content = file_content.decode(encoding)
-                    # Only return if it seems to be mostly text content
-                    if len([c for c in content[:1000] if c.isprintable() or c.isspace()]) > 800:
-                        return content
-                except:
-                    pass
-                
-                # If we can't extract text content, return a placeholder
-                return f"[Binary file: {filename}] - Content cannot be extracted as text, but file is stored and available for download."
-            
-        except Exception as e:
-            logger.error(f"Error extracting content from {filename}: {str(e)}")
-            return f"[Error extracting content from {filename}] - File is stored but content extraction failed: {str(e)}" 
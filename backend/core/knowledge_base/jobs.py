@@ -0,0 +1,168 @@
+"""
+Background processing of knowledge base uploads.
+
+The upload endpoint stores the file, records a job in ``knowledge_base_jobs``
+and returns; the ``process_knowledge_base_file`` Dramatiq actor then runs
+``FileProcessor.run_job``. CPU-bound text extraction runs in a process pool so
+it never blocks the worker's event loop (which agent runs share).
+
+At most KB_EXTRACTION_ACCOUNT_CONCURRENCY jobs per account run at a time. Slots
+are leases in a Redis sorted set scored by start time, so a slot held by a
+worker that died expires after SLOT_LEASE_SECONDS.
+
+A job that fails for a transient reason (storage, database, LLM) is retried
+by Dramatiq up to MAX_RETRIES times; it is marked failed and its file deleted
+only on a ``PermanentJobError`` or when the last attempt fails.
+"""
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.services import redis
+from core.utils.config import config
+from core.utils.logger import logger
+from .extraction import extract_text
+
+JOB_QUEUED = 'queued'
+JOB_PROCESSING = 'processing'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+PENDING_STATUSES = [JOB_QUEUED, JOB_PROCESSING]
+
+SLOTS_KEY = "kb_extraction_slots:{account_id}"
+SLOT_LEASE_SECONDS = 30 * 60
+DEFER_DELAY_MS = 5000
+MAX_RETRIES = 3
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class PermanentJobError(Exception):
+    """The upload itself cannot be processed; retrying will not help."""
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(
+            max_workers=max(1, config.KB_EXTRACTION_PROCESSES),
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _pool
+
+
+async def run_extraction(file_content: bytes, filename: str, mime_type: str) -> Tuple[str, bool]:
+    """Extract text in the extraction process pool. Returns (text, truncated)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_pool(), extract_text, file_content, filename, mime_type, config.KB_EXTRACTION_MAX_CHARS
+    )
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+async def create_job(
+    client,
+    account_id: str,
+    folder_id: str,
+    entry_id: str,
+    filename: str,
+    file_path: str,
+    file_size: int,
+    mime_type: str,
+) -> Dict[str, Any]:
+    result = await client.table('knowledge_base_jobs').insert({
+        'account_id': account_id,
+        'folder_id': folder_id,
+        'entry_id': entry_id,
+        'filename': filename,
+        'file_path': file_path,
+        'file_size': file_size,
+        'mime_type': mime_type,
+        'status': JOB_QUEUED,
+    }).execute()
+    return result.data[0]
+
+
+async def get_job(client, job_id: str, account_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    query = client.table('knowledge_base_jobs').select('*').eq('job_id', job_id)
+    if account_id:
+        query = query.eq('account_id', account_id)
+    result = await query.execute()
+    return result.data[0] if result.data else None
+
+
+async def update_job(client, job_id: str, status: str, **fields) -> None:
+    fields['status'] = status
+    if status == JOB_PROCESSING:
+        fields.setdefault('started_at', _now())
+    elif status in (JOB_COMPLETED, JOB_FAILED):
+        fields.setdefault('completed_at', _now())
+    await client.table('knowledge_base_jobs').update(fields).eq('job_id', job_id).execute()
+
+
+async def get_pending_jobs(client, account_id: str, folder_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Uploads that are stored but not processed yet (count towards size and name checks)."""
+    query = client.table('knowledge_base_jobs').select(
+        'job_id, folder_id, filename, file_size'
+    ).eq('account_id', account_id).in_('status', PENDING_STATUSES)
+    if folder_id:
+        query = query.eq('folder_id', folder_id)
+    result = await query.execute()
+    return result.data or []
+
+
+async def get_unfinished_jobs(client, account_id: str, folder_id: str) -> List[Dict[str, Any]]:
+    """Uploads in a folder that have no entry yet: still processing, or failed and not dismissed."""
+    result = await client.table('knowledge_base_jobs').select(
+        'job_id, entry_id, filename, file_size, status, error, created_at'
+    ).eq('account_id', account_id).eq('folder_id', folder_id).in_(
+        'status', PENDING_STATUSES + [JOB_FAILED]
+    ).order('created_at', desc=True).execute()
+    return result.data or []
+
+
+async def dismiss_failed_job(client, account_id: str, entry_id: str) -> bool:
+    """Delete the failed upload that would have created ``entry_id``; False if there is none."""
+    result = await client.table('knowledge_base_jobs').delete().eq('account_id', account_id).eq(
+        'entry_id', entry_id
+    ).eq('status', JOB_FAILED).execute()
+    return bool(result.data)
+
+
+async def acquire_slot(account_id: str, job_id: str) -> bool:
+    """Take one of the account's extraction slots; False if they are all in use."""
+    key = SLOTS_KEY.format(account_id=account_id)
+    now = time.time()
+    try:
+        client = await redis.get_client()
+        pipe = client.pipeline(transaction=False)
+        pipe.zremrangebyscore(key, '-inf', now - SLOT_LEASE_SECONDS)
+        pipe.zadd(key, {job_id: now}, nx=True)
+        pipe.zrank(key, job_id)
+        pipe.expire(key, SLOT_LEASE_SECONDS)
+        _, _, rank, _ = await pipe.execute()
+
+        # The earliest holders keep their slots; everyone else backs off
+        if rank is not None and rank < max(1, config.KB_EXTRACTION_ACCOUNT_CONCURRENCY):
+            return True
+        await client.zrem(key, job_id)
+        return False
+    except Exception as e:
+        logger.warning(f"Failed to take knowledge base extraction slot for job {job_id}, running unthrottled: {e}")
+        return True
+
+
+async def release_slot(account_id: str, job_id: str) -> None:
+    try:
+        client = await redis.get_client()
+        await client.zrem(SLOTS_KEY.format(account_id=account_id), job_id)
+    except Exception as e:
+        logger.warning(f"Failed to release knowledge base extraction slot for job {job_id}: {e}")
@@ -0,0 +1,385 @@
+"""
+Retrieval-based knowledge base context.
+
+``get_agent_knowledge_base_context`` inlines every enabled entry into the
+system prompt, so prompt size (and cost) grows with the knowledge base. Entries
+are instead split into chunks that are embedded at ingest time
+(``knowledge_base_chunks``). For each run the agent's chunks are loaded into an
+in-memory flat index, and only the chunks closest to the latest user message
+are injected, within a token budget. Each chunk stores the model that produced
+its vector; only chunks of the embedding client's primary model are indexed,
+and chunks that only the fallback model could embed are re-embedded on the
+next index build.
+
+Indexes are cached per agent and rebuilt when the account's knowledge base
+version (bumped on every KB mutation) changes or after ``KB_INDEX_TTL``. At
+most ``MAX_CACHED_INDEXES`` agents are kept; the least recently used one is
+evicted together with its build lock.
+"""
+
+import asyncio
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.services import redis
+from core.utils.config import config
+from core.utils.logger import logger
+
+CHUNK_TOKENS = 300
+MAX_CHUNK_TOKENS = 600
+CHUNK_OVERLAP_TOKENS = 40
+MAX_CHUNKS_PER_ENTRY = 1000
+MAX_CACHED_INDEXES = 256
+KB_VERSION_KEY = "kb_index_version:{account_id}"
+
+
+def estimate_tokens(text: str) -> int:
+    # Same ~4 characters per token estimate as get_agent_knowledge_base_context
+    return max(1, (len(text) + 3) // 4)
+
+
+def chunk_tokens_for(text: str) -> int:
+    """Chunk size for a document: CHUNK_TOKENS, grown (up to MAX_CHUNK_TOKENS)
+    so that large documents still fit in MAX_CHUNKS_PER_ENTRY chunks."""
+    needed = -(-estimate_tokens(text) // MAX_CHUNKS_PER_ENTRY)
+    return min(MAX_CHUNK_TOKENS, max(CHUNK_TOKENS, needed))
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    """Split text into chunks of about ``max_tokens``, preferring paragraph boundaries.
+
+    Consecutive chunks share ``overlap_tokens`` of text so a passage cut at a
+    chunk boundary is still retrievable from either side.
+    """
+    max_chars = max_tokens * 4
+    overlap_chars = overlap_tokens * 4
+
+    pieces: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = paragraph.strip()
+        # Offsets rather than re-slicing: a single huge paragraph would be copied once per chunk
+        start = 0
+        while len(paragraph) - start > max_chars:
+            cut = paragraph.rfind(" ", start, start + max_chars)
+            if cut <= start + max_chars // 2:
+                cut = start + max_chars
+            pieces.append(paragraph[start:cut])
+            start = cut
+            while start < len(paragraph) and paragraph[start].isspace():
+                start += 1
+        if start < len(paragraph):
+            pieces.append(paragraph[start:])
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            tail = current[-overlap_chars:] if overlap_chars else ""
+            if " " in tail:
+                tail = tail[tail.index(" ") + 1:]
+            current = f"{tail}\n\n{piece}" if tail else piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+@dataclass(frozen=True)
+class KnowledgeChunk:
+    entry_id: str
+    source: str
+    chunk_index: int
+    content: str
+    token_count: int
+
+
+class KnowledgeBaseIndex:
+    """Exact (flat) inner-product index over unit-length embeddings."""
+
+    def __init__(self, chunks: Sequence[KnowledgeChunk], vectors: np.ndarray, skipped: int = 0):
+        self.chunks = list(chunks)
+        self.vectors = vectors.astype(np.float32, copy=False)
+        # Chunks of the knowledge base that have no vector of the index's model
+        self.skipped = skipped
+
+    @classmethod
+    def empty(cls, skipped: int = 0) -> "KnowledgeBaseIndex":
+        return cls([], np.zeros((0, 0), dtype=np.float32), skipped)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search(self, query: Sequence[float], k: int) -> List[Tuple[float, KnowledgeChunk]]:
+        if not self.chunks or k <= 0:
+            return []
+        q = np.asarray(query, dtype=np.float32)
+        if q.shape[0] != self.vectors.shape[1]:
+            logger.warning(f"Query embedding dimension {q.shape[0]} does not match index dimension {self.vectors.shape[1]}")
+            return []
+        scores = self.vectors @ q
+        k = min(k, len(self.chunks))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), self.chunks[i]) for i in top]
+
+
+def format_context(results: Sequence[Tuple[float, KnowledgeChunk]], token_budget: int) -> str:
+    """Render search results grouped by source file, best match first, within ``token_budget``."""
+    sections: "OrderedDict[str, List[KnowledgeChunk]]" = OrderedDict()
+    used = 0
+    for _, chunk in results:
+        if used + chunk.token_count > token_budget:
+            continue
+        sections.setdefault(chunk.source, []).append(chunk)
+        used += chunk.token_count
+    if not sections:
+        return ""
+
+    context_text = ""
+    for source, chunks in sections.items():
+        context_text += f"\n\n## {source}\n"
+        context_text += "\n\n".join(c.content for c in sorted(chunks, key=lambda c: c.chunk_index))
+    return (
+        "# KNOWLEDGE BASE\n\nThe following excerpts from your knowledge base are relevant to the current request:"
+        + context_text
+    )
+
+
+@dataclass
+class _CachedIndex:
+    index: KnowledgeBaseIndex
+    version: Optional[str]
+    built_at: float
+
+
+@dataclass
+class _AgentIndex:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    cached: Optional[_CachedIndex] = None
+
+
+class KnowledgeBaseRetriever:
+    def __init__(self, embedding_client=None, index_ttl: Optional[int] = None, max_indexes: int = MAX_CACHED_INDEXES):
+        self._embedding_client = embedding_client
+        self.index_ttl = config.KB_INDEX_TTL if index_ttl is None else index_ttl
+        self.max_indexes = max_indexes
+        self._indexes: "OrderedDict[str, _AgentIndex]" = OrderedDict()
+
+    @property
+    def embeddings(self):
+        if self._embedding_client is None:
+            from core.services.embedding_client import get_embedding_client
+            self._embedding_client = get_embedding_client()
+        return self._embedding_client
+
+    # Ingest
+
+    async def embed_chunks(self, entry_id: str, account_id: str, summary: str, content: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Chunk and embed an entry; the summary is always chunk 0."""
+        texts = [summary]
+        if content:
+            chunks = chunk_text(content, max_tokens=chunk_tokens_for(content))
+            if len(chunks) > MAX_CHUNKS_PER_ENTRY:
+                logger.info(f"Entry {entry_id} has {len(chunks)} chunks, indexing the first {MAX_CHUNKS_PER_ENTRY}")
+            texts += chunks[:MAX_CHUNKS_PER_ENTRY]
+        embedded = await self.embeddings.embed_batch_with_models(texts)
+        return [
+            self._chunk_row(entry_id, account_id, chunk_index, text, vector, model)
+            for chunk_index, (text, (vector, model)) in enumerate(zip(texts, embedded))
+            if vector is not None
+        ]
+
+    @staticmethod
+    def _chunk_row(entry_id: str, account_id: str, chunk_index: int, text: str, vector: List[float], model: str) -> Dict[str, Any]:
+        # The model that actually produced the vector: the fallback model's vectors are not comparable
+        return {
+            'entry_id': entry_id,
+            'account_id': account_id,
+            'chunk_index': chunk_index,
+            'content': text,
+            'token_count': estimate_tokens(text),
+            'embedding': vector,
+            'embedding_model': model,
+        }
+
+    async def index_entry(self, client, entry_id: str, account_id: str, summary: str, content: Optional[str] = None) -> int:
+        """(Re)index an entry. Without ``content`` only the summary chunk is replaced.
+
+        The old chunks are kept when embedding produces nothing, and are
+        otherwise swapped for the new ones in one transaction.
+        """
+        rows = await self.embed_chunks(entry_id, account_id, summary, content)
+        if content is None:
+            rows = [row for row in rows if row['chunk_index'] == 0]
+        if not rows:
+            logger.warning(f"Embedding produced no chunks for entry {entry_id}; keeping its current chunks")
+            return 0
+        await client.rpc('replace_knowledge_base_chunks', {
+            'p_entry_id': entry_id,
+            'p_chunks': rows,
+            'p_summary_only': content is None,
+        }).execute()
+        await self.invalidate(account_id)
+        logger.debug(f"Indexed {len(rows)} knowledge base chunks for entry {entry_id}")
+        return len(rows)
+
+    async def invalidate(self, account_id: str) -> None:
+        """Mark the indexes of every agent of ``account_id`` as stale."""
+        try:
+            client = await redis.get_client()
+            await client.incr(KB_VERSION_KEY.format(account_id=account_id))
+        except Exception as e:
+            logger.warning(f"Failed to bump knowledge base version for {account_id}: {e}")
+
+    # Retrieval
+
+    async def get_context(
+        self,
+        client,
+        agent_id: str,
+        account_id: Optional[str],
+        query: str,
+        top_k: Optional[int] = None,
+        token_budget: Optional[int] = None,
+    ) -> Optional[str]:
+        """Knowledge base excerpts relevant to ``query``.
+
+        Returns None when retrieval is unavailable (e.g. no embedding provider,
+        or only the fallback model could embed) so the caller can fall back to
+        the full knowledge base, and an empty string when the agent has no
+        knowledge base.
+        """
+        if not query or not query.strip():
+            return None
+        index = await self._get_index(client, agent_id, account_id)
+        if not len(index):
+            return None if index.skipped else ""
+
+        started = time.perf_counter()
+        query_vector, query_model = await self.embeddings.embed_text_with_model(query)
+        if query_vector is None:
+            return None
+        if query_model != self.embeddings.model:
+            # The index only holds vectors of the primary model
+            logger.debug(f"Query for agent {agent_id} was embedded by {query_model}; not searching the index")
+            return None
+        results = index.search(query_vector, top_k or config.KB_RETRIEVAL_TOP_K)
+        context = format_context(results, token_budget or config.KB_RETRIEVAL_TOKEN_BUDGET)
+        logger.debug(
+            f"Retrieved {len(results)}/{len(index)} knowledge base chunks for agent {agent_id} "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms ({estimate_tokens(context)} tokens)"
+        )
+        return context
+
+    async def _version(self, account_id: Optional[str]) -> Optional[str]:
+        if not account_id:
+            return None
+        try:
+            return await redis.get(KB_VERSION_KEY.format(account_id=account_id))
+        except Exception:
+            return None
+
+    def _is_fresh(self, cached: Optional[_CachedIndex], version: Optional[str]) -> bool:
+        return bool(cached and cached.version == version and time.monotonic() - cached.built_at < self.index_ttl)
+
+    def _agent_index(self, agent_id: str) -> _AgentIndex:
+        """The cache slot of ``agent_id``, marked most recently used."""
+        slot = self._indexes.get(agent_id)
+        if slot is None:
+            slot = self._indexes[agent_id] = _AgentIndex()
+        self._indexes.move_to_end(agent_id)
+        for victim in list(self._indexes):
+            if len(self._indexes) <= self.max_indexes:
+                break
+            # A slot whose index is being built stays until the build is done
+            if victim != agent_id and not self._indexes[victim].lock.locked():
+                del self._indexes[victim]
+        return slot
+
+    async def _get_index(self, client, agent_id: str, account_id: Optional[str]) -> KnowledgeBaseIndex:
+        version = await self._version(account_id)
+        slot = self._agent_index(agent_id)
+        if self._is_fresh(slot.cached, version):
+            return slot.cached.index
+
+        async with slot.lock:
+            if self._is_fresh(slot.cached, version):
+                return slot.cached.index
+            index = await self._build_index(client, agent_id, account_id)
+            slot.cached = _CachedIndex(index=index, version=version, built_at=time.monotonic())
+            return index
+
+    async def _build_index(self, client, agent_id: str, account_id: Optional[str]) -> KnowledgeBaseIndex:
+        result = await client.rpc('get_agent_knowledge_base_chunks', {'p_agent_id': agent_id}).execute()
+        rows = list(result.data or [])
+
+        # Entries uploaded before chunking existed: embed their summary once and store it
+        for row in [r for r in rows if r.get('chunk_index') is None]:
+            rows.remove(row)
+            if not account_id:
+                continue
+            try:
+                backfilled = await self.embed_chunks(row['entry_id'], account_id, row['summary'])
+                if backfilled:
+                    await client.table('knowledge_base_chunks').upsert(backfilled, on_conflict='entry_id,chunk_index').execute()
+                rows.extend({**row, **chunk} for chunk in backfilled)
+            except Exception as e:
+                logger.warning(f"Failed to backfill knowledge base chunks for entry {row['entry_id']}: {e}")
+
+        # Similarities are only meaningful between vectors of one model: chunks stored by the
+        # fallback (or a previous) model are re-embedded, and left out while that fails
+        model = self.embeddings.model
+        current, stale = [], []
+        for row in rows:
+            if row.get('embedding'):
+                (current if row.get('embedding_model') == model else stale).append(row)
+        reembedded = await self._reembed(client, account_id, stale) if stale and account_id else []
+        skipped = len(stale) - len(reembedded)
+        rows = current + reembedded
+        if not rows:
+            return KnowledgeBaseIndex.empty(skipped)
+
+        dimension = len(rows[0]['embedding'])
+        chunks = [
+            KnowledgeChunk(
+                entry_id=r['entry_id'],
+                source=f"{r.get('folder_name') or 'Knowledge Base'}/{r.get('filename') or r['entry_id']}",
+                chunk_index=r['chunk_index'],
+                content=r['content'],
+                token_count=r.get('token_count') or estimate_tokens(r['content']),
+            )
+            for r in rows
+        ]
+        vectors = np.asarray([r['embedding'] for r in rows], dtype=np.float32)
+        logger.debug(f"Built knowledge base index for agent {agent_id}: {len(chunks)} chunks, dim {dimension}")
+        return KnowledgeBaseIndex(chunks, vectors, skipped)
+
+    async def _reembed(self, client, account_id: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Re-embed chunks stored by another model with the primary one; returns the rows that succeeded."""
+        try:
+            embedded = await self.embeddings.embed_batch_with_models([row['content'] for row in rows])
+            updated = [
+                (row, self._chunk_row(row['entry_id'], account_id, row['chunk_index'], row['content'], vector, model))
+                for row, (vector, model) in zip(rows, embedded)
+                if vector is not None and model == self.embeddings.model
+            ]
+            if updated:
+                await client.table('knowledge_base_chunks').upsert(
+                    [chunk for _, chunk in updated], on_conflict='entry_id,chunk_index'
+                ).execute()
+            if len(updated) < len(rows):
+                logger.info(f"{len(rows) - len(updated)} knowledge base chunks could not be re-embedded with {self.embeddings.model}")
+            return [{**row, **chunk} for row, chunk in updated]
+        except Exception as e:
+            logger.warning(f"Failed to re-embed {len(rows)} knowledge base chunks: {e}")
+            return []
+
+
+kb_retriever = KnowledgeBaseRetriever()
@@ -151,6 +151,7 @@ async def validate_file_name_unique_in_folder(filename: str, folder_id: str, exc
     Returns the final filename to use.
     """
     from core.services.supabase import DBConnection
+    from .jobs import PENDING_STATUSES
     
     db = DBConnection()
     client = await db.client
@@ -164,5 +165,11 @@ async def validate_file_name_unique_in_folder(filename: str, folder_id: str, exc
     result = await query.execute()
     existing_names = [entry['filename'] for entry in result.data]
     
+    # Uploads that are still being processed have no entry yet
+    pending = await client.table('knowledge_base_jobs').select('filename').eq(
+        'folder_id', folder_id
+    ).in_('status', PENDING_STATUSES).execute()
+    existing_names += [job['filename'] for job in pending.data]
+    
     # Generate unique name if needed
     return FileNameValidator.generate_unique_name(filename, existing_names, "file")
\ No newline at end of file
@@ -9,11 +9,10 @@ from datetime import datetime
 from collections import OrderedDict
 
 from mcp import ClientSession
-from mcp.client.sse import sse_client
-from mcp.client.streamable_http import streamablehttp_client
 
 from core.utils.logger import logger
 from core.credentials import EncryptionService
+from core.mcp_module.session_pool import mcp_session_pool, get_composio_mcp_url
 
 
 class MCPException(Exception):
@@ -51,6 +50,8 @@ class MCPConnection:
     external_user_id: Optional[str] = None
     session: Optional[ClientSession] = field(default=None, compare=False)
     tools: Optional[List[Any]] = field(default=None, compare=False)
+    url: Optional[str] = field(default=None, compare=False)
+    headers: Optional[Dict[str, str]] = field(default=None, compare=False)
 
 
 @dataclass(frozen=True)
@@ -127,30 +128,25 @@ class MCPService:
             
             # Add timeout to prevent hanging
             async with asyncio.timeout(30):
-                async with streamablehttp_client(server_url, headers=headers) as (
-                    read_stream, write_stream, _
-                ):
-                    session = ClientSession(read_stream, write_stream)
-                    await session.initialize()
-                    
-                    tool_result = await session.list_tools()
-                    tools = tool_result.tools if tool_result else []
-                    
-                    connection = MCPConnection(
-                        qualified_name=request.qualified_name,
-                        name=request.name,
-                        config=request.config,
-                        enabled_tools=request.enabled_tools,
-                        provider=request.provider,
-                        external_user_id=request.external_user_id,
-                        session=session,
-                        tools=tools
-                    )
-                    
-                    self._connections[request.qualified_name] = connection
-                    self._logger.debug(f"Connected to {request.qualified_name} ({len(tools)} tools available)")
-                    
-                    return connection
+                tool_result = await mcp_session_pool.list_tools("http", server_url, headers)
+            tools = tool_result.tools if tool_result else []
+            
+            connection = MCPConnection(
+                qualified_name=request.qualified_name,
+                name=request.name,
+                config=request.config,
+                enabled_tools=request.enabled_tools,
+                provider=request.provider,
+                external_user_id=request.external_user_id,
+                tools=tools,
+                url=server_url,
+                headers=headers
+            )
+            
+            self._connections[request.qualified_name] = connection
+            self._logger.debug(f"Connected to {request.qualified_name} ({len(tools)} tools available)")
+            
+            return connection
                     
         except asyncio.TimeoutError:
             error_msg = f"Connection timeout for {request.qualified_name} after 30 seconds"
@@ -185,9 +181,9 @@ class MCPService:
     
     async def disconnect_server(self, qualified_name: str) -> None:
         connection = self._connections.get(qualified_name)
-        if connection and connection.session:
+        if connection and connection.url:
             try:
-                await connection.session.close()
+                await mcp_session_pool.close("http", connection.url, connection.headers)
                 self._logger.debug(f"Disconnected from {qualified_name}")
             except Exception as e:
                 self._logger.warning(f"Error disconnecting from {qualified_name}: {str(e)}")
@@ -244,14 +240,16 @@ class MCPService:
         if not connection:
             raise MCPToolNotFoundError(f"Tool not found: {request.tool_name}")
         
-        if not connection.session:
+        if not connection.url:
             raise MCPToolExecutionError(f"No active session for tool: {request.tool_name}")
         
         if request.tool_name not in connection.enabled_tools:
             raise MCPToolExecutionError(f"Tool not enabled: {request.tool_name}")
         
         try:
-            result = await connection.session.call_tool(request.tool_name, request.arguments)
+            result = await mcp_session_pool.call_tool(
+                "http", connection.url, connection.headers, request.tool_name, request.arguments
+            )
             
             self._logger.debug(f"Tool {request.tool_name} executed successfully")
             
@@ -307,28 +305,25 @@ class MCPService:
             raise CustomMCPError("URL is required for HTTP MCP connections")
         
         try:
-            async with streamablehttp_client(url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    await session.initialize()
-                    tool_result = await session.list_tools()
-                    
-                    tools_info = []
-                    for tool in tool_result.tools:
-                        tools_info.append({
-                            "name": tool.name,
-                            "description": tool.description,
-                            "inputSchema": tool.inputSchema
-                        })
-                    
-                    return CustomMCPConnectionResult(
-                        success=True,
-                        qualified_name=f"custom_http_{url.split('/')[-1]}",
-                        display_name=f"Custom HTTP MCP ({url})",
-                        tools=tools_info,
-                        config=config,
-                        url=url,
-                        message=f"Connected via HTTP ({len(tools_info)} tools)"
-                    )
+            tool_result = await mcp_session_pool.list_tools("http", url)
+            
+            tools_info = []
+            for tool in tool_result.tools:
+                tools_info.append({
+                    "name": tool.name,
+                    "description": tool.description,
+                    "inputSchema": tool.inputSchema
+                })
+            
+            return CustomMCPConnectionResult(
+                success=True,
+                qualified_name=f"custom_http_{url.split('/')[-1]}",
+                display_name=f"Custom HTTP MCP ({url})",
+                tools=tools_info,
+                config=config,
+                url=url,
+                message=f"Connected via HTTP ({len(tools_info)} tools)"
+            )
         
         except Exception as e:
             self._logger.error(f"Error connecting to HTTP MCP server: {str(e)}")
@@ -348,28 +343,25 @@ class MCPService:
             raise CustomMCPError("URL is required for SSE MCP connections")
         
         try:
-            async with sse_client(url) as (read_stream, write_stream):
-                async with ClientSession(read_stream, write_stream) as session:
-                    await session.initialize()
-                    tool_result = await session.list_tools()
-                    
-                    tools_info = []
-                    for tool in tool_result.tools:
-                        tools_info.append({
-                            "name": tool.name,
-                            "description": tool.description,
-                            "inputSchema": tool.inputSchema
-                        })
-                    
-                    return CustomMCPConnectionResult(
-                        success=True,
-                        qualified_name=f"custom_sse_{url.split('/')[-1]}",
-                        display_name=f"Custom SSE MCP ({url})",
-                        tools=tools_info,
-                        config=config,
-                        url=url,
-                        message=f"Connected via SSE ({len(tools_info)} tools)"
-                    )
+            tool_result = await mcp_session_pool.list_tools("sse", url)
+            
+            tools_info = []
+            for tool in tool_result.tools:
+                tools_info.append({
+                    "name": tool.name,
+                    "description": tool.description,
+                    "inputSchema": tool.inputSchema
+                })
+            
+            return CustomMCPConnectionResult(
+                success=True,
+                qualified_name=f"custom_sse_{url.split('/')[-1]}",
+                display_name=f"Custom SSE MCP ({url})",
+                tools=tools_info,
+                config=config,
+                url=url,
+                message=f"Connected via SSE ({len(tools_info)} tools)"
+            )
         
         except Exception as e:
             self._logger.error(f"Error connecting to SSE MCP server: {str(e)}")
@@ -422,14 +414,8 @@ class MCPService:
         if not profile_id:
             raise MCPProviderError(f"profile_id not provided for Composio MCP server: {qualified_name}")
         
-        # Import here to avoid circular dependency
-        from core.composio_integration.composio_profile_service import ComposioProfileService
-        from core.services.supabase import DBConnection
-        
         try:
-            db = DBConnection()
-            profile_service = ComposioProfileService(db)
-            mcp_url = await profile_service.get_mcp_url_for_runtime(profile_id)
+            mcp_url = await get_composio_mcp_url(profile_id)
             
             self._logger.debug(f"Resolved Composio profile {profile_id} to MCP URL {mcp_url}")
             return mcp_url
@@ -0,0 +1,342 @@
+"""
+Pooled, persistent MCP client sessions.
+
+Opening an MCP session costs a transport connect plus an ``initialize``
+handshake. Tool calls used to pay that on every invocation; the pool keeps one
+initialized ``ClientSession`` per (transport, url, headers) and reuses it
+across calls, agent runs and tool discovery.
+
+Each session lives inside a dedicated owner task, because the MCP transports
+are anyio context managers that must be entered and exited from the same task.
+Callers only borrow ``entry.session``; the owner task tears the transport down
+when the session is evicted, idles out, or fails.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+import anyio
+import httpx
+
+from core.utils.logger import logger
+
+T = TypeVar("T")
+
+SessionKey = Tuple[str, str, str]
+SessionFactory = Callable[[str, str, Dict[str, str]], Any]
+
+DEFAULT_MAX_SESSIONS = 64
+DEFAULT_IDLE_TTL_SECONDS = 300
+DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS = 60
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 30
+COMPOSIO_URL_TTL_SECONDS = 600
+
+# Errors that mean the pooled connection itself is gone, as opposed to the
+# server reporting a failed tool call.
+TRANSPORT_ERRORS: Tuple[type, ...] = (
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+    httpx.TransportError,
+)
+
+
+def _headers_hash(headers: Optional[Dict[str, str]]) -> str:
+    payload = json.dumps(headers or {}, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def session_key(transport: str, url: str, headers: Optional[Dict[str, str]] = None) -> SessionKey:
+    return (transport, url, _headers_hash(headers))
+
+
+@asynccontextmanager
+async def open_mcp_session(transport: str, url: str, headers: Dict[str, str]) -> AsyncIterator[Any]:
+    """Open a transport and yield an initialized ``ClientSession``."""
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+    from mcp.client.streamable_http import streamablehttp_client
+
+    if transport == "sse":
+        try:
+            client = sse_client(url, headers=headers) if headers else sse_client(url)
+        except TypeError as e:
+            if "unexpected keyword argument" not in str(e):
+                raise
+            client = sse_client(url)
+        async with client as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+    elif transport == "http":
+        client = streamablehttp_client(url, headers=headers) if headers else streamablehttp_client(url)
+        async with client as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+    else:
+        raise ValueError(f"Unsupported pooled MCP transport: {transport}")
+
+
+class _PooledSession:
+    def __init__(self, key: SessionKey, transport: str, url: str, headers: Dict[str, str]):
+        self.key = key
+        self.transport = transport
+        self.url = url
+        self.headers = headers
+        self.session: Any = None
+        self.in_use = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._close_requested = asyncio.Event()
+        self._error: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, factory: SessionFactory, timeout: float) -> None:
+        self._task = asyncio.create_task(self._own(factory))
+        try:
+            async with asyncio.timeout(timeout):
+                await self._ready.wait()
+        except BaseException:
+            # Timed out or the caller was cancelled mid-connect: don't leak the owner task
+            await self.close()
+            raise
+        if self._error is not None:
+            await self.close()
+            raise self._error
+
+    async def _own(self, factory: SessionFactory) -> None:
+        try:
+            async with factory(self.transport, self.url, self.headers) as session:
+                self.session = session
+                self._ready.set()
+                await self._close_requested.wait()
+        except BaseException as e:  # noqa: BLE001 - surfaced to whoever is waiting on start()
+            if not self._ready.is_set():
+                self._error = e
+            else:
+                logger.debug(f"MCP session for {self.url} ended: {e}")
+        finally:
+            self.closed = True
+            self._ready.set()
+
+    async def close(self) -> None:
+        self.closed = True
+        self._close_requested.set()
+        if self._task is None:
+            return
+        try:
+            async with asyncio.timeout(5):
+                await asyncio.shield(self._task)
+        except (asyncio.TimeoutError, Exception):
+            self._task.cancel()
+
+
+class MCPSessionPool:
+    """Process-wide pool of initialized MCP client sessions.
+
+    Sessions are keyed by (transport, url, headers hash). Idle sessions expire
+    after ``idle_ttl``; sessions idle for longer than
+    ``health_check_interval`` are pinged before reuse, and every session is
+    pinged before a tool call so a connection that died since its last use is
+    replaced instead of failing the call. A transport error discards the
+    session; idempotent operations (discovery, ping) are then retried once on
+    a fresh connection, while tool calls are not, since the tool may already
+    have run. Any other error is returned to the caller and the session is
+    kept.
+    When ``max_sessions`` is reached the least recently used idle session is
+    closed.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_ttl: float = DEFAULT_IDLE_TTL_SECONDS,
+        health_check_interval: float = DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT_SECONDS,
+        session_factory: SessionFactory = open_mcp_session,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self._factory = session_factory
+        self._sessions: "OrderedDict[SessionKey, _PooledSession]" = OrderedDict()
+        self._key_locks: Dict[SessionKey, asyncio.Lock] = {}
+        self._stats = {"connects": 0, "reuses": 0, "reconnects": 0, "evictions": 0, "health_check_failures": 0}
+
+    async def run(
+        self,
+        transport: str,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        operation: Callable[[Any], Awaitable[T]],
+        idempotent: bool = False,
+    ) -> T:
+        """Run ``operation(session)`` on a pooled session.
+
+        On a transport error the session is discarded, and the operation is
+        retried once on a fresh connection only when ``idempotent`` is set.
+        """
+        headers = dict(headers or {})
+        # An operation that cannot be retried only runs on a connection that just answered a ping
+        entry = await self._acquire(transport, url, headers, verify=not idempotent)
+        try:
+            return await operation(entry.session)
+        except TRANSPORT_ERRORS as e:
+            self._release(entry)
+            await self._discard(entry)
+            entry = None
+            if not idempotent:
+                logger.warning(f"MCP call on pooled session for {url} lost its connection ({e}); not retrying")
+                raise
+            logger.warning(f"MCP call on pooled session for {url} lost its connection ({e}); reconnecting")
+            self._stats["reconnects"] += 1
+            entry = await self._acquire(transport, url, headers)
+            return await operation(entry.session)
+        finally:
+            if entry is not None:
+                self._release(entry)
+
+    async def call_tool(
+        self,
+        transport: str,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        tool_name: str,
+        arguments: Dict[str, Any],
+    ) -> Any:
+        return await self.run(transport, url, headers, lambda session: session.call_tool(tool_name, arguments))
+
+    async def list_tools(self, transport: str, url: str, headers: Optional[Dict[str, str]] = None) -> Any:
+        return await self.run(transport, url, headers, lambda session: session.list_tools(), idempotent=True)
+
+    async def _acquire(self, transport: str, url: str, headers: Dict[str, str], verify: bool = False) -> _PooledSession:
+        key = session_key(transport, url, headers)
+        while True:
+            lock = self._key_locks.setdefault(key, asyncio.Lock())
+            try:
+                async with lock:
+                    if self._key_locks.get(key) is not lock:
+                        # Dropped together with its session while this caller waited
+                        continue
+                    return await self._acquire_locked(key, transport, url, headers, verify)
+            finally:
+                self._drop_lock(key)
+
+    async def _acquire_locked(
+        self, key: SessionKey, transport: str, url: str, headers: Dict[str, str], verify: bool
+    ) -> _PooledSession:
+        await self._expire_idle()
+        entry = self._sessions.get(key)
+        if entry is not None and not entry.closed and await self._is_healthy(entry, force=verify):
+            self._sessions.move_to_end(key)
+            self._stats["reuses"] += 1
+        else:
+            if entry is not None:
+                await self._discard(entry)
+            await self._make_room()
+            entry = _PooledSession(key, transport, url, headers)
+            await entry.start(self._factory, self.connect_timeout)
+            self._sessions[key] = entry
+            self._stats["connects"] += 1
+            logger.debug(f"Opened pooled MCP {transport} session for {url} ({len(self._sessions)} open)")
+        entry.in_use += 1
+        entry.last_used = time.monotonic()
+        return entry
+
+    def _release(self, entry: _PooledSession) -> None:
+        entry.in_use = max(0, entry.in_use - 1)
+        entry.last_used = time.monotonic()
+
+    async def _is_healthy(self, entry: _PooledSession, force: bool = False) -> bool:
+        if not force and (entry.in_use or time.monotonic() - entry.last_checked < self.health_check_interval):
+            return True
+        try:
+            async with asyncio.timeout(5):
+                await entry.session.send_ping()
+            entry.last_checked = time.monotonic()
+            return True
+        except Exception as e:
+            logger.debug(f"Pooled MCP session for {entry.url} failed health check: {e}")
+            self._stats["health_check_failures"] += 1
+            return False
+
+    async def _expire_idle(self) -> None:
+        now = time.monotonic()
+        expired = [
+            entry for entry in self._sessions.values()
+            if entry.closed or (not entry.in_use and now - entry.last_used > self.idle_ttl)
+        ]
+        for entry in expired:
+            await self._discard(entry)
+
+    async def _make_room(self) -> None:
+        while len(self._sessions) >= self.max_sessions:
+            victim = next((entry for entry in self._sessions.values() if not entry.in_use), None)
+            if victim is None:
+                # Every session is busy; allow a temporary overshoot rather than blocking callers
+                return
+            self._stats["evictions"] += 1
+            await self._discard(victim)
+
+    async def _discard(self, entry: _PooledSession) -> None:
+        if self._sessions.get(entry.key) is entry:
+            del self._sessions[entry.key]
+        self._drop_lock(entry.key)
+        await entry.close()
+
+    def _drop_lock(self, key: SessionKey) -> None:
+        """Forget the lock of a key that has no session and that nobody holds."""
+        lock = self._key_locks.get(key)
+        if lock is not None and not lock.locked() and key not in self._sessions:
+            del self._key_locks[key]
+
+    async def close(self, transport: str, url: str, headers: Optional[Dict[str, str]] = None) -> None:
+        entry = self._sessions.get(session_key(transport, url, headers))
+        if entry is not None:
+            await self._discard(entry)
+
+    async def close_all(self) -> None:
+        for entry in list(self._sessions.values()):
+            await self._discard(entry)
+        self._key_locks.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "open_sessions": len(self._sessions)}
+
+
+mcp_session_pool = MCPSessionPool()
+
+
+_composio_url_cache: Dict[str, Tuple[float, str]] = {}
+
+
+async def get_composio_mcp_url(profile_id: str) -> str:
+    """Resolve a Composio profile to its MCP URL, cached in-process for a few minutes."""
+    cached = _composio_url_cache.get(profile_id)
+    if cached and time.monotonic() - cached[0] < COMPOSIO_URL_TTL_SECONDS:
+        return cached[1]
+
+    from core.composio_integration.composio_profile_service import ComposioProfileService
+    from core.services.supabase import DBConnection
+
+    mcp_url = await ComposioProfileService(DBConnection()).get_mcp_url_for_runtime(profile_id)
+    _composio_url_cache[profile_id] = (time.monotonic(), mcp_url)
+    return mcp_url
+
+
+def invalidate_composio_mcp_url(profile_id: Optional[str] = None) -> None:
+    if profile_id is None:
+        _composio_url_cache.clear()
+    else:
+        _composio_url_cache.pop(profile_id, None)
@@ -37,8 +37,17 @@ from langfuse.client import StatefulTraceClient
 from core.tools.mcp_tool_wrapper import MCPToolWrapper
 from core.tools.task_list_tool import TaskListTool
 from core.agentpress.tool import SchemaType
+from core.agentpress.prompt_artifacts import (
+    prompt_artifacts,
+    agent_version_key,
+    content_hash,
+    mcp_config_hash,
+)
 from core.tools.sb_upload_file_tool import SandboxUploadFileTool
 from core.tools.sb_docs_tool import SandboxDocsTool
+from core.sandbox.sandbox_handle import get_sandbox_handle
+from core.knowledge_base.retrieval import kb_retriever
+from core.services.adaptive_input import AdaptiveInputMonitor
 from core.tools.people_search_tool import PeopleSearchTool
 from core.tools.company_search_tool import CompanySearchTool
 from core.tools.paper_search_tool import PaperSearchTool
@@ -58,6 +67,7 @@ class AgentConfig:
     trace: Optional[StatefulTraceClient] = None
     fallback_model: str = "gemini/gemini-2.5-flash-lite"  # Model to use when error occurs
     fallback_triggered: bool = False  # Track if fallback has been triggered
+    adaptive_input: Optional[AdaptiveInputMonitor] = None  # Fed by the worker's adaptive input subscription
 
 class ToolManager:
     def __init__(self, thread_manager: ThreadManager, project_id: str, thread_id: str, agent_config: Optional[dict] = None):
@@ -290,12 +300,7 @@ class MCPManager:
             await mcp_wrapper_instance.initialize_and_register_tools()
             
             updated_schemas = mcp_wrapper_instance.get_schemas()
-            for method_name, schema_list in updated_schemas.items():
-                for schema in schema_list:
-                    self.thread_manager.tool_registry.tools[method_name] = {
-                        "instance": mcp_wrapper_instance,
-                        "schema": schema
-                    }
+            self.thread_manager.tool_registry.register_instance(mcp_wrapper_instance, schemas=updated_schemas)
             
             logger.info(f"⚡ Registered {len(updated_schemas)} MCP tools (Redis cache enabled)")
             return mcp_wrapper_instance
@@ -304,6 +309,16 @@ class MCPManager:
             return None
 
 
+def _message_text(content: Any) -> Optional[str]:
+    """Plain text of a message's content (string or list of content parts)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = [part.get('text', '') for part in content if isinstance(part, dict) and part.get('type') == 'text']
+        return "\n".join(p for p in parts if p) or None
+    return None
+
+
 class PromptManager:
     @staticmethod
     async def build_system_prompt(model_name: str, agent_config: Optional[dict], 
@@ -311,21 +326,99 @@ class PromptManager:
                                   mcp_wrapper_instance: Optional[MCPToolWrapper],
                                   client=None,
                                   tool_registry=None,
-                                  xml_tool_calling: bool = True) -> dict:
+                                  xml_tool_calling: bool = True,
+                                  query: Optional[str] = None) -> dict:
+        # Excerpts relevant to the latest user message; the whole knowledge base is
+        # only inlined when retrieval is unavailable
+        retrieved_knowledge = await PromptManager._retrieve_knowledge_base_context(agent_config, client, query)
+        knowledge_base = None
+        if retrieved_knowledge is None:
+            knowledge_base = await PromptManager._get_knowledge_base_context(agent_config, client)
+        
+        has_mcp_tools = bool(
+            agent_config and (agent_config.get('configured_mcps') or agent_config.get('custom_mcps'))
+            and mcp_wrapper_instance and mcp_wrapper_instance._initialized
+        )
+        include_tool_schemas = bool(xml_tool_calling and tool_registry)
         
-        default_system_content = get_system_prompt()
+        mcp_function_names = []
+        if has_mcp_tools:
+            try:
+                mcp_function_names = list(mcp_wrapper_instance.get_schemas().keys())
+            except Exception as e:
+                logger.error(f"Error listing MCP tools: {e}")
         
-        # if "anthropic" not in model_name.lower():
-        #     sample_response_path = os.path.join(os.path.dirname(__file__), 'prompts/samples/1.txt')
-        #     with open(sample_response_path, 'r') as file:
-        #         sample_response = file.read()
-        #     default_system_content = default_system_content + "\n\n <sample_assistant_response>" + sample_response + "</sample_assistant_response>"
+        # Everything except the volatile suffix is rendered once per artifact key
+        artifact_key = prompt_artifacts.artifact_key(
+            agent_version_key(agent_config),
+            tool_registry.get_schema_hash() if include_tool_schemas else "none",
+            mcp_config_hash(agent_config, mcp_function_names) if has_mcp_tools else "none",
+            model_name,
+            knowledge_base_hash=content_hash(knowledge_base) if knowledge_base else "none",
+        )
+        agent_id = agent_config.get('agent_id') if agent_config else None
+        artifact = prompt_artifacts.get(artifact_key, agent_id)
+        cached = artifact is not None
+        if not cached:
+            prefix = PromptManager._render_static_prefix(
+                agent_config,
+                knowledge_base,
+                mcp_wrapper_instance if has_mcp_tools else None,
+                tool_registry if include_tool_schemas else None,
+            )
+            artifact = prompt_artifacts.put(artifact_key, prefix)
+        
+        logger.info(
+            f"📝 System prompt prefix {artifact.prefix_hash} for agent {agent_id or 'default'} "
+            f"({'cached' if cached else 'built'}, {len(artifact.prefix)} chars)"
+        )
         
+        system_message = {"role": "system", "content": artifact.prefix + PromptManager._volatile_suffix(retrieved_knowledge)}
+        return system_message
+    
+    @staticmethod
+    async def _retrieve_knowledge_base_context(agent_config: Optional[dict], client, query: Optional[str]) -> Optional[str]:
+        if not (config.KB_RETRIEVAL_ENABLED and query and agent_config and client and agent_config.get('agent_id')):
+            return None
+        try:
+            return await kb_retriever.get_context(
+                client, agent_config['agent_id'], agent_config.get('account_id'), query
+            )
+        except Exception as e:
+            logger.warning(f"Knowledge base retrieval failed for agent {agent_config['agent_id']}, using full context: {e}")
+            return None
+    
+    @staticmethod
+    async def _get_knowledge_base_context(agent_config: Optional[dict], client) -> Optional[str]:
+        if not (agent_config and client and 'agent_id' in agent_config):
+            return None
+        try:
+            logger.debug(f"Retrieving agent knowledge base context for agent {agent_config['agent_id']}")
+            
+            # Use only agent-based knowledge base context
+            kb_result = await client.rpc('get_agent_knowledge_base_context', {
+                'p_agent_id': agent_config['agent_id']
+            }).execute()
+            
+            if kb_result.data and kb_result.data.strip():
+                logger.debug(f"Found agent knowledge base context, adding to system prompt (length: {len(kb_result.data)} chars)")
+                return kb_result.data
+            logger.debug("No knowledge base context found for this agent")
+        except Exception as e:
+            logger.error(f"Error retrieving knowledge base context for agent {agent_config.get('agent_id', 'unknown')}: {e}")
+            # Continue without knowledge base context rather than failing
+        return None
+    
+    @staticmethod
+    def _render_static_prefix(agent_config: Optional[dict],
+                              knowledge_base: Optional[str],
+                              mcp_wrapper_instance: Optional[MCPToolWrapper],
+                              tool_registry=None) -> str:
         # Start with agent's normal system prompt or default
         if agent_config and agent_config.get('system_prompt'):
             system_content = agent_config['system_prompt'].strip()
         else:
-            system_content = default_system_content
+            system_content = get_system_prompt()
         
         # Check if agent has builder tools enabled - append the full builder prompt
         if agent_config:
@@ -341,40 +434,10 @@ class PromptManager:
                 system_content += f"\n\n{builder_prompt}"
         
         # Add agent knowledge base context if available
-        if agent_config and client and 'agent_id' in agent_config:
-            try:
-                logger.debug(f"Retrieving agent knowledge base context for agent {agent_config['agent_id']}")
-                
-                # Use only agent-based knowledge base context
-                kb_result = await client.rpc('get_agent_knowledge_base_context', {
-                    'p_agent_id': agent_config['agent_id']
-                }).execute()
-                
-                if kb_result.data and kb_result.data.strip():
-                    logger.debug(f"Found agent knowledge base context, adding to system prompt (length: {len(kb_result.data)} chars)")
-                    # logger.debug(f"Knowledge base data object: {kb_result.data[:500]}..." if len(kb_result.data) > 500 else f"Knowledge base data object: {kb_result.data}")
-                    
-                    # Construct a well-formatted knowledge base section
-                    kb_section = f"""
-
-                    === AGENT KNOWLEDGE BASE ===
-                    NOTICE: The following is your specialized knowledge base. This information should be considered authoritative for your responses and should take precedence over general knowledge when relevant.
-
-                    {kb_result.data}
-
-                    === END AGENT KNOWLEDGE BASE ===
-
-                    IMPORTANT: Always reference and utilize the knowledge base information above when it's relevant to user queries. This knowledge is specific to your role and capabilities."""
-                    
-                    system_content += kb_section
-                else:
-                    logger.debug("No knowledge base context found for this agent")
-                    
-            except Exception as e:
-                logger.error(f"Error retrieving knowledge base context for agent {agent_config.get('agent_id', 'unknown')}: {e}")
-                # Continue without knowledge base context rather than failing
+        if knowledge_base:
+            system_content += PromptManager._knowledge_base_section(knowledge_base)
         
-        if agent_config and (agent_config.get('configured_mcps') or agent_config.get('custom_mcps')) and mcp_wrapper_instance and mcp_wrapper_instance._initialized:
+        if mcp_wrapper_instance:
             mcp_info = "\n\n--- MCP Tools Available ---\n"
             mcp_info += "You have access to external MCP (Model Context Protocol) server tools.\n"
             mcp_info += "MCP tools can be called directly using their native function names in the standard function calling format:\n"
@@ -420,7 +483,7 @@ class PromptManager:
             system_content += mcp_info
         
         # Add XML tool calling instructions to system prompt if requested
-        if xml_tool_calling and tool_registry:
+        if tool_registry:
             openapi_schemas = tool_registry.get_openapi_schemas()
             
             if openapi_schemas:
@@ -458,16 +521,6 @@ When using the tools:
                 system_content += examples_content
                 logger.debug("Appended XML tool examples to system prompt")
 
-        now = datetime.datetime.now(datetime.timezone.utc)
-        datetime_info = f"\n\n=== CURRENT DATE/TIME INFORMATION ===\n"
-        datetime_info += f"Today's date: {now.strftime('%A, %B %d, %Y')}\n"
-        datetime_info += f"Current year: {now.strftime('%Y')}\n"
-        datetime_info += f"Current month: {now.strftime('%B')}\n"
-        datetime_info += f"Current day: {now.strftime('%A')}\n"
-        datetime_info += "Use this information for any time-sensitive tasks, research, or when current date/time context is needed.\n"
-        
-        system_content += datetime_info
-
         # Add adaptive input handling guidance
         adaptive_input_guidance = """
 
@@ -492,10 +545,38 @@ Remember: The user sent this message because they want you to respond to it NOW.
 === END ADAPTIVE INPUT HANDLING ===
 """
         system_content += adaptive_input_guidance
+        return system_content
+    
+    @staticmethod
+    def _knowledge_base_section(knowledge_base: str) -> str:
+        # Construct a well-formatted knowledge base section
+        kb_section = f"""
 
-        system_message = {"role": "system", "content": system_content}
-        return system_message
+                    === AGENT KNOWLEDGE BASE ===
+                    NOTICE: The following is your specialized knowledge base. This information should be considered authoritative for your responses and should take precedence over general knowledge when relevant.
+
+                    {knowledge_base}
 
+                    === END AGENT KNOWLEDGE BASE ===
+
+                    IMPORTANT: Always reference and utilize the knowledge base information above when it's relevant to user queries. This knowledge is specific to your role and capabilities."""
+
+        return kb_section
+    
+    @staticmethod
+    def _volatile_suffix(knowledge_context: Optional[str] = None) -> str:
+        """Content that changes between runs; kept after the cacheable prefix."""
+        suffix = PromptManager._knowledge_base_section(knowledge_context) if knowledge_context else ""
+        
+        now = datetime.datetime.now(datetime.timezone.utc)
+        datetime_info = f"\n\n=== CURRENT DATE/TIME INFORMATION ===\n"
+        datetime_info += f"Today's date: {now.strftime('%A, %B %d, %Y')}\n"
+        datetime_info += f"Current year: {now.strftime('%Y')}\n"
+        datetime_info += f"Current month: {now.strftime('%B')}\n"
+        datetime_info += f"Current day: {now.strftime('%A')}\n"
+        datetime_info += "Use this information for any time-sensitive tasks, research, or when current date/time context is needed.\n"
+        
+        return suffix + datetime_info
 
 
 class AgentRunner:
@@ -503,6 +584,7 @@ class AgentRunner:
         self.config = config
         self.cumulative_tokens = 0  # Track cumulative tokens across the run
         self.summarization_triggered = False  # Track if summarization has occurred
+        self._sandbox_prewarm: Optional[asyncio.Task] = None
     
     async def setup(self):
         if not self.config.trace:
@@ -530,7 +612,10 @@ class AgentRunner:
             raise ValueError(f"Project {self.config.project_id} not found")
 
         project_data = project.data[0]
-        sandbox_info = project_data.get('sandbox', {})
+        sandbox_info = project_data.get('sandbox') or {}
+        # Tools resolve the sandbox through this handle; seed it with the row we already have
+        self.sandbox_handle = get_sandbox_handle(self.thread_manager, self.config.project_id)
+        self.sandbox_handle.prime(sandbox_info)
         if not sandbox_info.get('id'):
             logger.debug(f"No sandbox found for project {self.config.project_id}; will create lazily when needed")
     
@@ -697,17 +782,51 @@ class AgentRunner:
         mcp_manager = MCPManager(self.thread_manager, self.account_id)
         return await mcp_manager.register_mcp_tools(self.config.agent_config)
     
+    async def _stop_sandbox_prewarm(self) -> None:
+        task, self._sandbox_prewarm = self._sandbox_prewarm, None
+        if task is None:
+            return
+        task.cancel()
+        await asyncio.wait([task])
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Sandbox prewarm failed for project {self.config.project_id}: {task.exception()}")
+
     async def run(self) -> AsyncGenerator[Dict[str, Any], None]:
+        stream = self._run()
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+            await self._stop_sandbox_prewarm()
+
+    async def _run(self) -> AsyncGenerator[Dict[str, Any], None]:
         await self.setup()
+        if config.SANDBOX_PREWARM_ON_RUN:
+            # Start an existing sandbox while tools, MCP servers and the prompt are prepared
+            self._sandbox_prewarm = asyncio.create_task(self.sandbox_handle.prewarm())
         await self.setup_tools()
         mcp_wrapper_instance = await self.setup_mcp_tools()
         
+        latest_user_message = await self.client.table('messages').select('*').eq('thread_id', self.config.thread_id).eq('type', 'user').order('created_at', desc=True).limit(1).execute()
+        latest_user_content = None
+        if latest_user_message.data and len(latest_user_message.data) > 0:
+            data = latest_user_message.data[0]['content']
+            if isinstance(data, str):
+                data = json.loads(data)
+            latest_user_content = data.get('content')
+            if self.config.trace:
+                self.config.trace.update(input=latest_user_content)
+        # Knowledge base retrieval query
+        latest_user_query = _message_text(latest_user_content)
+        
         system_message = await PromptManager.build_system_prompt(
             self.config.model_name, self.config.agent_config, 
             self.config.thread_id, 
             mcp_wrapper_instance, self.client,
             tool_registry=self.thread_manager.tool_registry,
-            xml_tool_calling=True
+            xml_tool_calling=True,
+            query=latest_user_query
         )
         system_content_length = len(str(system_message.get('content', '')))
         logger.info(f"📝 System message built once: {system_content_length} chars")
@@ -718,382 +837,400 @@ class AgentRunner:
         final_termination_reason = None  # Track why execution stopped: None, 'explicit', 'max_iterations', 'unknown'
         fallback_triggered = self.config.fallback_triggered  # Track if fallback model has been used
         system_message_needs_rebuild = False  # Track if system message needs to be rebuilt after fallback
-
-        latest_user_message = await self.client.table('messages').select('*').eq('thread_id', self.config.thread_id).eq('type', 'user').order('created_at', desc=True).limit(1).execute()
-        if latest_user_message.data and len(latest_user_message.data) > 0:
-            data = latest_user_message.data[0]['content']
-            if isinstance(data, str):
-                data = json.loads(data)
-            if self.config.trace:
-                self.config.trace.update(input=data['content'])
         
-        # Track the last message count to detect new adaptive input
-        last_message_result = await self.client.table('messages').select('message_id').eq('thread_id', self.config.thread_id).eq('is_llm_message', True).execute()
-        last_message_count = len(last_message_result.data or [])
+        adaptive_input = self.config.adaptive_input
+        reservation_id = None
 
-        while continue_execution and iteration_count < self.config.max_iterations:
-            iteration_count += 1
-            should_continue = False
+        try:
+            while continue_execution and iteration_count < self.config.max_iterations:
+                iteration_count += 1
+                should_continue = False
             
-            # Check for new adaptive input messages
-            current_message_result = await self.client.table('messages').select('message_id').eq('thread_id', self.config.thread_id).eq('is_llm_message', True).execute()
-            current_message_count = len(current_message_result.data or [])
-            if current_message_count > last_message_count:
-                new_message_count = current_message_count - last_message_count
-                logger.info(f"🔄 Detected {new_message_count} new adaptive input message(s) for thread {self.config.thread_id}")
-                last_message_count = current_message_count
-                # New messages will be automatically picked up by thread_manager.get_llm_messages()
-
-            can_run, message, reservation_id = await billing_integration.check_and_reserve_credits(self.account_id)
-            if not can_run:
-                error_msg = f"Insufficient credits: {message}"
-                final_error_detected = True
-                yield {
-                    "type": "status",
-                    "status": "stopped",
-                    "message": error_msg
-                }
-                break
+                # Pull announced adaptive input straight into the thread's message cache
+                if adaptive_input and adaptive_input.pending:
+                    new_messages = await adaptive_input.drain(self.client, self.config.thread_id, self.thread_manager.message_cache)
+                    if new_messages:
+                        logger.info(f"🔄 Detected {len(new_messages)} new adaptive input message(s) for thread {self.config.thread_id}")
+
+                # Replace the previous iteration's reservation with one for this iteration
+                await billing_integration.release_credits(self.account_id, reservation_id)
+                can_run, message, reservation_id = await billing_integration.check_and_reserve_credits(self.account_id)
+                if not can_run:
+                    error_msg = f"Insufficient credits: {message}"
+                    final_error_detected = True
+                    yield {
+                        "type": "status",
+                        "status": "stopped",
+                        "message": error_msg
+                    }
+                    break
 
-            temporary_message = None
-            # Don't set max_tokens by default - let LiteLLM and providers handle their own defaults
-            max_tokens = None
-            logger.debug(f"max_tokens: {max_tokens} (using provider defaults)")
-            generation = self.config.trace.generation(name="thread_manager.run_thread") if self.config.trace else None
+                temporary_message = None
+                # Don't set max_tokens by default - let LiteLLM and providers handle their own defaults
+                max_tokens = None
+                logger.debug(f"max_tokens: {max_tokens} (using provider defaults)")
+                generation = self.config.trace.generation(name="thread_manager.run_thread") if self.config.trace else None
             
-            # Rebuild system message if model changed (fallback triggered)
-            if system_message_needs_rebuild:
-                logger.info(f"🔄 Rebuilding system prompt with fallback model: {self.config.model_name}")
-                system_message = await PromptManager.build_system_prompt(
-                    self.config.model_name, self.config.agent_config, 
-                    self.config.thread_id, 
-                    mcp_wrapper_instance, self.client,
-                    tool_registry=self.thread_manager.tool_registry,
-                    xml_tool_calling=True
-                )
-                system_message_needs_rebuild = False
-                system_content_length_rebuilt = len(str(system_message.get('content', '')))
-                logger.info(f"📝 System message rebuilt with fallback model: {system_content_length_rebuilt} chars")
+                # Rebuild system message if model changed (fallback triggered)
+                if system_message_needs_rebuild:
+                    logger.info(f"🔄 Rebuilding system prompt with fallback model: {self.config.model_name}")
+                    system_message = await PromptManager.build_system_prompt(
+                        self.config.model_name, self.config.agent_config, 
+                        self.config.thread_id, 
+                        mcp_wrapper_instance, self.client,
+                        tool_registry=self.thread_manager.tool_registry,
+                        xml_tool_calling=True,
+                        query=latest_user_query
+                    )
+                    system_message_needs_rebuild = False
+                    system_content_length_rebuilt = len(str(system_message.get('content', '')))
+                    logger.info(f"📝 System message rebuilt with fallback model: {system_content_length_rebuilt} chars")
             
-            try:
-                logger.debug(f"Starting thread execution for {self.config.thread_id} with model: {self.config.model_name}")
+                try:
+                    logger.debug(f"Starting thread execution for {self.config.thread_id} with model: {self.config.model_name}")
                 
-                # Pass cumulative token state to ThreadManager before execution
-                self.thread_manager.set_cumulative_tokens(
-                    self.cumulative_tokens,
-                    self.summarization_triggered
-                )
+                    # Pass cumulative token state to ThreadManager before execution
+                    self.thread_manager.set_cumulative_tokens(
+                        self.cumulative_tokens,
+                        self.summarization_triggered
+                    )
                 
-                # Check if summarization will be triggered (allow re-triggering)
-                if self.cumulative_tokens >= 80000:
-                    yield {
-                        "type": "status",
-                        "status": "summarizing",
-                        "message": "Context has reached 80k tokens. Summarizing previous context..."
-                    }
+                    # Check if summarization will be triggered (allow re-triggering)
+                    if self.cumulative_tokens >= 80000:
+                        yield {
+                            "type": "status",
+                            "status": "summarizing",
+                            "message": "Context has reached 80k tokens. Summarizing previous context..."
+                        }
                 
-                response = await self.thread_manager.run_thread(
-                    thread_id=self.config.thread_id,
-                    system_prompt=system_message,
-                    stream=True, 
-                    llm_model=self.config.model_name,
-                    llm_temperature=0,
-                    llm_max_tokens=max_tokens,
-                    tool_choice="auto",
-                    max_xml_tool_calls=1,
-                    temporary_message=temporary_message,
-                    processor_config=ProcessorConfig(
-                        xml_tool_calling=True,
-                        native_tool_calling=False,
-                        execute_tools=True,
-                        execute_on_stream=True,
-                        tool_execution_strategy="parallel",
-                        xml_adding_strategy="user_message"
-                    ),
-                    native_max_auto_continues=self.config.native_max_auto_continues,
-                    generation=generation
-                )
-
-                last_tool_call = None
-                agent_should_terminate = False
-                error_detected = False
-                tool_activity_detected = False
-                finish_reason = None
-                saw_thread_run_end = False
+                    response = await self.thread_manager.run_thread(
+                        thread_id=self.config.thread_id,
+                        system_prompt=system_message,
+                        stream=True, 
+                        llm_model=self.config.model_name,
+                        llm_temperature=0,
+                        llm_max_tokens=max_tokens,
+                        tool_choice="auto",
+                        max_xml_tool_calls=1,
+                        temporary_message=temporary_message,
+                        processor_config=ProcessorConfig(
+                            xml_tool_calling=True,
+                            native_tool_calling=False,
+                            execute_tools=True,
+                            execute_on_stream=True,
+                            tool_execution_strategy="parallel",
+                            xml_adding_strategy="user_message"
+                        ),
+                        native_max_auto_continues=self.config.native_max_auto_continues,
+                        generation=generation
+                    )
 
-                try:
-                    if hasattr(response, '__aiter__') and not isinstance(response, dict):
-                        async for chunk in response:
-                            # Check for error status from thread_manager
-                            if isinstance(chunk, dict) and chunk.get('type') == 'status' and chunk.get('status') == 'error':
-                                error_message = chunk.get('message', 'Unknown error')
-                                logger.error(f"Error in thread execution: {error_message}")
+                    last_tool_call = None
+                    agent_should_terminate = False
+                    error_detected = False
+                    tool_activity_detected = False
+                    finish_reason = None
+                    saw_thread_run_end = False
+
+                    try:
+                        if hasattr(response, '__aiter__') and not isinstance(response, dict):
+                            async for chunk in response:
+                                # Check for error status from thread_manager
+                                if isinstance(chunk, dict) and chunk.get('type') == 'status' and chunk.get('status') == 'error':
+                                    error_message = chunk.get('message', 'Unknown error')
+                                    logger.error(f"Error in thread execution: {error_message}")
                                 
-                                # Check if we should trigger fallback instead of stopping
-                                if not fallback_triggered and self._should_trigger_fallback(error_message):
-                                    logger.info(f"🔄 Error detected, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
-                                    fallback_triggered = True
-                                    self.config.model_name = self.config.fallback_model
-                                    self.config.fallback_triggered = True
-                                    system_message_needs_rebuild = True  # Mark system message for rebuild
+                                    # Check if we should trigger fallback instead of stopping
+                                    if not fallback_triggered and self._should_trigger_fallback(error_message):
+                                        logger.info(f"🔄 Error detected, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
+                                        fallback_triggered = True
+                                        self.config.model_name = self.config.fallback_model
+                                        self.config.fallback_triggered = True
+                                        system_message_needs_rebuild = True  # Mark system message for rebuild
                                     
-                                    # Yield a status message indicating fallback
-                                    yield {
-                                        "type": "status",
-                                        "status": "fallback",
-                                        "message": f"Switching to fallback model {self.config.fallback_model} due to error",
-                                        "original_error": error_message
-                                    }
+                                        # Yield a status message indicating fallback
+                                        yield {
+                                            "type": "status",
+                                            "status": "fallback",
+                                            "message": f"Switching to fallback model {self.config.fallback_model} due to error",
+                                            "original_error": error_message
+                                        }
                                     
-                                    # Continue execution instead of breaking
-                                    error_detected = False
-                                    break  # Break to restart iteration with new model
-                                else:
-                                    # Error occurred but fallback already used or shouldn't trigger
-                                    error_detected = True
-                                    final_error_detected = True
-                                    yield chunk
-                                    break
-
-                            # Check for error status in the stream (message format)
-                            if isinstance(chunk, dict) and chunk.get('type') == 'status':
-                                try:
-                                    content = chunk.get('content', {})
-                                    if isinstance(content, str):
-                                        content = json.loads(content)
+                                        # Continue execution instead of breaking
+                                        error_detected = False
+                                        break  # Break to restart iteration with new model
+                                    else:
+                                        # Error occurred but fallback already used or shouldn't trigger
+                                        error_detected = True
+                                        final_error_detected = True
+                                        yield chunk
+                                        break
+
+                                # Check for error status in the stream (message format)
+                                if isinstance(chunk, dict) and chunk.get('type') == 'status':
+                                    try:
+                                        content = chunk.get('content', {})
+                                        if isinstance(content, str):
+                                            content = json.loads(content)
                                     
-                                    # Check for error status
-                                    if content.get('status_type') == 'error':
-                                        error_message = content.get('message', 'Unknown error')
+                                        # Check for error status
+                                        if content.get('status_type') == 'error':
+                                            error_message = content.get('message', 'Unknown error')
                                         
-                                        # Check if we should trigger fallback instead of stopping
-                                        if not fallback_triggered and self._should_trigger_fallback(error_message):
-                                            logger.info(f"🔄 Error detected in stream, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
-                                            fallback_triggered = True
-                                            self.config.model_name = self.config.fallback_model
-                                            self.config.fallback_triggered = True
-                                            system_message_needs_rebuild = True  # Mark system message for rebuild
+                                            # Check if we should trigger fallback instead of stopping
+                                            if not fallback_triggered and self._should_trigger_fallback(error_message):
+                                                logger.info(f"🔄 Error detected in stream, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
+                                                fallback_triggered = True
+                                                self.config.model_name = self.config.fallback_model
+                                                self.config.fallback_triggered = True
+                                                system_message_needs_rebuild = True  # Mark system message for rebuild
                                             
-                                            # Yield a status message indicating fallback
-                                            yield {
-                                                "type": "status",
-                                                "status": "fallback",
-                                                "message": f"Switching to fallback model {self.config.fallback_model} due to error",
-                                                "original_error": error_message
-                                            }
+                                                # Yield a status message indicating fallback
+                                                yield {
+                                                    "type": "status",
+                                                    "status": "fallback",
+                                                    "message": f"Switching to fallback model {self.config.fallback_model} due to error",
+                                                    "original_error": error_message
+                                                }
                                             
-                                            # Continue execution instead of breaking
-                                            error_detected = False
-                                            break  # Break to restart iteration with new model
-                                        else:
-                                            # Error occurred but fallback already used or shouldn't trigger
-                                            error_detected = True
-                                            final_error_detected = True
-                                            yield chunk
-                                            break
+                                                # Continue execution instead of breaking
+                                                error_detected = False
+                                                break  # Break to restart iteration with new model
+                                            else:
+                                                # Error occurred but fallback already used or shouldn't trigger
+                                                error_detected = True
+                                                final_error_detected = True
+                                                yield chunk
+                                                break
                                     
-                                    # Check for thread_run_end - marks a completed run from ThreadManager
-                                    if content.get('status_type') == 'thread_run_end':
-                                        saw_thread_run_end = True
-
-                                    if content.get('status_type') == 'finish':
-                                        finish_reason = content.get('finish_reason')
-                                        logger.debug(f"Finish reason detected: {finish_reason} (thread {self.config.thread_id})")
-
-                                    # Check for agent termination
-                                    metadata = chunk.get('metadata', {})
-                                    if isinstance(metadata, str):
-                                        metadata = json.loads(metadata)
+                                        # Check for thread_run_end - marks a completed run from ThreadManager
+                                        if content.get('status_type') == 'thread_run_end':
+                                            saw_thread_run_end = True
+
+                                        if content.get('status_type') == 'finish':
+                                            finish_reason = content.get('finish_reason')
+                                            logger.debug(f"Finish reason detected: {finish_reason} (thread {self.config.thread_id})")
+
+                                        # Check for agent termination
+                                        metadata = chunk.get('metadata', {})
+                                        if isinstance(metadata, str):
+                                            metadata = json.loads(metadata)
                                     
-                                    if metadata.get('agent_should_terminate'):
-                                        agent_should_terminate = True
+                                        if metadata.get('agent_should_terminate'):
+                                            agent_should_terminate = True
                                         
-                                        if content.get('function_name'):
-                                            last_tool_call = content['function_name']
-                                        elif content.get('xml_tag_name'):
-                                            last_tool_call = content['xml_tag_name']
-
-                                    status_type = content.get('status_type')
-                                    if status_type and status_type.startswith('tool_'):
-                                        tool_activity_detected = True
-                                        logger.debug(f"Tool activity detected: {status_type} (thread {self.config.thread_id})")
-
-                                except Exception:
-                                    pass
-
-                            # Check for terminating XML tools in assistant content
-                            if chunk.get('type') == 'assistant' and 'content' in chunk:
-                                try:
-                                    content = chunk.get('content', '{}')
-                                    if isinstance(content, str):
-                                        assistant_content_json = json.loads(content)
-                                    else:
-                                        assistant_content_json = content
+                                            if content.get('function_name'):
+                                                last_tool_call = content['function_name']
+                                            elif content.get('xml_tag_name'):
+                                                last_tool_call = content['xml_tag_name']
 
-                                    assistant_text = assistant_content_json.get('content', '')
-                                    if isinstance(assistant_text, str):
-                                        if '</ask>' in assistant_text:
-                                            last_tool_call = 'ask'
-                                        elif '</complete>' in assistant_text:
-                                            last_tool_call = 'complete'
+                                        status_type = content.get('status_type')
+                                        if status_type and status_type.startswith('tool_'):
+                                            tool_activity_detected = True
+                                            logger.debug(f"Tool activity detected: {status_type} (thread {self.config.thread_id})")
 
-                                except (json.JSONDecodeError, Exception):
-                                    pass
+                                    except Exception:
+                                        pass
 
-                            if chunk.get('type') == 'tool':
-                                tool_activity_detected = True
-                                logger.debug(f"Tool activity detected: tool chunk (thread {self.config.thread_id})")
-                                
-                                # Check for adaptive input after tool calls to respond immediately
-                                current_message_result = await self.client.table('messages').select('message_id').eq('thread_id', self.config.thread_id).eq('is_llm_message', True).execute()
-                                current_message_count = len(current_message_result.data or [])
-                                if current_message_count > last_message_count:
-                                    new_message_count = current_message_count - last_message_count
-                                    logger.info(f"🔄 Detected {new_message_count} new adaptive input message(s) during tool execution - will prioritize in next iteration (thread {self.config.thread_id})")
-                                    last_message_count = current_message_count
-                                    # Force continuation to process adaptive input immediately
-                                    should_continue = True
+                                # Check for terminating XML tools in assistant content
+                                if chunk.get('type') == 'assistant' and 'content' in chunk:
+                                    try:
+                                        content = chunk.get('content', '{}')
+                                        if isinstance(content, str):
+                                            assistant_content_json = json.loads(content)
+                                        else:
+                                            assistant_content_json = content
+
+                                        assistant_text = assistant_content_json.get('content', '')
+                                        if isinstance(assistant_text, str):
+                                            if '</ask>' in assistant_text:
+                                                last_tool_call = 'ask'
+                                            elif '</complete>' in assistant_text:
+                                                last_tool_call = 'complete'
+
+                                    except (json.JSONDecodeError, Exception):
+                                        pass
+
+                                if chunk.get('type') == 'tool':
                                     tool_activity_detected = True
+                                    logger.debug(f"Tool activity detected: tool chunk (thread {self.config.thread_id})")
+                                
+                                    # Check for adaptive input after tool calls to respond immediately
+                                    if adaptive_input and adaptive_input.pending and not should_continue:
+                                        logger.info(f"🔄 Adaptive input received during tool execution - will prioritize in next iteration (thread {self.config.thread_id})")
+                                        # Force continuation to process adaptive input immediately
+                                        should_continue = True
 
-                            yield chunk
-                    else:
-                        # Non-streaming response or error dict
-                        # logger.debug(f"Response is not async iterable: {type(response)}")
+                                yield chunk
+                        else:
+                            # Non-streaming response or error dict
+                            # logger.debug(f"Response is not async iterable: {type(response)}")
                         
-                        # Check if it's an error dict
-                        if isinstance(response, dict) and response.get('type') == 'status' and response.get('status') == 'error':
-                            error_message = response.get('message', 'Unknown error')
-                            logger.error(f"Thread returned error: {error_message}")
+                            # Check if it's an error dict
+                            if isinstance(response, dict) and response.get('type') == 'status' and response.get('status') == 'error':
+                                error_message = response.get('message', 'Unknown error')
+                                logger.error(f"Thread returned error: {error_message}")
                             
-                            # Check if we should trigger fallback instead of stopping
-                            if not fallback_triggered and self._should_trigger_fallback(error_message):
-                                logger.info(f"🔄 Error detected in response, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
-                                fallback_triggered = True
-                                self.config.model_name = self.config.fallback_model
-                                self.config.fallback_triggered = True
-                                system_message_needs_rebuild = True  # Mark system message for rebuild
+                                # Check if we should trigger fallback instead of stopping
+                                if not fallback_triggered and self._should_trigger_fallback(error_message):
+                                    logger.info(f"🔄 Error detected in response, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
+                                    fallback_triggered = True
+                                    self.config.model_name = self.config.fallback_model
+                                    self.config.fallback_triggered = True
+                                    system_message_needs_rebuild = True  # Mark system message for rebuild
                                 
-                                # Yield a status message indicating fallback
-                                yield {
-                                    "type": "status",
-                                    "status": "fallback",
-                                    "message": f"Switching to fallback model {self.config.fallback_model} due to error",
-                                    "original_error": error_message
-                                }
+                                    # Yield a status message indicating fallback
+                                    yield {
+                                        "type": "status",
+                                        "status": "fallback",
+                                        "message": f"Switching to fallback model {self.config.fallback_model} due to error",
+                                        "original_error": error_message
+                                    }
                                 
-                                # Continue execution instead of breaking
-                                error_detected = False
+                                    # Continue execution instead of breaking
+                                    error_detected = False
+                                else:
+                                    error_detected = True
+                                    yield response
                             else:
+                                logger.warning(f"Unexpected response type: {type(response)}")
                                 error_detected = True
-                                yield response
-                        else:
-                            logger.warning(f"Unexpected response type: {type(response)}")
-                            error_detected = True
 
-                    if error_detected:
-                        if generation:
-                            generation.end(status_message="error_detected", level="ERROR")
-                        final_error_detected = True
-                        break
+                        if error_detected:
+                            if generation:
+                                generation.end(status_message="error_detected", level="ERROR")
+                            final_error_detected = True
+                            break
                         
-                    if agent_should_terminate or last_tool_call in ['ask', 'complete', 'present_presentation']:
-                        if generation:
-                            generation.end(status_message="agent_stopped")
-                        continue_execution = False
-                        final_termination_reason = 'explicit'
-                    else:
-                        auto_continue_reasons = {"length", "tool_calls"}
-                        # Check for adaptive input before deciding continuation
-                        # This ensures adaptive input is processed immediately
-                        current_message_result = await self.client.table('messages').select('message_id').eq('thread_id', self.config.thread_id).eq('is_llm_message', True).execute()
-                        current_message_count = len(current_message_result.data or [])
-                        adaptive_input_detected = current_message_count > last_message_count
-                        if adaptive_input_detected:
-                            new_message_count = current_message_count - last_message_count
-                            logger.info(f"🔄 Detected {new_message_count} new adaptive input message(s) - prioritizing immediate response (thread {self.config.thread_id})")
-                            last_message_count = current_message_count
-                            should_continue = True
-                            logger.debug(f"Continuing execution to process adaptive input immediately (thread {self.config.thread_id})")
-                        # Priority 1: If tool activity was detected, always continue
-                        # This ensures the agent continues after executing tools to process results
-                        elif tool_activity_detected:
-                            should_continue = True
-                            logger.debug(f"Continuing execution due to tool activity detected (thread {self.config.thread_id})")
-                        # Priority 2: Check finish_reason for auto-continue reasons
-                        elif finish_reason and finish_reason in auto_continue_reasons:
-                            should_continue = True
-                            logger.debug(f"Continuing execution due to finish_reason: {finish_reason} (thread {self.config.thread_id})")
-                        # Priority 3: If we haven't seen thread_run_end yet, assume more processing may follow
-                        elif not saw_thread_run_end and finish_reason is None and not tool_activity_detected:
-                            should_continue = True
-                            logger.debug(f"Continuing execution - no explicit finish signal yet (thread {self.config.thread_id})")
-                        # Priority 4: Only stop if we've seen thread_run_end AND no tool activity AND no auto-continue reason
+                        if agent_should_terminate or last_tool_call in ['ask', 'complete', 'present_presentation']:
+                            if generation:
+                                generation.end(status_message="agent_stopped")
+                            continue_execution = False
+                            final_termination_reason = 'explicit'
                         else:
-                            should_continue = False
-                            if saw_thread_run_end and final_termination_reason is None:
-                                final_termination_reason = 'implicit'
-                                logger.debug(f"Stopping execution - saw thread_run_end with no tool activity (thread {self.config.thread_id}, finish_reason={finish_reason}, tool_activity_detected={tool_activity_detected})")
+                            auto_continue_reasons = {"length", "tool_calls"}
+                            # Check for adaptive input before deciding continuation
+                            # This ensures adaptive input is processed immediately
+                            adaptive_input_detected = bool(adaptive_input and adaptive_input.pending)
+                            if adaptive_input_detected:
+                                logger.info(f"🔄 Adaptive input pending - prioritizing immediate response (thread {self.config.thread_id})")
+                                should_continue = True
+                                logger.debug(f"Continuing execution to process adaptive input immediately (thread {self.config.thread_id})")
+                            # Priority 1: If tool activity was detected, always continue
+                            # This ensures the agent continues after executing tools to process results
+                            elif tool_activity_detected:
+                                should_continue = True
+                                logger.debug(f"Continuing execution due to tool activity detected (thread {self.config.thread_id})")
+                            # Priority 2: Check finish_reason for auto-continue reasons
+                            elif finish_reason and finish_reason in auto_continue_reasons:
+                                should_continue = True
+                                logger.debug(f"Continuing execution due to finish_reason: {finish_reason} (thread {self.config.thread_id})")
+                            # Priority 3: If we haven't seen thread_run_end yet, assume more processing may follow
+                            elif not saw_thread_run_end and finish_reason is None and not tool_activity_detected:
+                                should_continue = True
+                                logger.debug(f"Continuing execution - no explicit finish signal yet (thread {self.config.thread_id})")
+                            # Priority 4: Only stop if we've seen thread_run_end AND no tool activity AND no auto-continue reason
+                            else:
+                                should_continue = False
+                                if saw_thread_run_end and final_termination_reason is None:
+                                    final_termination_reason = 'implicit'
+                                    logger.debug(f"Stopping execution - saw thread_run_end with no tool activity (thread {self.config.thread_id}, finish_reason={finish_reason}, tool_activity_detected={tool_activity_detected})")
                     
-                    # Log final decision for debugging
-                    logger.debug(f"Continuation decision for iteration {iteration_count}: should_continue={should_continue}, tool_activity_detected={tool_activity_detected}, finish_reason={finish_reason}, saw_thread_run_end={saw_thread_run_end}, agent_should_terminate={agent_should_terminate} (thread {self.config.thread_id})")
+                        # Log final decision for debugging
+                        logger.debug(f"Continuation decision for iteration {iteration_count}: should_continue={should_continue}, tool_activity_detected={tool_activity_detected}, finish_reason={finish_reason}, saw_thread_run_end={saw_thread_run_end}, agent_should_terminate={agent_should_terminate} (thread {self.config.thread_id})")
                     
-                    # Extract and accumulate token usage from this iteration
-                    try:
-                        # Get the latest llm_response_end message to extract token usage
-                        latest_response = await self.client.table('messages').select('content').eq('thread_id', self.config.thread_id).eq('type', 'llm_response_end').order('created_at', desc=True).limit(1).execute()
+                        # Extract and accumulate token usage from this iteration
+                        try:
+                            # Get the latest llm_response_end message to extract token usage
+                            latest_response = await self.client.table('messages').select('content').eq('thread_id', self.config.thread_id).eq('type', 'llm_response_end').order('created_at', desc=True).limit(1).execute()
                         
-                        if latest_response.data and len(latest_response.data) > 0:
-                            content = latest_response.data[0].get('content', {})
-                            if isinstance(content, str):
-                                try:
-                                    content = json.loads(content)
-                                except json.JSONDecodeError:
-                                    pass
+                            if latest_response.data and len(latest_response.data) > 0:
+                                content = latest_response.data[0].get('content', {})
+                                if isinstance(content, str):
+                                    try:
+                                        content = json.loads(content)
+                                    except json.JSONDecodeError:
+                                        pass
                             
-                            if isinstance(content, dict):
-                                usage = content.get("usage", {})
-                                prompt_tokens = int(usage.get("prompt_tokens", 0) or 0)
-                                completion_tokens = int(usage.get("completion_tokens", 0) or 0)
-                                iteration_tokens = prompt_tokens + completion_tokens
+                                if isinstance(content, dict):
+                                    usage = content.get("usage", {})
+                                    prompt_tokens = int(usage.get("prompt_tokens", 0) or 0)
+                                    completion_tokens = int(usage.get("completion_tokens", 0) or 0)
+                                    iteration_tokens = prompt_tokens + completion_tokens
                                 
-                                if iteration_tokens > 0:
-                                    self.cumulative_tokens += iteration_tokens
-                                    logger.debug(f"Cumulative tokens: {self.cumulative_tokens:,} (added {iteration_tokens:,} this iteration)")
+                                    if iteration_tokens > 0:
+                                        self.cumulative_tokens += iteration_tokens
+                                        logger.debug(f"Cumulative tokens: {self.cumulative_tokens:,} (added {iteration_tokens:,} this iteration)")
+                        except Exception as e:
+                            logger.debug(f"Could not extract token usage: {e}")
+                    
+                        # Check if summarization was triggered and update state
+                        # Note: summarization_triggered in ThreadManager is set when summary is created
+                        # We track it here but allow re-triggering if tokens hit 80k again
+                        if self.thread_manager.summarization_triggered:
+                            # If tokens drop below 80k, we can allow re-triggering
+                            if self.cumulative_tokens < 80000:
+                                # Reset flag to allow re-triggering when tokens hit 80k again
+                                self.thread_manager.summarization_triggered = False
+                                self.summarization_triggered = False
+                        
+                            if not self.summarization_triggered:
+                                self.summarization_triggered = True
+                                yield {
+                                    "type": "status",
+                                    "status": "summarization_complete",
+                                    "message": "Context summarization complete. Resuming execution..."
+                                }
+
                     except Exception as e:
-                        logger.debug(f"Could not extract token usage: {e}")
+                        # Use ErrorProcessor for safe error handling
+                        processed_error = ErrorProcessor.process_system_error(e, context={"thread_id": self.config.thread_id})
+                        ErrorProcessor.log_error(processed_error)
+                        error_message = processed_error.message
                     
-                    # Check if summarization was triggered and update state
-                    # Note: summarization_triggered in ThreadManager is set when summary is created
-                    # We track it here but allow re-triggering if tokens hit 80k again
-                    if self.thread_manager.summarization_triggered:
-                        # If tokens drop below 80k, we can allow re-triggering
-                        if self.cumulative_tokens < 80000:
-                            # Reset flag to allow re-triggering when tokens hit 80k again
-                            self.thread_manager.summarization_triggered = False
-                            self.summarization_triggered = False
+                        # Check if we should trigger fallback instead of stopping
+                        if not fallback_triggered and self._should_trigger_fallback(error_message):
+                            logger.info(f"🔄 Exception detected, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
+                            fallback_triggered = True
+                            self.config.model_name = self.config.fallback_model
+                            self.config.fallback_triggered = True
+                            system_message_needs_rebuild = True  # Mark system message for rebuild
                         
-                        if not self.summarization_triggered:
-                            self.summarization_triggered = True
+                            # Yield a status message indicating fallback
                             yield {
                                 "type": "status",
-                                "status": "summarization_complete",
-                                "message": "Context summarization complete. Resuming execution..."
+                                "status": "fallback",
+                                "message": f"Switching to fallback model {self.config.fallback_model} due to error",
+                                "original_error": error_message
                             }
-
+                        
+                            # Continue execution instead of breaking - restart iteration with new model
+                            error_detected = False
+                            if generation:
+                                generation.end()
+                            continue  # Continue to next iteration with fallback model
+                        else:
+                            # Error occurred but fallback already used or shouldn't trigger
+                            if generation:
+                                generation.end(status_message=processed_error.message, level="ERROR")
+                            final_error_detected = True
+                            yield processed_error.to_stream_dict()
+                            break
+                    
                 except Exception as e:
-                    # Use ErrorProcessor for safe error handling
+                    # Use ErrorProcessor for safe error conversion
                     processed_error = ErrorProcessor.process_system_error(e, context={"thread_id": self.config.thread_id})
                     ErrorProcessor.log_error(processed_error)
                     error_message = processed_error.message
-                    
+                
                     # Check if we should trigger fallback instead of stopping
                     if not fallback_triggered and self._should_trigger_fallback(error_message):
-                        logger.info(f"🔄 Exception detected, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
+                        logger.info(f"🔄 Outer exception detected, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
                         fallback_triggered = True
                         self.config.model_name = self.config.fallback_model
                         self.config.fallback_triggered = True
                         system_message_needs_rebuild = True  # Mark system message for rebuild
-                        
+                    
                         # Yield a status message indicating fallback
                         yield {
                             "type": "status",
@@ -1101,55 +1238,23 @@ class AgentRunner:
                             "message": f"Switching to fallback model {self.config.fallback_model} due to error",
                             "original_error": error_message
                         }
-                        
+                    
                         # Continue execution instead of breaking - restart iteration with new model
-                        error_detected = False
-                        if generation:
-                            generation.end()
+                        final_error_detected = False
                         continue  # Continue to next iteration with fallback model
                     else:
                         # Error occurred but fallback already used or shouldn't trigger
-                        if generation:
-                            generation.end(status_message=processed_error.message, level="ERROR")
                         final_error_detected = True
                         yield processed_error.to_stream_dict()
                         break
-                    
-            except Exception as e:
-                # Use ErrorProcessor for safe error conversion
-                processed_error = ErrorProcessor.process_system_error(e, context={"thread_id": self.config.thread_id})
-                ErrorProcessor.log_error(processed_error)
-                error_message = processed_error.message
-                
-                # Check if we should trigger fallback instead of stopping
-                if not fallback_triggered and self._should_trigger_fallback(error_message):
-                    logger.info(f"🔄 Outer exception detected, triggering fallback to {self.config.fallback_model} (thread {self.config.thread_id})")
-                    fallback_triggered = True
-                    self.config.model_name = self.config.fallback_model
-                    self.config.fallback_triggered = True
-                    system_message_needs_rebuild = True  # Mark system message for rebuild
-                    
-                    # Yield a status message indicating fallback
-                    yield {
-                        "type": "status",
-                        "status": "fallback",
-                        "message": f"Switching to fallback model {self.config.fallback_model} due to error",
-                        "original_error": error_message
-                    }
-                    
-                    # Continue execution instead of breaking - restart iteration with new model
-                    final_error_detected = False
-                    continue  # Continue to next iteration with fallback model
-                else:
-                    # Error occurred but fallback already used or shouldn't trigger
-                    final_error_detected = True
-                    yield processed_error.to_stream_dict()
-                    break
             
-            if generation:
-                generation.end()
+                if generation:
+                    generation.end()
 
-            continue_execution = should_continue
+                continue_execution = should_continue
+        finally:
+            # Also runs when the run is stopped or cancelled (the generator is closed) or fails
+            await billing_integration.release_credits(self.account_id, reservation_id)
 
         # Yield completion status when loop exits naturally (not via break)
         # This ensures run_agent_background knows why the agent stopped
@@ -1200,7 +1305,8 @@ async def run_agent(
     max_iterations: int = 100,
     model_name: str = "gemini/gemini-2.5-flash",
     agent_config: Optional[dict] = None,    
-    trace: Optional[StatefulTraceClient] = None
+    trace: Optional[StatefulTraceClient] = None,
+    adaptive_input: Optional[AdaptiveInputMonitor] = None
 ):
     effective_model = model_name
 
@@ -1220,7 +1326,8 @@ async def run_agent(
         max_iterations=max_iterations,
         model_name=effective_model,
         agent_config=agent_config,
-        trace=trace
+        trace=trace,
+        adaptive_input=adaptive_input
     )
     
     runner = AgentRunner(config)
@@ -8,6 +8,7 @@ from pydantic import BaseModel
 from daytona_sdk import AsyncSandbox
 
 from core.sandbox.sandbox import get_or_start_sandbox, delete_sandbox
+from core.sandbox.workspace_manifest import changes_since, workspace_manifests
 from core.utils.logger import logger
 from core.utils.auth_utils import get_optional_user_id, verify_and_get_user_id_from_jwt, verify_sandbox_access, verify_sandbox_access_optional
 from core.services.supabase import DBConnection
@@ -284,6 +285,41 @@ async def read_file(
         logger.error(f"Error reading file in sandbox {sandbox_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/sandboxes/{sandbox_id}/workspace/changes")
+async def get_workspace_changes(
+    sandbox_id: str,
+    since: int = 0,
+    request: Request = None,
+    user_id: Optional[str] = Depends(get_optional_user_id)
+):
+    """List files of /workspace added, modified or deleted since a workspace revision (metadata only)"""
+    logger.debug(f"Received workspace changes request for sandbox {sandbox_id}, since revision {since}, user_id: {user_id}")
+    client = await db.client
+    
+    # Verify the user has access to this sandbox
+    await verify_sandbox_access_optional(client, sandbox_id, user_id)
+    
+    try:
+        sandbox = await get_sandbox_by_id_safely(client, sandbox_id)
+        project_result = await client.table('projects').select('project_id').filter('sandbox->>id', 'eq', sandbox_id).execute()
+        project_id = project_result.data[0]['project_id']
+        
+        manifest = await workspace_manifests.refresh(project_id, sandbox)
+        changes = changes_since(manifest, since)
+        return {
+            "revision": changes.revision,
+            "since": changes.since,
+            "complete": changes.complete,
+            "added": [manifest.entry(path) for path in changes.added],
+            "modified": [manifest.entry(path) for path in changes.modified],
+            "deleted": changes.deleted,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing workspace changes in sandbox {sandbox_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/sandboxes/{sandbox_id}/files")
 async def delete_file(
     sandbox_id: str, 
@@ -0,0 +1,257 @@
+"""
+Transport to the Stagehand browser API (browserApi.ts) running in a sandbox.
+
+The browser tool used to build a ``curl`` command for every browser step and
+run it with ``sandbox.process.exec``: a process spawn plus a round trip through
+the Daytona exec API per step, with the screenshot base64-encoded inside the
+JSON body. Browser steps now go over HTTP to the sandbox's preview URL for the
+API port, through one pooled ``httpx.AsyncClient`` per worker, and ask for the
+binary result format: one line of JSON followed by the raw PNG bytes.
+``ExecBrowserTransport`` keeps the curl path for sandboxes without a
+reachable preview URL.
+
+Screenshots are downsized (and re-encoded, when that makes them smaller) and
+uploaded once per distinct image: ``ScreenshotStore`` remembers uploaded URLs
+by content hash (process LRU + Redis), so a step that leaves the page
+unchanged reuses the URL.
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import shlex
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from PIL import Image
+
+from core.services import redis
+from core.utils.config import config
+from core.utils.logger import logger
+from core.utils.s3_upload_utils import upload_image_bytes
+
+BROWSER_API_PORT = 8004
+BINARY_RESULT_TYPE = "application/x-browser-result"
+SCREENSHOT_CACHE_KEY = "browser_screenshot:{digest}"
+SCREENSHOT_CACHE_TTL = 3600 * 24 * 7
+SUPPORTED_FORMATS = {'JPEG', 'PNG', 'GIF', 'BMP', 'WEBP', 'TIFF'}
+MAX_SCREENSHOT_BYTES = 10 * 1024 * 1024
+
+
+class BrowserApiUnavailable(Exception):
+    """The browser API could not be reached at all (as opposed to returning an error)."""
+
+
+@dataclass
+class BrowserApiResponse:
+    status_code: int
+    result: Dict[str, Any]
+    screenshot: Optional[bytes] = None
+    screenshot_error: Optional[str] = None
+
+
+def parse_binary_result(status_code: int, body: bytes) -> BrowserApiResponse:
+    """Split a binary result (JSON line, then image bytes) into its parts."""
+    head, _, image = body.partition(b"\n")
+    return BrowserApiResponse(status_code, json.loads(head), image or None)
+
+
+def parse_json_result(status_code: int, result: Dict[str, Any]) -> BrowserApiResponse:
+    """Read a JSON result whose screenshot, if any, is base64 in ``screenshot_base64``."""
+    if "screenshot_base64" not in result:
+        return BrowserApiResponse(status_code, result)
+    data = result.pop("screenshot_base64") or ""
+    if data.startswith('data:'):
+        data = data.split(',', 1)[-1]
+    if len(data) < 10:
+        return BrowserApiResponse(status_code, result, screenshot_error="Base64 string is empty or too short")
+    try:
+        return BrowserApiResponse(status_code, result, base64.b64decode(data, validate=True))
+    except ValueError as e:
+        return BrowserApiResponse(status_code, result, screenshot_error=f"Base64 decoding failed: {str(e)}")
+
+
+class BrowserApiClient:
+    """Pooled HTTP client for the browser APIs of all sandboxes, reached through preview URLs."""
+
+    def __init__(self):
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop:
+            # Pooled connections belong to the loop that created them
+            self._http = httpx.AsyncClient(
+                timeout=httpx.Timeout(30, connect=10),
+                limits=httpx.Limits(max_connections=config.BROWSER_API_MAX_CONNECTIONS),
+            )
+            self._loop = loop
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._loop = None
+
+    async def request(
+        self,
+        base_url: str,
+        token: Optional[str],
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: float = 30,
+    ) -> BrowserApiResponse:
+        headers = {
+            "Accept": f"{BINARY_RESULT_TYPE}, application/json",
+            "X-Daytona-Skip-Preview-Warning": "true",
+        }
+        if token:
+            headers["X-Daytona-Preview-Token"] = token
+        url = f"{base_url.rstrip('/')}/api{path}"
+        try:
+            if method == "GET":
+                response = await self._get_http().get(url, params=params, headers=headers, timeout=timeout)
+            else:
+                response = await self._get_http().post(url, json=params, headers=headers, timeout=timeout)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            raise BrowserApiUnavailable(f"Browser API at {base_url} is not reachable: {e!r}")
+
+        content_type = response.headers.get("content-type", "")
+        if content_type.startswith(BINARY_RESULT_TYPE):
+            return parse_binary_result(response.status_code, response.content)
+        try:
+            result = response.json()
+        except ValueError:
+            # Not the browser API answering, e.g. the preview proxy's error page
+            raise BrowserApiUnavailable(f"Browser API at {base_url} returned {response.status_code}: {response.text[:200]}")
+        return parse_json_result(response.status_code, result)
+
+
+browser_api_client = BrowserApiClient()
+
+
+class HttpBrowserTransport:
+    """Calls the browser API through the sandbox preview URL of its port."""
+
+    def __init__(self, base_url: str, token: Optional[str], client: BrowserApiClient = browser_api_client):
+        self.base_url = base_url
+        self.token = token
+        self.client = client
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, timeout: float = 30) -> BrowserApiResponse:
+        return await self.client.request(self.base_url, self.token, method, path, params, timeout)
+
+
+class ExecBrowserTransport:
+    """Calls the browser API with curl inside the sandbox (one process per request)."""
+
+    def __init__(self, sandbox):
+        self.sandbox = sandbox
+
+    async def request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None, timeout: float = 30) -> BrowserApiResponse:
+        url = f"http://localhost:{BROWSER_API_PORT}/api{path}"
+        env = None
+        if method == "GET" and params:
+            url = f"{url}?{httpx.QueryParams(params)}"
+        curl_cmd = f"curl -s -w '\\n%{{http_code}}' -X {method} {shlex.quote(url)} -H 'Content-Type: application/json'"
+        if method != "GET" and params:
+            # Passed through the environment so values are neither shell-quoted nor logged
+            env = {"BROWSER_API_PAYLOAD": json.dumps(params)}
+            curl_cmd += ' -d "$BROWSER_API_PAYLOAD"'
+
+        response = await self.sandbox.process.exec(curl_cmd, timeout=int(timeout), env=env)
+        if response.exit_code == 7:
+            raise BrowserApiUnavailable(f"Browser API is not listening on port {BROWSER_API_PORT}")
+        if response.exit_code != 0:
+            raise BrowserApiUnavailable(f"Browser API request failed: {response}")
+        body, _, status = response.result.rpartition("\n")
+        try:
+            return parse_json_result(int(status), json.loads(body))
+        except ValueError as e:
+            raise BrowserApiUnavailable(f"Failed to parse response JSON: {response.result} {e}")
+
+
+def downsize_screenshot(image: bytes) -> Tuple[bytes, str]:
+    """Validate a screenshot and return it no larger than BROWSER_SCREENSHOT_MAX_DIMENSION, with its content type.
+
+    Screenshots are re-encoded as JPEG unless the original already fits and is
+    smaller (flat pages often compress better as PNG).
+    """
+    if not image:
+        raise ValueError("Decoded image data is empty")
+    if len(image) > MAX_SCREENSHOT_BYTES:
+        raise ValueError(f"Image size ({len(image)} bytes) exceeds limit ({MAX_SCREENSHOT_BYTES} bytes)")
+    try:
+        with Image.open(io.BytesIO(image)) as img:
+            if img.format not in SUPPORTED_FORMATS:
+                raise ValueError(f"Unsupported image format: {img.format}")
+            original_format = img.format
+            img.load()
+            converted = img.convert("RGB")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Image validation failed: {str(e)}")
+
+    max_dimension = config.BROWSER_SCREENSHOT_MAX_DIMENSION
+    fits = max(converted.size) <= max_dimension
+    converted.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    output = io.BytesIO()
+    converted.save(output, format="JPEG", quality=config.BROWSER_SCREENSHOT_JPEG_QUALITY, optimize=True)
+    if fits and original_format in ('PNG', 'JPEG') and len(image) <= output.tell():
+        return image, f"image/{original_format.lower()}"
+    return output.getvalue(), "image/jpeg"
+
+
+class ScreenshotStore:
+    """Uploads each distinct screenshot once, downsized, and remembers its URL by content hash."""
+
+    def __init__(self, bucket_name: str = "browser-screenshots", max_entries: int = 512):
+        self.bucket_name = bucket_name
+        self.max_entries = max_entries
+        self._urls: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.uploads = 0
+
+    async def upload(self, image: bytes) -> str:
+        """Return the public URL of ``image``; raises ValueError for invalid images."""
+        digest = hashlib.sha256(image).hexdigest()
+        url = self._urls.get(digest)
+        if url is None:
+            try:
+                url = await redis.get(SCREENSHOT_CACHE_KEY.format(digest=digest))
+            except Exception as e:
+                logger.warning(f"Failed to read screenshot cache: {e}")
+        if url is not None:
+            self._remember(digest, url)
+            self.hits += 1
+            return url
+
+        downsized, content_type = await asyncio.to_thread(downsize_screenshot, image)
+        url = await upload_image_bytes(downsized, content_type, self.bucket_name, prefix="browser_screenshot")
+        self.uploads += 1
+        self._remember(digest, url)
+        try:
+            await redis.set(SCREENSHOT_CACHE_KEY.format(digest=digest), url, ex=SCREENSHOT_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Failed to write screenshot cache: {e}")
+        return url
+
+    def _remember(self, digest: str, url: str) -> None:
+        self._urls[digest] = url
+        self._urls.move_to_end(digest)
+        while len(self._urls) > self.max_entries:
+            self._urls.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'uploads': self.uploads}
+
+
+screenshot_store = ScreenshotStore()
@@ -0,0 +1,206 @@
+"""
+Command execution in a sandbox through Daytona session commands.
+
+The shell tool used to type commands into tmux sessions and, for blocking
+commands, poll ``tmux has-session`` and ``tmux capture-pane`` every 0.5 s
+through the session API until a completion marker showed up in the pane: at
+least half a second and several round trips per command, with output limited
+to the pane scrollback. Commands now run as session commands of a Daytona
+session named after the shell session:
+
+- blocking commands are executed synchronously; the sandbox daemon answers
+  when the command exits, so a command costs one round trip and its output and
+  exit code come back together,
+- non-blocking commands are started asynchronously and their output is read
+  later from the command logs, which the daemon keeps in full,
+- output is addressed by byte offset, so a long-running process can be read
+  incrementally (``read(..., offset=next_offset)``) and a large output in
+  pages of ``SHELL_OUTPUT_MAX_BYTES``.
+
+Sessions keep their shell state (working directory, environment) between
+commands, like the tmux sessions did.
+"""
+
+import asyncio
+import shlex
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+from daytona_sdk import SessionExecuteRequest
+
+from core.utils.config import config
+from core.utils.logger import logger
+
+
+class CommandNotFound(Exception):
+    """The session, or the command in it, does not exist."""
+
+
+@dataclass
+class CommandOutput:
+    session_name: str
+    command_id: Optional[str]
+    output: str
+    offset: int
+    next_offset: int
+    total_bytes: int
+    exit_code: Optional[int] = None
+
+    @property
+    def completed(self) -> bool:
+        return self.exit_code is not None
+
+    @property
+    def truncated(self) -> bool:
+        return self.offset > 0 or self.next_offset < self.total_bytes
+
+
+def slice_output(logs: str, offset: int, max_bytes: int) -> tuple:
+    """Return ``(text, start, end, total)`` for at most ``max_bytes`` of ``logs`` from byte ``offset``.
+
+    Negative offsets count from the end, so ``-max_bytes`` reads the tail.
+    Slices never split a UTF-8 character: they are widened to whole characters
+    at the start and narrowed at the end.
+    """
+    data = logs.encode("utf-8")
+    total = len(data)
+    start = max(0, total + offset) if offset < 0 else min(offset, total)
+    while 0 < start < total and data[start] & 0xC0 == 0x80:
+        start -= 1
+    end = min(total, start + max_bytes)
+    while start < end < total and data[end] & 0xC0 == 0x80:
+        end -= 1
+    return data[start:end].decode("utf-8", errors="replace"), start, end, total
+
+
+class CommandRunner:
+    """Runs and reads commands in named sessions of one sandbox (``sandbox.process``)."""
+
+    def __init__(self, process):
+        self.process = process
+        self._sessions: Set[str] = set()  # sessions known to exist
+
+    async def _ensure_session(self, session_name: str, new: bool = False) -> bool:
+        """Create the session unless it exists; returns True if it was created."""
+        if session_name in self._sessions:
+            return False
+        if not new:
+            try:
+                await self.process.get_session(session_name)
+                self._sessions.add(session_name)
+                return False
+            except Exception:
+                pass
+        await self.process.create_session(session_name)
+        self._sessions.add(session_name)
+        return True
+
+    @staticmethod
+    def _request(command: str, cwd: Optional[str], run_async: bool):
+        if cwd:
+            # Prefixed, not appended, so a heredoc terminator stays on a line of its own
+            command = f"cd {shlex.quote(cwd)} && {command}"
+        return SessionExecuteRequest(command=command, run_async=run_async)
+
+    async def run(
+        self,
+        session_name: str,
+        command: str,
+        cwd: Optional[str] = None,
+        timeout: int = 60,
+        new_session: bool = False,
+        chdir: bool = False,
+    ) -> CommandOutput:
+        """Run a command and wait for it, at most ``timeout`` seconds.
+
+        ``cwd`` is the working directory of a new session; an existing session
+        keeps its own unless ``chdir`` is set. When the command outlives the
+        timeout it keeps running; the returned output then has no exit code and
+        can be followed with ``read``.
+        """
+        created = await self._ensure_session(session_name, new=new_session)
+        request = self._request(command, cwd if created or chdir else None, run_async=False)
+        try:
+            response = await asyncio.wait_for(
+                self.process.execute_session_command(session_name, request, timeout=timeout + 5),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            logger.debug(f"Command in session {session_name} still running after {timeout}s")
+            return await self.read(session_name, offset=-config.SHELL_OUTPUT_MAX_BYTES)
+
+        logs = response.output
+        if logs is None:
+            logs = await self.process.get_session_command_logs(session_name, response.cmd_id)
+        return self._output(session_name, response.cmd_id, logs, -config.SHELL_OUTPUT_MAX_BYTES, response.exit_code)
+
+    async def start(
+        self,
+        session_name: str,
+        command: str,
+        cwd: Optional[str] = None,
+        new_session: bool = False,
+        chdir: bool = False,
+    ) -> str:
+        """Start a command without waiting for it and return its command id (``cwd`` as for ``run``)."""
+        created = await self._ensure_session(session_name, new=new_session)
+        request = self._request(command, cwd if created or chdir else None, run_async=True)
+        response = await self.process.execute_session_command(session_name, request)
+        return response.cmd_id
+
+    async def read(self, session_name: str, command_id: Optional[str] = None, offset: int = 0) -> CommandOutput:
+        """Read the output of a command (the latest one in the session by default) from byte ``offset``."""
+        if command_id is None:
+            command = await self._latest_command(session_name)
+        else:
+            try:
+                command = await self.process.get_session_command(session_name, command_id)
+            except Exception:
+                raise CommandNotFound(f"Command '{command_id}' does not exist in session '{session_name}'.")
+        logs = await self.process.get_session_command_logs(session_name, command.id)
+        return self._output(session_name, command.id, logs or "", offset, command.exit_code)
+
+    async def _latest_command(self, session_name: str):
+        try:
+            session = await self.process.get_session(session_name)
+        except Exception:
+            raise CommandNotFound(f"Session '{session_name}' does not exist.")
+        commands = session.commands or []
+        if not commands:
+            raise CommandNotFound(f"No command has run in session '{session_name}'.")
+        return commands[-1]
+
+    def _output(self, session_name: str, command_id: str, logs: str, offset: int, exit_code: Optional[int]) -> CommandOutput:
+        text, start, end, total = slice_output(logs, offset, config.SHELL_OUTPUT_MAX_BYTES)
+        return CommandOutput(session_name, command_id, text, start, end, total, exit_code)
+
+    async def terminate(self, session_name: str) -> None:
+        """Kill a session and everything running in it."""
+        try:
+            await self.process.delete_session(session_name)
+        except Exception:
+            raise CommandNotFound(f"Session '{session_name}' does not exist.")
+        finally:
+            self._sessions.discard(session_name)
+
+    async def list(self) -> List[Dict[str, object]]:
+        """Sessions in the sandbox with their latest command and whether it is still running."""
+        sessions = []
+        for session in await self.process.list_sessions():
+            commands = session.commands or []
+            last = commands[-1] if commands else None
+            sessions.append({
+                "session_name": session.session_id,
+                "command": last.command if last else None,
+                "running": last is not None and last.exit_code is None,
+                "exit_code": last.exit_code if last else None,
+            })
+        return sessions
+
+    async def close(self) -> None:
+        """Delete the sessions this runner created or used."""
+        for session_name in list(self._sessions):
+            try:
+                await self.terminate(session_name)
+            except CommandNotFound:
+                pass
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Export latency benchmark for the presentation routers.
+
+Writes a synthetic deck (20 slides by default) under /workspace/presentations
+and times exports through ``PresentationToPDFAPI`` (or the PPTX converter):
+
+- baseline: a new Chromium per export and no render cache, as the routers
+  worked before the browser pool,
+- cold: shared browser not started yet, empty render cache,
+- warm: same deck again, every slide served from the render cache,
+- one slide changed: one slide's HTML edited, only that slide is rendered.
+
+Runs against real Chromium by default, so run it inside the sandbox image:
+
+    python bench_slide_export.py --slides 20
+    python bench_slide_export.py --format pptx
+
+``--simulated`` (PDF only) replaces Chromium with a stand-in that sleeps for
+``--launch-ms`` per launch, ``--load-ms`` per page load and ``--pdf-ms`` per
+print, plus the router's own fixed waits; use it where no browser is available.
+"""
+
+import argparse
+import asyncio
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import html_to_pdf_router
+from browser_pool import BrowserPool
+from slide_render_cache import SlideRenderCache
+
+WORKSPACE = Path("/workspace")
+
+SLIDE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<style>
+  body {{ margin: 0; font-family: 'DejaVu Sans', sans-serif; }}
+  .slide-container {{ width: 1920px; height: 1080px; padding: 120px; box-sizing: border-box;
+                     background: linear-gradient(135deg, #0f172a, #1e3a8a); color: white; }}
+  .card {{ display: inline-block; width: 480px; margin: 24px; padding: 32px; border-radius: 16px;
+           background: rgba(255, 255, 255, 0.08); box-shadow: 0 8px 24px rgba(0, 0, 0, 0.3); }}
+  h1 {{ font-size: 72px; margin: 0 0 48px; }}
+  p {{ font-size: 28px; line-height: 1.4; }}
+</style>
+</head>
+<body>
+<div class="slide-container">
+  <h1>{title}</h1>
+  <div class="card"><svg width="64" height="64"><circle cx="32" cy="32" r="28" fill="#38bdf8"/></svg>
+    <p>Quarterly revenue grew {number}% with retention steady across regions.</p></div>
+  <div class="card"><p>Launch schedule, owners and budget for workstream {number}.</p></div>
+  <div class="card"><p>Risks: vendor lead times, hiring plan, support tier capacity.</p></div>
+</div>
+</body>
+</html>
+"""
+
+
+class _SimulatedPage:
+    def __init__(self, args):
+        self.args = args
+
+    async def set_viewport_size(self, size):
+        pass
+
+    async def emulate_media(self, media):
+        pass
+
+    async def evaluate(self, script, *args):
+        pass
+
+    async def goto(self, url, **kwargs):
+        await asyncio.sleep(self.args.load_ms / 1000)
+
+    async def wait_for_timeout(self, ms):
+        await asyncio.sleep(ms / 1000)
+
+    async def pdf(self, path, **kwargs):
+        from PyPDF2 import PdfWriter
+
+        await asyncio.sleep(self.args.pdf_ms / 1000)
+        writer = PdfWriter()
+        writer.add_blank_page(width=1920, height=1080)
+        with open(path, 'wb') as f:
+            writer.write(f)
+
+    async def close(self):
+        pass
+
+
+class _SimulatedContext:
+    def __init__(self, args):
+        self.args = args
+        self.listeners = []
+
+    def on(self, event, callback):
+        self.listeners.append(callback)
+
+    async def new_page(self):
+        page = _SimulatedPage(self.args)
+        for listener in self.listeners:
+            listener(page)
+        return page
+
+    async def close(self):
+        pass
+
+
+class _SimulatedBrowser:
+    def __init__(self, args):
+        self.args = args
+
+    def on(self, event, callback):
+        pass
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, **options):
+        return _SimulatedContext(self.args)
+
+    async def close(self):
+        pass
+
+
+class _SimulatedPlaywright:
+    def __init__(self, args):
+        self.args = args
+        self.chromium = self
+
+    async def launch(self, **kwargs):
+        await asyncio.sleep(self.args.launch_ms / 1000)
+        return _SimulatedBrowser(self.args)
+
+    async def stop(self):
+        pass
+
+
+def _new_pool(args) -> BrowserPool:
+    pool = BrowserPool()
+    if args.simulated:
+        async def start_playwright():
+            return _SimulatedPlaywright(args)
+        pool._start_playwright = start_playwright
+    return pool
+
+
+def _write_deck(deck_dir: Path, slides: int) -> None:
+    deck_dir.mkdir(parents=True)
+    metadata = {'presentation_name': 'bench_deck', 'title': 'Benchmark deck', 'slides': {}}
+    for number in range(1, slides + 1):
+        filename = f"slide_{number:02d}.html"
+        (deck_dir / filename).write_text(SLIDE_TEMPLATE.format(title=f"Slide {number}", number=number))
+        metadata['slides'][str(number)] = {
+            'title': f"Slide {number}",
+            'filename': filename,
+            'file_path': str((deck_dir / filename).relative_to(WORKSPACE)),
+        }
+    (deck_dir / "metadata.json").write_text(json.dumps(metadata))
+
+
+def _use(router, pool: BrowserPool, cache: SlideRenderCache) -> None:
+    router.browser_pool = pool
+    router.render_cache = cache
+
+
+async def _export(args, deck_dir: Path) -> float:
+    if args.format == 'pdf':
+        converter = html_to_pdf_router.PresentationToPDFAPI(str(deck_dir))
+        convert = converter.convert_to_pdf
+    else:
+        import html_to_pptx_router
+        converter = html_to_pptx_router.OptimizedHTMLToPPTXConverter(str(deck_dir))
+        convert = converter.convert_to_pptx
+    start = time.perf_counter()
+    await convert(store_locally=False)
+    return time.perf_counter() - start
+
+
+async def _main(args) -> None:
+    if args.format == 'pptx' and args.simulated:
+        raise SystemExit("--simulated only supports --format pdf")
+    if args.format == 'pdf':
+        router = html_to_pdf_router
+    else:
+        import html_to_pptx_router as router
+
+    deck_dir = WORKSPACE / "presentations" / f".bench_deck_{int(time.time())}"
+    cache_dir = Path(tempfile.mkdtemp(prefix="slide_render_cache_"))
+    _write_deck(deck_dir, args.slides)
+    runs = []
+    try:
+        # Before: every export launched its own Chromium and rendered every slide
+        baseline = []
+        for _ in range(args.baseline_runs):
+            pool = _new_pool(args)
+            _use(router, pool, SlideRenderCache(cache_dir / "disabled", max_bytes=0))
+            baseline.append(await _export(args, deck_dir))
+            await pool.close()
+        runs.append(("baseline", sum(baseline) / len(baseline)))
+
+        pool = _new_pool(args)
+        cache = SlideRenderCache(cache_dir / "cache", max_bytes=512 * 1024 * 1024)
+        _use(router, pool, cache)
+        runs.append(("cold", await _export(args, deck_dir)))
+        runs.append(("warm", await _export(args, deck_dir)))
+
+        changed = deck_dir / "slide_07.html"
+        changed.write_text(changed.read_text().replace("Slide 7", "Slide 7 (revised)"))
+        runs.append(("one slide changed", await _export(args, deck_dir)))
+        await pool.close()
+    finally:
+        shutil.rmtree(deck_dir, ignore_errors=True)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    browser = "simulated" if args.simulated else "chromium"
+    if args.simulated:
+        browser += f" (launch {args.launch_ms}ms, load {args.load_ms}ms, print {args.pdf_ms}ms)"
+    print()
+    print(f"Format: {args.format}  Slides: {args.slides}  Browser: {browser}")
+    print(f"Pool: {pool.max_contexts} contexts  Cache stats: {cache.stats()}")
+    for label, seconds in runs:
+        print(f"{label:>18}: {seconds * 1000:9.1f} ms  ({runs[0][1] / seconds:6.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=["pdf", "pptx"], default="pdf")
+    parser.add_argument("--slides", type=int, default=20)
+    parser.add_argument("--baseline-runs", type=int, default=1)
+    parser.add_argument("--simulated", action="store_true", help="Use a timed stand-in instead of Chromium (PDF only)")
+    parser.add_argument("--launch-ms", type=float, default=800.0)
+    parser.add_argument("--load-ms", type=float, default=250.0)
+    parser.add_argument("--pdf-ms", type=float, default=150.0)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
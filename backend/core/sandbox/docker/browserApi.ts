@@ -15,6 +15,21 @@ interface BrowserActionResult {
     action?: string;
 }
 
+// Clients that send this in Accept get one line of JSON followed by the raw PNG
+// bytes, instead of the screenshot base64-encoded inside the JSON body
+const BINARY_RESULT_TYPE = 'application/x-browser-result';
+
+function sendResult(req: express.Request, res: express.Response, status: number, result: object, screenshot?: Buffer) {
+    if (req.get('Accept')?.includes(BINARY_RESULT_TYPE)) {
+        const head = Buffer.from(JSON.stringify(result) + "\n", 'utf-8');
+        res.status(status).type(BINARY_RESULT_TYPE).send(screenshot ? Buffer.concat([head, screenshot]) : head);
+    } else if (screenshot) {
+        res.status(status).json({ ...result, screenshot_base64: screenshot.toString('base64') });
+    } else {
+        res.status(status).json(result);
+    }
+}
+
 class BrowserAutomation {
     public router: express.Router;
 
@@ -138,25 +153,25 @@ class BrowserAutomation {
         try{
             const health = this.health();
             if (this.page && health.status === "healthy") {
-                const screenshot_base64 = await this.page.screenshot({ fullPage: false }).then(buffer => buffer.toString('base64'));
+                const screenshot = await this.page.screenshot({ fullPage: false });
                 const page_info = {
                     url: await this.page.url(),
                     title: await this.page.title(),
-                    screenshot_base64: screenshot_base64,
+                    screenshot: screenshot,
                 };
                 return page_info;
             }
             return {
                 url: "",
                 title: "",
-                screenshot_base64: "",
+                screenshot: Buffer.alloc(0),
             }
         } catch (error) {
             console.error("Error capturing stagehand state", error);
             return {
                 url: "",
                 title: "",
-                screenshot_base64: "",
+                screenshot: Buffer.alloc(0),
             }
         }
     }
@@ -173,9 +188,8 @@ class BrowserAutomation {
                     error: "",
                     url: page_info.url,
                     title: page_info.title,
-                    screenshot_base64: page_info?.screenshot_base64,
                 }
-                res.json(result);
+                sendResult(req, res, 200, result, page_info.screenshot);
             } else {
                 res.status(500).json({
                     "status": "error",
@@ -186,14 +200,13 @@ class BrowserAutomation {
         } catch (error) {
             console.error(error);
             const page_info = await this.get_stagehand_state();
-            res.status(500).json({
+            sendResult(req, res, 500, {
                 success: false,
                 message: "Failed to navigate to " + req.body.url,
                 url: page_info.url,
                 title: page_info.title,
-                screenshot_base64: page_info.screenshot_base64,
                 error
-            })
+            }, page_info.screenshot)
         }
     }
 
@@ -206,9 +219,8 @@ class BrowserAutomation {
                     message: "Screenshot taken",
                     url: page_info.url,
                     title: page_info.title,
-                    screenshot_base64: page_info.screenshot_base64,
                 }
-                res.json(result);
+                sendResult(req, res, 200, result, page_info.screenshot);
             } else {
                 res.status(500).json({
                     "status": "error",
@@ -249,9 +261,8 @@ class BrowserAutomation {
                     action: result.action,
                     url: page_info.url,
                     title: page_info.title,
-                    screenshot_base64: page_info.screenshot_base64,
                 }
-                res.json(response);
+                sendResult(req, res, 200, response, page_info.screenshot);
             } else {
                 res.status(500).json({
                     "status": "error",
@@ -261,14 +272,13 @@ class BrowserAutomation {
         } catch (error) {
             console.error(error);
             const page_info = await this.get_stagehand_state();
-            res.status(500).json({
+            sendResult(req, res, 500, {
                 success: false,
                 message: "Failed to act",
                 url: page_info.url,
                 title: page_info.title,
-                screenshot_base64: page_info.screenshot_base64,
                 error
-            })
+            }, page_info.screenshot)
         } finally {
             if (this.page && fileChooseHandler) {
                 this.page.off('filechooser', fileChooseHandler);
@@ -289,21 +299,19 @@ class BrowserAutomation {
                     action: result.extraction,
                     url: page_info.url,
                     title: page_info.title,
-                    screenshot_base64: page_info.screenshot_base64,
                 }
-                res.json(response);
+                sendResult(req, res, 200, response, page_info.screenshot);
             }
         } catch (error) {
             console.error(error);
             const page_info = await this.get_stagehand_state();
-            res.status(500).json({
+            sendResult(req, res, 500, {
                 success: false,
                 message: "Failed to extract",
                 url: page_info.url,
                 title: page_info.title,
-                screenshot_base64: page_info.screenshot_base64,
                 error
-            })
+            }, page_info.screenshot)
         }
     }
 
@@ -342,7 +350,7 @@ class BrowserAutomation {
             // Wait for any potential loading/animations
             await this.page.waitForTimeout(500);
 
-            let screenshot_base64: string;
+            let screenshot: Buffer;
             
             // Try to get the SVG element and take a screenshot of just that element
             const svgElement = await this.page.locator('svg').first();
@@ -354,41 +362,36 @@ class BrowserAutomation {
                 
                 if (bbox && bbox.width > 0 && bbox.height > 0) {
                     // Take screenshot of just the SVG element
-                    const screenshotBuffer = await svgElement.screenshot({ type: 'png' });
-                    screenshot_base64 = screenshotBuffer.toString('base64');
+                    screenshot = await svgElement.screenshot({ type: 'png' });
                 } else {
                     // Fallback to full page screenshot
-                    const screenshotBuffer = await this.page.screenshot({ fullPage: true, type: 'png' });
-                    screenshot_base64 = screenshotBuffer.toString('base64');
+                    screenshot = await this.page.screenshot({ fullPage: true, type: 'png' });
                 }
             } else {
                 // No SVG found, take full page screenshot anyway
-                const screenshotBuffer = await this.page.screenshot({ fullPage: true, type: 'png' });
-                screenshot_base64 = screenshotBuffer.toString('base64');
+                screenshot = await this.page.screenshot({ fullPage: true, type: 'png' });
             }
 
             const page_info = await this.get_stagehand_state();
             
-            res.json({
+            sendResult(req, res, 200, {
                 success: true,
                 message: `Successfully converted SVG to PNG: ${svg_file_path}`,
                 url: page_info.url,
                 title: page_info.title,
-                screenshot_base64: screenshot_base64
-            } as BrowserActionResult);
+            } as BrowserActionResult, screenshot);
 
         } catch (error) {
             console.error("Error converting SVG:", error);
             const page_info = await this.get_stagehand_state();
             
-            res.status(500).json({
+            sendResult(req, res, 500, {
                 success: false,
                 message: "Failed to convert SVG",
                 url: page_info.url,
                 title: page_info.title,
-                screenshot_base64: page_info.screenshot_base64,
                 error: String(error)
-            } as BrowserActionResult);
+            } as BrowserActionResult, page_info.screenshot);
         }
     }
 
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Shared headless Chromium for the presentation export routers.
+
+Launching Chromium costs about a second per export, so the sandbox server keeps
+one browser running and hands out isolated browser contexts from it:
+
+- at most BROWSER_POOL_MAX_CONTEXTS contexts are open at once; further exports
+  wait for one to be released,
+- the browser is replaced after BROWSER_POOL_MAX_RENDERS pages (Chromium's
+  memory use creeps up over time) or as soon as it disconnects (crash, OOM
+  kill); a browser being replaced is closed once its last context is released.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+CHROMIUM_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--force-device-scale-factor=1',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+    '--disable-features=VizDisplayCompositor',
+    '--disable-extensions',
+    '--disable-plugins',
+    '--disable-web-security',
+    '--disable-features=TranslateUI',
+    '--disable-ipc-flooding-protection'
+]
+
+
+class BrowserPool:
+    def __init__(self, max_contexts: int = 4, max_renders: int = 500, launch_args: Optional[List[str]] = None):
+        self.max_contexts = max(1, max_contexts)
+        self.max_renders = max(1, max_renders)
+        self.launch_args = launch_args if launch_args is not None else CHROMIUM_ARGS
+        self.launches = 0
+
+        self._playwright = None
+        self._browser = None
+        self._renders = 0
+        self._leases: Dict[object, int] = {}
+        self._retired: List[object] = []
+        self._lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(self.max_contexts)
+
+    async def _start_playwright(self):
+        from playwright.async_api import async_playwright
+        return await async_playwright().start()
+
+    async def _launch(self):
+        if self._playwright is None:
+            self._playwright = await self._start_playwright()
+        print(f"🌐 Launching pooled Chromium (launch #{self.launches + 1})...")
+        browser = await self._playwright.chromium.launch(headless=True, args=self.launch_args)
+        browser.on("disconnected", lambda _: self._on_disconnected(browser))
+        self.launches += 1
+        self._renders = 0
+        return browser
+
+    def _on_disconnected(self, browser) -> None:
+        if browser is self._browser:
+            print("⚠️ Pooled Chromium disconnected, a new one will be launched for the next export")
+            self._browser = None
+
+    def _count_render(self, browser) -> None:
+        if browser is self._browser:
+            self._renders += 1
+
+    async def _retire(self, browser) -> None:
+        """Stop handing out ``browser``; close it now if no context is using it."""
+        if browser is self._browser:
+            self._browser = None
+        if self._leases.get(browser, 0) > 0:
+            if browser not in self._retired:
+                self._retired.append(browser)
+            return
+        if browser in self._retired:
+            self._retired.remove(browser)
+        self._leases.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception as e:
+            print(f"Failed to close retired Chromium: {e}")
+
+    async def _acquire_browser(self):
+        async with self._lock:
+            browser = self._browser
+            if browser is not None and (not browser.is_connected() or self._renders >= self.max_renders):
+                await self._retire(browser)
+            if self._browser is None:
+                self._browser = await self._launch()
+            browser = self._browser
+            self._leases[browser] = self._leases.get(browser, 0) + 1
+            return browser
+
+    async def _release_browser(self, browser) -> None:
+        async with self._lock:
+            self._leases[browser] -= 1
+            if browser in self._retired or (not browser.is_connected() and browser is not self._browser):
+                await self._retire(browser)
+
+    @asynccontextmanager
+    async def context(self, **context_options) -> AsyncIterator[object]:
+        """Lease a fresh browser context, closed again when the block exits.
+
+        Every page opened in it counts towards the browser's render budget.
+        """
+        async with self._semaphore:
+            browser = await self._acquire_browser()
+            try:
+                context = await browser.new_context(**context_options)
+                context.on("page", lambda _: self._count_render(browser))
+                try:
+                    yield context
+                finally:
+                    try:
+                        await context.close()
+                    except Exception as e:
+                        # The browser went away underneath us; it is replaced on the next lease
+                        print(f"Failed to close browser context: {e}")
+            finally:
+                await self._release_browser(browser)
+
+    async def close(self) -> None:
+        """Close every browser and stop Playwright (server shutdown)."""
+        async with self._lock:
+            for browser in [self._browser, *self._retired]:
+                if browser is None:
+                    continue
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+            self._browser = None
+            self._retired = []
+            self._leases = {}
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'launches': self.launches,
+            'renders': self._renders,
+            'active_contexts': sum(self._leases.values()),
+            'retired_browsers': len(self._retired),
+        }
+
+
+browser_pool = BrowserPool(
+    max_contexts=int(os.getenv("BROWSER_POOL_MAX_CONTEXTS", "4")),
+    max_renders=int(os.getenv("BROWSER_POOL_MAX_RENDERS", "500")),
+)
@@ -8,23 +8,21 @@ Provides PDF conversion endpoints as a FastAPI router that can be included in ot
 import json
 import asyncio
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 import tempfile
 
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
 from pydantic import BaseModel, Field
 
-try:
-    from playwright.async_api import async_playwright
-except ImportError:
-    raise ImportError("Playwright is not installed. Please install it with: pip install playwright")
-
 try:
     from PyPDF2 import PdfWriter, PdfReader
 except ImportError:
     raise ImportError("PyPDF2 is not installed. Please install it with: pip install PyPDF2")
 
+from browser_pool import browser_pool
+from slide_render_cache import render_cache
+
 
 # Create router
 router = APIRouter(prefix="/presentation", tags=["pdf-conversion"])
@@ -33,6 +31,10 @@ router = APIRouter(prefix="/presentation", tags=["pdf-conversion"])
 output_dir = Path("generated_pdfs")
 output_dir.mkdir(exist_ok=True)
 
+SLIDE_VIEWPORT = {"width": 1920, "height": 1080}
+# Bump when the rendering below changes, so cached slides are rendered again
+PDF_RENDERER = "pdf-v1"
+
 
 class ConvertRequest(BaseModel):
     presentation_path: str = Field(..., description="Path to the presentation folder containing metadata.json")
@@ -106,15 +108,32 @@ class PresentationToPDFAPI:
         except Exception as e:
             raise ValueError(f"Error loading metadata: {e}")
     
-    async def render_slide_to_pdf(self, browser, slide_info: Dict, temp_dir: Path) -> Path:
+    def slide_pdf_path(self, slide_info: Dict, temp_dir: Path) -> Path:
+        """Where a slide's PDF goes; each slide gets its own directory (one render cache entry)."""
+        slide_num = slide_info['number']
+        return temp_dir / f"slide_{slide_num:02d}" / f"slide_{slide_num:02d}.pdf"
+    
+    def load_cached_slide(self, slide_info: Dict, temp_dir: Path) -> Optional[Path]:
+        """Return the PDF of an unchanged slide from the render cache, or None."""
+        pdf_path = self.slide_pdf_path(slide_info, temp_dir)
+        cache_key = render_cache.key(PDF_RENDERER, slide_info['path'], SLIDE_VIEWPORT)
+        if render_cache.get(cache_key, pdf_path.parent) and pdf_path.exists():
+            print(f"  ✓ Slide {slide_info['number']} unchanged, using cached render")
+            return pdf_path
+        return None
+    
+    async def render_slide_to_pdf(self, context, slide_info: Dict, temp_dir: Path) -> Path:
         """Render a single HTML slide to PDF using Playwright."""
         html_path = slide_info['path']
         slide_num = slide_info['number']
+        temp_pdf_path = self.slide_pdf_path(slide_info, temp_dir)
+        cache_key = render_cache.key(PDF_RENDERER, html_path, SLIDE_VIEWPORT)
         
         print(f"Rendering slide {slide_num}: {slide_info['title']}")
+        temp_pdf_path.parent.mkdir(exist_ok=True)
         
         # Create new page with exact presentation dimensions
-        page = await browser.new_page()
+        page = await context.new_page()
         
         try:
             # Set exact viewport to 1920x1080
@@ -160,8 +179,6 @@ class PresentationToPDFAPI:
             await page.wait_for_timeout(1000)
             
             # Generate PDF for this slide
-            temp_pdf_path = temp_dir / f"slide_{slide_num:02d}.pdf"
-            
             await page.pdf(
                 path=str(temp_pdf_path),
                 width="1920px",
@@ -171,6 +188,8 @@ class PresentationToPDFAPI:
                 prefer_css_page_size=False
             )
             
+            render_cache.put(cache_key, temp_pdf_path.parent)
+            
             print(f"  ✓ Slide {slide_num} rendered")
             return temp_pdf_path
             
@@ -213,35 +232,22 @@ class PresentationToPDFAPI:
         with tempfile.TemporaryDirectory() as temp_dir:
             temp_path = Path(temp_dir)
             
-            # Launch browser
-            async with async_playwright() as p:
-                print("🌐 Launching browser...")
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-dev-shm-usage',
-                        '--disable-gpu',
-                        '--force-device-scale-factor=1',
-                        '--disable-background-timer-throttling'
-                    ]
-                )
-                
-                try:
+            pdf_paths = [self.load_cached_slide(slide_info, temp_path) for slide_info in self.slides_info]
+            to_render = [slide_info for slide_info, pdf_path in zip(self.slides_info, pdf_paths) if pdf_path is None]
+            
+            if to_render:
+                # Render changed slides in a context of the shared browser
+                async with browser_pool.context(viewport=SLIDE_VIEWPORT) as context:
                     # Process all slides concurrently using asyncio.gather
-                    print(f"📄 Processing {len(self.slides_info)} slides concurrently...")
+                    print(f"📄 Processing {len(to_render)} of {len(self.slides_info)} slides concurrently...")
                     
                     tasks = [
-                        self.render_slide_to_pdf(browser, slide_info, temp_path)
-                        for slide_info in self.slides_info
+                        self.render_slide_to_pdf(context, slide_info, temp_path)
+                        for slide_info in to_render
                     ]
                     
                     # Wait for all slides to be processed concurrently
-                    pdf_paths = await asyncio.gather(*tasks)
-                    
-                finally:
-                    await browser.close()
+                    pdf_paths = [p for p in pdf_paths if p is not None] + await asyncio.gather(*tasks)
             
             # Create output path
             presentation_name = self.metadata.get('presentation_name', 'presentation')
@@ -14,17 +14,12 @@ from typing import Dict, List, Optional
 import tempfile
 import shutil
 import traceback
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import Response
 from pydantic import BaseModel, Field
 
-try:
-    from playwright.async_api import async_playwright
-except ImportError:
-    raise ImportError("Playwright is not installed. Please install it with: pip install playwright")
-
 try:
     from pptx import Presentation
     from pptx.util import Inches, Pt
@@ -33,6 +28,9 @@ try:
 except ImportError as e:
     raise ImportError(f"python-pptx is not installed. Please install it with: pip install python-pptx. Error: {e}")
 
+from browser_pool import browser_pool
+from slide_render_cache import render_cache
+
 
 # Create router
 router = APIRouter(prefix="/presentation", tags=["pptx-conversion"])
@@ -41,6 +39,10 @@ router = APIRouter(prefix="/presentation", tags=["pptx-conversion"])
 output_dir = Path("generated_pptx")
 output_dir.mkdir(exist_ok=True)
 
+SLIDE_VIEWPORT = {"width": 1920, "height": 1080}
+# Bump when the slide extraction below changes, so cached slides are analyzed again
+PPTX_RENDERER = "pptx-v1"
+
 
 class ConvertRequest(BaseModel):
     presentation_path: str = Field(..., description="Path to the presentation folder containing metadata.json")
@@ -1258,6 +1260,58 @@ class OptimizedHTMLToPPTXConverter:
                 except Exception:
                     pass
     
+    def load_cached_analysis(self, slide_info: Dict, temp_dir: Path) -> Optional[Dict]:
+        """Return the analysis of an unchanged slide from the render cache, or None."""
+        cache_key = render_cache.key(PPTX_RENDERER, slide_info['path'], SLIDE_VIEWPORT)
+        entry_dir = render_cache.get(cache_key, temp_dir / f"cached_slide_{slide_info['number']:03d}")
+        if not entry_dir:
+            return None
+        
+        try:
+            with open(entry_dir / "analysis.json", 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            background_name = cached['background_path']
+            return {
+                'slide_info': slide_info,
+                'visual_elements': [
+                    {**element, 'image_path': entry_dir / element['image_path']}
+                    for element in cached['visual_elements']
+                ],
+                'background_path': entry_dir / background_name if background_name else None,
+                'text_elements': [TextElement(**element) for element in cached['text_elements']],
+            }
+        except Exception as e:
+            self.log("Ignoring unreadable cached slide", slide_number=slide_info['number'], error=str(e))
+            return None
+    
+    def store_analysis(self, cache_key: str, slide_analysis: Dict, temp_dir: Path) -> None:
+        """Copy a slide's screenshots and extracted text into the render cache."""
+        slide_num = slide_analysis['slide_info']['number']
+        entry_dir = temp_dir / f"render_cache_slide_{slide_num:03d}"
+        
+        def stage(image_path: Optional[Path]) -> Optional[str]:
+            if not image_path:
+                return None
+            if image_path.exists():
+                shutil.copy2(image_path, entry_dir / image_path.name)
+            return image_path.name
+        
+        try:
+            entry_dir.mkdir()
+            cached = {
+                'visual_elements': [
+                    {**element, 'image_path': stage(element['image_path'])}
+                    for element in slide_analysis['visual_elements']
+                ],
+                'background_path': stage(slide_analysis['background_path']),
+                'text_elements': [asdict(element) for element in slide_analysis['text_elements']],
+            }
+            with open(entry_dir / "analysis.json", 'w', encoding='utf-8') as f:
+                json.dump(cached, f, default=str)
+            render_cache.put(cache_key, entry_dir)
+        except Exception as e:
+            self.log("Failed to cache slide analysis", slide_number=slide_num, error=str(e))
+    
     async def convert_to_pptx(self, store_locally: bool = True) -> tuple:
         """Main conversion method - optimized and reliable."""
         self.log("Starting PPTX conversion", store_locally=store_locally)
@@ -1270,46 +1324,31 @@ class OptimizedHTMLToPPTXConverter:
             temp_path = Path(temp_dir)
             self.log("Created temporary workspace", temp_dir=temp_dir)
             
-            # Launch browser for processing
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=[
-                        '--no-sandbox',
-                        '--disable-setuid-sandbox',
-                        '--disable-dev-shm-usage',
-                        '--disable-gpu',
-                        '--force-device-scale-factor=1',
-                        '--disable-background-timer-throttling',
-                        '--disable-backgrounding-occluded-windows',
-                        '--disable-renderer-backgrounding',
-                        '--disable-features=VizDisplayCompositor',
-                        '--disable-extensions',
-                        '--disable-plugins',
-                        '--disable-web-security',
-                        '--disable-features=TranslateUI',
-                        '--disable-ipc-flooding-protection'
-                    ]
-                )
-                self.log("Chromium launched")
-                
-                try:
-                    # Process all slides in parallel
+            # Unchanged slides come from the render cache
+            cached_analyses = {}
+            for slide_info in self.slides_info:
+                cached_analysis = self.load_cached_analysis(slide_info, temp_path)
+                if cached_analysis:
+                    cached_analyses[slide_info['number']] = cached_analysis
+            slides_to_render = [
+                slide_info for slide_info in self.slides_info
+                if slide_info['number'] not in cached_analyses
+            ]
+            self.log("Render cache checked", cached=len(cached_analyses), to_render=len(slides_to_render))
+            
+            slide_analyses = []
+            if slides_to_render:
+                # Render the remaining slides in a context of the shared browser
+                async with browser_pool.context(viewport=SLIDE_VIEWPORT) as context:
                     # Create semaphore to limit concurrent operations
                     semaphore = asyncio.Semaphore(5)
-                    context = await browser.new_context(
-                        viewport={'width': 1920, 'height': 1080}
-                    )
-                    
-                    context = await browser.new_context(
-                        viewport={'width': 1920, 'height': 1080}
-                    )
                     self.log("Browser context ready")
                     
                     async def process_single_slide(slide_info: Dict) -> Dict:
                         """Process a single slide with controlled concurrency."""
                         async with semaphore:
                             slide_num = slide_info['number']
+                            cache_key = render_cache.key(PPTX_RENDERER, slide_info['path'], SLIDE_VIEWPORT)
                             self.log("Processing slide", slide_number=slide_num, title=slide_info.get('title'))
                             
                             try:
@@ -1353,6 +1392,7 @@ class OptimizedHTMLToPPTXConverter:
                                         background=str(background_path) if background_path else "none"
                                     )
                                     
+                                    self.store_analysis(cache_key, slide_analysis, temp_path)
                                     return slide_analysis
                                     
                                 except Exception as e:
@@ -1379,38 +1419,35 @@ class OptimizedHTMLToPPTXConverter:
                                     'error': f"Page creation failed: {str(e)}"
                                 }
                     
-                    # Launch ALL slides in parallel
+                    # Launch remaining slides in parallel
                     parallel_tasks = [
                         process_single_slide(slide_info) 
-                        for slide_info in self.slides_info
+                        for slide_info in slides_to_render
                     ]
                     
                     # Wait for ALL slides to complete in parallel
                     slide_analyses = await asyncio.gather(*parallel_tasks, return_exceptions=True)
-                    self.log("Slide processing completed", requested=len(self.slides_info))
-                    
-                    # Handle any top-level exceptions
-                    processed_analyses = []
-                    for i, result in enumerate(slide_analyses):
-                        if isinstance(result, Exception):
-                            traceback_str = "".join(traceback.format_exception(type(result), result, result.__traceback__))
-                            self.log("Top-level slide processing exception", slide_number=self.slides_info[i]['number'], error=str(result), traceback=traceback_str)
-                            error_analysis = {
-                                'slide_info': self.slides_info[i],
-                                'visual_elements': [],
-                                'background_path': None,
-                                'text_elements': [],
-                                'error': str(result)
-                            }
-                            processed_analyses.append(error_analysis)
-                        else:
-                            processed_analyses.append(result)
-                    
-                    all_slide_analyses = processed_analyses
-                    
-                finally:
-                    await browser.close()
-                    self.log("Chromium browser closed")
+                    self.log("Slide processing completed", requested=len(slides_to_render))
+            
+            # Handle any top-level exceptions
+            rendered_analyses = {}
+            for slide_info, result in zip(slides_to_render, slide_analyses):
+                if isinstance(result, Exception):
+                    traceback_str = "".join(traceback.format_exception(type(result), result, result.__traceback__))
+                    self.log("Top-level slide processing exception", slide_number=slide_info['number'], error=str(result), traceback=traceback_str)
+                    result = {
+                        'slide_info': slide_info,
+                        'visual_elements': [],
+                        'background_path': None,
+                        'text_elements': [],
+                        'error': str(result)
+                    }
+                rendered_analyses[slide_info['number']] = result
+            
+            all_slide_analyses = [
+                cached_analyses.get(slide_info['number']) or rendered_analyses[slide_info['number']]
+                for slide_info in self.slides_info
+            ]
             
             # Build PPTX presentation
             # Create new PowerPoint presentation
@@ -10,6 +10,7 @@ from html_to_pdf_router import router as pdf_router
 from visual_html_editor_router import router as editor_router
 from html_to_pptx_router import router as pptx_router
 from html_to_docx_router import router as docx_router
+from browser_pool import browser_pool
 
 # Ensure we're serving from the /workspace directory
 workspace_dir = "/workspace"
@@ -31,6 +32,10 @@ async def add_daytona_skip_header(request: Request, call_next):
     response.headers["X-Daytona-Skip-Preview-Warning"] = "true"
     return response
 
+@app.on_event("shutdown")
+async def close_browser_pool():
+    await browser_pool.close()
+
 # Include routers
 app.include_router(pdf_router)
 app.include_router(editor_router)
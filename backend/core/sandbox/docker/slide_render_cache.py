@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of rendered slides for the presentation export routers.
+
+Each entry is a directory holding whatever a router produced for one slide (a
+one-page PDF, or the screenshots and extracted text of a PPTX slide). Entries
+are keyed by a hash of the slide HTML, the local files it references (by size
+and modification time), the viewport and a renderer tag, so exporting a deck
+again only renders the slides that changed. Remote resources (fonts and
+scripts from a CDN) are not part of the key.
+
+The cache is bounded by SLIDE_RENDER_CACHE_MAX_MB; least recently used
+entries are removed first.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+# src="..." / href="..." attributes and url(...) in inline styles
+_REFERENCE_PATTERN = re.compile(r"""(?:\b(?:src|href)\s*=\s*["']([^"']+)["'])|(?:url\(\s*["']?([^"')]+)["']?\s*\))""", re.IGNORECASE)
+_REMOTE_PREFIXES = ('http:', 'https:', 'data:', 'mailto:', 'javascript:', 'blob:', '//', '#')
+
+
+def _local_references(html: str, base_dir: Path):
+    for match in _REFERENCE_PATTERN.finditer(html):
+        reference = (match.group(1) or match.group(2) or '').strip()
+        if not reference or reference.lower().startswith(_REMOTE_PREFIXES):
+            continue
+        reference = reference.split('#', 1)[0].split('?', 1)[0]
+        if reference.startswith('file://'):
+            reference = reference[len('file://'):]
+        if reference:
+            yield reference, (base_dir / reference)
+
+
+class SlideRenderCache:
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, renderer: str, html_path: Path, viewport: Dict[str, int]) -> str:
+        html_bytes = Path(html_path).read_bytes()
+        digest = hashlib.sha256()
+        digest.update(f"{renderer}|{viewport['width']}x{viewport['height']}|".encode())
+        digest.update(html_bytes)
+
+        base_dir = Path(html_path).parent
+        for reference, path in sorted(set(_local_references(html_bytes.decode('utf-8', errors='replace'), base_dir))):
+            try:
+                stat = path.stat()
+                digest.update(f"|{reference}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+            except OSError:
+                digest.update(f"|{reference}:missing".encode())
+        return digest.hexdigest()
+
+    def get(self, key: str, dest_dir: Path) -> Optional[Path]:
+        """Copy the entry for ``key`` to ``dest_dir`` and return it, or None on a miss."""
+        entry = self.root / key
+        try:
+            shutil.copytree(entry, dest_dir)
+            os.utime(entry)
+        except (FileNotFoundError, NotADirectoryError):
+            self.misses += 1
+            return None
+        except OSError as e:
+            # e.g. evicted while we were copying it
+            print(f"Slide render cache read failed for {key}: {e}")
+            shutil.rmtree(dest_dir, ignore_errors=True)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dest_dir
+
+    def put(self, key: str, src_dir: Path) -> None:
+        """Store a copy of ``src_dir`` as the entry for ``key``."""
+        entry = self.root / key
+        if entry.exists():
+            return
+        staging = self.root / f".{key}.{uuid.uuid4().hex}"
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            shutil.copytree(src_dir, staging)
+            os.replace(staging, entry)
+        except OSError as e:
+            # Another export stored the same slide first, or the disk is full
+            shutil.rmtree(staging, ignore_errors=True)
+            if not entry.exists():
+                print(f"Slide render cache write failed for {key}: {e}")
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            if entry.name.startswith('.') or not entry.is_dir():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in entry.rglob('*') if f.is_file())
+                entries.append((entry.stat().st_mtime, size, entry))
+                total += size
+            except OSError:
+                continue
+        if total <= self.max_bytes:
+            return
+        for _, size, entry in sorted(entries):
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+render_cache = SlideRenderCache(
+    root=Path(os.getenv("SLIDE_RENDER_CACHE_DIR", "slide_render_cache")),
+    max_bytes=int(os.getenv("SLIDE_RENDER_CACHE_MAX_MB", "512")) * 1024 * 1024,
+)
@@ -0,0 +1,237 @@
+"""
+Write-back store for the files and JSON indexes of the presentation and docs tools.
+
+Both tools kept their state in JSON files in the sandbox (a metadata file per
+presentation, ``presentations/.metadata.json``, ``docs/.metadata.json``) and
+on every slide or document operation created directories, uploaded the file,
+then downloaded, rewrote and re-uploaded the JSON: a 15-slide deck meant over a
+hundred round trips to the sandbox.
+
+A ``SandboxDocumentStore`` lives for one tool instance (one agent run):
+
+- each JSON file is downloaded once per tool call and then edited in memory;
+  ``refresh()``, called at the start of every tool call, drops the cached
+  copies because the files may have been edited since without going through
+  a store (by the files tool, the shell or the frontend editor),
+- files and changed JSON are written together by ``flush()``, in one
+  ``fs.upload_files`` call, which the tools run once at the end of a call,
+- JSON files carry a ``store_version`` that is also recorded in Redis once
+  the file is written. A flush first takes a leased claim on each JSON file it
+  writes; when the recorded version moved since the file was read, the file
+  is downloaded again and this run's changes are replayed on top of it, so
+  concurrent edits of the same index are merged instead of clobbered. The
+  lease outlives the upload timeout, so a claim is only taken over once its
+  writer can no longer be writing.
+
+Uploads create missing parent directories, so no directories are made.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from daytona_sdk import FileUpload
+
+from core.services import redis
+from core.utils.logger import logger
+
+VERSION_FIELD = "store_version"
+VERSION_CACHE_KEY = "sandbox_document_version:{sandbox_id}:{path}"
+VERSION_CACHE_TTL = 3600 * 24 * 7
+CLAIM_KEY = "sandbox_document_claim:{sandbox_id}:{path}"
+UPLOAD_TIMEOUT_SECONDS = 120
+CLAIM_LEASE_SECONDS = UPLOAD_TIMEOUT_SECONDS + 30
+CLAIM_WAIT_SECONDS = 5.0
+
+Change = Callable[[Dict[str, Any]], None]
+
+
+class DocumentConflictError(Exception):
+    """Another writer held a JSON file for longer than a flush is willing to wait."""
+
+
+@dataclass
+class _JsonDocument:
+    data: Optional[Dict[str, Any]]  # None while the file does not exist
+    version: Optional[str]  # store_version of the copy the changes apply to
+    default: Callable[[], Dict[str, Any]] = dict
+    changes: List[Change] = field(default_factory=list)
+    stale: bool = False  # the file may have changed since it was read
+
+
+class SandboxDocumentStore:
+    """Per-run cache of sandbox JSON indexes plus a batch of pending file writes."""
+
+    def __init__(self, tool):
+        self.tool = tool
+        self._documents: Dict[str, _JsonDocument] = {}
+        self._files: Dict[str, bytes] = {}
+        self._lock = asyncio.Lock()
+        self.round_trips = 0
+
+    async def _sandbox(self):
+        await self.tool._ensure_sandbox()
+        return self.tool.sandbox
+
+    async def _download_json(self, path: str) -> Optional[Dict[str, Any]]:
+        sandbox = await self._sandbox()
+        self.round_trips += 1
+        try:
+            raw = await sandbox.fs.download_file(path)
+        except Exception:
+            return None
+        try:
+            return json.loads(raw.decode())
+        except ValueError:
+            logger.warning(f"Ignoring unreadable JSON file {path}")
+            return None
+
+    async def read_json(self, path: str) -> Optional[Dict[str, Any]]:
+        """Current content of a JSON file (including unflushed changes), None if it does not exist.
+
+        The returned dict is the store's own copy: change it through ``update_json``.
+        """
+        document = self._documents.get(path)
+        if document is None:
+            data = await self._download_json(path)
+            document = _JsonDocument(data, (data or {}).get(VERSION_FIELD))
+            self._documents[path] = document
+        elif document.stale:
+            await self._rebase(path, document)
+        return document.data
+
+    async def update_json(self, path: str, change: Change, default: Callable[[], Dict[str, Any]] = dict) -> Dict[str, Any]:
+        """Apply ``change`` to a JSON file (created from ``default()`` if missing) and schedule its write.
+
+        ``change`` may run again on a newer copy of the file if another writer
+        changed it first, so it must only set what this caller means to set.
+        """
+        await self.read_json(path)
+        document = self._documents[path]
+        document.default = default
+        if document.data is None:
+            document.data = default()
+        change(document.data)
+        document.changes.append(change)
+        return document.data
+
+    def write_file(self, path: str, content: bytes) -> None:
+        """Schedule a file write for the next flush."""
+        self._files[path] = content
+
+    def read_pending(self, path: str) -> Optional[bytes]:
+        """Content of a file written since the last flush, if any."""
+        return self._files.get(path)
+
+    def forget(self, path: str) -> None:
+        """Drop pending writes and cached content of a file or directory deleted from the sandbox."""
+        def under(candidate: str) -> bool:
+            return candidate == path or candidate.startswith(path.rstrip("/") + "/")
+
+        self._files = {name: content for name, content in self._files.items() if not under(name)}
+        self._documents = {name: document for name, document in self._documents.items() if not under(name)}
+
+    def refresh(self) -> None:
+        """Stop trusting cached JSON: the next read downloads the file again.
+
+        Copies with unflushed changes (left by a failed flush) are kept, and
+        their changes are replayed on the reloaded file.
+        """
+        self._documents = {path: document for path, document in self._documents.items() if document.changes}
+        for document in self._documents.values():
+            document.stale = True
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._files) or any(document.changes for document in self._documents.values())
+
+    def _version_key(self, path: str) -> str:
+        return VERSION_CACHE_KEY.format(sandbox_id=self.tool.sandbox_id, path=path)
+
+    def _claim_key(self, path: str) -> str:
+        return CLAIM_KEY.format(sandbox_id=self.tool.sandbox_id, path=path)
+
+    async def _acquire_claim(self, path: str, version: str) -> None:
+        """Claim ``path`` for this flush, waiting a little for another writer's claim to end or expire."""
+        deadline = time.monotonic() + CLAIM_WAIT_SECONDS
+        delay = 0.05
+        while True:
+            try:
+                if await redis.compare_and_set(self._claim_key(path), None, version, CLAIM_LEASE_SECONDS):
+                    return
+            except Exception as e:
+                logger.warning(f"Failed to claim {path}, writing it anyway: {e}")
+                return
+            if time.monotonic() >= deadline:
+                raise DocumentConflictError(f"{path} is being written by another writer")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+
+    async def _release_claims(self, claimed: List[tuple]) -> None:
+        for path, _, version in claimed:
+            try:
+                await redis.compare_and_delete(self._claim_key(path), version)
+            except Exception as e:
+                logger.warning(f"Failed to release claim on {path}: {e}")
+
+    async def _written_version(self, path: str) -> Optional[str]:
+        try:
+            return await redis.get(self._version_key(path))
+        except Exception as e:
+            logger.warning(f"Failed to check version of {path}, writing it anyway: {e}")
+            return None
+
+    async def _rebase(self, path: str, document: _JsonDocument) -> None:
+        """Reload a JSON file written by someone else and replay this run's changes on it."""
+        data = await self._download_json(path)
+        document.version = (data or {}).get(VERSION_FIELD)
+        document.data = data if data is not None else document.default()
+        document.stale = False
+        for change in document.changes:
+            change(document.data)
+
+    async def flush(self) -> None:
+        """Write pending files and changed JSON files in one upload."""
+        async with self._lock:
+            if not self.dirty:
+                return
+            uploads = [FileUpload(content, path) for path, content in self._files.items()]
+            claimed = []
+            try:
+                for path, document in self._documents.items():
+                    if not document.changes:
+                        continue
+                    version = uuid.uuid4().hex
+                    await self._acquire_claim(path, version)
+                    claimed.append((path, document, version))
+                    if document.stale or await self._written_version(path) not in (None, document.version):
+                        logger.debug(f"{path} was changed by another writer, replaying {len(document.changes)} changes")
+                        await self._rebase(path, document)
+                    document.data[VERSION_FIELD] = version
+                    payload = json.dumps(document.data, indent=2, ensure_ascii=False)
+                    uploads.append(FileUpload(payload.encode("utf-8"), path))
+
+                sandbox = await self._sandbox()
+                self.round_trips += 1
+                async with asyncio.timeout(UPLOAD_TIMEOUT_SECONDS):
+                    await sandbox.fs.upload_files(uploads)
+            except TimeoutError:
+                # The upload may still land: keep the claims until their lease runs out
+                logger.warning(f"Upload of {len(uploads)} files timed out; leaving their claims to expire")
+                raise
+            except BaseException:
+                await self._release_claims(claimed)
+                raise
+
+            self._files.clear()
+            for path, document, version in claimed:
+                try:
+                    await redis.set(self._version_key(path), version, ex=VERSION_CACHE_TTL)
+                except Exception as e:
+                    logger.warning(f"Failed to record version of {path}: {e}")
+                document.version = version
+                document.changes.clear()
+            await self._release_claims(claimed)
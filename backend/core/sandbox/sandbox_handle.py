@@ -0,0 +1,181 @@
+"""
+Per-run shared sandbox handles.
+
+Every sandbox tool used to resolve its own sandbox: read the ``projects`` row,
+then ``get_or_start_sandbox`` (a Daytona API round trip) on its first call, and
+parallel tool calls on a project without a sandbox could each create one. A
+``SandboxHandle`` resolves the project's sandbox once per agent run behind a
+lock (single flight) and is shared by all tools registered on the same
+``ThreadManager``. Preview links are cached on the handle as well.
+"""
+
+import asyncio
+import uuid
+import weakref
+from typing import Any, Dict, Optional
+
+from daytona_sdk import AsyncSandbox
+
+from core.sandbox.proxy import PreviewLinkInfo, ensure_custom_domain_metadata
+from core.sandbox.sandbox import (
+    create_sandbox,
+    delete_sandbox,
+    get_or_start_sandbox,
+    get_preview_link_info,
+)
+from core.utils.config import config
+from core.utils.logger import logger
+
+
+class SandboxHandle:
+    """Lazily resolved sandbox for one project, shared for the lifetime of a run."""
+
+    def __init__(self, project_id: str, db):
+        self.project_id = project_id
+        self.db = db
+        self.sandbox: Optional[AsyncSandbox] = None
+        self.sandbox_id: Optional[str] = None
+        self.sandbox_pass: Optional[str] = None
+        self._sandbox_info: Optional[Dict[str, Any]] = None
+        self._preview_links: Dict[int, PreviewLinkInfo] = {}
+        self._lock = asyncio.Lock()
+
+    def prime(self, sandbox_info: Optional[Dict[str, Any]]) -> None:
+        """Seed the handle with the project's ``sandbox`` column to skip re-reading it."""
+        if self._sandbox_info is None and sandbox_info is not None:
+            self._sandbox_info = dict(sandbox_info)
+
+    async def ensure(self) -> AsyncSandbox:
+        """Return the project's sandbox, starting or creating it at most once."""
+        if self.sandbox is not None:
+            return self.sandbox
+        async with self._lock:
+            if self.sandbox is None:
+                await self._resolve(create=True)
+        return self.sandbox
+
+    async def prewarm(self) -> None:
+        """Start an existing sandbox ahead of the first tool call; never creates one."""
+        if self.sandbox is not None:
+            return
+        try:
+            async with self._lock:
+                if self.sandbox is None:
+                    await self._resolve(create=False)
+        except Exception as e:
+            logger.warning(f"Sandbox prewarm failed for project {self.project_id}: {str(e)}")
+
+    async def get_preview_link(self, port: int) -> PreviewLinkInfo:
+        cached = self._preview_links.get(port)
+        if cached is not None:
+            return cached
+        sandbox = await self.ensure()
+        info = await get_preview_link_info(sandbox, port)
+        self._preview_links[port] = info
+        return info
+
+    async def _resolve(self, create: bool) -> None:
+        client = await self.db.client
+        sandbox_info = self._sandbox_info
+        if sandbox_info is None:
+            project = await client.table('projects').select('sandbox').eq('project_id', self.project_id).execute()
+            if not project.data or len(project.data) == 0:
+                raise ValueError(f"Project {self.project_id} not found")
+            sandbox_info = project.data[0].get('sandbox') or {}
+            self._sandbox_info = sandbox_info
+
+        if sandbox_info.get('id'):
+            self.sandbox_id = sandbox_info['id']
+            self.sandbox_pass = sandbox_info.get('pass')
+            self.sandbox = await get_or_start_sandbox(self.sandbox_id)
+            await self._sync_custom_domain(client, sandbox_info)
+        elif create:
+            await self._create(client)
+
+    async def _create(self, client) -> None:
+        logger.debug(f"No sandbox recorded for project {self.project_id}; creating lazily")
+        sandbox_pass = str(uuid.uuid4())
+        sandbox_obj = await create_sandbox(sandbox_pass, self.project_id)
+        sandbox_id = sandbox_obj.id
+
+        # Wait 5 seconds for services to start up
+        logger.info(f"Waiting 5 seconds for sandbox {sandbox_id} services to initialize...")
+        await asyncio.sleep(5)
+
+        # Gather preview links and token (best-effort parsing)
+        try:
+            vnc_info, website_info = await asyncio.gather(
+                get_preview_link_info(sandbox_obj, 6080),
+                get_preview_link_info(sandbox_obj, 8080),
+            )
+            self._preview_links[6080] = vnc_info
+            self._preview_links[8080] = website_info
+            vnc_url = vnc_info.url
+            website_url = website_info.url
+            token = vnc_info.token
+        except Exception:
+            # If preview link extraction fails, still proceed but leave fields None
+            logger.warning(f"Failed to extract preview links for sandbox {sandbox_id}", exc_info=True)
+            vnc_url = None
+            website_url = None
+            token = None
+
+        sandbox_info = {
+            'id': sandbox_id,
+            'pass': sandbox_pass,
+            'vnc_preview': vnc_url,
+            'sandbox_url': website_url,
+            'token': token
+        }
+        update_result = await client.table('projects').update({'sandbox': sandbox_info}).eq(
+            'project_id', self.project_id
+        ).execute()
+
+        if not update_result.data:
+            # Cleanup created sandbox if DB update failed
+            try:
+                await delete_sandbox(sandbox_id)
+            except Exception:
+                logger.error(f"Failed to delete sandbox {sandbox_id} after DB update failure", exc_info=True)
+            raise Exception("Database update failed when storing sandbox metadata")
+
+        self._sandbox_info = sandbox_info
+        self.sandbox_id = sandbox_id
+        self.sandbox_pass = sandbox_pass
+        self.sandbox = await get_or_start_sandbox(sandbox_id)
+
+    async def _sync_custom_domain(self, client, sandbox_info: Dict[str, Any]) -> None:
+        # If a custom proxy domain is configured, make sure stored URLs match it
+        if not config.SANDBOX_PROXY_DOMAIN:
+            return
+        updated_info, changed = ensure_custom_domain_metadata(sandbox_info)
+        if not changed:
+            return
+        try:
+            await client.table('projects').update({'sandbox': updated_info}).eq(
+                'project_id', self.project_id
+            ).execute()
+            self._sandbox_info = updated_info
+        except Exception as exc:
+            logger.warning(
+                "Failed to persist custom sandbox URLs for project %s: %s",
+                self.project_id,
+                exc,
+            )
+
+
+_handles: "weakref.WeakKeyDictionary[Any, Dict[str, SandboxHandle]]" = weakref.WeakKeyDictionary()
+
+
+def get_sandbox_handle(thread_manager, project_id: str) -> SandboxHandle:
+    """Return the handle for ``project_id`` shared by every tool of this run.
+
+    Handles are keyed by the run's ``ThreadManager`` so they live exactly as
+    long as the run does.
+    """
+    per_run = _handles.setdefault(thread_manager, {})
+    handle = per_run.get(project_id)
+    if handle is None:
+        handle = SandboxHandle(project_id, thread_manager.db)
+        per_run[project_id] = handle
+    return handle
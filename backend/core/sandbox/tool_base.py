@@ -1,20 +1,12 @@
 from typing import Optional
-import uuid
-import asyncio
 
 from core.agentpress.thread_manager import ThreadManager
 from core.agentpress.tool import Tool
 from daytona_sdk import AsyncSandbox
-from core.sandbox.sandbox import (
-    get_or_start_sandbox,
-    create_sandbox,
-    delete_sandbox,
-    get_preview_link_info,
-)
+from core.sandbox.proxy import PreviewLinkInfo
+from core.sandbox.sandbox_handle import get_sandbox_handle
 from core.utils.logger import logger
 from core.utils.files_utils import clean_path
-from core.utils.config import config
-from core.sandbox.proxy import ensure_custom_domain_metadata
 
 class SandboxToolsBase(Tool):
     """Base class for all sandbox tools that provides project-based sandbox access."""
@@ -34,97 +26,26 @@ class SandboxToolsBase(Tool):
     async def _ensure_sandbox(self) -> AsyncSandbox:
         """Ensure we have a valid sandbox instance, retrieving it from the project if needed.
 
-        If the project does not yet have a sandbox, create it lazily and persist
-        the metadata to the `projects` table so subsequent calls can reuse it.
+        The sandbox is resolved through the run's shared ``SandboxHandle``, so
+        all sandbox tools of a run reuse one lookup (and at most one lazy
+        creation) instead of each tool fetching the project and sandbox itself.
         """
         if self._sandbox is None:
             try:
-                # Get database client
-                client = await self.thread_manager.db.client
-
-                # Get project data
-                project = await client.table('projects').select('*').eq('project_id', self.project_id).execute()
-                if not project.data or len(project.data) == 0:
-                    raise ValueError(f"Project {self.project_id} not found")
-
-                project_data = project.data[0]
-                sandbox_info = project_data.get('sandbox') or {}
-
-                # If there is no sandbox recorded for this project, create one lazily
-                if not sandbox_info.get('id'):
-                    logger.debug(f"No sandbox recorded for project {self.project_id}; creating lazily")
-                    sandbox_pass = str(uuid.uuid4())
-                    sandbox_obj = await create_sandbox(sandbox_pass, self.project_id)
-                    sandbox_id = sandbox_obj.id
-                    
-                    # Wait 5 seconds for services to start up
-                    logger.info(f"Waiting 5 seconds for sandbox {sandbox_id} services to initialize...")
-                    await asyncio.sleep(5)
-                    
-                    # Gather preview links and token (best-effort parsing)
-                    try:
-                        vnc_info = await get_preview_link_info(sandbox_obj, 6080)
-                        website_info = await get_preview_link_info(sandbox_obj, 8080)
-                        vnc_url = vnc_info.url
-                        website_url = website_info.url
-                        token = vnc_info.token
-                    except Exception:
-                        # If preview link extraction fails, still proceed but leave fields None
-                        logger.warning(f"Failed to extract preview links for sandbox {sandbox_id}", exc_info=True)
-                        vnc_url = None
-                        website_url = None
-                        token = None
-
-                    # Persist sandbox metadata to project record
-                    update_result = await client.table('projects').update({
-                        'sandbox': {
-                            'id': sandbox_id,
-                            'pass': sandbox_pass,
-                            'vnc_preview': vnc_url,
-                            'sandbox_url': website_url,
-                            'token': token
-                        }
-                    }).eq('project_id', self.project_id).execute()
-
-                    if not update_result.data:
-                        # Cleanup created sandbox if DB update failed
-                        try:
-                            await delete_sandbox(sandbox_id)
-                        except Exception:
-                            logger.error(f"Failed to delete sandbox {sandbox_id} after DB update failure", exc_info=True)
-                        raise Exception("Database update failed when storing sandbox metadata")
-
-                    # Store local metadata and ensure sandbox is ready
-                    self._sandbox_id = sandbox_id
-                    self._sandbox_pass = sandbox_pass
-                    self._sandbox = await get_or_start_sandbox(self._sandbox_id)
-                else:
-                    # Use existing sandbox metadata
-                    self._sandbox_id = sandbox_info['id']
-                    self._sandbox_pass = sandbox_info.get('pass')
-                    self._sandbox = await get_or_start_sandbox(self._sandbox_id)
-
-                    # If a custom proxy domain is configured, make sure stored URLs match it
-                    if config.SANDBOX_PROXY_DOMAIN:
-                        updated_info, changed = ensure_custom_domain_metadata(sandbox_info)
-                        if changed:
-                            try:
-                                await client.table('projects').update({'sandbox': updated_info}).eq(
-                                    'project_id', self.project_id
-                                ).execute()
-                            except Exception as exc:
-                                logger.warning(
-                                    "Failed to persist custom sandbox URLs for project %s: %s",
-                                    self.project_id,
-                                    exc,
-                                )
-                            sandbox_info = updated_info
+                handle = get_sandbox_handle(self.thread_manager, self.project_id)
+                self._sandbox = await handle.ensure()
+                self._sandbox_id = handle.sandbox_id
+                self._sandbox_pass = handle.sandbox_pass
             except Exception as e:
                 logger.error(f"Error retrieving/creating sandbox for project {self.project_id}: {str(e)}")
                 raise e
 
         return self._sandbox
 
+    async def _get_preview_link(self, port: int) -> PreviewLinkInfo:
+        """Preview link for a sandbox port, cached for the rest of the run."""
+        return await get_sandbox_handle(self.thread_manager, self.project_id).get_preview_link(port)
+
     @property
     def sandbox(self) -> AsyncSandbox:
         """Get the sandbox instance, ensuring it exists."""
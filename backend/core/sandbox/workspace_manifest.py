@@ -0,0 +1,268 @@
+"""
+Workspace manifests: what is in a sandbox's /workspace, and what changed.
+
+``SandboxFilesTool.get_workspace_state`` used to list the workspace and
+download every file to build its state, so each call moved the whole tree out
+of the sandbox. A manifest is now built inside the sandbox by one
+``process.exec`` of a small Python script: size, mtime and SHA-256 of every
+file the file tools do not exclude. The script keeps a stamp file in the
+sandbox, so only files whose size or mtime changed are hashed again.
+
+The backend keeps the latest manifest of each project in Redis (shared by
+workers) under a revision number, with the paths added, modified and deleted
+in recent revisions, so agents and the frontend can ask what changed since
+revision N. File contents are fetched only for hashes this process has not
+read before and are cached by hash.
+"""
+
+import asyncio
+import json
+import shlex
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from core.services import redis
+from core.utils.files_utils import EXCLUDED_DIRS, EXCLUDED_EXT, EXCLUDED_FILES
+from core.utils.logger import logger
+
+MANIFEST_CACHE_KEY = "workspace_manifest:{project_id}"
+MANIFEST_CACHE_TTL = 3600 * 24 * 7
+MANIFEST_HISTORY = 100  # revisions whose changes are kept
+STAMPS_PATH = "/tmp/.workspace_manifest_stamps.json"
+DOWNLOAD_CONCURRENCY = 8
+
+# Runs in the sandbox: prints {path: [size, mtime, sha256]} for the files under
+# argv[1], skipping what should_exclude_file() excludes. Digests are reused
+# from the stamp file at argv[2] while a file's size and mtime are unchanged.
+MANIFEST_SCRIPT = r"""
+import hashlib, json, os, sys
+root, stamps_path = sys.argv[1], sys.argv[2]
+rules = json.loads(os.environ["WORKSPACE_MANIFEST_RULES"])
+excluded_files, excluded_dirs, excluded_ext = set(rules["files"]), rules["dirs"], set(rules["ext"])
+try:
+    with open(stamps_path) as f:
+        stamps = json.load(f)
+except Exception:
+    stamps = {}
+files, fresh = {}, {}
+for directory, dirs, names in os.walk(root):
+    rel_dir = os.path.relpath(directory, root)
+    rel_dir = "" if rel_dir == "." else rel_dir
+    if any(excluded in rel_dir for excluded in excluded_dirs):
+        dirs[:] = []
+        continue
+    for name in names:
+        if name in excluded_files or os.path.splitext(name)[1].lower() in excluded_ext:
+            continue
+        path = os.path.join(directory, name)
+        rel_path = os.path.join(rel_dir, name)
+        try:
+            st = os.stat(path)
+            if not os.path.isfile(path):
+                continue
+            stamp = stamps.get(rel_path)
+            if stamp and stamp[0] == st.st_size and stamp[1] == st.st_mtime_ns:
+                digest = stamp[2]
+            else:
+                h = hashlib.sha256()
+                with open(path, "rb") as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b""):
+                        h.update(chunk)
+                digest = h.hexdigest()
+        except OSError:
+            continue
+        files[rel_path] = [st.st_size, st.st_mtime, digest]
+        fresh[rel_path] = [st.st_size, st.st_mtime_ns, digest]
+try:
+    with open(stamps_path + ".tmp", "w") as f:
+        json.dump(fresh, f)
+    os.replace(stamps_path + ".tmp", stamps_path)
+except OSError:
+    pass
+json.dump(files, sys.stdout)
+"""
+
+MANIFEST_RULES = json.dumps({
+    "files": sorted(EXCLUDED_FILES),
+    "dirs": sorted(EXCLUDED_DIRS),
+    "ext": sorted(EXCLUDED_EXT),
+})
+
+
+@dataclass
+class WorkspaceManifest:
+    """Files of a workspace at one revision: ``{path: [size, mtime, sha256]}``."""
+    revision: int = 0
+    files: Dict[str, List[Any]] = field(default_factory=dict)
+    # [revision, added, modified, deleted] for the most recent revisions, oldest first
+    history: List[List[Any]] = field(default_factory=list)
+
+    def entry(self, path: str) -> Dict[str, Any]:
+        size, mtime, digest = self.files[path]
+        return {
+            "path": path,
+            "size": size,
+            "modified": datetime.fromtimestamp(mtime, timezone.utc).isoformat(),
+            "hash": digest,
+        }
+
+
+@dataclass
+class ManifestChanges:
+    revision: int
+    since: int
+    added: List[str]
+    modified: List[str]
+    deleted: List[str]
+    # False when ``since`` is older than the kept history: every file is then listed as added
+    complete: bool = True
+
+
+def diff_files(old: Dict[str, List[Any]], new: Dict[str, List[Any]]) -> tuple:
+    """Return ``(added, modified, deleted)`` paths between two file maps, compared by hash."""
+    added = sorted(path for path in new if path not in old)
+    modified = sorted(path for path in new if path in old and old[path][2] != new[path][2])
+    deleted = sorted(path for path in old if path not in new)
+    return added, modified, deleted
+
+
+def changes_since(manifest: WorkspaceManifest, since: int) -> ManifestChanges:
+    """Changes from revision ``since`` to the manifest's revision, from the kept history.
+
+    A ``since`` newer than the manifest (e.g. after the stored manifest
+    expired) is answered like one older than the history: with every file.
+    """
+    if since == manifest.revision:
+        return ManifestChanges(manifest.revision, since, [], [], [])
+    revisions = [entry for entry in manifest.history if entry[0] > since]
+    if not 0 <= since < manifest.revision or not revisions or revisions[0][0] != since + 1:
+        return ManifestChanges(manifest.revision, since, sorted(manifest.files), [], [], complete=False)
+
+    existed: Dict[str, bool] = {}  # whether each changed path existed at ``since``
+    for _, added, modified, deleted in revisions:
+        for path in added:
+            existed.setdefault(path, False)
+        for path in (*modified, *deleted):
+            existed.setdefault(path, True)
+    added, modified, deleted = [], [], []
+    for path, existed_before in sorted(existed.items()):
+        exists = path in manifest.files
+        if exists and not existed_before:
+            added.append(path)
+        elif exists:
+            modified.append(path)
+        elif existed_before:
+            deleted.append(path)
+    return ManifestChanges(manifest.revision, since, added, modified, deleted)
+
+
+class WorkspaceManifests:
+    """Per-project workspace manifests and a process cache of file contents by hash."""
+
+    def __init__(self, max_content_bytes: int = 64 * 1024 * 1024):
+        self.max_content_bytes = max_content_bytes
+        self._contents: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._content_bytes = 0
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.downloads = 0
+
+    def _lock(self, project_id: str) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Locks belong to the loop that first used them
+            self._locks = {}
+            self._loop = loop
+        return self._locks.setdefault(project_id, asyncio.Lock())
+
+    async def load(self, project_id: str) -> WorkspaceManifest:
+        """The last stored manifest of a project (revision 0 and no files if there is none)."""
+        try:
+            cached = await redis.get(MANIFEST_CACHE_KEY.format(project_id=project_id))
+            if cached:
+                return WorkspaceManifest(**json.loads(cached))
+        except Exception as e:
+            logger.warning(f"Failed to read workspace manifest of project {project_id}: {e}")
+        return WorkspaceManifest()
+
+    async def _save(self, project_id: str, manifest: WorkspaceManifest) -> None:
+        try:
+            value = json.dumps({"revision": manifest.revision, "files": manifest.files, "history": manifest.history})
+            await redis.set(MANIFEST_CACHE_KEY.format(project_id=project_id), value, ex=MANIFEST_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Failed to write workspace manifest of project {project_id}: {e}")
+
+    async def scan(self, sandbox, root: str) -> Dict[str, List[Any]]:
+        """List the workspace inside the sandbox: ``{path: [size, mtime, sha256]}``."""
+        response = await sandbox.process.exec(
+            f'python3 -c "$WORKSPACE_MANIFEST_SCRIPT" {shlex.quote(root)} {STAMPS_PATH}',
+            env={"WORKSPACE_MANIFEST_SCRIPT": MANIFEST_SCRIPT, "WORKSPACE_MANIFEST_RULES": MANIFEST_RULES},
+            timeout=120,
+        )
+        if response.exit_code != 0:
+            raise RuntimeError(f"Workspace listing failed with exit code {response.exit_code}: {response.result[-500:]}")
+        return json.loads(response.result)
+
+    async def refresh(self, project_id: str, sandbox, root: str = "/workspace") -> WorkspaceManifest:
+        """Scan the workspace and store it as a new revision if anything changed."""
+        async with self._lock(project_id):
+            files = await self.scan(sandbox, root)
+            manifest = await self.load(project_id)
+            added, modified, deleted = diff_files(manifest.files, files)
+            if manifest.revision and not (added or modified or deleted):
+                return manifest
+            manifest.revision += 1
+            manifest.files = files
+            manifest.history = (manifest.history + [[manifest.revision, added, modified, deleted]])[-MANIFEST_HISTORY:]
+            await self._save(project_id, manifest)
+            return manifest
+
+    async def read_contents(self, sandbox, root: str, manifest: WorkspaceManifest, paths: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Text contents of ``paths`` (None for binary files), downloading only unseen hashes.
+
+        Files that cannot be downloaded are left out.
+        """
+        texts: Dict[str, Optional[str]] = {}  # hash -> content
+        missing: Dict[str, str] = {}  # hash -> a path to download it from
+        paths = list(paths)
+        for path in paths:
+            digest = manifest.files[path][2]
+            if digest in self._contents:
+                self._contents.move_to_end(digest)
+                texts[digest] = self._contents[digest]
+            else:
+                missing.setdefault(digest, path)
+
+        semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+
+        async def download(digest: str, path: str) -> None:
+            async with semaphore:
+                try:
+                    data = await sandbox.fs.download_file(f"{root}/{path}")
+                except Exception as e:
+                    logger.warning(f"Error reading file {path}: {e}")
+                    return
+            self.downloads += 1
+            try:
+                texts[digest] = data.decode()
+            except UnicodeDecodeError:
+                logger.debug(f"Skipping binary file: {path}")
+                texts[digest] = None
+            self._remember(digest, texts[digest])
+
+        await asyncio.gather(*(download(digest, path) for digest, path in missing.items()))
+        return {path: texts[manifest.files[path][2]] for path in paths if manifest.files[path][2] in texts}
+
+    def _remember(self, digest: str, text: Optional[str]) -> None:
+        if digest in self._contents:
+            return
+        self._contents[digest] = text
+        self._content_bytes += len(text or "")
+        while self._content_bytes > self.max_content_bytes and len(self._contents) > 1:
+            _, evicted = self._contents.popitem(last=False)
+            self._content_bytes -= len(evicted or "")
+
+
+workspace_manifests = WorkspaceManifests()
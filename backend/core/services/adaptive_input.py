@@ -0,0 +1,95 @@
+"""
+Event-driven adaptive input detection for agent runs.
+
+``send_adaptive_input`` inserts a user message and publishes its id on
+``agent_run:{id}:adaptive_input``. The background worker is already subscribed
+to that channel and forwards each notification to the run's
+``AdaptiveInputMonitor``, so the agent loop can tell whether new input arrived
+without scanning the thread's message ids on every iteration.
+
+When input is pending, ``drain`` fetches only the announced rows (or, for
+notifications without an id, rows created after the last one seen) and records
+them in the thread manager's message cache, so the next ``run_thread`` call
+picks them up without re-reading the thread.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from core.utils.logger import logger
+
+ADAPTIVE_INPUT_COLUMNS = 'message_id, type, content, created_at, is_llm_message'
+FALLBACK_FETCH_LIMIT = 50
+
+# Payload published by older API instances that do not send the message id
+LEGACY_NOTIFICATION = "new_input"
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveInputMonitor:
+    """Tracks adaptive input announced for one agent run."""
+
+    def __init__(self, agent_run_id: str):
+        self.agent_run_id = agent_run_id
+        self._pending_ids: List[str] = []
+        self._pending_unknown = False
+        self._last_seen = datetime.now(timezone.utc)
+        self.received = 0
+
+    @property
+    def pending(self) -> bool:
+        return bool(self._pending_ids) or self._pending_unknown
+
+    def notify(self, payload: Any) -> None:
+        """Record a notification received on the run's adaptive input channel."""
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8')
+        self.received += 1
+        if isinstance(payload, str) and payload and payload != LEGACY_NOTIFICATION:
+            if payload not in self._pending_ids:
+                self._pending_ids.append(payload)
+        else:
+            self._pending_unknown = True
+
+    async def drain(self, client, thread_id: str, message_cache=None) -> List[Dict[str, Any]]:
+        """Fetch pending input messages and record them in ``message_cache``.
+
+        Returns the fetched rows; no query is issued when nothing is pending.
+        """
+        if not self.pending:
+            return []
+        message_ids, self._pending_ids = self._pending_ids, []
+        fetch_unknown, self._pending_unknown = self._pending_unknown, False
+
+        rows: List[Dict[str, Any]] = []
+        try:
+            if message_ids:
+                result = await client.table('messages').select(ADAPTIVE_INPUT_COLUMNS).eq('thread_id', thread_id).in_('message_id', message_ids).execute()
+                rows.extend(result.data or [])
+            if fetch_unknown:
+                result = await client.table('messages').select(ADAPTIVE_INPUT_COLUMNS).eq('thread_id', thread_id).eq('type', 'user').eq('is_llm_message', True).gt('created_at', self._last_seen.isoformat()).order('created_at').limit(FALLBACK_FETCH_LIMIT).execute()
+                known = {row['message_id'] for row in rows}
+                rows.extend(row for row in result.data or [] if row['message_id'] not in known)
+        except Exception as e:
+            # Leave the input pending so the next iteration retries the fetch
+            logger.warning(f"Failed to fetch adaptive input for agent run {self.agent_run_id}: {e}")
+            self._pending_ids = message_ids + self._pending_ids
+            self._pending_unknown = self._pending_unknown or fetch_unknown
+            return []
+
+        rows.sort(key=lambda row: row.get('created_at') or '')
+        for row in rows:
+            created_at = _parse_timestamp(row.get('created_at'))
+            if created_at and created_at > self._last_seen:
+                self._last_seen = created_at
+            if message_cache is not None:
+                message_cache.record_message(thread_id, row)
+        return rows
@@ -0,0 +1,296 @@
+"""
+Redis Streams transport for agent run responses.
+
+The background worker appends every response to ``agent_run:{id}:stream`` as a
+pre-serialized JSON payload (``XADD ... MAXLEN ~``). Viewers follow the stream
+with ``XREAD BLOCK`` from their last seen entry id and forward the payload
+untouched as an SSE frame whose ``id:`` is the stream id, so reconnecting
+clients resume from ``Last-Event-ID`` instead of replaying the whole run.
+
+Control signals (STOP / END_STREAM / ERROR) are written into the same stream,
+which lets a viewer wait on a single blocking read instead of a pubsub
+listener plus list range reads.
+
+The worker writes through ``ResponseStreamWriter``, which merges bursts of
+small content chunks and pipelines the resulting XADDs.
+
+``MAXLEN`` bounds a runaway run, but it means a very long run can be trimmed
+before a viewer reads it. A reader that starts before the oldest entry left
+in a trimmed stream replays the run's persisted messages instead, then
+follows the stream from its newest entry.
+"""
+
+import asyncio
+import json
+import re
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.services import redis
+from core.utils.logger import logger
+
+RESPONSE_STREAM_MAXLEN = 20_000
+RESPONSE_STREAM_TTL = 3600 * 24
+READ_BATCH_SIZE = 500
+READ_BLOCK_MS = 15_000
+
+CONTROL_SIGNALS = ("STOP", "END_STREAM", "ERROR")
+TERMINAL_STATUSES = ("completed", "failed", "stopped")
+
+_DATA_FIELD = "d"
+_CONTROL_FIELD = "c"
+_STREAM_ID_RE = re.compile(r"^\d+-\d+$")
+
+
+def response_stream_key(agent_run_id: str) -> str:
+    return f"agent_run:{agent_run_id}:stream"
+
+
+def normalize_last_event_id(value: Optional[str]) -> str:
+    """Return a valid stream id to resume after, or "0" to read from the start."""
+    if value and _STREAM_ID_RE.match(value.strip()):
+        return value.strip()
+    return "0"
+
+
+def format_sse(entry_id: Optional[str], data: str) -> str:
+    if entry_id is None:
+        return f"data: {data}\n\n"
+    return f"id: {entry_id}\ndata: {data}\n\n"
+
+
+def _parse_stream_id(entry_id: str) -> Tuple[int, int]:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+async def _trimmed_after(key: str, last_id: str) -> bool:
+    """Whether entries after ``last_id`` may have been trimmed from the stream."""
+    # Approximate trimming never takes a stream below MAXLEN, so a shorter one was never trimmed
+    if await redis.xlen(key) < RESPONSE_STREAM_MAXLEN:
+        return False
+    oldest = await redis.xrange(key, count=1)
+    return bool(oldest) and _parse_stream_id(oldest[0][0]) > _parse_stream_id(last_id)
+
+
+def _is_terminal_status(data: str) -> bool:
+    # Cheap substring test first so ordinary chunks are never JSON-decoded
+    if '"status"' not in data:
+        return False
+    try:
+        response = json.loads(data)
+    except (json.JSONDecodeError, TypeError):
+        return False
+    return response.get("type") == "status" and response.get("status") in TERMINAL_STATUSES
+
+
+async def append_response(agent_run_id: str, response: Dict[str, Any]) -> str:
+    """Serialize a response once and append it to the run's stream."""
+    return await redis.xadd(
+        response_stream_key(agent_run_id),
+        {_DATA_FIELD: json.dumps(response)},
+        maxlen=RESPONSE_STREAM_MAXLEN,
+    )
+
+
+async def append_control(agent_run_id: str, signal: str) -> str:
+    """Append a control signal so stream readers terminate."""
+    return await redis.xadd(
+        response_stream_key(agent_run_id),
+        {_CONTROL_FIELD: signal},
+        maxlen=RESPONSE_STREAM_MAXLEN,
+    )
+
+
+class ResponseStreamWriter:
+    """Writes one agent run's responses to its stream.
+
+    Consecutive content chunks (``stream_status: chunk``) from the same LLM
+    call are merged into a single event until ``coalesce_ms`` have passed since
+    the first one or ``coalesce_bytes`` of text have accumulated. The merged
+    event keeps the first chunk's ``sequence``, so clients that order chunks by
+    sequence are unaffected. Any other response closes the pending chunk and
+    is flushed immediately, which preserves ordering.
+
+    Flushes are serialized and use one pipelined round trip for everything
+    buffered. The producer awaits every flush it triggers, so a slow Redis
+    slows the agent loop down instead of piling up in-flight writes.
+    """
+
+    def __init__(self, agent_run_id: str, coalesce_ms: int = 30, coalesce_bytes: int = 2048):
+        self.agent_run_id = agent_run_id
+        self.key = response_stream_key(agent_run_id)
+        self.coalesce_seconds = max(0, coalesce_ms) / 1000
+        self.coalesce_bytes = coalesce_bytes
+        self.events_in = 0
+        self.entries_written = 0
+        self.round_trips = 0
+        self._buffer: List[Dict[str, str]] = []
+        self._chunk: Optional[Dict[str, Any]] = None
+        self._chunk_parts: List[str] = []
+        self._chunk_bytes = 0
+        self._chunk_updated_at: Any = None
+        self._timer: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def write(self, response: Dict[str, Any]) -> None:
+        self.events_in += 1
+        text = self._chunk_text(response) if self.coalesce_seconds else None
+
+        if text is None:
+            self._close_chunk()
+            self._buffer.append({_DATA_FIELD: json.dumps(response)})
+            await self.flush()
+            return
+
+        if self._chunk is not None and response.get("metadata") != self._chunk.get("metadata"):
+            self._close_chunk()
+        if self._chunk is None:
+            self._chunk = response
+            self._timer = asyncio.create_task(self._flush_after(self.coalesce_seconds))
+        self._chunk_parts.append(text)
+        self._chunk_bytes += len(text)
+        self._chunk_updated_at = response.get("updated_at")
+
+        if self._chunk_bytes >= self.coalesce_bytes:
+            self._close_chunk()
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            self._close_chunk()
+            if not self._buffer:
+                return
+            entries, self._buffer = self._buffer, []
+            if len(entries) == 1:
+                await redis.xadd(self.key, entries[0], maxlen=RESPONSE_STREAM_MAXLEN)
+            else:
+                await redis.xadd_many(self.key, entries, maxlen=RESPONSE_STREAM_MAXLEN)
+            self.round_trips += 1
+            self.entries_written += len(entries)
+
+    async def close(self) -> None:
+        await self.flush()
+        if self.events_in:
+            logger.debug(
+                f"Response stream for {self.agent_run_id}: {self.events_in} events -> "
+                f"{self.entries_written} entries in {self.round_trips} round trips"
+            )
+
+    @staticmethod
+    def _chunk_text(response: Dict[str, Any]) -> Optional[str]:
+        metadata = response.get("metadata")
+        if response.get("type") != "assistant" or not isinstance(metadata, str) or '"stream_status": "chunk"' not in metadata:
+            return None
+        try:
+            content = json.loads(response["content"])
+        except (KeyError, TypeError, json.JSONDecodeError):
+            return None
+        text = content.get("content") if isinstance(content, dict) else None
+        return text if isinstance(text, str) else None
+
+    def _close_chunk(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._chunk is None:
+            return
+        merged = self._chunk
+        if len(self._chunk_parts) > 1:
+            merged = dict(self._chunk)
+            merged["content"] = json.dumps({"role": "assistant", "content": "".join(self._chunk_parts)})
+            merged["updated_at"] = self._chunk_updated_at
+        self._buffer.append({_DATA_FIELD: json.dumps(merged)})
+        self._chunk = None
+        self._chunk_parts = []
+        self._chunk_bytes = 0
+
+    async def _flush_after(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # Detach before flushing so _close_chunk never cancels an in-flight write
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Failed to flush coalesced chunks for {self.agent_run_id}: {e}")
+
+
+async def read_all_responses(agent_run_id: str) -> List[Dict[str, Any]]:
+    entries = await redis.xrange(response_stream_key(agent_run_id))
+    return [json.loads(fields[_DATA_FIELD]) for _, fields in entries if _DATA_FIELD in fields]
+
+
+async def expire_response_stream(agent_run_id: str, ttl: int = RESPONSE_STREAM_TTL) -> None:
+    await redis.expire(response_stream_key(agent_run_id), ttl)
+
+
+def _entry_frame(agent_run_id: str, entry_id: str, fields: Dict[str, str], follow: bool) -> Tuple[Optional[str], bool]:
+    """The SSE frame for a stream entry (or None) and whether the reader should stop after it."""
+    control = fields.get(_CONTROL_FIELD)
+    if control is not None:
+        if not follow:
+            return None, False
+        logger.debug(f"Received control signal '{control}' for {agent_run_id}")
+        return format_sse(entry_id, json.dumps({"type": "status", "status": control})), True
+    data = fields.get(_DATA_FIELD)
+    if data is None:
+        return None, False
+    if follow and _is_terminal_status(data):
+        logger.debug(f"Detected run completion via status message in stream for {agent_run_id}")
+        return format_sse(entry_id, data), True
+    return format_sse(entry_id, data), False
+
+
+async def iter_sse_frames(
+    agent_run_id: str,
+    last_id: str = "0",
+    follow: bool = True,
+    block_ms: int = READ_BLOCK_MS,
+    batch_size: int = READ_BATCH_SIZE,
+    replay_trimmed: Optional[Callable[[], Awaitable[List[Dict[str, Any]]]]] = None,
+) -> AsyncIterator[str]:
+    """Yield SSE frames for entries after ``last_id``.
+
+    With ``follow`` the generator blocks for new entries until a terminal
+    status or control signal is read, emitting an SSE comment whenever a
+    blocking read times out so idle connections stay alive. Without it, only
+    the entries already in the stream are yielded.
+
+    If entries after ``last_id`` were trimmed from the stream, the messages
+    returned by ``replay_trimmed`` are yielded instead (without ids, so a
+    reconnect during the replay starts it over), followed by the stream's
+    newest entry and everything after it.
+    """
+    key = response_stream_key(agent_run_id)
+    if replay_trimmed is not None and await _trimmed_after(key, last_id):
+        newest = await redis.xrevrange(key, count=1)
+        messages = await replay_trimmed()
+        logger.info(
+            f"Response stream for {agent_run_id} was trimmed after {last_id}; "
+            f"replaying {len(messages)} persisted messages"
+        )
+        for message in messages:
+            yield format_sse(None, json.dumps(message))
+        if newest:
+            last_id, fields = newest[0]
+            frame, done = _entry_frame(agent_run_id, last_id, fields, follow)
+            if frame is not None:
+                yield frame
+            if done:
+                return
+
+    while True:
+        result = await redis.xread({key: last_id}, count=batch_size, block=block_ms if follow else None)
+        entries = result[0][1] if result else []
+        if not entries:
+            if not follow:
+                return
+            yield ": keep-alive\n\n"
+            continue
+
+        for entry_id, fields in entries:
+            last_id = entry_id
+            frame, done = _entry_frame(agent_run_id, entry_id, fields, follow)
+            if frame is not None:
+                yield frame
+            if done:
+                return
@@ -0,0 +1,110 @@
+"""
+Content-addressed cache of text embeddings.
+
+Vectors are keyed by (model, hash of the text), so re-indexing a knowledge base
+or re-embedding an unchanged document costs one Redis round trip instead of a
+model call per text. Recently used vectors are also kept in a process LRU as
+float32 arrays; Redis stores them base64-encoded float32 (about 1/4 the size of
+JSON).
+"""
+
+import base64
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from core.services import redis
+from core.utils.config import config
+from core.utils.logger import logger
+
+EMBEDDING_CACHE_KEY = "embedding:{model}:{digest}"
+DEFAULT_MAX_ENTRIES = 2048
+
+
+def embedding_digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _encode(vector: np.ndarray) -> str:
+    return base64.b64encode(vector.tobytes()).decode("ascii")
+
+
+def _decode(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype=np.float32)
+
+
+class EmbeddingCache:
+    """Two-level (process LRU + Redis) cache of embeddings keyed by model and digest."""
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._local[key] = vector
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def get_many(self, model: str, digests: Iterable[str]) -> Dict[str, List[float]]:
+        """Return cached embeddings for ``digests``, reading Redis once for local misses."""
+        unique = list(dict.fromkeys(digests))
+        found: Dict[str, List[float]] = {}
+        missing = []
+        for digest in unique:
+            key = EMBEDDING_CACHE_KEY.format(model=model, digest=digest)
+            vector = self._local.get(key)
+            if vector is not None:
+                self._local.move_to_end(key)
+                found[digest] = vector.tolist()
+            else:
+                missing.append((digest, key))
+
+        if missing:
+            try:
+                values = await redis.mget([key for _, key in missing])
+            except Exception as e:
+                logger.warning(f"Failed to read embedding cache: {e}")
+                values = [None] * len(missing)
+            for (digest, key), value in zip(missing, values):
+                if value is None:
+                    continue
+                try:
+                    vector = _decode(value)
+                except Exception:
+                    continue
+                self._remember(key, vector)
+                found[digest] = vector.tolist()
+
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    async def set_many(self, model: str, vectors: Dict[str, List[float]]) -> None:
+        if not vectors:
+            return
+        encoded = {}
+        for digest, vector in vectors.items():
+            key = EMBEDDING_CACHE_KEY.format(model=model, digest=digest)
+            array = np.asarray(vector, dtype=np.float32)
+            self._remember(key, array)
+            encoded[key] = _encode(array)
+        try:
+            client = await redis.get_client()
+            pipe = client.pipeline(transaction=False)
+            for key, value in encoded.items():
+                pipe.set(key, value, ex=self.ttl)
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to write embedding cache: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._local), "hits": self.hits, "misses": self.misses}
+
+
+embedding_cache = EmbeddingCache(ttl=config.EMBEDDING_CACHE_TTL)
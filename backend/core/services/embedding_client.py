@@ -9,11 +9,12 @@ Includes backoff, circuit breaker, and normalization.
 import os
 import asyncio
 import numpy as np
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone
 import time
 
 import litellm
+from core.services.embedding_cache import embedding_cache, embedding_digest
 from core.utils.logger import logger
 from core.utils.config import config
 
@@ -49,6 +50,7 @@ class EmbeddingClient:
         self._local_model_name: str = (
             model if provider.lower() == "local" and model else default_local_model
         )
+        self._gemini_model_name: str = self.model if self.provider == "gemini" else self._get_default_model("gemini")
         
         # Provider availability tracking
         self._gemini_available: Optional[bool] = None
@@ -56,7 +58,8 @@ class EmbeddingClient:
         self._gemini_notice_logged = False
         self._local_notice_logged = False
         self._providers_disabled_logged = False
-        self._target_dimension: Optional[int] = None
+        # Per model: vectors of different models are never compared, so they are never aligned to each other
+        self._target_dimensions: Dict[str, int] = {}
     
     def _get_default_model(self, provider: str) -> str:
         """Get default model for provider."""
@@ -66,6 +69,11 @@ class EmbeddingClient:
         }
         return defaults.get(provider.lower(), defaults["gemini"])
     
+    @property
+    def fallback_model(self) -> str:
+        """Model that produces the vectors when the primary provider fails."""
+        return self._local_model_name if self.provider == "gemini" else self._gemini_model_name
+    
     def _normalize_embedding(self, embedding: List[float]) -> List[float]:
         """Normalize embedding to unit length."""
         arr = np.array(embedding, dtype=np.float32)
@@ -75,28 +83,26 @@ class EmbeddingClient:
         normalized = (arr / norm).tolist()
         return normalized
 
-    def _finalize_embedding(self, embedding: List[float]) -> List[float]:
-        """Normalize and align embedding dimensions consistently."""
+    def _finalize_embedding(self, embedding: List[float], model: str) -> List[float]:
+        """Normalize and align the dimensions of ``model``'s embeddings consistently."""
         normalized = self._normalize_embedding(embedding)
         current_dim = len(normalized)
-        if self._target_dimension is None:
-            self._target_dimension = current_dim
-            return normalized
-        if current_dim == self._target_dimension:
+        target_dimension = self._target_dimensions.setdefault(model, current_dim)
+        if current_dim == target_dimension:
             return normalized
-        if current_dim > self._target_dimension:
+        if current_dim > target_dimension:
             logger.warning(
                 "Embedding dimension %d exceeds target %d; truncating",
                 current_dim,
-                self._target_dimension,
+                target_dimension,
             )
-            return normalized[: self._target_dimension]
+            return normalized[: target_dimension]
         logger.warning(
             "Embedding dimension %d below target %d; padding with zeros",
             current_dim,
-            self._target_dimension,
+            target_dimension,
         )
-        padded = normalized + [0.0] * (self._target_dimension - current_dim)
+        padded = normalized + [0.0] * (target_dimension - current_dim)
         return padded
     
     def _check_circuit_breaker(self) -> bool:
@@ -163,8 +169,8 @@ class EmbeddingClient:
         
         return cleaned
     
-    async def _embed_gemini(self, text: str) -> Optional[List[float]]:
-        """Embed using Gemini API."""
+    def _get_genai(self) -> Optional[Any]:
+        """Configured google.generativeai module, or None if Gemini is unavailable."""
         if self._gemini_available is False:
             return None
         
@@ -182,37 +188,34 @@ class EmbeddingClient:
             self._gemini_available = False
             return None
         
+        genai.configure(api_key=config.GEMINI_API_KEY)
+        return genai
+    
+    async def _embed_gemini(self, text: str) -> Optional[List[float]]:
+        """Embed using Gemini API."""
+        genai = self._get_genai()
+        if genai is None:
+            return None
+        
         prepared_text = self._prepare_text_for_embedding(text, "gemini")
         if not prepared_text:
             logger.debug("Skipping Gemini embedding: empty text after sanitization")
             return None
         
         try:
-            genai.configure(api_key=config.GEMINI_API_KEY)
-            
-            # Run synchronous genai.embed_content in executor since it's not async
-            # Use asyncio.to_thread if available (Python 3.9+), otherwise fall back to run_in_executor
+            # genai.embed_content is synchronous, run it off the event loop
             def embed_call():
-                return genai.embed_content(model=self.model, content=prepared_text)
-            
-            try:
-                # Python 3.9+ preferred method
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(embed_call),
-                    timeout=self.timeout_seconds
-                )
-            except AttributeError:
-                # Fallback for older Python versions
-                loop = asyncio.get_event_loop()
-                response = await asyncio.wait_for(
-                    loop.run_in_executor(None, embed_call),
-                    timeout=self.timeout_seconds
-                )
-            
+                return genai.embed_content(model=self._gemini_model_name, content=prepared_text)
+        
+            response = await asyncio.wait_for(
+                asyncio.to_thread(embed_call),
+                timeout=self.timeout_seconds
+            )
+        
             if response and response.get('embedding'):
                 embedding = response['embedding']
                 self._gemini_available = True
-                return self._finalize_embedding(embedding)
+                return self._finalize_embedding(embedding, self._gemini_model_name)
         
         except asyncio.TimeoutError:
             logger.warning(f"Embedding timeout for {self.provider}/{self.model}")
@@ -221,40 +224,94 @@ class EmbeddingClient:
         
         return None
     
-    async def _embed_local(self, text: str) -> Optional[List[float]]:
-        """Embed using local sentence-transformers model (optional fallback)."""
+    async def _embed_gemini_batch(self, texts: List[str]) -> Optional[List[Optional[List[float]]]]:
+        """Embed several texts with one Gemini request. Returns None if the request failed."""
+        genai = self._get_genai()
+        if genai is None:
+            return None
+        
+        prepared = [self._prepare_text_for_embedding(text, "gemini") for text in texts]
+        indices = [i for i, text in enumerate(prepared) if text]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        if not indices:
+            return results
+        
+        try:
+            def embed_call():
+                return genai.embed_content(model=self._gemini_model_name, content=[prepared[i] for i in indices])
+        
+            response = await asyncio.wait_for(
+                asyncio.to_thread(embed_call),
+                timeout=self.timeout_seconds
+            )
+            embeddings = response.get('embedding') if response else None
+            if not embeddings or len(embeddings) != len(indices):
+                logger.warning("Gemini batch embedding returned an unexpected number of vectors")
+                return None
+        
+            self._gemini_available = True
+            for i, embedding in zip(indices, embeddings):
+                results[i] = self._finalize_embedding(embedding, self._gemini_model_name)
+            return results
+        
+        except asyncio.TimeoutError:
+            logger.warning(f"Batch embedding timeout for {self.provider}/{self.model} ({len(indices)} texts)")
+        except Exception as e:
+            logger.warning(f"Gemini batch embedding failed: {e}")
+        
+        return None
+    
+    async def _get_local_model(self) -> Optional[Any]:
+        """Lazily load the sentence-transformers model, or None if unavailable."""
         if self._local_available is False:
             return None
+        if self._local_model is not None:
+            return self._local_model
         
         try:
             # Import check - sentence-transformers is optional
-            try:
-                from sentence_transformers import SentenceTransformer
-            except ImportError:
-                if not self._local_notice_logged:
-                    logger.debug(
-                        "sentence-transformers not available. "
-                        "Local embedding fallback disabled. "
-                        "(Optional: install manually if needed, but may not work on all platforms)"
-                    )
-                    self._local_notice_logged = True
-                self._local_available = False
-                return None
-            
-            # Lazy load local model
-            if self._local_model is None:
-                try:
-                    self._local_model = SentenceTransformer(self._local_model_name)
-                    logger.info(f"Loaded local embedding model: {self._local_model_name}")
-                except Exception as e:
-                    logger.warning(f"Failed to load local model {self._local_model_name}: {e}")
-                    self._local_available = False
-                    return None
-            
-            # Generate embedding
-            embedding = self._local_model.encode(text, normalize_embeddings=True)
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            if not self._local_notice_logged:
+                logger.debug(
+                    "sentence-transformers not available. "
+                    "Local embedding fallback disabled. "
+                    "(Optional: install manually if needed, but may not work on all platforms)"
+                )
+                self._local_notice_logged = True
+            self._local_available = False
+            return None
+        
+        try:
+            self._local_model = await asyncio.to_thread(SentenceTransformer, self._local_model_name)
+            logger.info(f"Loaded local embedding model: {self._local_model_name}")
+        except Exception as e:
+            logger.warning(f"Failed to load local model {self._local_model_name}: {e}")
+            self._local_available = False
+            return None
+        
+        return self._local_model
+    
+    async def _embed_local(self, text: str) -> Optional[List[float]]:
+        """Embed using local sentence-transformers model (optional fallback)."""
+        embeddings = await self._embed_local_batch([text])
+        return embeddings[0] if embeddings else None
+    
+    async def _embed_local_batch(self, texts: List[str]) -> Optional[List[Optional[List[float]]]]:
+        """Embed several texts with the local model in a worker thread. Returns None on failure."""
+        model = await self._get_local_model()
+        if model is None:
+            return None
+        
+        try:
+            embeddings = await asyncio.to_thread(
+                model.encode,
+                texts,
+                normalize_embeddings=True,
+                show_progress_bar=False,
+            )
             self._local_available = True
-            return self._finalize_embedding(embedding.tolist())
+            return [self._finalize_embedding(embedding.tolist(), self._local_model_name) for embedding in embeddings]
         
         except Exception as e:
             logger.warning(f"Local embedding failed: {e}")
@@ -265,10 +322,21 @@ class EmbeddingClient:
         """
         Embed single text with backoff and fallback.
         
+        Vectors from the primary provider are cached by content hash.
         Returns normalized embedding or None if all providers fail.
         """
+        embedding, _ = await self.embed_text_with_model(text)
+        return embedding
+    
+    async def embed_text_with_model(self, text: str) -> Tuple[Optional[List[float]], Optional[str]]:
+        """``embed_text``, also returning the model that produced the vector (``self.model`` or ``fallback_model``)."""
         if not text or not text.strip():
-            return None
+            return None, None
+        
+        digest = embedding_digest(text)
+        cached = await embedding_cache.get_many(self.model, [digest])
+        if digest in cached:
+            return cached[digest], self.model
         
         providers_tried: List[str] = []
         embedding: Optional[List[float]] = None
@@ -281,7 +349,8 @@ class EmbeddingClient:
                 embedding = await self._embed_gemini(text)
                 if embedding:
                     self._record_success()
-                    return embedding
+                    await embedding_cache.set_many(self.model, {digest: embedding})
+                    return embedding, self.model
                 self._record_failure()
         elif self.provider == "local":
             if self._check_circuit_breaker():
@@ -290,7 +359,8 @@ class EmbeddingClient:
                 embedding = await self._embed_local(text)
                 if embedding:
                     self._record_success()
-                    return embedding
+                    await embedding_cache.set_many(self.model, {digest: embedding})
+                    return embedding, self.model
                 self._record_failure()
         
         fallback_embedding: Optional[List[float]] = None
@@ -304,7 +374,7 @@ class EmbeddingClient:
             fallback_embedding = await self._embed_gemini(text)
         
         if fallback_embedding:
-            return fallback_embedding
+            return fallback_embedding, self.fallback_model
         
         if providers_tried:
             logger.warning(
@@ -317,47 +387,106 @@ class EmbeddingClient:
             )
             self._providers_disabled_logged = True
         
-        return None
+        return None, None
+    
+    @staticmethod
+    def _plan_batches(
+        items: List[Tuple[str, str]],
+        max_tokens: int,
+        max_size: int,
+    ) -> List[List[Tuple[str, str]]]:
+        """Group (digest, text) pairs into batches bounded by estimated tokens and count."""
+        batches: List[List[Tuple[str, str]]] = []
+        current: List[Tuple[str, str]] = []
+        current_tokens = 0
+        for digest, text in items:
+            tokens = max(1, len(text) // 4)
+            if current and (current_tokens + tokens > max_tokens or len(current) >= max_size):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append((digest, text))
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    async def _embed_uncached_batch(self, texts: List[str]) -> Tuple[List[Optional[List[float]]], str]:
+        """
+        Embed one batch with the primary provider, falling back to the other one.
+        
+        Also returns the model that produced the vectors (``self.model`` or
+        ``fallback_model``); only the primary model's vectors are cached.
+        """
+        primary, fallback = (
+            (self._embed_gemini_batch, self._embed_local_batch)
+            if self.provider == "gemini"
+            else (self._embed_local_batch, self._embed_gemini_batch)
+        )
+        if self._check_circuit_breaker():
+            embeddings = await primary(texts)
+            if embeddings is not None:
+                self._record_success()
+                return embeddings, self.model
+            self._record_failure()
+        
+        embeddings = await fallback(texts)
+        return (embeddings if embeddings is not None else [None] * len(texts)), self.fallback_model
     
     async def embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
         """
-        Embed batch of texts (more efficient for local model).
+        Embed batch of texts.
+        
+        Texts are deduplicated by content hash and looked up in the embedding
+        cache; the rest are grouped by EMBEDDING_BATCH_TOKENS /
+        EMBEDDING_BATCH_SIZE and embedded with up to EMBEDDING_CONCURRENCY
+        batches in flight.
         
         Returns list of embeddings (some may be None on failure).
         """
+        return [embedding for embedding, _ in await self.embed_batch_with_models(texts)]
+    
+    async def embed_batch_with_models(self, texts: List[str]) -> List[Tuple[Optional[List[float]], Optional[str]]]:
+        """``embed_batch``, pairing each vector with the model that produced it.
+        
+        Vectors of the primary model and of ``fallback_model`` are not
+        comparable; callers that store vectors must keep the model with them.
+        """
         if not texts:
             return []
         
-        # Batch processing for local model
-        if self.provider == "local" or self.provider != "local":
-            try:
-                if self._local_model is None:
-                    try:
-                        from sentence_transformers import SentenceTransformer
-                        self._local_model = SentenceTransformer(self._local_model_name)
-                    except ImportError:
-                        pass
-                
-                if self._local_model:
-                    embeddings = self._local_model.encode(
-                        texts,
-                        normalize_embeddings=True,
-                        show_progress_bar=False
-                    )
-                    finalized: List[List[float]] = []
-                    for emb in embeddings:
-                        finalized.append(self._finalize_embedding(emb.tolist()))
-                    return finalized
-            except Exception as e:
-                logger.warning(f"Batch local embedding failed: {e}")
-        
-        # Fallback to sequential for remote providers
-        results = []
-        for text in texts:
-            embedding = await self.embed_text(text)
-            results.append(embedding)
-        
-        return results
+        digests = [embedding_digest(text) if text and text.strip() else None for text in texts]
+        unique: Dict[str, str] = {}
+        for digest, text in zip(digests, texts):
+            if digest and digest not in unique:
+                unique[digest] = text
+        
+        cached = await embedding_cache.get_many(self.model, list(unique))
+        vectors: Dict[str, Tuple[List[float], str]] = {digest: (vector, self.model) for digest, vector in cached.items()}
+        pending = [(digest, text) for digest, text in unique.items() if digest not in vectors]
+        
+        if pending:
+            started = time.perf_counter()
+            batches = self._plan_batches(pending, config.EMBEDDING_BATCH_TOKENS, config.EMBEDDING_BATCH_SIZE)
+            semaphore = asyncio.Semaphore(max(1, config.EMBEDDING_CONCURRENCY))
+        
+            async def run(batch: List[Tuple[str, str]]) -> None:
+                async with semaphore:
+                    embeddings, model = await self._embed_uncached_batch([text for _, text in batch])
+                embedded = {digest: emb for (digest, _), emb in zip(batch, embeddings) if emb is not None}
+                vectors.update((digest, (emb, model)) for digest, emb in embedded.items())
+                if model == self.model:
+                    await embedding_cache.set_many(self.model, embedded)
+        
+            await asyncio.gather(*(run(batch) for batch in batches))
+            logger.debug(
+                "Embedded %d texts in %d batches in %.0fms (%d cached or duplicate)",
+                len(pending),
+                len(batches),
+                (time.perf_counter() - started) * 1000,
+                len(texts) - len(pending),
+            )
+        
+        return [vectors.get(digest, (None, None)) if digest else (None, None) for digest in digests]
 
 
 # Global embedding client instance
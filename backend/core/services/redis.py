@@ -3,7 +3,7 @@ import os
 from dotenv import load_dotenv
 import asyncio
 from core.utils.logger import logger
-from typing import List, Any
+from typing import List, Any, Optional
 from core.utils.retry import retry
 
 # Redis client and connection pool
@@ -135,6 +135,42 @@ async def get(key: str, default: str = None):
     return result if result is not None else default
 
 
+async def mget(keys: List[str]) -> List[Optional[str]]:
+    """Get several Redis keys in one round trip."""
+    redis_client = await get_client()
+    return await redis_client.mget(keys)
+
+
+_COMPARE_AND_SET = """
+local current = redis.call('GET', KEYS[1])
+if current and current ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+async def compare_and_set(key: str, expected: Optional[str], value: str, ex: int) -> bool:
+    """Set a key to `value` unless it holds something other than `expected` (a missing key always matches)."""
+    redis_client = await get_client()
+    return bool(await redis_client.eval(_COMPARE_AND_SET, 1, key, expected or "", value, ex))
+
+
+_COMPARE_AND_DELETE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+async def compare_and_delete(key: str, expected: str) -> bool:
+    """Delete a key only if it still holds `expected`."""
+    redis_client = await get_client()
+    return bool(await redis_client.eval(_COMPARE_AND_DELETE, 1, key, expected))
+
+
 async def delete(key: str):
     """Delete a Redis key."""
     redis_client = await get_client()
@@ -166,6 +202,46 @@ async def lrange(key: str, start: int, end: int) -> List[str]:
     return await redis_client.lrange(key, start, end)
 
 
+# Stream operations
+async def xadd(key: str, fields: dict, maxlen: int = None, approximate: bool = True) -> str:
+    """Append an entry to a stream, optionally trimming it to ~maxlen entries."""
+    redis_client = await get_client()
+    return await redis_client.xadd(key, fields, maxlen=maxlen, approximate=approximate)
+
+
+async def xadd_many(key: str, entries: List[dict], maxlen: int = None, approximate: bool = True) -> List[str]:
+    """Append several entries to a stream in one pipelined round trip."""
+    redis_client = await get_client()
+    pipe = redis_client.pipeline(transaction=False)
+    for fields in entries:
+        pipe.xadd(key, fields, maxlen=maxlen, approximate=approximate)
+    return await pipe.execute()
+
+
+async def xread(streams: dict, count: int = None, block: int = None) -> List[Any]:
+    """Read entries after the given ids, blocking up to `block` ms when set."""
+    redis_client = await get_client()
+    return await redis_client.xread(streams, count=count, block=block)
+
+
+async def xrange(key: str, min: str = "-", max: str = "+", count: int = None) -> List[Any]:
+    """Get a range of entries from a stream."""
+    redis_client = await get_client()
+    return await redis_client.xrange(key, min=min, max=max, count=count)
+
+
+async def xrevrange(key: str, max: str = "+", min: str = "-", count: int = None) -> List[Any]:
+    """Get a range of entries from a stream, newest first."""
+    redis_client = await get_client()
+    return await redis_client.xrevrange(key, max=max, min=min, count=count)
+
+
+async def xlen(key: str) -> int:
+    """Get the number of entries in a stream."""
+    redis_client = await get_client()
+    return await redis_client.xlen(key)
+
+
 # Key management
 
 
@@ -0,0 +1,139 @@
+"""
+Result caching and request coalescing for clients of external APIs.
+
+``ResultCache`` keeps JSON results with a TTL in a process LRU and in Redis,
+so identical calls within a run and across runs and workers are fetched once.
+``SingleFlight`` makes identical calls that are in flight at the same time
+share one upstream request.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core.services import redis
+from core.utils.logger import logger
+
+MISS = object()
+
+
+class ResultCache:
+    """Two-level (process LRU + Redis) cache of JSON results with a TTL."""
+
+    def __init__(self, key_format: str, max_entries: int, name: str = "result"):
+        self.key_format = key_format
+        self.max_entries = max_entries
+        self.name = name
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, digest: str) -> Any:
+        """Cached value for ``digest``, or ``MISS``."""
+        entry = self._local.get(digest)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._local.move_to_end(digest)
+                self.hits += 1
+                return value
+            del self._local[digest]
+
+        try:
+            raw = await redis.get(self.key_format.format(digest=digest))
+        except Exception as e:
+            logger.warning(f"Failed to read {self.name} cache: {e}")
+            raw = None
+        if raw is not None:
+            try:
+                expires_at, value = json.loads(raw)
+            except (ValueError, TypeError):
+                pass
+            else:
+                self._remember(digest, expires_at, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return MISS
+
+    def _remember(self, digest: str, expires_at: float, value: Any) -> None:
+        self._local[digest] = (expires_at, value)
+        self._local.move_to_end(digest)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    async def set(self, digest: str, value: Any, ttl: int) -> None:
+        expires_at = time.time() + ttl
+        self._remember(digest, expires_at, value)
+        try:
+            await redis.set(self.key_format.format(digest=digest), json.dumps([expires_at, value]), ex=ttl)
+        except Exception as e:
+            logger.warning(f"Failed to write {self.name} cache: {e}")
+
+
+class FetchCancelledError(Exception):
+    """The shared call was cancelled before it finished; calling again is safe."""
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Share one in-flight call between identical concurrent callers.
+
+    The call runs in its own task rather than in the caller that started it,
+    so cancelling that caller does not cancel the call for the others. The
+    task is cancelled once no caller is waiting for it any more; callers still
+    waiting on a call that was cancelled anyway get ``FetchCancelledError``.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, _Flight] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.deduplicated = 0
+
+    async def run(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Tasks belong to the loop that created them
+            self._inflight = {}
+            self._loop = loop
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(loop.create_task(self._fetch(key, fetch)))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda task: self._finished(key, flight))
+        else:
+            self.deduplicated += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Nobody wants the result any more; later callers start a new call
+                flight.task.cancel()
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+
+    @staticmethod
+    async def _fetch(key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await fetch()
+        except asyncio.CancelledError:
+            # Waiters must not see a cancellation that was not theirs
+            raise FetchCancelledError(f"Call {key} was cancelled") from None
+
+    def _finished(self, key: str, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not flight.task.cancelled():
+            flight.task.exception()  # waiters re-raise it; nobody else needs to retrieve it
@@ -0,0 +1,233 @@
+"""
+Web search (Tavily) and page scraping (Firecrawl) for the web search tool.
+
+Every tool instance used to open its own HTTP client (a new one per scraped
+URL for Firecrawl), and agents very often repeat the same search after an
+auto-continue or in the next run. This module keeps one pooled
+``httpx.AsyncClient`` per worker event loop and caches results:
+
+- searches by (normalized query, search parameters) for WEB_SEARCH_CACHE_TTL,
+- scraped pages by (normalized URL, formats) for WEB_SCRAPE_CACHE_TTL,
+
+in a process LRU and in Redis. Identical requests that are in flight at the
+same time (e.g. parallel tool calls) share one upstream request, and at most
+WEB_SEARCH_CONCURRENCY / WEB_SCRAPE_CONCURRENCY upstream requests per provider
+run at once.
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from core.services.result_cache import MISS, ResultCache, SingleFlight
+from core.utils.config import config
+from core.utils.logger import logger
+
+SEARCH_CACHE_KEY = "web_search:{digest}"
+SCRAPE_CACHE_KEY = "web_scrape:{digest}"
+DEFAULT_TAVILY_URL = "https://api.tavily.com"
+
+# Pages larger than this are scraped every time rather than cached
+MAX_CACHED_PAGE_BYTES = 2 * 1024 * 1024
+
+SEARCH_MAX_RETRIES = 3
+SEARCH_BASE_DELAY = 1.0
+SCRAPE_MAX_ATTEMPTS = 3
+SCRAPE_TIMEOUT = 30
+
+
+class TavilyRateLimitError(Exception):
+    """Custom exception for Tavily API rate limit errors"""
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TavilyAPIError(Exception):
+    """Custom exception for general Tavily API errors"""
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def normalize_url(url: str) -> str:
+    """Scheme and host are case-insensitive and the fragment is never sent."""
+    parts = urlsplit(url.strip())
+    netloc = parts.netloc.lower()
+    if parts.scheme.lower() == 'https' and netloc.endswith(':443'):
+        netloc = netloc[:-4]
+    elif parts.scheme.lower() == 'http' and netloc.endswith(':80'):
+        netloc = netloc[:-3]
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or '/', parts.query, ''))
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, separators=(',', ':')).encode("utf-8")).hexdigest()
+
+
+class WebRetrieval:
+    def __init__(self):
+        self.search_cache = ResultCache(SEARCH_CACHE_KEY, max_entries=512, name="web search")
+        self.scrape_cache = ResultCache(SCRAPE_CACHE_KEY, max_entries=128, name="web scrape")
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._single_flight = SingleFlight()
+        self.requests = {'tavily': 0, 'firecrawl': 0}
+
+    def _get_http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop:
+            # Pooled connections and semaphores belong to the loop that created them
+            self._http = httpx.AsyncClient(
+                timeout=SCRAPE_TIMEOUT,
+                limits=httpx.Limits(max_connections=config.WEB_SEARCH_CONCURRENCY + config.WEB_SCRAPE_CONCURRENCY),
+            )
+            self._loop = loop
+            self._limits = {
+                'tavily': asyncio.Semaphore(max(1, config.WEB_SEARCH_CONCURRENCY)),
+                'firecrawl': asyncio.Semaphore(max(1, config.WEB_SCRAPE_CONCURRENCY)),
+            }
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._loop = None
+
+    def _count_request(self, provider: str) -> None:
+        self.requests[provider] += 1
+        if self.requests[provider] % 50 == 0:
+            logger.info(f"{provider} usage: {self.requests[provider]} upstream requests from this worker")
+
+    async def search(self, query: str, max_results: int) -> Dict[str, Any]:
+        """Tavily search (advanced depth, with answer and images), cached by normalized query."""
+        params = {
+            'max_results': max_results,
+            'include_images': True,
+            'include_answer': 'advanced',
+            'search_depth': 'advanced',
+        }
+        digest = _digest('tavily', normalize_query(query), params)
+        cached = await self.search_cache.get(digest)
+        if cached is not MISS:
+            logger.debug(f"Web search cache hit for query: '{query}'")
+            return cached
+
+        http = self._get_http()
+
+        async def fetch() -> Dict[str, Any]:
+            result = await self._tavily_search(http, query, params)
+            # Empty results are not cached: the next attempt may find something
+            if result.get('results') or (result.get('answer') or '').strip():
+                await self.search_cache.set(digest, result, config.WEB_SEARCH_CACHE_TTL)
+            return result
+
+        return await self._single_flight.run(f"search:{digest}", fetch)
+
+    async def _tavily_search(self, http: httpx.AsyncClient, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        url = f"{(config.TAVILY_URL or DEFAULT_TAVILY_URL).rstrip('/')}/search"
+        headers = {"Authorization": f"Bearer {config.TAVILY_API_KEY}", "Content-Type": "application/json"}
+
+        for attempt in range(SEARCH_MAX_RETRIES + 1):
+            delay = SEARCH_BASE_DELAY * (2 ** attempt)
+            async with self._limits['tavily']:
+                self._count_request('tavily')
+                logger.info(f"Executing Tavily search (attempt {attempt + 1}/{SEARCH_MAX_RETRIES + 1}) for query: '{query}'")
+                try:
+                    response = await http.post(url, json={'query': query, **params}, headers=headers)
+                except httpx.TransportError as e:
+                    if attempt == SEARCH_MAX_RETRIES:
+                        raise TavilyAPIError(f"Tavily API error after {SEARCH_MAX_RETRIES + 1} attempts: {e!r}")
+                    logger.warning(f"Tavily search attempt {attempt + 1} failed ({e!r}), retrying in {delay} seconds...")
+                    response = None
+
+            if response is None:
+                await asyncio.sleep(delay)
+                continue
+
+            if response.status_code == 200:
+                return response.json()
+
+            error_message = response.text[:500]
+            if response.status_code in (429, 432, 433):
+                if attempt == SEARCH_MAX_RETRIES:
+                    raise TavilyRateLimitError(
+                        f"Tavily API rate limit exceeded after {SEARCH_MAX_RETRIES + 1} attempts. "
+                        f"Please try again later. Error: {error_message}"
+                    )
+                logger.warning(f"Rate limit detected, retrying in {delay} seconds...")
+            elif response.status_code in (401, 403):
+                raise TavilyAPIError(f"Tavily API authentication failed: {error_message}", status_code=401)
+            elif response.status_code == 400:
+                raise TavilyAPIError(f"Invalid request to Tavily API: {error_message}", status_code=400)
+            elif attempt == SEARCH_MAX_RETRIES:
+                raise TavilyAPIError(
+                    f"Tavily API error after {SEARCH_MAX_RETRIES + 1} attempts: {error_message}",
+                    status_code=response.status_code,
+                )
+            else:
+                logger.warning(f"Tavily API error {response.status_code}, retrying in {delay} seconds...")
+            await asyncio.sleep(delay)
+
+    async def scrape(self, url: str, formats: List[str]) -> Dict[str, Any]:
+        """Firecrawl scrape; returns the response body, cached by normalized URL and formats."""
+        digest = _digest('firecrawl', normalize_url(url), sorted(formats))
+        cached = await self.scrape_cache.get(digest)
+        if cached is not MISS:
+            logger.debug(f"Scrape cache hit for URL: {url}")
+            return cached
+
+        http = self._get_http()
+
+        async def fetch() -> Dict[str, Any]:
+            data = await self._firecrawl_scrape(http, url, formats)
+            if data.get('success', True) and data.get('data') and len(json.dumps(data)) <= MAX_CACHED_PAGE_BYTES:
+                await self.scrape_cache.set(digest, data, config.WEB_SCRAPE_CACHE_TTL)
+            return data
+
+        return await self._single_flight.run(f"scrape:{digest}", fetch)
+
+    async def _firecrawl_scrape(self, http: httpx.AsyncClient, url: str, formats: List[str]) -> Dict[str, Any]:
+        headers = {
+            "Authorization": f"Bearer {config.FIRECRAWL_API_KEY}",
+            "Content-Type": "application/json",
+        }
+        for attempt in range(1, SCRAPE_MAX_ATTEMPTS + 1):
+            try:
+                async with self._limits['firecrawl']:
+                    self._count_request('firecrawl')
+                    logger.info(f"Sending request to Firecrawl (attempt {attempt}/{SCRAPE_MAX_ATTEMPTS}) for URL: {url}")
+                    response = await http.post(
+                        f"{config.FIRECRAWL_URL}/v1/scrape",
+                        json={"url": url, "formats": formats},
+                        headers=headers,
+                        timeout=SCRAPE_TIMEOUT,
+                    )
+                response.raise_for_status()
+                return response.json()
+            except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
+                logger.warning(f"Request timed out (attempt {attempt}/{SCRAPE_MAX_ATTEMPTS}): {str(timeout_err)}")
+                if attempt >= SCRAPE_MAX_ATTEMPTS:
+                    raise Exception(f"Request timed out after {SCRAPE_MAX_ATTEMPTS} attempts with {SCRAPE_TIMEOUT}s timeout")
+                await asyncio.sleep(2 ** attempt)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'search': {'hits': self.search_cache.hits, 'misses': self.search_cache.misses},
+            'scrape': {'hits': self.scrape_cache.hits, 'misses': self.scrape_cache.misses},
+            'upstream_requests': dict(self.requests),
+            'deduplicated': self._single_flight.deduplicated,
+        }
+
+
+web_retrieval = WebRetrieval()
@@ -10,6 +10,7 @@ from core.utils.auth_utils import verify_and_get_user_id_from_jwt, verify_and_au
 from core.utils.logger import logger
 from core.sandbox.sandbox import create_sandbox, delete_sandbox, get_preview_link_info
 from core.sandbox.proxy import ensure_custom_domain_metadata
+from core.agentpress.message_cache import invalidate_thread_messages
 
 from .api_models import CreateThreadResponse, MessageCreateRequest
 from . import core_utils as utils
@@ -424,6 +425,7 @@ async def delete_message(
     try:
         # Don't allow users to delete the "status" messages
         await client.table('messages').delete().eq('message_id', message_id).eq('is_llm_message', True).eq('thread_id', thread_id).execute()
+        await invalidate_thread_messages(thread_id)
         return {"message": "Message deleted successfully"}
     except Exception as e:
         logger.error(f"Error deleting message {message_id} from thread {thread_id}: {str(e)}")
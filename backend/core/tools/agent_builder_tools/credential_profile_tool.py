@@ -265,13 +265,9 @@ After connecting, you'll be able to use {result.toolkit.name} tools in your agen
                 await mcp_wrapper_instance.initialize_and_register_tools()
                 updated_schemas = mcp_wrapper_instance.get_schemas()
                 
-                for method_name, schema_list in updated_schemas.items():
-                    for schema in schema_list:
-                        self.thread_manager.tool_registry.tools[method_name] = {
-                            "instance": mcp_wrapper_instance,
-                            "schema": schema
-                        }
-                        logger.debug(f"Dynamically registered MCP tool: {method_name}")
+                self.thread_manager.tool_registry.register_instance(mcp_wrapper_instance, schemas=updated_schemas)
+                for method_name in updated_schemas:
+                    logger.debug(f"Dynamically registered MCP tool: {method_name}")
                 
                 logger.debug(f"Successfully registered {len(updated_schemas)} MCP tools dynamically for {profile.toolkit_name}")
                 
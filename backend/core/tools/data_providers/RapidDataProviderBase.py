@@ -1,7 +1,8 @@
 import os
-import requests
 from typing import Dict, Any, Optional, TypedDict, Literal
 
+from core.tools.data_providers.rapid_api_client import rapid_api_client
+
 
 class EndpointSchema(TypedDict):
     route: str
@@ -12,6 +13,10 @@ class EndpointSchema(TypedDict):
 
 
 class RapidDataProviderBase:
+    # Per-provider overrides of RAPID_API_REQUESTS_PER_SECOND and RAPID_API_CACHE_TTL
+    requests_per_second: Optional[int] = None
+    cache_ttl: Optional[int] = None
+
     def __init__(self, base_url: str, endpoints: Dict[str, EndpointSchema]):
         self.base_url = base_url
         self.endpoints = endpoints
@@ -19,7 +24,7 @@ class RapidDataProviderBase:
     def get_endpoints(self):
         return self.endpoints
     
-    def call_endpoint(
+    async def call_endpoint(
             self,
             route: str,
             payload: Optional[Dict[str, Any]] = None
@@ -51,11 +56,14 @@ class RapidDataProviderBase:
         }
 
         method = endpoint.get('method', 'GET').upper()
-        
-        if method == 'GET':
-            response = requests.get(url, params=payload, headers=headers)
-        elif method == 'POST':
-            response = requests.post(url, json=payload, headers=headers)
-        else:
+        if method not in ('GET', 'POST'):
             raise ValueError(f"Unsupported HTTP method: {method}")
-        return response.json()
+        
+        return await rapid_api_client.request(
+            method,
+            url,
+            payload,
+            headers=headers,
+            rate_limit=self.requests_per_second,
+            cache_ttl=self.cache_ttl,
+        )
@@ -0,0 +1,190 @@
+"""
+Shared async HTTP client for the RapidAPI data providers.
+
+All providers go through one ``httpx.AsyncClient`` per event loop, so calls
+reuse pooled keep-alive connections instead of blocking the loop on a new
+``requests`` connection each time. Requests to each provider (RapidAPI host)
+are rate limited with a token bucket, 429 and 5xx responses and transport
+errors are retried with jittered exponential backoff, and successful responses
+are cached for a TTL keyed by (method, URL, normalized parameters): in a
+process LRU and in Redis, so identical calls within a run and across runs and
+workers are fetched once. Identical calls that are in flight at the same time
+share one request.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from core.services.result_cache import MISS, ResultCache, SingleFlight
+from core.utils.config import config
+from core.utils.logger import logger
+
+RESPONSE_CACHE_KEY = "rapidapi_response:{digest}"
+DEFAULT_MAX_ENTRIES = 1024
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
+
+def normalize_params(method: str, payload: Optional[Dict[str, Any]]) -> str:
+    """Canonical form of request parameters for cache keys.
+
+    Key order and None values do not matter; query parameters are compared as
+    the strings they are sent as (``page=1`` and ``page="1"`` are the same call).
+    """
+    params = {key: value for key, value in (payload or {}).items() if value is not None}
+    if method == 'GET':
+        params = {key: value if isinstance(value, (list, tuple)) else str(value) for key, value in params.items()}
+    return json.dumps(params, sort_keys=True, separators=(',', ':'), default=str)
+
+
+def response_digest(method: str, url: str, payload: Optional[Dict[str, Any]]) -> str:
+    return hashlib.sha1(f"{method} {url}\x00{normalize_params(method, payload)}".encode("utf-8")).hexdigest()
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` requests per second, in bursts of up to ``max(rate, 1)``."""
+
+    def __init__(self, rate: float):
+        self.rate = max(rate, 0.1)
+        # A request needs a whole token, so the bucket must hold at least one even below 1 request/s
+        self.capacity = max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def _backoff(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), RETRY_MAX_DELAY))
+        except ValueError:
+            pass
+    return delay
+
+
+class RapidApiClient:
+    def __init__(self, cache_ttl: Optional[int] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache_ttl = cache_ttl
+        self.cache = ResultCache(RESPONSE_CACHE_KEY, max_entries=max_entries, name="RapidAPI response")
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._single_flight = SingleFlight()
+        self.requests = 0
+
+    def _get_http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._http is None or self._loop is not loop:
+            # Pooled connections and locks belong to the loop that created them
+            self._http = httpx.AsyncClient(
+                timeout=config.RAPID_API_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=config.RAPID_API_MAX_CONNECTIONS,
+                    max_keepalive_connections=config.RAPID_API_MAX_CONNECTIONS,
+                ),
+            )
+            self._loop = loop
+            self._limiters = {}
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+            self._loop = None
+
+    async def _send(
+        self,
+        http: httpx.AsyncClient,
+        method: str,
+        url: str,
+        payload: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        rate_limit: Optional[int],
+    ) -> Tuple[int, Any]:
+        host = httpx.URL(url).host
+        limiter = self._limiters.get(host)
+        if limiter is None:
+            limiter = self._limiters[host] = RateLimiter(rate_limit or config.RAPID_API_REQUESTS_PER_SECOND)
+
+        attempts = max(1, config.RAPID_API_MAX_RETRIES + 1)
+        for attempt in range(attempts):
+            await limiter.acquire()
+            self.requests += 1
+            try:
+                if method == 'GET':
+                    response = await http.get(url, params=payload, headers=headers)
+                else:
+                    response = await http.post(url, json=payload, headers=headers)
+            except httpx.TransportError as e:
+                if attempt == attempts - 1:
+                    raise
+                delay = _backoff(attempt)
+                logger.warning(f"RapidAPI request to {host} failed ({e!r}), retrying in {delay:.1f}s")
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                    return response.status_code, response.json()
+                delay = _backoff(attempt, response)
+                logger.warning(f"RapidAPI request to {host} returned {response.status_code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        payload: Optional[Dict[str, Any]] = None,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        rate_limit: Optional[int] = None,
+        cache_ttl: Optional[int] = None,
+    ) -> Any:
+        """Send a GET (payload as query parameters) or POST (payload as JSON) and return the JSON body.
+
+        Only 2xx responses are cached. ``rate_limit`` (requests per second for
+        the URL's host) and ``cache_ttl`` (seconds, 0 disables caching) default
+        to RAPID_API_REQUESTS_PER_SECOND and RAPID_API_CACHE_TTL.
+        """
+        method = method.upper()
+        ttl = cache_ttl if cache_ttl is not None else (self.cache_ttl if self.cache_ttl is not None else config.RAPID_API_CACHE_TTL)
+        digest = response_digest(method, url, payload)
+
+        if ttl > 0:
+            cached = await self.cache.get(digest)
+            if cached is not MISS:
+                return cached
+
+        http = self._get_http()
+
+        async def fetch() -> Any:
+            status, body = await self._send(http, method, url, payload, headers, rate_limit)
+            if ttl > 0 and 200 <= status < 300:
+                await self.cache.set(digest, body, ttl)
+            return body
+
+        return await self._single_flight.run(digest, fetch)
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.cache.hits, 'misses': self.cache.misses, 'requests': self.requests}
+
+
+rapid_api_client = RapidApiClient()
@@ -10,6 +10,7 @@ from uuid import uuid4
 from bs4 import BeautifulSoup
 from core.agentpress.thread_manager import ThreadManager
 from core.agentpress.tool import ToolResult, openapi_schema, tool_metadata
+from core.sandbox.document_store import SandboxDocumentStore
 from core.sandbox.tool_base import SandboxToolsBase
 from core.tools.fonts import get_lmroman_data_uri
 from core.utils.config import config
@@ -33,26 +34,32 @@ class SandboxDocsTool(SandboxToolsBase):
         super().__init__(project_id, thread_manager)
         self.docs_dir = "/workspace/docs"
         self.metadata_file = "/workspace/docs/.metadata.json"
-        
-    async def _ensure_docs_directory(self):
-        await self._ensure_sandbox()
-        try:
-            await self.sandbox.fs.make_dir(self.docs_dir)
-        except:
-            pass
+        # Documents and the metadata index are written back in one upload per tool call
+        self._store = SandboxDocumentStore(self)
             
     async def _load_metadata(self) -> Dict[str, Any]:
-        try:
-            await self._ensure_sandbox()
-            content = await self.sandbox.fs.download_file(self.metadata_file)
-            return json.loads(content.decode())
-        except:
-            return {"documents": {}}
-            
-    async def _save_metadata(self, metadata: Dict[str, Any]):
-        await self._ensure_sandbox()
-        content = json.dumps(metadata, indent=2)
-        await self.sandbox.fs.upload_file(content.encode(), self.metadata_file)
+        metadata = await self._store.read_json(self.metadata_file)
+        return metadata if metadata is not None else {"documents": {}}
+
+    async def _update_metadata(self, change) -> None:
+        await self._store.update_json(self.metadata_file, change, default=lambda: {"documents": {}})
+
+    async def _set_document(self, doc_id: str, doc_info: Dict[str, Any]) -> None:
+        def change(metadata: Dict[str, Any]) -> None:
+            metadata.setdefault("documents", {})[doc_id] = doc_info
+        await self._update_metadata(change)
+
+    async def _update_document(self, doc_id: str, **fields: Any) -> None:
+        def change(metadata: Dict[str, Any]) -> None:
+            doc_info = metadata.setdefault("documents", {}).get(doc_id)
+            if doc_info is not None:
+                doc_info.update(fields)
+        await self._update_metadata(change)
+
+    async def _remove_document(self, doc_id: str) -> None:
+        def change(metadata: Dict[str, Any]) -> None:
+            metadata.setdefault("documents", {}).pop(doc_id, None)
+        await self._update_metadata(change)
         
     def _generate_doc_id(self) -> str:
         return f"doc_{uuid.uuid4().hex[:8]}"
@@ -489,7 +496,8 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
     })
     async def create_document(self, title: str, content: str, format: str = "html", metadata: Optional[Dict] = None) -> ToolResult:
         try:
-            await self._ensure_docs_directory()
+            self._store.refresh()
+            await self._ensure_sandbox()
 
             doc_id = self._generate_doc_id()
             extension = "doc" if format == "html" else format
@@ -537,9 +545,8 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
             else:
                 content_to_save = content
             
-            await self.sandbox.fs.upload_file(content_to_save.encode(), file_path)
+            self._store.write_file(file_path, content_to_save.encode())
             
-            all_metadata = await self._load_metadata()
             doc_info = {
                 "id": doc_id,
                 "title": title,
@@ -552,8 +559,8 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
                 "is_tiptap_doc": format == "html",
                 "doc_type": "tiptap_document" if format == "html" else "plain"
             }
-            all_metadata["documents"][doc_id] = doc_info
-            await self._save_metadata(all_metadata)
+            await self._set_document(doc_id, doc_info)
+            await self._store.flush()
             
             preview_url = None
             if hasattr(self, '_sandbox_url') and self._sandbox_url:
@@ -594,6 +601,7 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
     })
     async def read_document(self, doc_id: str) -> ToolResult:
         try:
+            self._store.refresh()
             await self._ensure_sandbox()
             
             all_metadata = await self._load_metadata()
@@ -601,7 +609,7 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
             if doc_id not in all_metadata["documents"]:
                 return self.fail_response(f"Document with ID '{doc_id}' not found")
             
-            doc_info = all_metadata["documents"][doc_id]
+            doc_info = dict(all_metadata["documents"][doc_id])
             
             content_raw = await self.sandbox.fs.download_file(doc_info["path"])
             content_str = content_raw.decode()
@@ -663,6 +671,7 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
     })
     async def list_documents(self, tag: Optional[str] = None) -> ToolResult:
         try:
+            self._store.refresh()
             await self._ensure_sandbox()
             
             all_metadata = await self._load_metadata()
@@ -713,6 +722,7 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
     })
     async def delete_document(self, doc_id: str) -> ToolResult:
         try:
+            self._store.refresh()
             await self._ensure_sandbox()
             
             all_metadata = await self._load_metadata()
@@ -722,13 +732,14 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
             
             doc_info = all_metadata["documents"][doc_id]
             
+            self._store.forget(doc_info["path"])
             try:
                 await self.sandbox.fs.delete_file(doc_info["path"])
             except:
                 pass
 
-            del all_metadata["documents"][doc_id]
-            await self._save_metadata(all_metadata)
+            await self._remove_document(doc_id)
+            await self._store.flush()
             
             return self.success_response({
                 "success": True,
@@ -1115,6 +1126,7 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
     })
     async def convert_to_pdf(self, doc_id: str, download: bool = False) -> ToolResult:
         try:
+            self._store.refresh()
             await self._ensure_sandbox()
             
             all_metadata = await self._load_metadata()
@@ -1151,7 +1163,7 @@ IMPORTANT: All content must be wrapped in proper HTML tags. Do not use unsupport
             
             temp_html_filename = f"temp_pdf_{doc_id}.html"
             temp_html_path = f"/workspace/{temp_html_filename}"
-            await self.sandbox.fs.upload_file(complete_html.encode(), temp_html_path)
+            self._store.write_file(temp_html_path, complete_html.encode())
             
             logger.info(f"Creating PDF from document: {title}")
             
@@ -1237,7 +1249,8 @@ if __name__ == "__main__":
 """
             
             script_path = f"/workspace/temp_pdf_script_{doc_id}.py"
-            await self.sandbox.fs.upload_file(pdf_generation_script.encode(), script_path)
+            self._store.write_file(script_path, pdf_generation_script.encode())
+            await self._store.flush()
             
             response = await self.sandbox.process.exec(
                 f"cd /workspace && python {script_path}",
@@ -1263,12 +1276,12 @@ if __name__ == "__main__":
                 "source_document": doc_info
             }
             
-            all_metadata["documents"][doc_id]["last_pdf_export"] = {
+            await self._update_document(doc_id, last_pdf_export={
                 "filename": pdf_filename,
                 "path": pdf_path,
                 "exported_at": datetime.now().isoformat()
-            }
-            await self._save_metadata(all_metadata)
+            })
+            await self._store.flush()
             
             preview_url = None
             download_url = None
@@ -1348,6 +1361,7 @@ if __name__ == "__main__":
     })
     async def convert_to_docx(self, doc_id: str, download: bool = False) -> ToolResult:
         try:
+            self._store.refresh()
             await self._ensure_sandbox()
             
             all_metadata = await self._load_metadata()
@@ -1431,15 +1445,15 @@ if __name__ == "__main__":
             
             # Save DOCX file to docs directory
             docx_path = f"/workspace/docs/{docx_filename}"
-            await self.sandbox.fs.upload_file(docx_content, docx_path)
+            self._store.write_file(docx_path, docx_content)
             
-            # Update metadata
-            all_metadata["documents"][doc_id]["last_docx_export"] = {
+            # Update metadata, written together with the DOCX file
+            await self._update_document(doc_id, last_docx_export={
                 "filename": docx_filename,
                 "path": docx_path,
                 "exported_at": datetime.now().isoformat()
-            }
-            await self._save_metadata(all_metadata)
+            })
+            await self._store.flush()
             
             preview_url = None
             download_url = None
@@ -3,7 +3,6 @@ from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
 import asyncio
 import time
-from core.sandbox.sandbox import get_preview_link_info
 
 @tool_metadata(
     display_name="Port Exposure",
@@ -61,7 +60,7 @@ class SandboxExposeTool(SandboxToolsBase):
                     pass
 
             # Get the preview link for the specified port
-            preview_info = await get_preview_link_info(self.sandbox, port)
+            preview_info = await self._get_preview_link(port)
             url = preview_info.url or preview_info.original_url
             
             return self.success_response({
@@ -1,10 +1,10 @@
 from core.agentpress.tool import ToolResult, openapi_schema, tool_metadata
 from core.sandbox.tool_base import SandboxToolsBase
+from core.sandbox.workspace_manifest import changes_since, workspace_manifests
 from core.utils.files_utils import should_exclude_file, clean_path
 from core.agentpress.thread_manager import ThreadManager
 from core.utils.logger import logger
 from core.utils.config import config
-from core.sandbox.sandbox import get_preview_link_info
 import os
 import json
 import litellm
@@ -44,41 +44,80 @@ class SandboxFilesTool(SandboxToolsBase):
         except Exception:
             return False
 
-    async def get_workspace_state(self) -> dict:
-        """Get the current workspace state by reading all files"""
+    async def get_workspace_state(self, include_content: bool = True) -> dict:
+        """Get the current workspace state from the project's workspace manifest.
+
+        The manifest is built in the sandbox, so only files whose content has
+        not been read before are downloaded; with ``include_content=False``
+        nothing is downloaded at all.
+        """
         files_state = {}
         try:
             # Ensure sandbox is initialized
             await self._ensure_sandbox()
             
-            files = await self.sandbox.fs.list_files(self.workspace_path)
-            for file_info in files:
-                rel_path = file_info.name
-                
-                # Skip excluded files and directories
-                if self._should_exclude_file(rel_path) or file_info.is_dir:
-                    continue
-
-                try:
-                    full_path = f"{self.workspace_path}/{rel_path}"
-                    content = (await self.sandbox.fs.download_file(full_path)).decode()
-                    files_state[rel_path] = {
-                        "content": content,
-                        "is_dir": file_info.is_dir,
-                        "size": file_info.size,
-                        "modified": file_info.mod_time
-                    }
-                except Exception as e:
-                    print(f"Error reading file {rel_path}: {e}")
-                except UnicodeDecodeError:
-                    print(f"Skipping binary file: {rel_path}")
+            manifest = await workspace_manifests.refresh(self.project_id, self.sandbox, self.workspace_path)
+            contents = {}
+            if include_content:
+                contents = await workspace_manifests.read_contents(self.sandbox, self.workspace_path, manifest, manifest.files)
+            for rel_path in sorted(manifest.files):
+                entry = manifest.entry(rel_path)
+                state = {
+                    "is_dir": False,
+                    "size": entry["size"],
+                    "modified": entry["modified"],
+                    "hash": entry["hash"],
+                    "revision": manifest.revision,
+                }
+                if include_content:
+                    # Binary and unreadable files have no text content
+                    if contents.get(rel_path) is None:
+                        continue
+                    state["content"] = contents[rel_path]
+                files_state[rel_path] = state
 
             return files_state
         
         except Exception as e:
-            print(f"Error getting workspace state: {str(e)}")
+            logger.error(f"Error getting workspace state: {str(e)}")
             return {}
 
+    @openapi_schema({
+        "type": "function",
+        "function": {
+            "name": "get_workspace_changes",
+            "description": "List the files in /workspace that were added, modified or deleted since a workspace revision, with their size, modification time and hash. Returns the current revision; pass it as since_revision next time to see only newer changes. Use since_revision 0 to list every file.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "since_revision": {
+                        "type": "integer",
+                        "description": "Workspace revision returned by an earlier call. Defaults to 0 (all files).",
+                        "default": 0
+                    }
+                },
+                "required": []
+            }
+        }
+    })
+    async def get_workspace_changes(self, since_revision: int = 0) -> ToolResult:
+        try:
+            # Ensure sandbox is initialized
+            await self._ensure_sandbox()
+            
+            manifest = await workspace_manifests.refresh(self.project_id, self.sandbox, self.workspace_path)
+            changes = changes_since(manifest, since_revision)
+            return self.success_response({
+                "revision": changes.revision,
+                "since_revision": changes.since,
+                "complete": changes.complete,
+                "added": [manifest.entry(path) for path in changes.added],
+                "modified": [manifest.entry(path) for path in changes.modified],
+                "deleted": changes.deleted,
+            })
+        except Exception as e:
+            return self.fail_response(f"Error getting workspace changes: {str(e)}")
+
 
     # def _get_preview_url(self, file_path: str) -> Optional[str]:
     #     """Get the preview URL for a file if it's an HTML file."""
@@ -145,7 +184,7 @@ class SandboxFilesTool(SandboxToolsBase):
             # Check if index.html was created and add 8080 server info (only in root workspace)
             if file_path.lower() == 'index.html':
                 try:
-                    website_info = await get_preview_link_info(self.sandbox, 8080)
+                    website_info = await self._get_preview_link(8080)
                     website_url = website_info.url or website_info.original_url
                     message += f"\n\n[Auto-detected index.html - HTTP server available at: {website_url}]"
                     message += "\n[Note: Use the provided HTTP server URL above instead of starting a new server]"
@@ -267,7 +306,7 @@ class SandboxFilesTool(SandboxToolsBase):
             # Check if index.html was rewritten and add 8080 server info (only in root workspace)
             if file_path.lower() == 'index.html':
                 try:
-                    website_info = await get_preview_link_info(self.sandbox, 8080)
+                    website_info = await self._get_preview_link(8080)
                     website_url = website_info.url or website_info.original_url
                     message += f"\n\n[Auto-detected index.html - HTTP server available at: {website_url}]"
                     message += "\n[Note: Use the provided HTTP server URL above instead of starting a new server]"
@@ -5,6 +5,7 @@ from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
 from core.utils.config import config
 from core.knowledge_base.validation import FileNameValidator, ValidationError
+from core.knowledge_base.retrieval import kb_retriever
 from core.utils.logger import logger
 
 @tool_metadata(
@@ -514,6 +515,8 @@ Agent ID: {agent_id}
             
             from core.services.supabase import DBConnection
             from core.knowledge_base.file_processor import FileProcessor
+            from core.knowledge_base.jobs import get_pending_jobs
+            from run_agent_background import process_knowledge_base_file
             import os
             import mimetypes
             
@@ -562,6 +565,7 @@ Agent ID: {agent_id}
             ).eq('account_id', account_id).eq('is_active', True).execute()
             
             current_total = sum(entry['file_size'] for entry in current_result.data)
+            current_total += sum(job['file_size'] for job in await get_pending_jobs(client, account_id))
             if current_total + len(file_content) > MAX_TOTAL_SIZE:
                 current_mb = current_total / (1024 * 1024)
                 new_mb = len(file_content) / (1024 * 1024)
@@ -571,9 +575,9 @@ Agent ID: {agent_id}
             from core.knowledge_base.validation import validate_file_name_unique_in_folder
             final_filename = await validate_file_name_unique_in_folder(filename, folder_id)
             
-            # Process file using existing processor
+            # Store the file and queue it; extraction and summarization run on a worker
             processor = FileProcessor()
-            result = await processor.process_file(
+            result = await processor.stage_file(
                 account_id=account_id,
                 folder_id=folder_id,
                 file_content=file_content,
@@ -586,13 +590,17 @@ Agent ID: {agent_id}
                 error_msg = result.get('error', 'Unknown processing error')
                 return self.fail_response(f"Failed to process file: {error_msg}")
             
+            process_knowledge_base_file.send(result['job_id'])
+            
             response_data = {
-                "message": f"Successfully uploaded '{final_filename}' to folder '{folder_name}'",
+                "message": f"Successfully uploaded '{final_filename}' to folder '{folder_name}'. It is being processed and will be available in the knowledge base shortly.",
                 "entry_id": result['entry_id'],
+                "job_id": result['job_id'],
+                "status": result['status'],
                 "filename": final_filename,
                 "folder_name": folder_name,
                 "file_size": len(file_content),
-                "summary": result.get('summary', 'Processing...')
+                "summary": 'Processing...'
             }
             
             # Add info about filename changes
@@ -600,7 +608,7 @@ Agent ID: {agent_id}
                 response_data["filename_changed"] = True
                 response_data["original_filename"] = filename
                 response_data["final_filename"] = final_filename
-                response_data["message"] = f"Successfully uploaded '{filename}' as '{final_filename}' to folder '{folder_name}' (name was auto-adjusted to avoid conflicts)"
+                response_data["message"] = f"Successfully uploaded '{filename}' as '{final_filename}' to folder '{folder_name}' (name was auto-adjusted to avoid conflicts). It is being processed and will be available in the knowledge base shortly."
             
             return self.success_response(response_data)
             
@@ -658,6 +666,7 @@ Agent ID: {agent_id}
                     return self.fail_response(f"Folder with ID '{item_id}' not found")
                 
                 deleted_folder = folder_result.data[0]
+                await kb_retriever.invalidate(account_id)
                 return self.success_response({
                     "message": f"Successfully deleted folder '{deleted_folder.get('name', 'Unknown')}' and all its files",
                     "deleted_type": "folder",
@@ -675,6 +684,7 @@ Agent ID: {agent_id}
                     return self.fail_response(f"File with ID '{item_id}' not found")
                 
                 deleted_file = file_result.data[0]
+                await kb_retriever.invalidate(account_id)
                 return self.success_response({
                     "message": f"Successfully deleted file '{deleted_file.get('filename', 'Unknown')}'",
                     "deleted_type": "file",
@@ -765,6 +775,8 @@ Agent ID: {agent_id}
                     'enabled': enabled
                 }).execute()
             
+            await kb_retriever.invalidate(account_id)
+            
             status = "enabled" if enabled else "disabled"
             return self.success_response({
                 "message": f"Successfully {status} file '{filename}' for this agent",
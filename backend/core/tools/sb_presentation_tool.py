@@ -20,6 +20,7 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 
 from core.agentpress.thread_manager import ThreadManager
 from core.agentpress.tool import ToolResult, openapi_schema, tool_metadata
+from core.sandbox.document_store import SandboxDocumentStore
 from core.sandbox.tool_base import SandboxToolsBase
 from core.utils.logger import logger
 from .presentation_themes import DEFAULT_THEME_KEY, PRESENTATION_THEMES, get_theme
@@ -185,69 +186,66 @@ class PresentationState:
 
 
 class PresentationStorage:
+    """Presentation metadata and slides, written back to the sandbox by ``flush()``."""
+
     def __init__(self, tool: "ProfessionalPresentationTool"):
         self.tool = tool
         self.root_dir = f"{tool.workspace_path}/presentations"
         self.index_path = f"{self.root_dir}/.metadata.json"
+        self.store = SandboxDocumentStore(tool)
 
-    async def ensure_root(self) -> None:
-        await self.tool._ensure_sandbox()
-        try:
-            await self.tool.sandbox.fs.make_dir(self.root_dir)
-        except Exception:
-            pass
-
-    async def ensure_presentation_dir(self, presentation_name: str) -> str:
-        await self.ensure_root()
-        presentation_dir = f"{self.root_dir}/{presentation_name}"
-        try:
-            await self.tool.sandbox.fs.make_dir(presentation_dir)
-        except Exception:
-            pass
-        return presentation_dir
+    def _metadata_path(self, presentation_name: str) -> str:
+        return f"{self.root_dir}/{presentation_name}/metadata.json"
 
     async def load(self, presentation_reference: str, *, create_if_missing: bool = False, default_title: Optional[str] = None, default_theme: str = DEFAULT_THEME) -> PresentationState:
         name_candidate = sanitize_presentation_id(presentation_reference)
-        metadata_path = f"{self.root_dir}/{name_candidate}/metadata.json"
-
-        try:
-            raw = await self.tool.sandbox.fs.download_file(metadata_path)
-            metadata = json.loads(raw.decode())
-            state = PresentationState.from_metadata(metadata)
-            return state
-        except Exception:
-            if not create_if_missing:
-                raise FileNotFoundError(f"Presentation '{presentation_reference}' does not exist")
-
-            await self.ensure_presentation_dir(name_candidate)
-            now = utc_now()
-            state = PresentationState(
-                presentation_id=presentation_reference,
-                presentation_name=name_candidate,
-                title=default_title or presentation_reference,
-                theme=default_theme or DEFAULT_THEME,
-                created_at=now,
-                updated_at=now,
-            )
-            await self.save(state)
-            return state
+        metadata = await self.store.read_json(self._metadata_path(name_candidate))
+        if metadata is not None:
+            return PresentationState.from_metadata(metadata)
+        if not create_if_missing:
+            raise FileNotFoundError(f"Presentation '{presentation_reference}' does not exist")
+
+        now = utc_now()
+        state = PresentationState(
+            presentation_id=presentation_reference,
+            presentation_name=name_candidate,
+            title=default_title or presentation_reference,
+            theme=default_theme or DEFAULT_THEME,
+            created_at=now,
+            updated_at=now,
+        )
+        await self.save(state)
+        return state
 
     async def save(self, state: PresentationState) -> None:
-        await self.ensure_presentation_dir(state.presentation_name)
         state.updated_at = utc_now()
-        metadata_path = f"{self.root_dir}/{state.presentation_name}/metadata.json"
-        payload = json.dumps(state.to_metadata(), indent=2, ensure_ascii=False)
-        await self.tool.sandbox.fs.upload_file(payload.encode("utf-8"), metadata_path)
+        metadata_path = self._metadata_path(state.presentation_name)
+        metadata = state.to_metadata()
+        stored = await self.store.read_json(metadata_path) or {}
+
+        # Only what differs from the stored copy, so that replaying the change
+        # on a copy another run wrote keeps that run's slides
+        fields = {key: value for key, value in metadata.items() if key != "slides" and stored.get(key) != value}
+        stored_slides = stored.get("slides", {})
+        changed_slides = {key: value for key, value in metadata["slides"].items() if stored_slides.get(key) != value}
+        removed_slides = [key for key in stored_slides if key not in metadata["slides"]]
+
+        def change(data: Dict[str, Any]) -> None:
+            data.update(fields)
+            slides = data.setdefault("slides", {})
+            slides.update(changed_slides)
+            for key in removed_slides:
+                slides.pop(key, None)
+            data["slides"] = dict(sorted(slides.items(), key=lambda item: int(item[0]) if item[0].isdigit() else 0))
+            data["slide_count"] = len(slides)
+
+        await self.store.update_json(metadata_path, change)
+
+    def write_slide(self, state: PresentationState, slide: SlideEntry, rendered: str) -> None:
+        self.store.write_file(f"{self.root_dir}/{state.presentation_name}/{slide.filename}", rendered.encode("utf-8"))
 
     async def update_index(self, state: PresentationState) -> None:
-        await self.ensure_root()
-        try:
-            raw = await self.tool.sandbox.fs.download_file(self.index_path)
-            index = json.loads(raw.decode())
-        except Exception:
-            index = {"presentations": {}, "updated_at": utc_now()}
-
-        index.setdefault("presentations", {})[state.presentation_name] = {
+        entry = {
             "presentation_id": state.presentation_id,
             "title": state.title,
             "description": state.description,
@@ -258,26 +256,35 @@ class PresentationStorage:
             "presentation_name": state.presentation_name,
             "metadata_path": state.metadata_path,
         }
-        index["updated_at"] = utc_now()
-        await self.tool.sandbox.fs.upload_file(json.dumps(index, indent=2).encode("utf-8"), self.index_path)
+
+        def change(index: Dict[str, Any]) -> None:
+            index.setdefault("presentations", {})[state.presentation_name] = entry
+            index["updated_at"] = utc_now()
+
+        await self.store.update_json(self.index_path, change, default=lambda: {"presentations": {}})
 
     async def remove_from_index(self, presentation_name: str) -> None:
-        await self.ensure_root()
-        try:
-            raw = await self.tool.sandbox.fs.download_file(self.index_path)
-            index = json.loads(raw.decode())
-        except Exception:
+        index = await self.store.read_json(self.index_path)
+        if not index or presentation_name not in index.get("presentations", {}):
             return
 
-        presentations = index.get("presentations", {})
-        if presentation_name in presentations:
-            presentations.pop(presentation_name, None)
-            index["presentations"] = presentations
+        def change(index: Dict[str, Any]) -> None:
+            index.setdefault("presentations", {}).pop(presentation_name, None)
             index["updated_at"] = utc_now()
-            await self.tool.sandbox.fs.upload_file(json.dumps(index, indent=2).encode("utf-8"), self.index_path)
+
+        await self.store.update_json(self.index_path, change)
+
+    def forget(self, presentation_name: str) -> None:
+        self.store.forget(f"{self.root_dir}/{presentation_name}")
+
+    def refresh(self) -> None:
+        self.store.refresh()
+
+    async def flush(self) -> None:
+        await self.store.flush()
 
     async def list_presentations(self) -> List[PresentationState]:
-        await self.ensure_root()
+        await self.tool._ensure_sandbox()
         try:
             entries = await self.tool.sandbox.fs.list_files(self.root_dir)
         except Exception as exc:
@@ -705,8 +712,7 @@ class ProfessionalPresentationTool(SandboxToolsBase):
         theme: str = DEFAULT_THEME,
     ) -> ToolResult:
         try:
-            await self._storage.ensure_root()
-
+            self._storage.refresh()
             if slide_number < 1:
                 return self.fail_response("slide_number must be >= 1")
             if not presentation_id.strip():
@@ -748,11 +754,11 @@ class ProfessionalPresentationTool(SandboxToolsBase):
                 slide_index=slide_number,
                 total_slides=total_slides,
             )
-            slide_full_path = f"{self._storage.root_dir}/{state.presentation_name}/{slide_filename}"
-            await self.sandbox.fs.upload_file(rendered.encode("utf-8"), slide_full_path)
+            self._storage.write_slide(state, slide_entry, rendered)
 
             await self._storage.save(state)
             await self._storage.update_index(state)
+            await self._storage.flush()
 
             sandbox_links = await self._get_sandbox_links()
             sandbox_url = sandbox_links.get("sandbox_url")
@@ -799,6 +805,7 @@ class ProfessionalPresentationTool(SandboxToolsBase):
     })
     async def list_slides(self, presentation_id: str) -> ToolResult:
         try:
+            self._storage.refresh()
             state = await self._storage.load(presentation_id, create_if_missing=False)
             sandbox_links = await self._get_sandbox_links()
             sandbox_url = sandbox_links.get("sandbox_url")
@@ -850,12 +857,14 @@ class ProfessionalPresentationTool(SandboxToolsBase):
     })
     async def delete_slide(self, presentation_id: str, slide_number: int) -> ToolResult:
         try:
+            self._storage.refresh()
             state = await self._storage.load(presentation_id, create_if_missing=False)
             slide = state.slides.get(slide_number)
             if not slide:
                 return self.fail_response(f"Slide {slide_number} not found in presentation '{presentation_id}'")
 
             slide_full_path = f"{self._storage.root_dir}/{state.presentation_name}/{slide.filename}"
+            self._storage.store.forget(slide_full_path)
             try:
                 await self.sandbox.fs.delete_file(slide_full_path)
             except Exception as exc:
@@ -864,6 +873,7 @@ class ProfessionalPresentationTool(SandboxToolsBase):
             del state.slides[slide_number]
             await self._storage.save(state)
             await self._storage.update_index(state)
+            await self._storage.flush()
 
             response = {
                 "message": f"Slide {slide_number} '{slide.title}' deleted successfully",
@@ -894,6 +904,7 @@ class ProfessionalPresentationTool(SandboxToolsBase):
     })
     async def list_presentations(self) -> ToolResult:
         try:
+            self._storage.refresh()
             states = await self._storage.list_presentations()
             presentations = [
                 {
@@ -936,14 +947,18 @@ class ProfessionalPresentationTool(SandboxToolsBase):
     })
     async def delete_presentation(self, presentation_id: str) -> ToolResult:
         try:
+            self._storage.refresh()
             slug = sanitize_presentation_id(presentation_id)
             full_path = f"{self._storage.root_dir}/{slug}"
+            await self._ensure_sandbox()
             try:
                 await self.sandbox.fs.delete_folder(full_path)
             except Exception as exc:
                 return self.fail_response(f"Presentation '{presentation_id}' not found or could not be deleted: {exc}")
 
+            self._storage.forget(slug)
             await self._storage.remove_from_index(slug)
+            await self._storage.flush()
             return self.success_response({
                 "message": f"Presentation '{presentation_id}' deleted successfully",
                 "deleted_path": f"presentations/{slug}",
@@ -973,6 +988,7 @@ class ProfessionalPresentationTool(SandboxToolsBase):
     })
     async def validate_slide(self, presentation_id: str, slide_number: int) -> ToolResult:
         try:
+            self._storage.refresh()
             state = await self._storage.load(presentation_id, create_if_missing=False)
             slide = state.slides.get(slide_number)
             if not slide:
@@ -1072,6 +1088,7 @@ print(json.dumps(asyncio.run(measure())))
         description: str = "",
     ) -> ToolResult:
         try:
+            self._storage.refresh()
             state = await self._storage.load(presentation_id, create_if_missing=False)
             state.title = presentation_title
             state.description = description or state.description
@@ -1089,11 +1106,11 @@ print(json.dumps(asyncio.run(measure())))
                     slide_index=idx,
                     total_slides=total_slides,
                 )
-                slide_full_path = f"{self._storage.root_dir}/{state.presentation_name}/{slide.filename}"
-                await self.sandbox.fs.upload_file(rendered.encode("utf-8"), slide_full_path)
+                self._storage.write_slide(state, slide, rendered)
 
             await self._storage.save(state)
             await self._storage.update_index(state)
+            await self._storage.flush()
 
             sandbox_links = await self._get_sandbox_links()
             sandbox_url = sandbox_links.get("sandbox_url")
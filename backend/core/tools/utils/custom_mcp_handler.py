@@ -2,9 +2,8 @@ import json
 import asyncio
 from typing import Dict, Any, List
 from mcp import ClientSession, StdioServerParameters
-from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
-from mcp.client.streamable_http import streamablehttp_client
+from core.mcp_module.session_pool import mcp_session_pool, get_composio_mcp_url
 from core.utils.logger import logger
 from .mcp_connection_manager import MCPConnectionManager
 
@@ -65,23 +64,15 @@ class CustomMCPHandler:
             return
         
         try:
-            from core.composio_integration.composio_profile_service import ComposioProfileService
-            from core.services.supabase import DBConnection
-            
-            db = DBConnection()
-            profile_service = ComposioProfileService(db)
-            mcp_url = await profile_service.get_mcp_url_for_runtime(profile_id)
+            mcp_url = await get_composio_mcp_url(profile_id)
             
             logger.debug(f"Resolved Composio profile {profile_id} to MCP URL")
 
-            async with streamablehttp_client(mcp_url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    await session.initialize()
-                    tools_result = await session.list_tools()
-                    tools = tools_result.tools if hasattr(tools_result, 'tools') else tools_result
-                    
-                    self._register_custom_tools(tools, server_name, enabled_tools, 'composio', server_config)
-                    logger.debug(f"Registered {len(tools)} tools from Composio MCP {server_name}")
+            tools_result = await mcp_session_pool.list_tools('http', mcp_url, server_config.get('headers', {}))
+            tools = tools_result.tools if hasattr(tools_result, 'tools') else tools_result
+            
+            self._register_custom_tools(tools, server_name, enabled_tools, 'composio', server_config)
+            logger.debug(f"Registered {len(tools)} tools from Composio MCP {server_name}")
             
         except Exception as e:
             logger.error(f"Failed to initialize Composio MCP {server_name}: {str(e)}")
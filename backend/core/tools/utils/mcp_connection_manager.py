@@ -1,9 +1,8 @@
 import asyncio
 from typing import Dict, Any, List
 from mcp import ClientSession, StdioServerParameters
-from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
-from mcp.client.streamable_http import streamablehttp_client
+from core.mcp_module.session_pool import mcp_session_pool
 from core.utils.logger import logger
 
 
@@ -16,89 +15,36 @@ class MCPConnectionManager:
         headers = server_config.get("headers", {})
         
         async with asyncio.timeout(timeout):
-            try:
-                async with sse_client(url, headers=headers) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        tools_result = await session.list_tools()
-                        
-                        tools_info = [
-                            {
-                                "name": tool.name,
-                                "description": tool.description,
-                                "input_schema": tool.inputSchema
-                            }
-                            for tool in tools_result.tools
-                        ]
-                        
-                        server_info = {
-                            "status": "connected",
-                            "transport": "sse",
-                            "url": url,
-                            "tools": tools_info
-                        }
-                        
-                        self.connected_servers[server_name] = server_info
-                        logger.debug(f"Connected to {server_name} via SSE ({len(tools_info)} tools)")
-                        return server_info
-                        
-            except TypeError as e:
-                if "unexpected keyword argument" in str(e):
-                    async with sse_client(url) as (read, write):
-                        async with ClientSession(read, write) as session:
-                            await session.initialize()
-                            tools_result = await session.list_tools()
-                            
-                            tools_info = [
-                                {
-                                    "name": tool.name,
-                                    "description": tool.description,
-                                    "input_schema": tool.inputSchema
-                                }
-                                for tool in tools_result.tools
-                            ]
-                            
-                            server_info = {
-                                "status": "connected",
-                                "transport": "sse",
-                                "url": url,
-                                "tools": tools_info
-                            }
-                            
-                            self.connected_servers[server_name] = server_info
-                            logger.debug(f"Connected to {server_name} via SSE ({len(tools_info)} tools)")
-                            return server_info
-                else:
-                    raise
+            tools_result = await mcp_session_pool.list_tools("sse", url, headers)
+        
+        server_info = {
+            "status": "connected",
+            "transport": "sse",
+            "url": url,
+            "tools": self._tools_info(tools_result)
+        }
+        
+        self.connected_servers[server_name] = server_info
+        logger.debug(f"Connected to {server_name} via SSE ({len(server_info['tools'])} tools)")
+        return server_info
     
     async def connect_http_server(self, server_name: str, server_config: Dict[str, Any], timeout: int = 15) -> Dict[str, Any]:
         url = server_config["url"]
+        headers = server_config.get("headers", {})
         
         async with asyncio.timeout(timeout):
-            async with streamablehttp_client(url) as (read_stream, write_stream, _):
-                async with ClientSession(read_stream, write_stream) as session:
-                    await session.initialize()
-                    tools_result = await session.list_tools()
-                    
-                    tools_info = [
-                        {
-                            "name": tool.name,
-                            "description": tool.description,
-                            "input_schema": tool.inputSchema
-                        }
-                        for tool in tools_result.tools
-                    ]
-                    
-                    server_info = {
-                        "status": "connected",
-                        "transport": "http",
-                        "url": url,
-                        "tools": tools_info
-                    }
-                    
-                    self.connected_servers[server_name] = server_info
-                    logger.debug(f"Connected to {server_name} via HTTP ({len(tools_info)} tools)")
-                    return server_info
+            tools_result = await mcp_session_pool.list_tools("http", url, headers)
+        
+        server_info = {
+            "status": "connected",
+            "transport": "http",
+            "url": url,
+            "tools": self._tools_info(tools_result)
+        }
+        
+        self.connected_servers[server_name] = server_info
+        logger.debug(f"Connected to {server_name} via HTTP ({len(server_info['tools'])} tools)")
+        return server_info
     
     async def connect_stdio_server(self, server_name: str, server_config: Dict[str, Any], timeout: int = 15) -> Dict[str, Any]:
         server_params = StdioServerParameters(
@@ -132,6 +78,17 @@ class MCPConnectionManager:
                     logger.debug(f"Connected to {server_name} via stdio ({len(tools_info)} tools)")
                     return server_info
     
+    @staticmethod
+    def _tools_info(tools_result) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": tool.name,
+                "description": tool.description,
+                "input_schema": tool.inputSchema
+            }
+            for tool in tools_result.tools
+        ]
+    
     def get_server_info(self, server_name: str) -> Dict[str, Any]:
         return self.connected_servers.get(server_name, {})
     
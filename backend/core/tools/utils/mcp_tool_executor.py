@@ -3,10 +3,9 @@ import asyncio
 from typing import Dict, Any
 from core.agentpress.tool import ToolResult
 from mcp import ClientSession, StdioServerParameters
-from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
-from mcp.client.streamable_http import streamablehttp_client
 from core.mcp_module import mcp_service
+from core.mcp_module.session_pool import mcp_session_pool, get_composio_mcp_url
 from core.utils.logger import logger
 
 
@@ -50,12 +49,7 @@ class MCPToolExecutor:
                 return self._create_error_result("Missing profile_id for Composio tool")
             
             try:
-                from core.composio_integration.composio_profile_service import ComposioProfileService
-                from core.services.supabase import DBConnection
-                
-                db = DBConnection()
-                profile_service = ComposioProfileService(db)
-                mcp_url = await profile_service.get_mcp_url_for_runtime(profile_id)
+                mcp_url = await get_composio_mcp_url(profile_id)
                 modified_tool_info = tool_info.copy()
                 modified_tool_info['custom_config'] = {
                     **custom_config,
@@ -84,36 +78,20 @@ class MCPToolExecutor:
         headers = custom_config.get('headers', {})
         
         async with asyncio.timeout(30):
-            try:
-                async with sse_client(url, headers=headers) as (read, write):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        result = await session.call_tool(original_tool_name, arguments)
-                        return self._create_success_result(self._extract_content(result))
-                        
-            except TypeError as e:
-                if "unexpected keyword argument" in str(e):
-                    async with sse_client(url) as (read, write):
-                        async with ClientSession(read, write) as session:
-                            await session.initialize()
-                            result = await session.call_tool(original_tool_name, arguments)
-                            return self._create_success_result(self._extract_content(result))
-                else:
-                    raise
+            result = await mcp_session_pool.call_tool('sse', url, headers, original_tool_name, arguments)
+            return self._create_success_result(self._extract_content(result))
     
     async def _execute_http_tool(self, tool_name: str, arguments: Dict[str, Any], tool_info: Dict[str, Any]) -> ToolResult:
         custom_config = tool_info['custom_config']
         original_tool_name = tool_info['original_name']
         
         url = custom_config['url']
+        headers = custom_config.get('headers', {})
         
         try:
             async with asyncio.timeout(30):
-                async with streamablehttp_client(url) as (read, write, _):
-                    async with ClientSession(read, write) as session:
-                        await session.initialize()
-                        result = await session.call_tool(original_tool_name, arguments)
-                        return self._create_success_result(self._extract_content(result))
+                result = await mcp_session_pool.call_tool('http', url, headers, original_tool_name, arguments)
+                return self._create_success_result(self._extract_content(result))
                         
         except Exception as e:
             logger.error(f"Error executing HTTP MCP tool: {str(e)}")
@@ -1,30 +1,16 @@
-from tavily import AsyncTavilyClient
-import httpx
 from dotenv import load_dotenv
 from core.agentpress.tool import Tool, ToolResult, openapi_schema, tool_metadata
 from core.utils.config import config
 from core.sandbox.tool_base import SandboxToolsBase
 from core.agentpress.thread_manager import ThreadManager
+from core.services.web_retrieval import web_retrieval, TavilyRateLimitError, TavilyAPIError
 import json
 import datetime
 import asyncio
 import logging
-from typing import Optional
 
 # TODO: add subpages, etc... in filters as sometimes its necessary 
 
-class TavilyRateLimitError(Exception):
-    """Custom exception for Tavily API rate limit errors"""
-    def __init__(self, message: str, retry_after: Optional[int] = None):
-        super().__init__(message)
-        self.retry_after = retry_after
-
-class TavilyAPIError(Exception):
-    """Custom exception for general Tavily API errors"""
-    def __init__(self, message: str, status_code: Optional[int] = None):
-        super().__init__(message)
-        self.status_code = status_code
-
 @tool_metadata(
     display_name="Web Search",
     description="Search the internet for information, news, and research",
@@ -43,128 +29,14 @@ class SandboxWebSearchTool(SandboxToolsBase):
         # Use API keys from config
         self.tavily_api_key = config.TAVILY_API_KEY
         self.firecrawl_api_key = config.FIRECRAWL_API_KEY
-        self.firecrawl_url = config.FIRECRAWL_URL
         
         if not self.tavily_api_key:
             raise ValueError("TAVILY_API_KEY not found in configuration")
         if not self.firecrawl_api_key:
             raise ValueError("FIRECRAWL_API_KEY not found in configuration")
 
-        # Tavily asynchronous search client
-        self.tavily_client = AsyncTavilyClient(api_key=self.tavily_api_key)
-        
-        # Rate limiting configuration
-        self.max_retries = 3
-        self.base_delay = 1.0  # Base delay in seconds
-        
-        # API usage tracking
-        self._usage_count = 0
-        self._last_reset_time = datetime.datetime.now()
-
-    def _track_api_usage(self):
-        """Track API usage and log warnings if approaching limits"""
-        self._usage_count += 1
-        current_time = datetime.datetime.now()
-        
-        # Reset counter every hour
-        if (current_time - self._last_reset_time).total_seconds() > 3600:
-            self._usage_count = 1
-            self._last_reset_time = current_time
-        
-        # Log usage every 10 requests
-        if self._usage_count % 10 == 0:
-            logging.info(f"Tavily API usage: {self._usage_count} requests in the last hour")
-        
-        # Warning at 50 requests (assuming free tier limit is around 100/hour)
-        if self._usage_count == 50:
-            logging.warning(f"Tavily API usage approaching limit: {self._usage_count} requests in the last hour")
-
-    async def _tavily_search_with_retry(self, query: str, max_results: int) -> dict:
-        """
-        Execute Tavily search with retry logic and proper error handling.
-        
-        Args:
-            query: Search query
-            max_results: Maximum number of results to return
-            
-        Returns:
-            Search response from Tavily API
-            
-        Raises:
-            TavilyRateLimitError: When rate limit is exceeded
-            TavilyAPIError: For other API errors
-        """
-        last_exception = None
-        
-        for attempt in range(self.max_retries + 1):
-            try:
-                # Track API usage
-                self._track_api_usage()
-                
-                logging.info(f"Executing Tavily search (attempt {attempt + 1}/{self.max_retries + 1}) for query: '{query}'")
-                
-                search_response = await self.tavily_client.search(
-                    query=query,
-                    max_results=max_results,
-                    include_images=True,
-                    include_answer="advanced",
-                    search_depth="advanced",
-                )
-                
-                logging.info(f"Tavily search successful for query: '{query}'")
-                return search_response
-                
-            except Exception as e:
-                last_exception = e
-                error_message = str(e)
-                error_lower = error_message.lower()
-                
-                logging.warning(f"Tavily search attempt {attempt + 1} failed: {error_message}")
-                
-                # Check for rate limit errors
-                if any(keyword in error_lower for keyword in ['rate limit', 'quota exceeded', 'too many requests', '429']):
-                    if attempt < self.max_retries:
-                        # Calculate exponential backoff delay
-                        delay = self.base_delay * (2 ** attempt)
-                        logging.warning(f"Rate limit detected, retrying in {delay} seconds...")
-                        await asyncio.sleep(delay)
-                        continue
-                    else:
-                        # Max retries exceeded
-                        raise TavilyRateLimitError(
-                            f"Tavily API rate limit exceeded after {self.max_retries + 1} attempts. "
-                            f"Please try again later. Error: {error_message}"
-                        )
-                
-                # Check for authentication errors
-                elif any(keyword in error_lower for keyword in ['unauthorized', '401', 'invalid api key', 'authentication']):
-                    raise TavilyAPIError(
-                        f"Tavily API authentication failed: {error_message}",
-                        status_code=401
-                    )
-                
-                # Check for other HTTP errors
-                elif any(keyword in error_lower for keyword in ['400', 'bad request', 'invalid request']):
-                    raise TavilyAPIError(
-                        f"Invalid request to Tavily API: {error_message}",
-                        status_code=400
-                    )
-                
-                # For other errors, retry if we haven't exceeded max attempts
-                elif attempt < self.max_retries:
-                    delay = self.base_delay * (2 ** attempt)
-                    logging.warning(f"API error detected, retrying in {delay} seconds...")
-                    await asyncio.sleep(delay)
-                    continue
-                else:
-                    # Max retries exceeded for other errors
-                    raise TavilyAPIError(
-                        f"Tavily API error after {self.max_retries + 1} attempts: {error_message}"
-                    )
-        
-        # This should never be reached, but just in case
-        if last_exception:
-            raise TavilyAPIError(f"Unexpected error in Tavily search: {str(last_exception)}")
+        # Searches and scrapes go through the shared, cached web retrieval layer
+        self.web_retrieval = web_retrieval
 
     @openapi_schema({
         "type": "function",
@@ -216,7 +88,7 @@ class SandboxWebSearchTool(SandboxToolsBase):
 
             # Execute the search with Tavily using retry logic
             logging.info(f"Executing web search for query: '{query}' with {num_results} results")
-            search_response = await self._tavily_search_with_retry(query, num_results)
+            search_response = await self.web_retrieval.search(query, num_results)
             
             # Check if we have actual results or an answer
             results = search_response.get('results', [])
@@ -403,52 +275,13 @@ class SandboxWebSearchTool(SandboxToolsBase):
         
         try:
             # ---------- Firecrawl scrape endpoint ----------
-            logging.info(f"Sending request to Firecrawl for URL: {url}")
-            async with httpx.AsyncClient() as client:
-                headers = {
-                    "Authorization": f"Bearer {self.firecrawl_api_key}",
-                    "Content-Type": "application/json",
-                }
-                # Determine formats to request based on include_html flag
-                formats = ["markdown"]
-                if include_html:
-                    formats.append("html")
-                
-                payload = {
-                    "url": url,
-                    "formats": formats
-                }
-                
-                # Use longer timeout and retry logic for more reliability
-                max_retries = 3
-                timeout_seconds = 30
-                retry_count = 0
-                
-                while retry_count < max_retries:
-                    try:
-                        logging.info(f"Sending request to Firecrawl (attempt {retry_count + 1}/{max_retries})")
-                        response = await client.post(
-                            f"{self.firecrawl_url}/v1/scrape",
-                            json=payload,
-                            headers=headers,
-                            timeout=timeout_seconds,
-                        )
-                        response.raise_for_status()
-                        data = response.json()
-                        logging.info(f"Successfully received response from Firecrawl for {url}")
-                        break
-                    except (httpx.ReadTimeout, httpx.ConnectTimeout, httpx.ReadError) as timeout_err:
-                        retry_count += 1
-                        logging.warning(f"Request timed out (attempt {retry_count}/{max_retries}): {str(timeout_err)}")
-                        if retry_count >= max_retries:
-                            raise Exception(f"Request timed out after {max_retries} attempts with {timeout_seconds}s timeout")
-                        # Exponential backoff
-                        logging.info(f"Waiting {2 ** retry_count}s before retry")
-                        await asyncio.sleep(2 ** retry_count)
-                    except Exception as e:
-                        # Don't retry on non-timeout errors
-                        logging.error(f"Error during scraping: {str(e)}")
-                        raise e
+            # Determine formats to request based on include_html flag
+            formats = ["markdown"]
+            if include_html:
+                formats.append("html")
+            
+            data = await self.web_retrieval.scrape(url, formats)
+            logging.info(f"Successfully received response from Firecrawl for {url}")
 
             # Format the response
             title = data.get("data", {}).get("metadata", {}).get("title", "")
@@ -283,6 +283,60 @@ class Configuration:
     REDIS_PASSWORD: Optional[str] = None
     REDIS_SSL: bool = True
     
+    # Agent run response streaming: consecutive content chunks are merged for
+    # up to this many ms / bytes before being written (0 ms disables merging)
+    AGENT_STREAM_COALESCE_MS: int = 30
+    AGENT_STREAM_COALESCE_BYTES: int = 2048
+    
+    # Context compression: parallel summarization calls and summary cache TTL
+    CONTEXT_SUMMARY_CONCURRENCY: int = 8
+    CONTEXT_SUMMARY_CACHE_TTL: int = 3600 * 24 * 7
+    
+    # Knowledge base retrieval: chunks relevant to the latest user message are
+    # injected instead of the whole knowledge base
+    KB_RETRIEVAL_ENABLED: bool = True
+    KB_RETRIEVAL_TOP_K: int = 8
+    KB_RETRIEVAL_TOKEN_BUDGET: int = 1500
+    KB_INDEX_TTL: int = 600
+    
+    # Embedding pipeline: texts are grouped into batches of at most this many
+    # tokens / texts, with up to EMBEDDING_CONCURRENCY batches in flight
+    EMBEDDING_BATCH_TOKENS: int = 8000
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_CACHE_TTL: int = 3600 * 24 * 30
+    
+    # Knowledge base uploads are processed by a background worker: per-account
+    # job concurrency, extraction processes per worker and extracted text cap
+    KB_EXTRACTION_ACCOUNT_CONCURRENCY: int = 2
+    KB_EXTRACTION_PROCESSES: int = 2
+    KB_EXTRACTION_MAX_CHARS: int = 4_000_000
+    
+    # RapidAPI data providers: pooled connections, requests per second per
+    # provider, retries of 429/5xx responses and response cache TTL (seconds)
+    RAPID_API_MAX_CONNECTIONS: int = 50
+    RAPID_API_REQUESTS_PER_SECOND: int = 5
+    RAPID_API_MAX_RETRIES: int = 3
+    RAPID_API_TIMEOUT: int = 30
+    RAPID_API_CACHE_TTL: int = 900
+    
+    # Web search tool: concurrent upstream requests per worker for Tavily
+    # searches and Firecrawl scrapes, and how long results are cached (seconds)
+    WEB_SEARCH_CONCURRENCY: int = 8
+    WEB_SCRAPE_CONCURRENCY: int = 10
+    WEB_SEARCH_CACHE_TTL: int = 3600
+    WEB_SCRAPE_CACHE_TTL: int = 3600 * 6
+    
+    # Browser tool: pooled connections to sandbox browser APIs and how
+    # screenshots are downsized before upload (longest side, JPEG quality)
+    BROWSER_API_MAX_CONNECTIONS: int = 100
+    BROWSER_SCREENSHOT_MAX_DIMENSION: int = 1280
+    BROWSER_SCREENSHOT_JPEG_QUALITY: int = 80
+    
+    # Shell tool: most bytes of command output returned per call; longer
+    # output is read in pages by byte offset
+    SHELL_OUTPUT_MAX_BYTES: int = 64 * 1024
+    
     # Daytona sandbox configuration
     DAYTONA_API_KEY: str
     DAYTONA_SERVER_URL: str
@@ -290,9 +344,11 @@ class Configuration:
     SANDBOX_PROXY_DOMAIN: Optional[str] = None
     SANDBOX_PROXY_PROTOCOL: str = "https"
     SANDBOX_PROXY_PORT: Optional[int] = None
+    SANDBOX_PREWARM_ON_RUN: bool = True
     
     # Search and other API keys
     TAVILY_API_KEY: str
+    TAVILY_URL: Optional[str] = "https://api.tavily.com"
     RAPID_API_KEY: str
     SERPER_API_KEY: Optional[str] = None
     CLOUDFLARE_API_TOKEN: Optional[str] = None
@@ -3,6 +3,7 @@ import json
 from typing import Optional, List
 from fastapi import HTTPException
 from core.services import redis
+from core.services.agent_run_stream import append_control, read_all_responses
 from ..utils.logger import logger
 from run_agent_background import update_agent_run_status, _cleanup_redis_response_list
 
@@ -55,11 +56,9 @@ async def stop_agent_run_with_helpers(agent_run_id: str, error_message: Optional
     final_status = "failed" if error_message else "stopped"
 
     # Attempt to fetch final responses from Redis
-    response_list_key = f"agent_run:{agent_run_id}:responses"
     all_responses = []
     try:
-        all_responses_json = await redis.lrange(response_list_key, 0, -1)
-        all_responses = [json.loads(r) for r in all_responses_json]
+        all_responses = await read_all_responses(agent_run_id)
         logger.debug(f"Fetched {len(all_responses)} responses from Redis for DB update on stop/fail: {agent_run_id}")
     except Exception as e:
         logger.error(f"Failed to fetch responses from Redis for {agent_run_id} during stop/fail: {e}")
@@ -77,6 +76,7 @@ async def stop_agent_run_with_helpers(agent_run_id: str, error_message: Optional
     global_control_channel = f"agent_run:{agent_run_id}:control"
     try:
         await redis.publish(global_control_channel, "STOP")
+        await append_control(agent_run_id, "STOP")
         logger.debug(f"Published STOP signal to global channel {global_control_channel}")
     except Exception as e:
         logger.error(f"Failed to publish STOP signal to global channel {global_control_channel}: {str(e)}")
@@ -483,7 +483,7 @@ async def fast_gemini_chat_non_streaming(
         )
         logger.debug(f"[Quick Chat] Using system instructions (length: {len(resolved_instructions)} chars)")
         chat = model.start_chat(history=conversation_history)
-        response = chat.send_message({
+        response = await chat.send_message_async({
             "role": "user",
             "parts": user_parts
         })
@@ -535,8 +535,8 @@ async def fast_gemini_chat_streaming(
             logger.debug(f"[Quick Chat Stream] Using system instructions (length: {len(resolved_instructions)} chars)")
             chat = model.start_chat(history=conversation_history)
             
-            # Stream response
-            response = chat.send_message({
+            # Stream response on the async client so the event loop keeps serving other requests
+            response = await chat.send_message_async({
                 "role": "user",
                 "parts": user_parts
             }, stream=True)
@@ -544,7 +544,7 @@ async def fast_gemini_chat_streaming(
             # Stream each token chunk as it arrives from Gemini
             # This gives the true letter-by-letter typewriter effect
             # For very large chunks, split them character-by-character for smooth streaming
-            for chunk in response:
+            async for chunk in response:
                 if chunk.text:
                     # If chunk is large, stream it character-by-character for smooth effect
                     if len(chunk.text) > 50:
@@ -981,7 +981,7 @@ async def run_adaptive_router(
     )
     logger.debug(f"[Adaptive] Using system instructions (length: {len(resolved_instructions)} chars)")
     chat = model.start_chat(history=conversation_history)
-    response = chat.send_message({
+    response = await chat.send_message_async({
         "role": "user",
         "parts": user_parts
     })
@@ -1061,7 +1061,8 @@ async def adaptive_chat_stream(
             chat = model.start_chat(history=conversation_history)
             
             # Start the API call - this is the critical path for zero latency!
-            response = chat.send_message({
+            # Async client: never blocks the event loop while Gemini generates
+            response = await chat.send_message_async({
                 "role": "user",
                 "parts": user_parts
             }, stream=True)
@@ -1076,7 +1077,7 @@ async def adaptive_chat_stream(
             streaming_answer = False
             
             # Stream tokens immediately - this is the key to zero latency!
-            for chunk in response:
+            async for chunk in response:
                 if chunk.text:
                     chunk_text = chunk.text
                     full_response += chunk_text
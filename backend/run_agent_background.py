@@ -8,12 +8,24 @@ import traceback
 from datetime import datetime, timezone
 from typing import Optional
 from core.services import redis
+from core.services.adaptive_input import AdaptiveInputMonitor
+from core.services.agent_run_stream import (
+    RESPONSE_STREAM_TTL,
+    ResponseStreamWriter,
+    append_control,
+    expire_response_stream,
+    response_stream_key,
+)
+from core.utils.config import config
 from core.run import run_agent
 from core.utils.logger import logger, structlog
 import dramatiq
 import uuid
 from core.agentpress.thread_manager import ThreadManager
 from core.services.supabase import DBConnection
+from core.billing.usage_ledger import usage_ledger
+from core.knowledge_base import jobs as kb_jobs
+from core.knowledge_base.file_processor import FileProcessor
 from core.services import redis
 from dramatiq.brokers.redis import RedisBroker
 import os
@@ -27,7 +39,12 @@ redis_host = os.getenv('REDIS_HOST', 'redis')
 redis_port = int(os.getenv('REDIS_PORT', 6379))
 
 logger.info(f"🔧 Configuring Dramatiq broker with Redis at {redis_host}:{redis_port}")
-redis_broker = RedisBroker(host=redis_host, port=redis_port, middleware=[dramatiq.middleware.AsyncIO()])
+# This list replaces Dramatiq's default middleware: retries are opt-in per actor (max_retries)
+redis_broker = RedisBroker(host=redis_host, port=redis_port, middleware=[
+    dramatiq.middleware.AsyncIO(),
+    dramatiq.middleware.CurrentMessage(),
+    dramatiq.middleware.Retries(max_retries=0),
+])
 
 dramatiq.set_broker(redis_broker)
 
@@ -48,6 +65,8 @@ async def initialize():
     logger.info(f"Initializing worker with Redis at {redis_host}:{redis_port}")
     await retry(lambda: redis.initialize_async())
     await db.initialize()
+    # Applies queued usage charges, including ones left behind by a previous worker
+    usage_ledger.start()
 
     _initialized = True
     logger.info(f"✅ Worker initialized successfully with instance ID: {instance_id}")
@@ -58,6 +77,19 @@ async def check_health(key: str):
     structlog.contextvars.clear_contextvars()
     await redis.set(key, "healthy", ex=redis.REDIS_KEY_TTL)
 
+@dramatiq.actor(max_retries=kb_jobs.MAX_RETRIES)
+async def process_knowledge_base_file(job_id: str):
+    """Extract, summarize and index an uploaded knowledge base file."""
+    structlog.contextvars.clear_contextvars()
+    structlog.contextvars.bind_contextvars(kb_job_id=job_id)
+    await initialize()
+
+    message = dramatiq.middleware.CurrentMessage.get_current_message()
+    retries = message.options.get("retries", 0) if message else 0
+    if not await FileProcessor().run_job(job_id, final_attempt=retries >= kb_jobs.MAX_RETRIES):
+        # The account's extraction slots are busy; try again shortly
+        process_knowledge_base_file.send_with_options(args=(job_id,), delay=kb_jobs.DEFER_DELAY_MS)
+
 @dramatiq.actor
 async def run_agent_background(
     agent_run_id: str,
@@ -119,12 +151,16 @@ async def run_agent_background(
     stop_signal_received = False
 
     # Define Redis keys and channels
-    response_list_key = f"agent_run:{agent_run_id}:responses"
-    response_channel = f"agent_run:{agent_run_id}:new_response"
     instance_control_channel = f"agent_run:{agent_run_id}:control:{instance_id}"
     global_control_channel = f"agent_run:{agent_run_id}:control"
     adaptive_input_channel = f"agent_run:{agent_run_id}:adaptive_input"
+    adaptive_input = AdaptiveInputMonitor(agent_run_id)
     instance_active_key = f"active_run:{instance_id}:{agent_run_id}"
+    response_writer = ResponseStreamWriter(
+        agent_run_id,
+        coalesce_ms=config.AGENT_STREAM_COALESCE_MS,
+        coalesce_bytes=config.AGENT_STREAM_COALESCE_BYTES,
+    )
 
     async def check_for_stop_signal():
         nonlocal stop_signal_received
@@ -135,7 +171,11 @@ async def run_agent_background(
                 if message and message.get("type") == "message":
                     data = message.get("data")
                     if isinstance(data, bytes): data = data.decode('utf-8')
-                    if data == "STOP":
+                    channel = message.get("channel")
+                    if isinstance(channel, bytes): channel = channel.decode('utf-8')
+                    if channel == adaptive_input_channel:
+                        adaptive_input.notify(data)
+                    elif data == "STOP":
                         logger.debug(f"Received STOP signal for agent run {agent_run_id} (Instance: {instance_id})")
                         stop_signal_received = True
                         break
@@ -173,13 +213,12 @@ async def run_agent_background(
             model_name=effective_model,
             agent_config=agent_config,
             trace=trace,
+            adaptive_input=adaptive_input,
         )
 
         final_status = "running"
         error_message = None
 
-        pending_redis_operations = []
-
         async for response in agent_gen:
             if stop_signal_received:
                 logger.debug(f"Agent run {agent_run_id} stopped by signal.")
@@ -187,10 +226,8 @@ async def run_agent_background(
                 trace.span(name="agent_run_stopped").end(status_message="agent_run_stopped", level="WARNING")
                 break
 
-            # Store response in Redis list and publish notification
-            response_json = json.dumps(response)
-            pending_redis_operations.append(asyncio.create_task(redis.rpush(response_list_key, response_json)))
-            pending_redis_operations.append(asyncio.create_task(redis.publish(response_channel, "new")))
+            # Append to the run's response stream (content chunks are coalesced)
+            await response_writer.write(response)
             total_responses += 1
 
             # Check for agent-signaled completion or error
@@ -235,12 +272,10 @@ async def run_agent_background(
              logger.info(f"Agent run {agent_run_id} completed normally (duration: {duration:.2f}s, responses: {total_responses})")
              completion_message = {"type": "status", "status": "completed", "message": "Agent run completed successfully"}
              trace.span(name="agent_run_completed").end(status_message="agent_run_completed")
-             await redis.rpush(response_list_key, json.dumps(completion_message))
-             await redis.publish(response_channel, "new") # Notify about the completion message
+             await response_writer.write(completion_message)
 
-        # Fetch final responses from Redis for DB update
-        all_responses_json = await redis.lrange(response_list_key, 0, -1)
-        all_responses = [json.loads(r) for r in all_responses_json]
+        # Flush any coalesced chunks before the stream is terminated
+        await response_writer.close()
 
         # Update DB status
         await update_agent_run_status(client, agent_run_id, final_status, error=error_message)
@@ -249,6 +284,7 @@ async def run_agent_background(
         control_signal = "END_STREAM" if final_status == "completed" else "ERROR" if final_status == "failed" else "STOP"
         try:
             await redis.publish(global_control_channel, control_signal)
+            await append_control(agent_run_id, control_signal)
             # No need to publish to instance channel as the run is ending on this instance
             logger.debug(f"Published final control signal '{control_signal}' to {global_control_channel}")
         except Exception as e:
@@ -279,11 +315,10 @@ async def run_agent_background(
         final_status = "failed"
         trace.span(name="agent_run_failed").end(status_message=error_message, level="ERROR")
 
-        # Push error message to Redis list
+        # Push error message to the response stream
         error_response = {"type": "status", "status": "error", "message": error_message}
         try:
-            await redis.rpush(response_list_key, json.dumps(error_response))
-            await redis.publish(response_channel, "new")
+            await response_writer.write(error_response)
         except Exception as redis_err:
              logger.error(f"Failed to push error response to Redis for {agent_run_id}: {redis_err}")
 
@@ -299,6 +334,7 @@ async def run_agent_background(
         # Publish ERROR signal
         try:
             await redis.publish(global_control_channel, "ERROR")
+            await append_control(agent_run_id, "ERROR")
             logger.debug(f"Published ERROR signal to {global_control_channel}")
         except Exception as e:
             logger.warning(f"Failed to publish ERROR signal: {str(e)}")
@@ -330,7 +366,12 @@ async def run_agent_background(
             except Exception as e:
                 logger.warning(f"Error closing pubsub for {agent_run_id}: {str(e)}")
 
-        # Set TTL on the response list in Redis
+        try:
+            await response_writer.close()
+        except Exception as e:
+            logger.warning(f"Failed to flush response stream for {agent_run_id}: {str(e)}")
+
+        # Set TTL on the response stream in Redis
         await _cleanup_redis_response_list(agent_run_id)
 
         # Remove the instance-specific active run key
@@ -339,12 +380,6 @@ async def run_agent_background(
         # Clean up the run lock
         await _cleanup_redis_run_lock(agent_run_id)
 
-        # Wait for all pending redis operations to complete, with timeout
-        try:
-            await asyncio.wait_for(asyncio.gather(*pending_redis_operations), timeout=30.0)
-        except asyncio.TimeoutError:
-            logger.warning(f"Timeout waiting for pending Redis operations for {agent_run_id}")
-
         logger.debug(f"Agent run background task fully completed for: {agent_run_id} (Instance: {instance_id}) with final status: {final_status}")
 
 async def _cleanup_redis_instance_key(agent_run_id: str):
@@ -370,17 +405,15 @@ async def _cleanup_redis_run_lock(agent_run_id: str):
     except Exception as e:
         logger.warning(f"Failed to clean up Redis run lock key {run_lock_key}: {str(e)}")
 
-# TTL for Redis response lists (24 hours)
-REDIS_RESPONSE_LIST_TTL = 3600 * 24
+# TTL for Redis response streams (24 hours)
+REDIS_RESPONSE_LIST_TTL = RESPONSE_STREAM_TTL
 
 async def _cleanup_redis_response_list(agent_run_id: str):
-    """Set TTL on the Redis response list."""
-    response_list_key = f"agent_run:{agent_run_id}:responses"
+    """Set TTL on the Redis response stream."""
     try:
-        await redis.expire(response_list_key, REDIS_RESPONSE_LIST_TTL)
-        # logger.debug(f"Set TTL ({REDIS_RESPONSE_LIST_TTL}s) on response list: {response_list_key}")
+        await expire_response_stream(agent_run_id, REDIS_RESPONSE_LIST_TTL)
     except Exception as e:
-        logger.warning(f"Failed to set TTL on response list {response_list_key}: {str(e)}")
+        logger.warning(f"Failed to set TTL on response stream {response_stream_key(agent_run_id)}: {str(e)}")
 
 async def update_agent_run_status(
     client,
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Load test for the agent run response transport.
+
+Replays one agent run of N response events to V concurrent viewers and
+compares the legacy list transport (RPUSH + PUBLISH per event, LRANGE per
+notification per viewer) with the Redis Streams transport (XADD per event,
+XREAD BLOCK per viewer). Events are produced every --interval seconds, like
+a streaming LLM response. Reports delivered events/s and Redis commands per
+event. Uses a local Redis at REDIS_URL (default redis://localhost:6379/15), or
+fakeredis when --fake is passed.
+
+Usage:
+    uv run python scripts/bench_agent_run_stream.py
+    uv run python scripts/bench_agent_run_stream.py --events 5000 --viewers 1 4 16 --fake
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict
+
+from core.services import agent_run_stream, redis
+
+
+class _CountingClient:
+    """Wraps a redis client and counts every command issued through it."""
+
+    def __init__(self, client: Any):
+        self._client = client
+        self.commands: Counter = Counter()
+
+    def pubsub(self):
+        return self._client.pubsub()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        async def counted(*args, **kwargs):
+            self.commands[name] += 1
+            return await attr(*args, **kwargs)
+
+        return counted
+
+
+def _make_client(fake: bool) -> Any:
+    if fake:
+        import fakeredis
+
+        return fakeredis.FakeAsyncRedis(decode_responses=True)
+    import redis.asyncio as aioredis
+
+    return aioredis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/15"), decode_responses=True)
+
+
+def _event(i: int) -> Dict[str, Any]:
+    return {"type": "assistant", "content": json.dumps({"content": f"token {i} "}), "metadata": "{}", "sequence": i}
+
+
+async def _legacy_run(client: _CountingClient, events: int, viewers: int, interval: float) -> int:
+    run_id = uuid.uuid4().hex
+    list_key = f"agent_run:{run_id}:responses"
+    channel = f"agent_run:{run_id}:new_response"
+    delivered = 0
+    ready = asyncio.Barrier(viewers + 1)
+
+    async def viewer() -> None:
+        nonlocal delivered
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        await ready.wait()
+        last = -1
+        done = False
+        while not done:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if not message:
+                continue
+            # Server-side push to the subscriber; counted as an op like any command
+            client.commands["pubsub_message"] += 1
+            for raw in await client.lrange(list_key, last + 1, -1):
+                last += 1
+                response = json.loads(raw)
+                _ = f"data: {json.dumps(response)}\n\n"
+                delivered += 1
+                if response.get("type") == "status":
+                    done = True
+        await pubsub.aclose()
+
+    tasks = [asyncio.create_task(viewer()) for _ in range(viewers)]
+    await ready.wait()
+    for i in range(events):
+        await client.rpush(list_key, json.dumps(_event(i)))
+        await client.publish(channel, "new")
+        await asyncio.sleep(interval)
+    await client.rpush(list_key, json.dumps({"type": "status", "status": "completed"}))
+    await client.publish(channel, "new")
+    await asyncio.gather(*tasks)
+    await client.delete(list_key)
+    return delivered
+
+
+async def _streams_run(client: _CountingClient, events: int, viewers: int, interval: float) -> int:
+    run_id = uuid.uuid4().hex
+    delivered = 0
+
+    async def viewer() -> None:
+        nonlocal delivered
+        async for frame in agent_run_stream.iter_sse_frames(run_id, block_ms=1000):
+            if frame.startswith("id:"):
+                delivered += 1
+
+    tasks = [asyncio.create_task(viewer()) for _ in range(viewers)]
+    await asyncio.sleep(0)
+    for i in range(events):
+        await agent_run_stream.append_response(run_id, _event(i))
+        await asyncio.sleep(interval)
+    await agent_run_stream.append_response(run_id, {"type": "status", "status": "completed"})
+    await asyncio.gather(*tasks)
+    await client.delete(agent_run_stream.response_stream_key(run_id))
+    return delivered
+
+
+async def _measure(transport: str, fake: bool, events: int, viewers: int, interval: float) -> Dict[str, Any]:
+    client = _CountingClient(_make_client(fake))
+    redis.client = client
+    redis._initialized = True
+
+    start = time.perf_counter()
+    runner = _legacy_run if transport == "list" else _streams_run
+    delivered = await runner(client, events, viewers, interval)
+    elapsed = time.perf_counter() - start
+
+    commands = sum(count for name, count in client.commands.items() if name != "delete")
+    return {
+        "delivered": delivered,
+        "events_per_s": delivered / elapsed if elapsed else 0.0,
+        "commands_per_event": commands / (events + 1),
+        "commands": dict(client.commands),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--viewers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--interval", type=float, default=0.001, help="Delay between produced events (s)")
+    parser.add_argument("--fake", action="store_true", help="Use fakeredis instead of a local Redis")
+    args = parser.parse_args()
+
+    for viewers in args.viewers:
+        for transport in ("list", "streams"):
+            result = asyncio.run(_measure(transport, args.fake, args.events, viewers, args.interval))
+            print(
+                f"{transport:>8} viewers={viewers:<3} delivered={result['delivered']:<7} "
+                f"events/s={result['events_per_s']:10,.0f} redis_cmds/event={result['commands_per_event']:6.2f} "
+                f"{result['commands']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for browser tool steps against a local fake browser API.
+
+Starts a fake browserApi.ts (``--step-ms`` of browser work per action, a
+1024x768 PNG screenshot that only changes when an action changes the page)
+and runs ``--steps`` navigate/act/extract/screenshot steps through:
+
+- exec + curl: a health check and the action each as a ``curl`` process
+  (spawned for real on this machine) behind a simulated Daytona exec call
+  (``--rtt-ms`` + ``--exec-ms``), base64 screenshot decoded, validated and
+  uploaded at full size on every step, as the browser tool worked before,
+- http transport: pooled HTTP to the API (``--rtt-ms`` per request), binary
+  screenshots, one health check, screenshots downsized and uploaded once per
+  distinct image.
+
+Uploads are simulated: ``--upload-ms`` plus the bytes at ``--upload-mbps``.
+
+Usage:
+    uv run python scripts/bench_browser_transport.py
+    uv run python scripts/bench_browser_transport.py --steps 50 --rtt-ms 40 --unchanged 0.5
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import random
+import statistics
+import time
+from typing import List, Tuple
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from core.sandbox import browser_api
+from core.sandbox.browser_api import (
+    BINARY_RESULT_TYPE,
+    BrowserApiClient,
+    HttpBrowserTransport,
+    ScreenshotStore,
+    downsize_screenshot,
+)
+
+
+def _screenshot(seed: int) -> bytes:
+    """A page-like 1024x768 PNG: header, text lines and a couple of photos."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (1024, 768), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 1024, 64), fill=(rng.randrange(256), 60, 120))
+    for y in range(96, 740, 18):
+        draw.line((40 + rng.randrange(20), y, rng.randrange(300, 980), y), fill=(40, 40, 40), width=9)
+    for x, y in ((560, 110), (560, 430)):
+        photo = Image.merge("RGB", [Image.effect_noise((420, 280), 40 + rng.randrange(30)) for _ in range(3)])
+        image.paste(photo.filter(ImageFilter.GaussianBlur(1)), (x, y))
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+class _MemoryRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+class _FakeBrowserApi:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.page_state = 0
+        self.screenshots = {}
+
+    async def start(self) -> Tuple[str, int]:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}", port
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    def _current_screenshot(self) -> bytes:
+        if self.page_state not in self.screenshots:
+            self.screenshots[self.page_state] = _screenshot(self.page_state)
+        return self.screenshots[self.page_state]
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                path = request_line.decode().split(" ")[1]
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                await reader.readexactly(int(headers.get("content-length", 0)))
+
+                if path.rstrip("/") == "/api":
+                    result, screenshot = {"status": "healthy", "service": "browserApi"}, None
+                else:
+                    await asyncio.sleep(self.args.step_ms / 1000)
+                    if path in ("/api/navigate", "/api/act") and self.rng.random() >= self.args.unchanged:
+                        self.page_state += 1
+                    result = {"success": True, "message": path, "url": f"https://example.com/{self.page_state}", "title": "Example"}
+                    screenshot = self._current_screenshot()
+
+                if screenshot is not None and BINARY_RESULT_TYPE in headers.get("accept", ""):
+                    content_type, data = BINARY_RESULT_TYPE, json.dumps(result).encode() + b"\n" + screenshot
+                else:
+                    if screenshot is not None:
+                        result["screenshot_base64"] = base64.b64encode(screenshot).decode()
+                    content_type, data = "application/json", json.dumps(result).encode()
+                writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _simulated_upload(args, data: bytes) -> str:
+    await asyncio.sleep(args.upload_ms / 1000 + len(data) * 8 / (args.upload_mbps * 1_000_000))
+    return "https://storage.example.com/screenshot.png"
+
+
+async def _exec_curl(args, port: int, endpoint: str, params: dict) -> dict:
+    """One ``sandbox.process.exec`` of a curl command: network + exec API overhead + a real process."""
+    await asyncio.sleep((args.rtt_ms + args.exec_ms) / 1000)
+    cmd = f"curl -s -X POST 'http://127.0.0.1:{port}/api/{endpoint}' -H 'Content-Type: application/json' -d '{json.dumps(params)}'"
+    if endpoint == "":
+        cmd = f"curl -s -X GET 'http://127.0.0.1:{port}/api' -H 'Content-Type: application/json'"
+    process = await asyncio.create_subprocess_shell(cmd, stdout=asyncio.subprocess.PIPE)
+    stdout, _ = await process.communicate()
+    return json.loads(stdout)
+
+
+async def _exec_step(args, port: int, endpoint: str, params: dict) -> None:
+    await _exec_curl(args, port, "", {})  # the health check the tool ran before every step
+    result = await _exec_curl(args, port, endpoint, params)
+    image = base64.b64decode(result.pop("screenshot_base64"), validate=True)
+    with Image.open(io.BytesIO(image)) as img:
+        img.verify()
+    await _simulated_upload(args, image)
+
+
+class _RemoteTransport(HttpBrowserTransport):
+    """Adds the backend-to-sandbox round trip that a local server does not have."""
+
+    def __init__(self, args, *a, **kw):
+        super().__init__(*a, **kw)
+        self.args = args
+
+    async def request(self, *a, **kw):
+        await asyncio.sleep(self.args.rtt_ms / 1000)
+        return await super().request(*a, **kw)
+
+
+def _steps(args) -> List[Tuple[str, dict]]:
+    rng = random.Random(args.seed + 1)
+    steps = [("navigate", {"url": "https://example.com"})]
+    while len(steps) < args.steps:
+        endpoint = rng.choices(["act", "extract", "screenshot", "navigate"], [5, 2, 1, 1])[0]
+        steps.append((endpoint, {"action": f"step {len(steps)}"} if endpoint == "act" else {"x": len(steps)}))
+    return steps
+
+
+async def _main(args) -> None:
+    server = _FakeBrowserApi(args)
+    base_url, port = await server.start()
+    steps = _steps(args)
+
+    async def upload(data, content_type, bucket_name, prefix):
+        return await _simulated_upload(args, data)
+
+    browser_api.upload_image_bytes = upload
+    browser_api.redis = _MemoryRedis()
+
+    runs = []
+    server.page_state, server.rng = 0, random.Random(args.seed)
+    timings = []
+    for endpoint, params in steps:
+        start = time.perf_counter()
+        await _exec_step(args, port, endpoint, params)
+        timings.append(time.perf_counter() - start)
+    runs.append(("exec + curl", timings))
+
+    server.page_state, server.rng = 0, random.Random(args.seed)
+    client = BrowserApiClient()
+    store = ScreenshotStore()
+    transport = _RemoteTransport(args, base_url, None, client)
+    timings = []
+    await transport.request("GET", "", timeout=10)  # one health check per tool instance
+    for endpoint, params in steps:
+        start = time.perf_counter()
+        response = await transport.request("POST", f"/{endpoint}", params)
+        await store.upload(response.screenshot)
+        timings.append(time.perf_counter() - start)
+    runs.append(("http transport", timings))
+    await client.aclose()
+    await server.stop()
+
+    sample = next(iter(server.screenshots.values()))
+    print(f"Steps: {len(steps)}  ({args.unchanged:.0%} of actions leave the page unchanged, {len(server.screenshots)} distinct screenshots)")
+    print(f"Simulated: browser {args.step_ms}ms/step, rtt {args.rtt_ms}ms, exec API {args.exec_ms}ms, "
+          f"upload {args.upload_ms}ms + {args.upload_mbps} Mbit/s")
+    print(f"Screenshot: {len(sample) / 1024:.0f} KB PNG, {len(base64.b64encode(sample)) / 1024:.0f} KB as base64, "
+          f"{len(downsize_screenshot(sample)[0]) / 1024:.0f} KB downsized")
+    print()
+    baseline = statistics.mean(runs[0][1])
+    for label, timings in runs:
+        ordered = sorted(timings)
+        mean = statistics.mean(timings)
+        print(f"{label:>15}: mean {mean * 1000:7.1f} ms  p50 {ordered[len(ordered) // 2] * 1000:7.1f} ms  "
+              f"p95 {ordered[int(len(ordered) * 0.95)] * 1000:7.1f} ms  ({baseline / mean:4.1f}x)")
+    print(f"{'screenshots':>15}: {store.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--unchanged", type=float, default=0.3, help="Fraction of actions that leave the page as it was")
+    parser.add_argument("--step-ms", type=float, default=50.0)
+    parser.add_argument("--rtt-ms", type=float, default=30.0)
+    parser.add_argument("--exec-ms", type=float, default=60.0)
+    parser.add_argument("--upload-ms", type=float, default=80.0)
+    parser.add_argument("--upload-mbps", type=float, default=100.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the summarization phase of context compression.
+
+Replaces the LLM with a fake that answers after a fixed latency and runs
+``ContextManager.summarize_messages`` over a synthetic backlog with different
+concurrency limits, then once more against a warm summary cache (fakeredis),
+reporting wall-clock time and the number of LLM calls.
+
+Usage:
+    uv run python scripts/bench_context_summarization.py
+    uv run python scripts/bench_context_summarization.py --messages 120 --latency-ms 400
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from core.agentpress import context_manager
+from core.agentpress.context_manager import ContextManager
+from core.agentpress.summary_cache import SummaryCache
+from core.services import redis
+
+
+def _install_fake_llm(latency: float) -> SimpleNamespace:
+    stats = SimpleNamespace(calls=0)
+
+    async def make_llm_api_call(messages, **kwargs):
+        stats.calls += 1
+        await asyncio.sleep(latency)
+        return {"choices": [{"message": {"content": "Short summary of the message."}}]}
+
+    context_manager.make_llm_api_call = make_llm_api_call
+    return stats
+
+
+def _install_fake_redis() -> None:
+    import fakeredis
+
+    redis.client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis._initialized = True
+
+
+def _backlog(count: int):
+    return [
+        {"role": "user" if i % 2 else "assistant", "content": f"Message {i}: " + "details about the task " * 40}
+        for i in range(count)
+    ]
+
+
+async def _run(messages, concurrency: int, cache: SummaryCache, stats: SimpleNamespace):
+    context_manager.summary_cache = cache
+    calls_before = stats.calls
+    start = time.perf_counter()
+    summaries = await ContextManager.__new__(ContextManager).summarize_messages(messages, concurrency=concurrency)
+    elapsed = time.perf_counter() - start
+    assert all(summaries), "summarization failed"
+    return elapsed, stats.calls - calls_before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=120)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    _install_fake_redis()
+    stats = _install_fake_llm(args.latency_ms / 1000)
+    messages = _backlog(args.messages)
+
+    async def scenarios():
+        for concurrency in (1, 4, 8, 16):
+            elapsed, calls = await _run(messages, concurrency, SummaryCache(), stats)
+            print(f"{'cold, concurrency=' + str(concurrency):>24}: {elapsed * 1000:8.0f} ms  llm_calls={calls}")
+            await redis.client.flushall()
+
+        shared = SummaryCache(ttl=60)
+        await _run(messages, 8, shared, stats)
+        # Next turn in another worker: only the Redis level is warm
+        elapsed, calls = await _run(messages, 8, SummaryCache(ttl=60), stats)
+        print(f"{'warm cache (redis)':>24}: {elapsed * 1000:8.0f} ms  llm_calls={calls}")
+        elapsed, calls = await _run(messages, 8, shared, stats)
+        print(f"{'warm cache (local)':>24}: {elapsed * 1000:8.0f} ms  llm_calls={calls}")
+
+    asyncio.run(scenarios())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark for per-LLM-call billing latency.
+
+Compares the previous read-modify-write deduction (select credit_accounts,
+update it, insert a credit_ledger row, invalidate the balance cache) with
+``UsageLedger.record`` (one pipelined Redis round trip; the deduction is
+applied by the background flusher). The database is simulated with a fixed
+round-trip time and Redis with fakeredis plus a simulated round trip. It also
+reports how many updates the read-modify-write path loses when calls for the
+same account overlap.
+
+Usage:
+    uv run python scripts/bench_credit_ledger.py
+    uv run python scripts/bench_credit_ledger.py --calls 500 --concurrency 8 --db-rtt-ms 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from decimal import Decimal
+from typing import List
+
+from core.billing import usage_ledger as ledger_module
+from core.billing.usage_ledger import UsageLedger
+from core.services import redis
+
+COST = Decimal("0.0125")
+
+
+class _SimulatedDB:
+    def __init__(self, balance: Decimal, rtt: float):
+        self.balance = balance
+        self.rtt = rtt
+        self.round_trips = 0
+        self.applied = set()
+
+    async def round_trip(self):
+        self.round_trips += 1
+        await asyncio.sleep(self.rtt)
+
+    async def apply_credit_usage(self, account_id, events, description, allow_partial=True):
+        await self.round_trip()
+        amount = sum(Decimal(e["amount"]) for e in events if e["id"] not in self.applied)
+        self.applied.update(e["id"] for e in events)
+        self.balance -= amount
+        return {"success": True, "amount_deducted": float(amount), "new_total": float(self.balance)}
+
+
+async def _read_modify_write(db: _SimulatedDB, redis_rtt: float) -> None:
+    await db.round_trip()               # select credit_accounts
+    current = db.balance
+    await db.round_trip()               # update credit_accounts
+    db.balance = current - COST
+    await db.round_trip()               # insert credit_ledger
+    await asyncio.sleep(redis_rtt)      # Cache.invalidate
+
+
+async def _timed_calls(call, calls: int, concurrency: int) -> List[float]:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies
+
+
+def _report(label: str, latencies: List[float], db: _SimulatedDB, start_balance: Decimal, calls: int) -> None:
+    lost = (db.balance - (start_balance - COST * calls)) / COST
+    p50 = statistics.median(latencies) * 1000
+    p99 = sorted(latencies)[int(len(latencies) * 0.99) - 1] * 1000
+    print(
+        f"{label:>22}: p50={p50:7.2f} ms  p99={p99:7.2f} ms  "
+        f"db_round_trips={db.round_trips:<5} lost_updates={lost:.0f}"
+    )
+
+
+async def _main(args) -> None:
+    import fakeredis
+
+    redis_rtt = args.redis_rtt_ms / 1000
+    db_rtt = args.db_rtt_ms / 1000
+    start_balance = Decimal("1000")
+
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def get_client():
+        await asyncio.sleep(redis_rtt)
+        return fake
+
+    redis.client, redis._initialized = fake, True
+    ledger_module.redis.get_client = get_client
+
+    db = _SimulatedDB(start_balance, db_rtt)
+    latencies = await _timed_calls(lambda: _read_modify_write(db, redis_rtt), args.calls, args.concurrency)
+    _report("read-modify-write", latencies, db, start_balance, args.calls)
+
+    db = _SimulatedDB(start_balance, db_rtt)
+    ledger = UsageLedger(flush_interval=args.flush_interval_ms / 1000)
+    ledger.apply_usage = db.apply_credit_usage
+    latencies = await _timed_calls(lambda: ledger.record("acct", COST, "bench usage"), args.calls, args.concurrency)
+    await ledger.stop()
+    _report("write-behind ledger", latencies, db, start_balance, args.calls)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=4, help="Overlapping LLM calls for one account")
+    parser.add_argument("--db-rtt-ms", type=float, default=15)
+    parser.add_argument("--redis-rtt-ms", type=float, default=1)
+    parser.add_argument("--flush-interval-ms", type=float, default=1000)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
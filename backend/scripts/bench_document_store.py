@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Round-trip benchmark for building a deck with the presentation tool.
+
+Creates a ``--slides`` slide deck (``create_slide`` per slide, then
+``finalize_presentation``) against an in-memory stand-in for the Daytona FS
+API where every call costs ``--rtt-ms``, and Redis calls cost ``--redis-ms``.
+Compares:
+
+- per-operation writes: the tool's previous flow - on every slide, download
+  the presentation metadata, upload the slide and the metadata, then download
+  and re-upload the presentations index (its ``make_dir`` calls are not
+  counted: the SDK has no such method, so they failed before any request),
+- write-back store: ``ProfessionalPresentationTool`` as it is now, where each
+  tool call ends with one batched ``upload_files`` of the slide(s), metadata
+  and index, and version claims go to Redis.
+
+Usage:
+    uv run python scripts/bench_document_store.py
+    uv run python scripts/bench_document_store.py --slides 40 --rtt-ms 40
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from core.sandbox import document_store
+from core.tools.sb_presentation_tool import (
+    PresentationState,
+    ProfessionalPresentationTool,
+    SlideEntry,
+    render_slide_html,
+    utc_now,
+)
+
+ROOT = "/workspace/presentations"
+
+
+class _MemoryFS:
+    """``sandbox.fs`` stand-in over a dict: every call costs a round trip."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.files = {}
+        self.round_trips = 0
+        self.bytes = 0
+
+    async def _round_trip(self, size: int = 0) -> None:
+        self.round_trips += 1
+        self.bytes += size
+        await asyncio.sleep(self.rtt)
+
+    async def download_file(self, path):
+        await self._round_trip()
+        if path not in self.files:
+            raise Exception(f"File not found: {path}")
+        self.bytes += len(self.files[path])
+        return self.files[path]
+
+    async def upload_file(self, content, path):
+        await self._round_trip(len(content))
+        self.files[path] = content
+
+    async def upload_files(self, files):
+        await self._round_trip(sum(len(f.source) for f in files))
+        for f in files:
+            self.files[f.destination] = f.source
+
+
+class _MemoryRedis:
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.values = {}
+        self.calls = 0
+
+    async def compare_and_set(self, key, expected, value, ex):
+        self.calls += 1
+        await asyncio.sleep(self.rtt)
+        current = self.values.get(key)
+        if current is not None and current != (expected or ""):
+            return False
+        self.values[key] = value
+        return True
+
+    async def set(self, key, value, ex=None):
+        self.calls += 1
+        await asyncio.sleep(self.rtt)
+        self.values[key] = value
+
+    async def get(self, key):
+        self.calls += 1
+        await asyncio.sleep(self.rtt)
+        return self.values.get(key)
+
+    async def compare_and_delete(self, key, expected):
+        self.calls += 1
+        await asyncio.sleep(self.rtt)
+        if self.values.get(key) != expected:
+            return False
+        del self.values[key]
+        return True
+
+
+class _BenchTool(ProfessionalPresentationTool):
+    def __init__(self, fs: _MemoryFS):
+        super().__init__("bench", None)
+        self._sandbox = SimpleNamespace(fs=fs)
+        self._sandbox_id = "bench"
+
+    async def _get_sandbox_links(self):
+        return {"sandbox_url": None, "vnc_url": None, "token": None}
+
+
+def _slide_content(number: int) -> str:
+    return f"<h2>Point {number}</h2>" + "<p>Supporting detail for the audience.</p>" * 12
+
+
+async def _previous_save(fs: _MemoryFS, state: PresentationState) -> None:
+    state.updated_at = utc_now()
+    payload = json.dumps(state.to_metadata(), indent=2, ensure_ascii=False)
+    await fs.upload_file(payload.encode("utf-8"), f"{ROOT}/{state.presentation_name}/metadata.json")
+
+
+async def _previous_update_index(fs: _MemoryFS, state: PresentationState) -> None:
+    try:
+        index = json.loads((await fs.download_file(f"{ROOT}/.metadata.json")).decode())
+    except Exception:
+        index = {"presentations": {}}
+    index["presentations"][state.presentation_name] = {"title": state.title, "slide_count": state.slide_count()}
+    index["updated_at"] = utc_now()
+    await fs.upload_file(json.dumps(index, indent=2).encode("utf-8"), f"{ROOT}/.metadata.json")
+
+
+async def _previous_load(fs: _MemoryFS, name: str, title: str) -> PresentationState:
+    try:
+        return PresentationState.from_metadata(json.loads((await fs.download_file(f"{ROOT}/{name}/metadata.json")).decode()))
+    except Exception:
+        state = PresentationState(presentation_id=name, presentation_name=name, title=title)
+        await _previous_save(fs, state)
+        return state
+
+
+async def _per_operation(args, fs: _MemoryFS) -> None:
+    for number in range(1, args.slides + 1):
+        state = await _previous_load(fs, "deck", "Deck")
+        slide = SlideEntry(number, f"Slide {number}", f"slide_{number:03d}.html", f"presentations/deck/slide_{number:03d}.html",
+                           _slide_content(number), utc_now(), utc_now())
+        state.slides[number] = slide
+        rendered = render_slide_html(presentation=state, slide=slide, slide_index=number, total_slides=state.slide_count())
+        await fs.upload_file(rendered.encode("utf-8"), f"{ROOT}/deck/{slide.filename}")
+        await _previous_save(fs, state)
+        await _previous_update_index(fs, state)
+
+    state = await _previous_load(fs, "deck", "Deck")
+    for idx, slide in enumerate(state.ordered_slides(), start=1):
+        rendered = render_slide_html(presentation=state, slide=slide, slide_index=idx, total_slides=state.slide_count())
+        await fs.upload_file(rendered.encode("utf-8"), f"{ROOT}/deck/{slide.filename}")
+    await _previous_save(fs, state)
+    await _previous_update_index(fs, state)
+
+
+async def _write_back(args, fs: _MemoryFS) -> None:
+    tool = _BenchTool(fs)
+    for number in range(1, args.slides + 1):
+        result = await tool.create_slide("deck", number, f"Slide {number}", _slide_content(number))
+        assert result.success, result.output
+    result = await tool.finalize_presentation("deck", "Deck")
+    assert result.success, result.output
+
+
+async def _main(args) -> None:
+    results = []
+    for label, run in (("per-operation writes", _per_operation), ("write-back store", _write_back)):
+        fs, redis = _MemoryFS(args.rtt_ms / 1000), _MemoryRedis(args.redis_ms / 1000)
+        document_store.redis = redis
+        start = time.perf_counter()
+        await run(args, fs)
+        results.append((label, time.perf_counter() - start, fs.round_trips, redis.calls, fs.bytes))
+
+    print(f"Deck: {args.slides} slides created one tool call each, then finalized; "
+          f"{args.rtt_ms}ms per sandbox call, {args.redis_ms}ms per Redis call")
+    print()
+    baseline = results[0][1]
+    for label, seconds, round_trips, redis_calls, transferred in results:
+        print(f"{label:>20}: {seconds * 1000:8.1f} ms  {round_trips:4} sandbox round trips  {redis_calls:3} Redis calls  "
+              f"{transferred / 1024:8.1f} KB  ({baseline / seconds:4.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slides", type=int, default=20)
+    parser.add_argument("--rtt-ms", type=float, default=30.0)
+    parser.add_argument("--redis-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the embedding pipeline.
+
+Embeds a knowledge-base-shaped corpus (chunks of one synthetic document set,
+with some duplicated chunks) and reports texts/sec for:
+
+- sequential: one request per text, as ``embed_batch`` did for remote providers,
+- pipeline (cold): token-budgeted batches, EMBEDDING_CONCURRENCY in flight,
+  deduplicated by content hash,
+- pipeline (warm): the same corpus again, served from the embedding cache.
+
+``--provider local`` uses the real sentence-transformers model
+(all-MiniLM-L6-v2 unless EMBEDDINGS_MODEL is set). ``--provider simulated``
+replaces the model with one that sleeps ``--latency-ms`` per request plus
+``--per-text-ms`` per text, which approximates a remote embedding API.
+
+The cache uses an in-memory stand-in for Redis unless ``--redis`` is given.
+
+Usage:
+    uv run python scripts/bench_embeddings.py --provider local --texts 2000
+    uv run python scripts/bench_embeddings.py --provider simulated --latency-ms 120 --per-text-ms 2
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+
+from core.knowledge_base.retrieval import chunk_text
+from core.services import embedding_cache, embedding_client
+from core.services.embedding_cache import EmbeddingCache
+from core.services.embedding_client import EmbeddingClient
+from core.utils.config import config
+
+WORDS = ("pricing invoice onboarding deployment region backup retention escalation policy owner team "
+         "rate limit support tier launch schedule customer contract renewal security audit incident").split()
+
+
+class _MemoryRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    async def get_client(self):
+        values = self.values
+
+        class _Pipeline:
+            def __init__(self):
+                self.ops = []
+
+            def set(self, key, value, ex=None):
+                self.ops.append((key, value))
+
+            async def execute(self):
+                values.update(self.ops)
+
+        return SimpleNamespace(pipeline=lambda transaction=False: _Pipeline())
+
+
+class _SimulatedModel:
+    """Blocking encode() with fixed per-request and per-text latency."""
+
+    def __init__(self, latency_ms: float, per_text_ms: float, dimension: int = 384):
+        self.latency = latency_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.dimension = dimension
+
+    def encode(self, texts, normalize_embeddings=True, show_progress_bar=False):
+        texts = [texts] if isinstance(texts, str) else texts
+        time.sleep(self.latency + self.per_text * len(texts))
+        rng = np.random.default_rng(len(texts))
+        return rng.standard_normal((len(texts), self.dimension)).astype(np.float32)
+
+
+def _corpus(texts: int, duplicate_ratio: float, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    chunks: List[str] = []
+    while len(chunks) < texts:
+        paragraphs = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 160))) for _ in range(12)]
+        chunks.extend(chunk_text("\n\n".join(paragraphs)))
+    chunks = chunks[:texts]
+    for i in range(int(texts * duplicate_ratio)):
+        chunks[rng.randrange(texts)] = chunks[i]
+    return chunks
+
+
+def _client(args) -> EmbeddingClient:
+    client = EmbeddingClient(provider="local")
+    if args.provider == "simulated":
+        client._local_model = _SimulatedModel(args.latency_ms, args.per_text_ms)
+    return client
+
+
+async def _sequential(client: EmbeddingClient, texts: List[str]) -> int:
+    embedded = 0
+    for text in texts:
+        embedded += (await client._embed_local(text)) is not None
+    return embedded
+
+
+async def _main(args) -> None:
+    if not args.redis:
+        embedding_cache.redis = _MemoryRedis()
+    cache = EmbeddingCache(ttl=3600)
+    embedding_client.embedding_cache = cache
+
+    texts = _corpus(args.texts, args.duplicates, args.seed)
+    client = _client(args)
+    if await client._get_local_model() is None:
+        raise SystemExit("Local embedding model unavailable (is sentence-transformers installed and the model downloaded?)")
+    await client._embed_local("warm up")
+
+    print(f"Provider: {args.provider} ({client._local_model_name if args.provider == 'local' else f'{args.latency_ms}ms + {args.per_text_ms}ms/text'})")
+    print(f"Corpus: {len(texts)} texts, {len(set(texts))} unique, ~{sum(len(t) for t in texts) // 4:,} tokens")
+    print(f"Batches: {config.EMBEDDING_BATCH_TOKENS} tokens / {config.EMBEDDING_BATCH_SIZE} texts, "
+          f"{config.EMBEDDING_CONCURRENCY} in flight")
+    print()
+
+    runs = []
+    sample = texts[: args.sequential_sample]
+    start = time.perf_counter()
+    await _sequential(client, sample)
+    runs.append(("sequential", len(sample), time.perf_counter() - start))
+
+    for label in ("pipeline (cold)", "pipeline (warm)"):
+        start = time.perf_counter()
+        vectors = await client.embed_batch(texts)
+        runs.append((label, len(texts), time.perf_counter() - start))
+        assert sum(v is not None for v in vectors) == len(texts)
+
+    baseline = runs[0][1] / runs[0][2]
+    for label, count, seconds in runs:
+        rate = count / seconds
+        print(f"{label:>16}: {count:>6} texts in {seconds * 1000:9.1f} ms  {rate:10.1f} texts/sec  ({rate / baseline:6.1f}x)")
+    print(f"Cache: {cache.stats()}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", choices=["local", "simulated"], default="local")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="Fraction of texts that repeat another text")
+    parser.add_argument("--sequential-sample", type=int, default=100, help="Texts embedded one by one for the baseline")
+    parser.add_argument("--latency-ms", type=float, default=120.0)
+    parser.add_argument("--per-text-ms", type=float, default=2.0)
+    parser.add_argument("--redis", action="store_true", help="Use the configured Redis instead of an in-memory cache")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
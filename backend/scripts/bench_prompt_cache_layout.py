@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Replay a thread turn by turn through the Gemini prompt cache planner and report
+the expected provider prefix-cache hit ratio with and without the stable
+(append-only) cache block layout.
+
+A token counts as an expected cache hit when the message carrying it is part of
+the longest prefix shared with the previous turn's prompt.
+
+Usage:
+    uv run python scripts/bench_prompt_cache_layout.py
+    uv run python scripts/bench_prompt_cache_layout.py --thread-file thread.json --turns 50
+"""
+
+import argparse
+import json
+import random
+from typing import Any, Dict, List, Optional
+
+from core.agentpress.prompt_caching import (
+    CacheBlockLayout,
+    GeminiPromptCachePlanner,
+    get_message_token_count,
+)
+
+MODEL = "gemini/gemini-2.5-flash"
+SYSTEM_PROMPT = {"role": "system", "content": "You are Iris. " + "Follow the operating guidelines carefully. " * 300}
+
+
+def _synthetic_thread(turns: int, seed: int) -> List[List[Dict[str, Any]]]:
+    rng = random.Random(seed)
+    words = ["file", "build", "deploy", "query", "result", "table", "chart", "fix", "error", "page"]
+    thread: List[List[Dict[str, Any]]] = []
+    for turn in range(turns):
+        def text(n: int) -> str:
+            return " ".join(rng.choice(words) for _ in range(n))
+
+        thread.append([
+            {"role": "user", "content": f"Turn {turn}: {text(rng.randint(20, 120))}", "message_id": f"u{turn}"},
+            {"role": "assistant", "content": f"Working on it. {text(rng.randint(100, 600))}", "message_id": f"a{turn}"},
+            {"role": "user", "content": f"<tool_result>{text(rng.randint(400, 2500))}</tool_result>", "message_id": f"t{turn}"},
+        ])
+    return thread
+
+
+def _load_thread(path: str) -> List[List[Dict[str, Any]]]:
+    with open(path) as handle:
+        messages = json.load(handle)
+    # One turn per user message
+    turns: List[List[Dict[str, Any]]] = []
+    for message in messages:
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _render(message: Dict[str, Any]) -> str:
+    return json.dumps(message, sort_keys=True, default=str)
+
+
+def replay(turns: List[List[Dict[str, Any]]], stable: bool, context_window: int) -> Dict[str, Any]:
+    planner = GeminiPromptCachePlanner(MODEL, context_window)
+    layout: Optional[CacheBlockLayout] = CacheBlockLayout(model=MODEL) if stable else None
+    conversation: List[Dict[str, Any]] = []
+    previous: List[str] = []
+    total_tokens = 0
+    hit_tokens = 0
+
+    for turn in turns:
+        conversation.extend(turn)
+        prepared = planner.assemble(SYSTEM_PROMPT, conversation, layout=layout).messages
+        rendered = [_render(m) for m in prepared]
+        tokens = [max(1, get_message_token_count(m, MODEL)) for m in prepared]
+
+        shared = 0
+        while shared < min(len(rendered), len(previous)) and rendered[shared] == previous[shared]:
+            shared += 1
+
+        total_tokens += sum(tokens)
+        hit_tokens += sum(tokens[:shared])
+        previous = rendered
+
+    return {
+        "turns": len(turns),
+        "prompt_tokens": total_tokens,
+        "expected_cache_hit_tokens": hit_tokens,
+        "expected_cache_hit_ratio": round(hit_tokens / total_tokens, 4) if total_tokens else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thread-file", help="JSON list of LLM messages recorded from a thread")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--context-window", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    turns = _load_thread(args.thread_file) if args.thread_file else _synthetic_thread(args.turns, args.seed)
+    turns = turns[: args.turns]
+
+    for label, stable in (("recomputed boundaries", False), ("stable layout", True)):
+        result = replay(turns, stable, args.context_window)
+        print(
+            f"{label:>22}: turns={result['turns']} prompt_tokens={result['prompt_tokens']:,} "
+            f"expected_hits={result['expected_cache_hit_tokens']:,} "
+            f"hit_ratio={result['expected_cache_hit_ratio'] * 100:.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for the quick-chat streaming endpoints.
+
+Starts a local fake Gemini server in a separate process: the
+``GenerativeService`` gRPC API that the async ``google.generativeai`` client
+talks to, over HTTP/2 on localhost. It waits a fixed time before the first
+chunk and between chunks. The client is pointed at it, and the script
+measures time-to-first-chunk of ``/fast-gemini-chat/stream`` and
+``/adaptive/stream`` in two sweeps:
+
+- concurrency: N simultaneous requests with ``--turns`` turns of chat context,
+- context: ``--context-concurrency`` simultaneous requests with a growing
+  number of context turns.
+
+The server's time to first chunk depends on neither, so the p50 of every run
+must stay within ``--max-ratio`` of the first run of its sweep; the script
+exits non-zero otherwise. A blocking Gemini call would serialize the requests
+and grow TTFB about N-fold. What remains is the client's CPU time per request
+(the SDK converts every context turn to protobuf), which is why very large
+contexts at high concurrency are kept out of the defaults.
+
+Usage:
+    uv run python scripts/bench_quick_chat_concurrency.py
+    uv run python scripts/bench_quick_chat_concurrency.py --concurrency 1 8 32 64 --context-turns 0 50 200
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+from typing import List, Tuple
+
+import grpc
+from google.ai import generativelanguage_v1beta as glm
+from google.ai.generativelanguage_v1beta.services.generative_service.transports.grpc_asyncio import (
+    GenerativeServiceGrpcAsyncIOTransport,
+)
+from google.generativeai import client as genai_client
+
+from fast_gemini_chat import ChatRequest, adaptive_chat_stream, fast_gemini_chat_streaming
+
+SERVICE = "google.ai.generativelanguage.v1beta.GenerativeService"
+
+
+class _FakeGeminiServer:
+    """Streams canned ``StreamGenerateContent`` responses after fixed delays."""
+
+    def __init__(self, first_delay: float, chunk_delay: float, chunk_count: int):
+        self.first_delay = first_delay
+        self.chunk_delay = chunk_delay
+        self.chunk_count = chunk_count
+        self.requests = 0
+
+    async def serve(self, conn) -> None:
+        server = grpc.aio.server()
+        server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(SERVICE, {
+            "StreamGenerateContent": grpc.unary_stream_rpc_method_handler(
+                self._stream_generate_content,
+                request_deserializer=glm.GenerateContentRequest.deserialize,
+                response_serializer=glm.GenerateContentResponse.serialize,
+            ),
+        }),))
+        conn.send(server.add_insecure_port("127.0.0.1:0"))
+        await server.start()
+        await asyncio.get_running_loop().run_in_executor(None, conn.recv)  # until asked to stop
+        await server.stop(None)
+        conn.send(self.requests)
+
+    def _chunks(self, json_mode: bool) -> List[str]:
+        words = [f"word{i} " for i in range(self.chunk_count)]
+        if not json_mode:
+            return words
+        answer = "".join(words).strip()
+        payload = json.dumps({"answer": answer, "decision": {"state": "agent_not_needed", "confidence": 0.9, "reason": "Simple question"}})
+        size = max(1, len(payload) // self.chunk_count)
+        return [payload[i:i + size] for i in range(0, len(payload), size)]
+
+    async def _stream_generate_content(self, request, context):
+        self.requests += 1
+        json_mode = request.generation_config.response_mime_type == "application/json"
+        for index, text in enumerate(self._chunks(json_mode)):
+            await asyncio.sleep(self.first_delay if index == 0 else self.chunk_delay)
+            yield glm.GenerateContentResponse(candidates=[
+                glm.Candidate(index=0, content=glm.Content(role="model", parts=[glm.Part(text=text)])),
+            ])
+
+
+def _run_server(conn, first_delay: float, chunk_delay: float, chunk_count: int) -> None:
+    asyncio.run(_FakeGeminiServer(first_delay, chunk_delay, chunk_count).serve(conn))
+
+
+def _use_server(port: int) -> None:
+    """Route the async Gemini client to the fake server (no TLS, no API key)."""
+    channel = grpc.aio.insecure_channel(f"127.0.0.1:{port}")
+    transport = GenerativeServiceGrpcAsyncIOTransport(channel=channel)
+    genai_client._client_manager.clients["generative_async"] = glm.GenerativeServiceAsyncClient(transport=transport)
+
+
+def _history(turns: int) -> List[dict]:
+    context = []
+    for i in range(turns):
+        context.append({"role": "user", "content": f"Question {i}: " + "what about the quarterly numbers? " * 8})
+        context.append({"role": "assistant", "content": f"Answer {i}: " + "the quarterly numbers were in line. " * 16})
+    return context
+
+
+async def _time_to_first_content(endpoint, content_types, history: List[dict]) -> float:
+    start = time.perf_counter()
+    request = ChatRequest(message="hello", model="fake-gemini", chat_context=history)
+    response = await endpoint(request, user_id=None)
+    first = None
+    async for frame in response.body_iterator:
+        if '"type": "error"' in frame:
+            raise RuntimeError(f"Endpoint failed: {frame.strip()}")
+        if first is None and any(f'"type": "{kind}"' in frame for kind in content_types):
+            first = time.perf_counter() - start
+    return first if first is not None else float("nan")
+
+
+async def _run(endpoint, content_types, concurrency: int, history: List[dict]) -> List[float]:
+    return await asyncio.gather(*[_time_to_first_content(endpoint, content_types, history) for _ in range(concurrency)])
+
+
+async def _p50(endpoint, content_types, concurrency: int, turns: int, repeats: int) -> Tuple[float, float]:
+    history = _history(turns)
+    p50s, p95s = [], []
+    for _ in range(repeats):
+        ttfb = sorted(await _run(endpoint, content_types, concurrency, history))
+        p50s.append(statistics.median(ttfb))
+        p95s.append(ttfb[max(0, int(len(ttfb) * 0.95) - 1)])
+    return statistics.median(p50s), statistics.median(p95s)
+
+
+async def _main(args, port: int) -> List[str]:
+    _use_server(port)
+    endpoints = (
+        ("fast-gemini-chat/stream", fast_gemini_chat_streaming, ("chunk",)),
+        ("adaptive/stream", adaptive_chat_stream, ("content",)),
+    )
+    sweeps = (
+        ("concurrency", [(n, args.turns) for n in args.concurrency]),
+        ("context", [(args.context_concurrency, turns) for turns in args.context_turns]),
+    )
+    failures = []
+    for name, endpoint, content_types in endpoints:
+        await _run(endpoint, content_types, 1, [])  # warm up the channel
+        for sweep, points in sweeps:
+            baseline = None
+            for concurrency, turns in points:
+                p50, p95 = await _p50(endpoint, content_types, concurrency, turns, args.repeats)
+                baseline = baseline or p50
+                ratio = p50 / baseline
+                print(
+                    f"{name:>24} {sweep:>11}: N={concurrency:<4} turns={turns:<4} ttfb_p50={p50 * 1000:7.1f}ms "
+                    f"ttfb_p95={p95 * 1000:7.1f}ms ratio={ratio:5.2f}x"
+                )
+                if not ratio <= args.max_ratio:
+                    failures.append(
+                        f"{name} N={concurrency} turns={turns}: p50 {p50 * 1000:.1f}ms is {ratio:.2f}x "
+                        f"the {sweep} baseline {baseline * 1000:.1f}ms"
+                    )
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--turns", type=int, default=10, help="Context turns per request in the concurrency sweep")
+    parser.add_argument("--context-turns", type=int, nargs="+", default=[0, 50, 200])
+    parser.add_argument("--context-concurrency", type=int, default=4, help="Simultaneous requests in the context sweep")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per point; the median p50 is reported")
+    parser.add_argument("--first-delay", type=float, default=0.2, help="Fake Gemini time to first chunk (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Fake Gemini delay between chunks (s)")
+    parser.add_argument("--chunks", type=int, default=20, help="Chunks per fake Gemini response")
+    parser.add_argument("--max-ratio", type=float, default=2.0, help="Allowed p50 TTFB growth over the first run of a sweep")
+    args = parser.parse_args()
+
+    # The server runs in its own process, like the real API: it must not compete with the endpoints for the GIL
+    conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.get_context("spawn").Process(
+        target=_run_server, args=(child_conn, args.first_delay, args.chunk_delay, args.chunks), daemon=True,
+    )
+    server.start()
+    port = conn.recv()
+    try:
+        failures = asyncio.run(_main(args, port))
+    finally:
+        conn.send("stop")
+        requests = conn.recv()
+        server.join()
+
+    print(f"\nFake Gemini server on 127.0.0.1:{port} served {requests} streams")
+    if failures:
+        for failure in failures:
+            print(f"FAIL {failure}")
+        raise SystemExit(1)
+    print(f"OK: p50 time to first chunk stayed within {args.max_ratio}x as concurrency and context grew")
+
+
+if __name__ == "__main__":
+    main()
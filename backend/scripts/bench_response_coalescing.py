@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark for content-chunk coalescing in the agent run response writer.
+
+Feeds a synthetic LLM stream (tiny 1-5 character deltas, optionally paced)
+through ``ResponseStreamWriter`` with coalescing disabled and enabled, against
+fakeredis with a simulated network round trip, and reports producer
+events/sec, Redis round trips and the SSE frames a viewer would receive.
+
+Usage:
+    uv run python scripts/bench_response_coalescing.py
+    uv run python scripts/bench_response_coalescing.py --chunks 5000 --rtt-ms 1 --interval-ms 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from core.services import agent_run_stream, redis
+from core.services.agent_run_stream import ResponseStreamWriter
+
+
+def _chunk_events(count: int, seed: int) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    thread_run_id = str(uuid.uuid4())
+    events = []
+    for sequence in range(count):
+        now = datetime.now(timezone.utc).isoformat()
+        text = "".join(rng.choice("abcdefgh ") for _ in range(rng.randint(1, 5)))
+        events.append({
+            "sequence": sequence,
+            "message_id": None, "thread_id": "bench", "type": "assistant",
+            "is_llm_message": True,
+            "content": json.dumps({"role": "assistant", "content": text}),
+            "metadata": json.dumps({"stream_status": "chunk", "thread_run_id": thread_run_id}),
+            "created_at": now, "updated_at": now,
+        })
+    return events
+
+
+def _install_fake_redis(rtt: float) -> None:
+    import fakeredis
+
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis.client = client
+    redis._initialized = True
+    original_xadd, original_xadd_many = redis.xadd, redis.xadd_many
+
+    async def xadd(*args, **kwargs):
+        await asyncio.sleep(rtt)
+        return await original_xadd(*args, **kwargs)
+
+    async def xadd_many(*args, **kwargs):
+        await asyncio.sleep(rtt)
+        return await original_xadd_many(*args, **kwargs)
+
+    redis.xadd, redis.xadd_many = xadd, xadd_many
+
+
+async def _run(events: List[Dict[str, Any]], coalesce_ms: int, interval: float) -> Dict[str, Any]:
+    run_id = uuid.uuid4().hex
+    writer = ResponseStreamWriter(run_id, coalesce_ms=coalesce_ms)
+
+    start = time.perf_counter()
+    for event in events:
+        await writer.write(event)
+        if interval:
+            await asyncio.sleep(interval)
+    await writer.write({"type": "status", "status": "completed"})
+    await writer.close()
+    elapsed = time.perf_counter() - start
+
+    frames = [f async for f in agent_run_stream.iter_sse_frames(run_id, follow=False)]
+    text = "".join(
+        json.loads(json.loads(frame.split("data: ", 1)[1])["content"])["content"]
+        for frame in frames[:-1]
+    )
+    return {
+        "events_per_s": len(events) / elapsed,
+        "round_trips": writer.round_trips,
+        "frames": len(frames),
+        "text": text,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="Simulated Redis round trip")
+    parser.add_argument("--interval-ms", type=float, default=0.0, help="Delay between LLM deltas (0 = burst)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    _install_fake_redis(args.rtt_ms / 1000)
+    events = _chunk_events(args.chunks, args.seed)
+    expected = "".join(json.loads(e["content"])["content"] for e in events)
+
+    for label, coalesce_ms in (("per-event writes", 0), ("coalesced 30ms/2KB", 30)):
+        result = asyncio.run(_run(events, coalesce_ms, args.interval_ms / 1000))
+        assert result["text"] == expected, "coalesced stream lost or reordered content"
+        print(
+            f"{label:>20}: events/s={result['events_per_s']:10,.0f} "
+            f"redis_round_trips={result['round_trips']:<6} sse_frames={result['frames']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
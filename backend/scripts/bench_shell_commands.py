@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Per-command overhead benchmark for the shell tool's blocking commands.
+
+Runs a mix of short and longer commands (``sleep`` of 0 to ``--max-ms``) for
+real on this machine, behind a stand-in for ``sandbox.process`` that adds
+``--rtt-ms`` to every Daytona API call, through:
+
+- tmux polling: the tool's previous flow - ``tmux has-session``,
+  ``new-session``, ``send-keys`` with a completion marker, then
+  ``has-session`` + ``capture-pane`` every 0.5 s until the marker shows up, and
+  ``kill-session``; every tmux command is a session command plus a logs fetch,
+- session commands: ``CommandRunner.run``, one synchronous session command
+  answered when the command exits.
+
+Overhead is the wall time of a tool call minus the time the command itself ran.
+Needs tmux and bash.
+
+Usage:
+    uv run python scripts/bench_shell_commands.py
+    uv run python scripts/bench_shell_commands.py --commands 30 --rtt-ms 40
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from types import SimpleNamespace
+from uuid import uuid4
+
+from core.sandbox.command_runner import CommandRunner
+
+
+class _RemoteProcess:
+    """``sandbox.process`` stand-in: session commands run locally, each API call costs a round trip."""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.sessions = {}
+        self.api_calls = 0
+
+    async def _round_trip(self) -> None:
+        self.api_calls += 1
+        await asyncio.sleep(self.rtt)
+
+    async def create_session(self, session_id):
+        await self._round_trip()
+        self.sessions[session_id] = {}
+
+    async def get_session(self, session_id):
+        await self._round_trip()
+        if session_id not in self.sessions:
+            raise Exception(f"Session {session_id} not found")
+        return SimpleNamespace(session_id=session_id, commands=list(self.sessions[session_id].values()))
+
+    async def execute_session_command(self, session_id, req, timeout=None):
+        await self._round_trip()
+        process = await asyncio.create_subprocess_exec(
+            "bash", "-c", req.command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        )
+        stdout, _ = await process.communicate()
+        command = SimpleNamespace(id=str(uuid4()), command=req.command, exit_code=process.returncode, logs=stdout.decode())
+        self.sessions[session_id][command.id] = command
+        return SimpleNamespace(cmd_id=command.id, output=command.logs, exit_code=command.exit_code)
+
+    async def get_session_command_logs(self, session_id, command_id):
+        await self._round_trip()
+        return self.sessions[session_id][command_id].logs
+
+    async def delete_session(self, session_id):
+        await self._round_trip()
+        self.sessions.pop(session_id, None)
+
+
+async def _raw(process: _RemoteProcess, command: str) -> str:
+    """The previous ``_execute_raw_command``: a session command, then its logs."""
+    response = await process.execute_session_command("raw_commands", SimpleNamespace(command=command))
+    return await process.get_session_command_logs("raw_commands", response.cmd_id)
+
+
+async def _tmux_blocking(process: _RemoteProcess, command: str, timeout: int = 60) -> str:
+    session_name = f"session_{str(uuid4())[:8]}"
+    if "raw_commands" not in process.sessions:
+        await process.create_session("raw_commands")
+    check = await _raw(process, f"tmux has-session -t {session_name} 2>/dev/null || echo 'not_exists'")
+    if "not_exists" in check:
+        # A bare shell, so this machine's shell startup files do not count as overhead
+        await _raw(process, f"tmux new-session -d -s {session_name} -c /tmp 'bash --norc --noprofile'")
+    marker = f"COMMAND_DONE_{str(uuid4())[:8]}"
+    await _raw(process, f'tmux send-keys -t {session_name} "{command} ; echo {marker}" Enter')
+    start, output = time.time(), ""
+    while time.time() - start < timeout:
+        await asyncio.sleep(0.5)
+        if "ended" in await _raw(process, f"tmux has-session -t {session_name} 2>/dev/null || echo 'ended'"):
+            break
+        pane = await _raw(process, f"tmux capture-pane -t {session_name} -p -S - -E -")
+        # The pane shows the marker once in the echoed command line and once as output
+        if pane.count(marker) >= 2:
+            output = pane
+            break
+    await _raw(process, f"tmux kill-session -t {session_name}")
+    return output
+
+
+async def _measure(args, run) -> tuple:
+    process = _RemoteProcess(args.rtt_ms / 1000)
+    rng = random.Random(args.seed)
+    overheads = []
+    for _ in range(args.commands):
+        duration = rng.choice([0, 0.02, 0.05, 0.2, args.max_ms / 1000])
+        start = time.perf_counter()
+        await run(process, f"sleep {duration} && echo ok")
+        overheads.append(time.perf_counter() - start - duration)
+    return overheads, process.api_calls / args.commands
+
+
+async def _main(args) -> None:
+    runs = [
+        ("tmux polling", await _measure(args, _tmux_blocking)),
+        ("session commands", await _measure(
+            args, lambda process, command: CommandRunner(process).run(f"session_{str(uuid4())[:8]}", command, cwd="/tmp", new_session=True),
+        )),
+    ]
+    await asyncio.create_subprocess_exec("tmux", "kill-server", stderr=asyncio.subprocess.DEVNULL)
+
+    print(f"Commands: {args.commands} blocking commands of 0-{args.max_ms:.0f} ms, {args.rtt_ms}ms per Daytona API call")
+    print()
+    baseline = statistics.mean(runs[0][1][0])
+    for label, (overheads, calls) in runs:
+        ordered = sorted(overheads)
+        mean = statistics.mean(overheads)
+        print(f"{label:>16}: overhead mean {mean * 1000:7.1f} ms  p50 {ordered[len(ordered) // 2] * 1000:7.1f} ms  "
+              f"p95 {ordered[int(len(ordered) * 0.95)] * 1000:7.1f} ms  {calls:4.1f} API calls/command  ({baseline / mean:5.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument("--max-ms", type=float, default=1500.0, help="Duration of the longest commands")
+    parser.add_argument("--rtt-ms", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark for ToolRegistry read paths.
+
+Builds a registry shaped like a large agent run (native sandbox tools plus MCP
+and Composio tools registered through MCP wrappers) and measures the per-call
+cost of ``get_available_functions``, ``get_openapi_schemas`` and the legacy
+XML tag-name list, comparing the previous rebuild-on-every-call behaviour with
+the memoized views.
+
+Usage:
+    uv run python scripts/bench_tool_registry.py
+    uv run python scripts/bench_tool_registry.py --native 120 --mcp 40 --composio 30 --calls 20000
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List
+
+from core.agentpress.tool import SchemaType, Tool, ToolSchema
+from core.agentpress.tool_registry import ToolRegistry
+
+NATIVE_FUNCTIONS_PER_TOOL = 8
+
+
+def _schema(name: str) -> Dict:
+    return {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": f"Synthetic function {name} used for benchmarking the registry.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Input"},
+                    "limit": {"type": "integer", "description": "Maximum results"},
+                },
+                "required": ["query"],
+            },
+        },
+    }
+
+
+def _native_tool_class(index: int):
+    """A Tool subclass with NATIVE_FUNCTIONS_PER_TOOL decorated methods."""
+    namespace = {}
+    for n in range(NATIVE_FUNCTIONS_PER_TOOL):
+        name = f"native_{index}_{n}"
+
+        async def method(self, query: str, limit: int = 10):
+            return self.success_response(query)
+
+        method.__name__ = name
+        method.tool_schemas = [ToolSchema(schema_type=SchemaType.OPENAPI, schema=_schema(name))]
+        namespace[name] = method
+    return type(f"NativeTool{index}", (Tool,), namespace)
+
+
+class _WrapperTool(Tool):
+    """Resolves its functions dynamically, like MCPToolWrapper."""
+
+    def __init__(self, names: List[str]):
+        super().__init__()
+        self._methods = {name: (lambda n=name: n) for name in names}
+
+    def __getattr__(self, name):
+        methods = self.__dict__.get("_methods", {})
+        if name in methods:
+            return methods[name]
+        raise AttributeError(name)
+
+
+def _build_registry(native: int, mcp: int, composio: int) -> ToolRegistry:
+    registry = ToolRegistry()
+    for index in range(max(1, native // NATIVE_FUNCTIONS_PER_TOOL)):
+        registry.register_tool(_native_tool_class(index))
+    for prefix, count in (("mcp", mcp), ("composio", composio)):
+        names = [f"{prefix}_tool_{i}" for i in range(count)]
+        registry.register_instance(_WrapperTool(names), schemas={
+            name: [ToolSchema(schema_type=SchemaType.OPENAPI, schema=_schema(name))] for name in names
+        })
+    return registry
+
+
+def _legacy_views(registry: ToolRegistry) -> Dict[str, Callable]:
+    """The previous implementations, which iterated every registered tool per call."""
+    tools = registry.tools
+
+    def get_available_functions():
+        return {name: getattr(info["instance"], name) for name, info in tools.items()}
+
+    def get_openapi_schemas():
+        return [
+            info["schema"].schema for info in tools.values()
+            if info["schema"].schema_type == SchemaType.OPENAPI
+        ]
+
+    def xml_tag_names():
+        return [name.replace("_", "-") for name in get_available_functions().keys()]
+
+    return {
+        "get_available_functions": get_available_functions,
+        "get_openapi_schemas": get_openapi_schemas,
+        "xml_tag_names": xml_tag_names,
+    }
+
+
+def _per_call_us(fn: Callable, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--native", type=int, default=112, help="Native tool functions")
+    parser.add_argument("--mcp", type=int, default=30)
+    parser.add_argument("--composio", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=10000)
+    args = parser.parse_args()
+
+    registry = _build_registry(args.native, args.mcp, args.composio)
+    legacy = _legacy_views(registry)
+    memoized = {
+        "get_available_functions": registry.get_available_functions,
+        "get_openapi_schemas": registry.get_openapi_schemas,
+        "xml_tag_names": registry.get_xml_tag_names,
+    }
+
+    print(f"Registry: {len(registry.tools)} functions ({args.mcp} MCP, {args.composio} Composio), {args.calls} calls each")
+    for name in memoized:
+        before = _per_call_us(legacy[name], args.calls)
+        after = _per_call_us(memoized[name], args.calls)
+        print(f"{name:>24}: rebuild={before:8.2f} us  memoized={after:6.2f} us  ({before / after:5.1f}x)")
+
+    start = time.perf_counter()
+    registry.remove("mcp_tool_0")
+    registry.get_available_functions()
+    print(f"{'rebuild after remove':>24}: {(time.perf_counter() - start) * 1e6:8.2f} us (once per mutation)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Hit-rate and latency benchmark for the web search tool's retrieval layer.
+
+Starts a local fake Tavily/Firecrawl server (``--latency-ms`` per request) and
+replays a synthetic agent workload: ``--runs`` agent runs, each issuing
+``--searches`` searches drawn from a skewed pool of queries (with casing and
+spacing variations) and scraping the top URLs of each search in one parallel
+``scrape_webpage``-style batch. Compares:
+
+- baseline: no cache, a new HTTP client per scraped URL, as the tool worked
+  before the retrieval layer,
+- retrieval layer: pooled client, TTL cache, single-flight deduplication.
+
+The cache uses an in-memory stand-in for Redis.
+
+Usage:
+    uv run python scripts/bench_web_retrieval.py
+    uv run python scripts/bench_web_retrieval.py --runs 50 --queries 40 --latency-ms 300
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List, Tuple
+
+import httpx
+
+from core.services import result_cache, web_retrieval
+from core.services.web_retrieval import WebRetrieval
+
+TOPICS = ("python release", "gpu prices", "eu ai act", "rust async runtime", "postgres 17 features",
+          "iphone battery life", "mortgage rates", "kubernetes autoscaling", "llm evals", "solar panel cost")
+
+
+class _MemoryRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+class _FakeProviders:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.requests = 0
+        self.connections = 0
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                path = request_line.decode().split(" ")[1]
+                length = 0
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, value = line.decode().split(":", 1)
+                    if name.strip().lower() == "content-length":
+                        length = int(value)
+                body = json.loads(await reader.readexactly(length))
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+                if path == "/search":
+                    slug = "-".join(body["query"].lower().split())
+                    payload = {"query": body["query"], "answer": "...", "results": [
+                        {"title": f"{body['query']} {i}", "url": f"https://example.com/{slug}/{i}"} for i in range(5)
+                    ]}
+                else:
+                    payload = {"success": True, "data": {"markdown": "lorem ipsum " * 500, "metadata": {"title": body["url"]}}}
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _workload(args) -> List[List[str]]:
+    """Queries per run, drawn with a Zipf-like skew, with casing/spacing noise."""
+    rng = random.Random(args.seed)
+    pool = [f"{rng.choice(TOPICS)} {year}" for year in range(2000, 2000 + args.queries)]
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    runs = []
+    for _ in range(args.runs):
+        queries = rng.choices(pool, weights, k=args.searches)
+        runs.append([q.upper() if rng.random() < 0.2 else q.replace(" ", "  ") if rng.random() < 0.2 else q for q in queries])
+    return runs
+
+
+async def _baseline_run(queries: List[str], base_url: str, scrape_top: int) -> None:
+    async with httpx.AsyncClient(timeout=30) as search_client:
+        for query in queries:
+            response = await search_client.post(f"{base_url}/search", json={"query": query, "max_results": 20})
+            urls = [r["url"] for r in response.json()["results"][:scrape_top]]
+
+            async def scrape(url: str) -> None:
+                async with httpx.AsyncClient() as client:
+                    (await client.post(f"{base_url}/v1/scrape", json={"url": url, "formats": ["markdown"]}, timeout=30)).json()
+
+            await asyncio.gather(*(scrape(url) for url in urls))
+
+
+async def _retrieval_run(retrieval: WebRetrieval, queries: List[str], scrape_top: int) -> None:
+    for query in queries:
+        result = await retrieval.search(query, 20)
+        urls = [r["url"] for r in result["results"][:scrape_top]]
+        await asyncio.gather(*(retrieval.scrape(url, ["markdown"]) for url in urls))
+
+
+async def _measure(server: _FakeProviders, runs: List[List[str]], args, run) -> Tuple[float, int, int]:
+    server.requests = server.connections = 0
+    start = time.perf_counter()
+    # Agent runs overlap in time, --parallel at once
+    for i in range(0, len(runs), args.parallel):
+        await asyncio.gather(*(run(queries) for queries in runs[i:i + args.parallel]))
+    return time.perf_counter() - start, server.requests, server.connections
+
+
+async def _main(args) -> None:
+    server = _FakeProviders(args.latency_ms / 1000)
+    base_url = await server.start()
+    result_cache.redis = _MemoryRedis()
+    web_retrieval.config.TAVILY_URL = base_url
+    web_retrieval.config.FIRECRAWL_URL = base_url
+    runs = _workload(args)
+    distinct = len({" ".join(q.lower().split()) for queries in runs for q in queries})
+
+    retrieval = WebRetrieval()
+    results = [
+        ("baseline", *await _measure(server, runs, args, lambda queries: _baseline_run(queries, base_url, args.scrape_top))),
+        ("retrieval layer", *await _measure(server, runs, args, lambda queries: _retrieval_run(retrieval, queries, args.scrape_top))),
+    ]
+    stats = retrieval.stats()
+    await retrieval.aclose()
+    await server.stop()
+
+    print(f"Workload: {args.runs} runs x {args.searches} searches ({distinct} distinct queries), "
+          f"top {args.scrape_top} URLs scraped per search, {args.parallel} runs in parallel, {args.latency_ms}ms upstream latency")
+    print()
+    for label, seconds, requests, connections in results:
+        print(f"{label:>16}: {seconds * 1000:9.1f} ms  {requests:6} upstream requests  {connections:5} connections  "
+              f"({results[0][1] / seconds:5.1f}x)")
+    for kind in ("search", "scrape"):
+        hits, misses = stats[kind]["hits"], stats[kind]["misses"]
+        print(f"{kind:>16} cache: {hits} hits / {hits + misses} lookups ({hits / max(1, hits + misses):.1%})")
+    print(f"{'single-flight':>16}: {stats['deduplicated']} requests deduplicated")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--searches", type=int, default=6, help="Searches per agent run")
+    parser.add_argument("--queries", type=int, default=25, help="Size of the query pool")
+    parser.add_argument("--scrape-top", type=int, default=3)
+    parser.add_argument("--parallel", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
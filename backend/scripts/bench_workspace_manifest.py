@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Transfer and latency benchmark for building workspace state.
+
+Generates a project of ``--files`` text files in a temporary directory, then
+has an agent ask for the workspace state ``--calls`` times, editing
+``--edits`` files between calls. The sandbox is a local-filesystem stand-in
+for the Daytona FS and process APIs: every call costs ``--rtt-ms`` and moves
+its payload at ``--mbps``; ``process.exec`` runs the command on this machine.
+Compares:
+
+- list + download: list every directory and download every file on every
+  call, as ``get_workspace_state`` worked before (recursively),
+- manifest: one in-sandbox listing with hashes, downloads only for content
+  not read before,
+- manifest, metadata only: the listing alone (``include_content=False``).
+
+Usage:
+    uv run python scripts/bench_workspace_manifest.py
+    uv run python scripts/bench_workspace_manifest.py --files 800 --edits 3 --rtt-ms 40
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+from core.sandbox import workspace_manifest
+from core.sandbox.workspace_manifest import WorkspaceManifests
+from core.utils.files_utils import should_exclude_file
+
+
+class _MemoryRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+class _LocalSandbox:
+    """Daytona FS/process stand-in over a local directory, with simulated network cost."""
+
+    def __init__(self, args):
+        self.args = args
+        self.api_calls = 0
+        self.bytes = 0
+        self.process = SimpleNamespace(exec=self._exec)
+        self.fs = SimpleNamespace(list_files=self._list_files, download_file=self._download_file)
+
+    async def _transfer(self, size: int) -> None:
+        self.api_calls += 1
+        self.bytes += size
+        await asyncio.sleep(self.args.rtt_ms / 1000 + size * 8 / (self.args.mbps * 1_000_000))
+
+    async def _exec(self, command, env=None, timeout=None):
+        result = await asyncio.to_thread(
+            subprocess.run, command.replace("python3", sys.executable), shell=True,
+            capture_output=True, text=True, env={**os.environ, **(env or {})},
+        )
+        await self._transfer(len(result.stdout))
+        return SimpleNamespace(exit_code=result.returncode, result=result.stdout + result.stderr)
+
+    async def _list_files(self, path):
+        entries = [
+            SimpleNamespace(name=entry.name, is_dir=entry.is_dir(), size=entry.stat().st_size, mod_time=str(entry.stat().st_mtime))
+            for entry in os.scandir(path)
+        ]
+        await self._transfer(120 * len(entries))
+        return entries
+
+    async def _download_file(self, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        await self._transfer(len(data))
+        return data
+
+
+async def _list_and_download(sandbox: _LocalSandbox, root: str) -> dict:
+    state, pending = {}, [""]
+    while pending:
+        directory = pending.pop()
+        for info in await sandbox.fs.list_files(os.path.join(root, directory)):
+            rel_path = os.path.join(directory, info.name)
+            if info.is_dir:
+                pending.append(rel_path)
+            elif not should_exclude_file(rel_path):
+                content = (await sandbox.fs.download_file(os.path.join(root, rel_path))).decode()
+                state[rel_path] = {"content": content, "size": info.size, "modified": info.mod_time}
+    return state
+
+
+async def _manifest(manifests: WorkspaceManifests, sandbox: _LocalSandbox, root: str, include_content: bool) -> dict:
+    manifest = await manifests.refresh("project", sandbox, root)
+    contents = await manifests.read_contents(sandbox, root, manifest, manifest.files) if include_content else {}
+    return {path: {"content": contents.get(path), **manifest.entry(path)} for path in manifest.files}
+
+
+def _make_project(root: str, args) -> list:
+    rng = random.Random(args.seed)
+    paths = []
+    for i in range(args.files):
+        directory = os.path.join(root, f"pkg{i % 12}", f"mod{i % 5}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file{i}.py")
+        with open(path, "w") as f:
+            f.write(f"# file {i}\n" + "x = 1\n" * rng.randint(100, 2000))
+        paths.append(path)
+    os.makedirs(os.path.join(root, "node_modules", "dep"), exist_ok=True)
+    for i in range(args.files):
+        with open(os.path.join(root, "node_modules", "dep", f"m{i}.js"), "w") as f:
+            f.write("module.exports = 1;\n" * 200)
+    return paths
+
+
+async def _measure(args, label, paths, run) -> tuple:
+    rng = random.Random(args.seed + 1)
+    sandbox = _LocalSandbox(args)
+    start = time.perf_counter()
+    for call in range(args.calls):
+        if call:
+            for path in rng.sample(paths, args.edits):
+                with open(path, "a") as f:
+                    f.write(f"y = {call}\n")
+        state = await run(sandbox)
+    return label, time.perf_counter() - start, sandbox.api_calls, sandbox.bytes, len(state)
+
+
+async def _main(args) -> None:
+    workspace_manifest.redis = _MemoryRedis()
+    results = []
+    for label, make_run in (
+        ("list + download", lambda root: lambda sandbox: _list_and_download(sandbox, root)),
+        ("manifest", lambda root: (lambda m: lambda sandbox: _manifest(m, sandbox, root, True))(WorkspaceManifests())),
+        ("metadata only", lambda root: (lambda m: lambda sandbox: _manifest(m, sandbox, root, False))(WorkspaceManifests())),
+    ):
+        # A fresh copy of the project per strategy, so every one sees the same edits
+        root = tempfile.mkdtemp(prefix="bench_workspace_")
+        workspace_manifest.STAMPS_PATH = os.path.join(root, ".stamps.json")
+        workspace = os.path.join(root, "workspace")
+        paths = _make_project(workspace, args)
+        try:
+            results.append(await _measure(args, label, paths, make_run(workspace)))
+        finally:
+            shutil.rmtree(root)
+
+    print(f"Project: {args.files} files (+{args.files} excluded in node_modules), {args.calls} state calls, "
+          f"{args.edits} files edited between calls; {args.rtt_ms}ms per API call, {args.mbps} Mbit/s")
+    print()
+    baseline = results[0][1]
+    for label, seconds, calls, transferred, files in results:
+        print(f"{label:>16}: {seconds * 1000:8.1f} ms  {calls:6} API calls  {transferred / 1024 / 1024:7.2f} MB  "
+              f"{files} files  ({baseline / seconds:5.1f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=300)
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--edits", type=int, default=2, help="Files edited between two calls")
+    parser.add_argument("--rtt-ms", type=float, default=30.0)
+    parser.add_argument("--mbps", type=float, default=200.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of retrieval-based knowledge base context.
+
+Indexes a knowledge base with the same chunker, flat index and context packer
+the agent loop uses, then runs a set of questions against it and reports:
+
+- prompt tokens injected per run: whole knowledge base vs. the legacy 4000
+  token cap vs. the retrieved excerpts,
+- hit rate: how often the excerpt holding the answer was injected,
+- latency: index build, query embedding and search (p50/p99).
+
+Embeddings come from a local model so no API key or network is needed:
+``--embedder local`` uses sentence-transformers (all-MiniLM-L6-v2) through
+EmbeddingClient; ``--embedder hashing`` is a dependency-free bag-of-words
+baseline. By default a synthetic knowledge base with known answers is
+generated; ``--corpus DIR`` indexes real .txt/.md files instead (token and
+latency numbers only).
+
+Usage:
+    uv run python scripts/eval_kb_retrieval.py
+    uv run python scripts/eval_kb_retrieval.py --embedder local --documents 60 --top-k 8 --budget 1500
+    uv run python scripts/eval_kb_retrieval.py --corpus ./docs --queries "How do I deploy?" "What is the refund policy?"
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import statistics
+import time
+import zlib
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from core.knowledge_base.retrieval import (
+    KnowledgeBaseIndex,
+    KnowledgeChunk,
+    chunk_text,
+    estimate_tokens,
+    format_context,
+)
+
+LEGACY_MAX_TOKENS = 4000
+
+ENTITIES = ["Orion", "Vega", "Lyra", "Draco", "Cygnus", "Perseus", "Auriga", "Carina", "Hydra", "Pavo"]
+ATTRIBUTES = ["retention period", "escalation contact", "deployment region", "billing cycle", "SLA target",
+              "backup schedule", "owner team", "launch date", "rate limit", "support tier"]
+FILLER = ("This section describes internal procedures, historical context and general guidance that "
+          "applies across projects. Teams should consult it when planning work and reviewing changes. ")
+
+
+class HashingEmbedder:
+    model = "hashing-512"
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(512, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9]+", text.lower()):
+            vector[zlib.crc32(word.encode()) % 512] += 1
+        return (vector / (np.linalg.norm(vector) or 1)).tolist()
+
+    async def embed_text(self, text: str) -> Optional[List[float]]:
+        return self._vector(text)
+
+    async def embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        return [self._vector(t) for t in texts]
+
+
+def _embedder(name: str):
+    if name == "hashing":
+        return HashingEmbedder()
+    from core.services.embedding_client import EmbeddingClient
+    return EmbeddingClient(provider="local")
+
+
+def synthetic_corpus(documents: int, paragraphs: int, seed: int) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """Documents full of filler with one distinctive fact per paragraph, and questions about those facts."""
+    rng = random.Random(seed)
+    docs, questions = [], []
+    for d in range(documents):
+        body = []
+        for p in range(paragraphs):
+            entity = f"{rng.choice(ENTITIES)}-{d}-{p}"
+            attribute = rng.choice(ATTRIBUTES)
+            value = f"value-{rng.randint(10000, 99999)}"
+            body.append(f"{FILLER * rng.randint(2, 5)}The {attribute} of project {entity} is {value}. {FILLER}")
+            questions.append((f"What is the {attribute} of project {entity}?", value))
+        docs.append((f"handbook-{d}.md", "\n\n".join(body)))
+    rng.shuffle(questions)
+    return docs, questions
+
+
+def load_corpus(directory: str) -> List[Tuple[str, str]]:
+    files = sorted(p for p in Path(directory).rglob("*") if p.suffix.lower() in {".txt", ".md"})
+    return [(str(p.relative_to(directory)), p.read_text(errors="replace")) for p in files]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, int(len(ordered) * pct) - 1)]
+
+
+async def _main(args) -> None:
+    embedder = _embedder(args.embedder)
+    if args.corpus:
+        docs, questions = load_corpus(args.corpus), [(q, None) for q in args.queries]
+    else:
+        docs, questions = synthetic_corpus(args.documents, args.paragraphs, args.seed)
+        questions = questions[: args.questions]
+    if not docs or not questions:
+        raise SystemExit("Nothing to evaluate: provide --corpus with files and --queries, or use the synthetic corpus")
+
+    started = time.perf_counter()
+    chunks: List[KnowledgeChunk] = []
+    texts: List[str] = []
+    for filename, content in docs:
+        for chunk_index, text in enumerate(chunk_text(content)):
+            chunks.append(KnowledgeChunk(f"doc-{filename}", f"Docs/{filename}", chunk_index, text, estimate_tokens(text)))
+            texts.append(text)
+    embed_started = time.perf_counter()
+    vectors = await embedder.embed_batch(texts)
+    keep = [i for i, v in enumerate(vectors) if v is not None]
+    if not keep:
+        raise SystemExit(f"The {args.embedder} embedder produced no vectors (is the model available offline?)")
+    index = KnowledgeBaseIndex([chunks[i] for i in keep], np.asarray([vectors[i] for i in keep], dtype=np.float32))
+    build_ms = (time.perf_counter() - started) * 1000
+    embed_ms = (time.perf_counter() - embed_started) * 1000
+
+    full_tokens = sum(estimate_tokens(content) for _, content in docs)
+    query_ms, search_ms, injected, hits = [], [], [], 0
+    for question, answer in questions:
+        t0 = time.perf_counter()
+        query_vector = await embedder.embed_text(question)
+        t1 = time.perf_counter()
+        results = index.search(query_vector, args.top_k)
+        context = format_context(results, args.budget)
+        t2 = time.perf_counter()
+        query_ms.append((t1 - t0) * 1000)
+        search_ms.append((t2 - t1) * 1000)
+        injected.append(estimate_tokens(context) if context else 0)
+        hits += bool(answer and answer in context)
+
+    mean_injected = statistics.mean(injected)
+    print(f"Embedder: {getattr(embedder, 'model', args.embedder)}")
+    print(f"Knowledge base: {len(docs)} documents, {len(index)} chunks, ~{full_tokens:,} tokens")
+    print(f"Index build: {build_ms:.0f} ms ({embed_ms:.0f} ms embedding)")
+    print()
+    print("Prompt tokens per run:")
+    print(f"  whole knowledge base     {full_tokens:>8,}")
+    print(f"  legacy (4000 token cap)  {min(full_tokens, LEGACY_MAX_TOKENS):>8,}")
+    print(f"  retrieved (top {args.top_k}, {args.budget} budget) {mean_injected:>6,.0f}  "
+          f"({1 - mean_injected / full_tokens:.1%} saved vs whole KB)")
+    if not args.corpus:
+        print(f"Hit rate: {hits}/{len(questions)} ({hits / len(questions):.1%}) questions had their answer injected")
+    print()
+    print(f"Latency over {len(questions)} queries:")
+    print(f"  query embedding  p50={statistics.median(query_ms):7.2f} ms  p99={_percentile(query_ms, 0.99):7.2f} ms")
+    print(f"  search + packing p50={statistics.median(search_ms):7.2f} ms  p99={_percentile(search_ms, 0.99):7.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embedder", choices=["local", "hashing"], default="local")
+    parser.add_argument("--corpus", help="Directory of .txt/.md files to index instead of the synthetic corpus")
+    parser.add_argument("--queries", nargs="*", default=[], help="Questions to run against --corpus")
+    parser.add_argument("--documents", type=int, default=40)
+    parser.add_argument("--paragraphs", type=int, default=12)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
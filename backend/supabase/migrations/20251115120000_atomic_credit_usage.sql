@@ -0,0 +1,179 @@
+-- Atomic credit deduction.
+--
+-- Usage used to be billed with a read-modify-write of credit_accounts from
+-- Python, which loses updates when two runs of the same account finish at the
+-- same time. apply_credit_usage applies one or more usage events under a row
+-- lock in a single statement. Event ids are recorded in credit_usage_events so
+-- a batch that is retried after a crash is never charged twice. Each charged
+-- event gets its own credit_ledger row, referencing its thread or message.
+--
+-- Every change of an account's balance bumps credit_accounts.balance_version,
+-- so a cached copy of the balance can tell which of two values is newer.
+
+CREATE TABLE IF NOT EXISTS credit_usage_events (
+    event_id TEXT PRIMARY KEY,
+    account_id UUID NOT NULL,
+    amount DECIMAL(14, 6) NOT NULL,
+    message_id TEXT,
+    applied_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_credit_usage_events_account ON credit_usage_events(account_id, applied_at DESC);
+
+ALTER TABLE credit_usage_events ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Service role manages credit usage events" ON credit_usage_events;
+CREATE POLICY "Service role manages credit usage events" ON credit_usage_events
+    FOR ALL USING (auth.role() = 'service_role');
+
+ALTER TABLE credit_accounts ADD COLUMN IF NOT EXISTS balance_version BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_credit_balance_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.balance IS DISTINCT FROM OLD.balance THEN
+        NEW.balance_version := OLD.balance_version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_credit_accounts_balance_version ON credit_accounts;
+CREATE TRIGGER trigger_credit_accounts_balance_version
+    BEFORE UPDATE ON credit_accounts
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_credit_balance_version();
+
+CREATE OR REPLACE FUNCTION apply_credit_usage(
+    p_account_id UUID,
+    p_events JSONB,
+    p_description TEXT DEFAULT 'Usage',
+    p_allow_partial BOOLEAN DEFAULT TRUE
+) RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    v_expiring DECIMAL;
+    v_non_expiring DECIMAL;
+    v_balance DECIMAL;
+    v_amount DECIMAL;
+    v_charged DECIMAL;
+    v_from_expiring DECIMAL;
+    v_from_non_expiring DECIMAL;
+    v_difference DECIMAL;
+    v_event JSONB;
+    v_event_amount DECIMAL;
+    v_event_charged DECIMAL;
+    v_event_from_expiring DECIMAL;
+    v_reference TEXT;
+    v_version BIGINT;
+BEGIN
+    SELECT expiring_credits, non_expiring_credits, balance, balance_version
+    INTO v_expiring, v_non_expiring, v_balance, v_version
+    FROM credit_accounts
+    WHERE account_id = p_account_id
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('success', FALSE, 'error', 'No credit account found', 'available', 0);
+    END IF;
+
+    -- Only events that have not been applied yet count towards this charge
+    SELECT COALESCE(SUM((e->>'amount')::DECIMAL), 0)
+    INTO v_amount
+    FROM jsonb_array_elements(p_events) AS e
+    WHERE NOT EXISTS (SELECT 1 FROM credit_usage_events u WHERE u.event_id = e->>'id');
+
+    IF NOT p_allow_partial AND v_balance < v_amount THEN
+        RETURN jsonb_build_object(
+            'success', FALSE,
+            'error', 'Insufficient credits',
+            'required', v_amount,
+            'available', v_balance
+        );
+    END IF;
+
+    -- balance is authoritative; bring the expiring / non-expiring split in line with it
+    v_difference := v_balance - (v_expiring + v_non_expiring);
+    IF abs(v_difference) > 0.01 THEN
+        IF v_difference > 0 THEN
+            v_non_expiring := v_non_expiring + v_difference;
+        ELSIF v_expiring >= -v_difference THEN
+            v_expiring := v_expiring + v_difference;
+        ELSE
+            v_non_expiring := GREATEST(0, v_non_expiring + v_expiring + v_difference);
+            v_expiring := 0;
+        END IF;
+    END IF;
+
+    v_charged := 0;
+    v_from_expiring := 0;
+    v_from_non_expiring := 0;
+
+    FOR v_event IN SELECT value FROM jsonb_array_elements(p_events) LOOP
+        INSERT INTO credit_usage_events (event_id, account_id, amount, message_id)
+        VALUES (v_event->>'id', p_account_id, (v_event->>'amount')::DECIMAL, v_event->>'message_id')
+        ON CONFLICT (event_id) DO NOTHING;
+        -- Already applied by an earlier attempt at this batch
+        CONTINUE WHEN NOT FOUND;
+
+        -- Usage beyond the remaining balance cannot be collected (balance >= 0)
+        v_event_amount := (v_event->>'amount')::DECIMAL;
+        v_event_charged := LEAST(v_event_amount, GREATEST(v_balance, 0));
+        CONTINUE WHEN v_event_charged <= 0;
+
+        v_event_from_expiring := LEAST(v_event_charged, GREATEST(v_expiring, 0));
+        v_expiring := v_expiring - v_event_from_expiring;
+        v_non_expiring := GREATEST(0, v_non_expiring - (v_event_charged - v_event_from_expiring));
+        v_balance := v_balance - v_event_charged;
+        v_charged := v_charged + v_event_charged;
+        v_from_expiring := v_from_expiring + v_event_from_expiring;
+        v_from_non_expiring := v_from_non_expiring + v_event_charged - v_event_from_expiring;
+
+        v_reference := COALESCE(v_event->>'thread_id', v_event->>'message_id');
+        INSERT INTO credit_ledger (account_id, amount, balance_after, type, description, reference_id, reference_type, metadata)
+        VALUES (
+            p_account_id, -v_event_charged, v_balance, 'usage', p_description,
+            CASE WHEN v_reference ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$' THEN v_reference::UUID END,
+            CASE
+                WHEN v_event->>'thread_id' IS NOT NULL THEN 'thread'
+                WHEN v_event->>'message_id' IS NOT NULL THEN 'message'
+            END,
+            jsonb_build_object(
+                'event_id', v_event->>'id',
+                'thread_id', v_event->>'thread_id',
+                'message_id', v_event->>'message_id',
+                'from_expiring', v_event_from_expiring,
+                'from_non_expiring', v_event_charged - v_event_from_expiring,
+                'uncollected', v_event_amount - v_event_charged
+            )
+        );
+    END LOOP;
+
+    IF v_charged > 0 THEN
+        UPDATE credit_accounts
+        SET expiring_credits = v_expiring,
+            non_expiring_credits = v_non_expiring,
+            balance = v_balance,
+            updated_at = NOW()
+        WHERE account_id = p_account_id
+        RETURNING balance_version INTO v_version;
+    END IF;
+
+    RETURN jsonb_build_object(
+        'success', TRUE,
+        'amount_deducted', v_charged,
+        'uncollected', v_amount - v_charged,
+        'from_expiring', v_from_expiring,
+        'from_non_expiring', v_from_non_expiring,
+        'new_expiring', v_expiring,
+        'new_non_expiring', v_non_expiring,
+        'new_total', v_balance,
+        'balance_version', v_version
+    );
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION apply_credit_usage(UUID, JSONB, TEXT, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_credit_usage(UUID, JSONB, TEXT, BOOLEAN) TO service_role;
@@ -0,0 +1,125 @@
+-- Retrieval-based knowledge base context.
+--
+-- get_agent_knowledge_base_context inlines every enabled entry into the
+-- system prompt. Entries are now split into chunks that are embedded at ingest
+-- time; the agent loop builds an in-memory vector index per agent from these
+-- rows and only injects the chunks relevant to the latest user message.
+-- Embeddings are stored as REAL[] so no database extension is required.
+
+CREATE TABLE IF NOT EXISTS knowledge_base_chunks (
+    chunk_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    entry_id UUID NOT NULL REFERENCES knowledge_base_entries(entry_id) ON DELETE CASCADE,
+    account_id UUID NOT NULL REFERENCES basejump.accounts(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    token_count INTEGER NOT NULL,
+    embedding REAL[] NOT NULL,
+    embedding_model VARCHAR(255) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+
+    UNIQUE(entry_id, chunk_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_kb_chunks_entry_id ON knowledge_base_chunks(entry_id);
+CREATE INDEX IF NOT EXISTS idx_kb_chunks_account_id ON knowledge_base_chunks(account_id);
+
+ALTER TABLE knowledge_base_chunks ENABLE ROW LEVEL SECURITY;
+
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE policyname = 'kb_chunks_account_access' AND tablename = 'knowledge_base_chunks') THEN
+        CREATE POLICY kb_chunks_account_access ON knowledge_base_chunks
+            FOR ALL USING (basejump.has_role_on_account(account_id) = true);
+    END IF;
+END $$;
+
+GRANT ALL ON knowledge_base_chunks TO authenticated, service_role;
+
+-- Chunks of every entry an agent may use. Entries that have not been chunked
+-- yet are returned once with NULL chunk columns so callers can backfill them.
+-- Runs with the caller's rights so the RLS policies of the underlying tables
+-- apply; only the backend (service role) calls it.
+CREATE OR REPLACE FUNCTION get_agent_knowledge_base_chunks(p_agent_id UUID)
+RETURNS TABLE (
+    entry_id UUID,
+    folder_name VARCHAR,
+    filename VARCHAR,
+    summary TEXT,
+    chunk_index INTEGER,
+    content TEXT,
+    token_count INTEGER,
+    embedding REAL[],
+    embedding_model VARCHAR
+)
+SECURITY INVOKER
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        kbe.entry_id,
+        kbf.name,
+        kbe.filename,
+        kbe.summary,
+        kbc.chunk_index,
+        kbc.content,
+        kbc.token_count,
+        kbc.embedding,
+        kbc.embedding_model
+    FROM knowledge_base_entries kbe
+    JOIN knowledge_base_folders kbf ON kbe.folder_id = kbf.folder_id
+    JOIN agent_knowledge_entry_assignments akea ON kbe.entry_id = akea.entry_id
+    LEFT JOIN knowledge_base_chunks kbc ON kbc.entry_id = kbe.entry_id
+    WHERE akea.agent_id = p_agent_id
+    AND akea.enabled = TRUE
+    AND kbe.is_active = TRUE
+    AND kbe.usage_context IN ('always', 'contextual')
+    ORDER BY kbe.created_at DESC, kbc.chunk_index;
+$$;
+
+REVOKE EXECUTE ON FUNCTION get_agent_knowledge_base_chunks(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION get_agent_knowledge_base_chunks(UUID) TO service_role;
+
+-- Swap the chunks of an entry for p_chunks in one transaction, so a failed
+-- re-embed never leaves an entry without chunks. With p_summary_only only
+-- the summary chunk (chunk 0) is replaced. Only the backend calls it.
+CREATE OR REPLACE FUNCTION replace_knowledge_base_chunks(
+    p_entry_id UUID,
+    p_chunks JSONB,
+    p_summary_only BOOLEAN DEFAULT FALSE
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    IF p_chunks IS NULL OR jsonb_array_length(p_chunks) = 0 THEN
+        RAISE EXCEPTION 'No chunks given for knowledge base entry %', p_entry_id;
+    END IF;
+
+    DELETE FROM knowledge_base_chunks
+    WHERE entry_id = p_entry_id
+    AND (NOT p_summary_only OR chunk_index = 0);
+
+    INSERT INTO knowledge_base_chunks (entry_id, account_id, chunk_index, content, token_count, embedding, embedding_model)
+    SELECT
+        p_entry_id,
+        (c->>'account_id')::UUID,
+        (c->>'chunk_index')::INTEGER,
+        c->>'content',
+        (c->>'token_count')::INTEGER,
+        ARRAY(
+            SELECT v::REAL
+            FROM jsonb_array_elements_text(c->'embedding') WITH ORDINALITY AS e(v, n)
+            ORDER BY n
+        ),
+        c->>'embedding_model'
+    FROM jsonb_array_elements(p_chunks) AS c
+    WHERE NOT p_summary_only OR (c->>'chunk_index')::INTEGER = 0;
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN v_count;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION replace_knowledge_base_chunks(UUID, JSONB, BOOLEAN) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION replace_knowledge_base_chunks(UUID, JSONB, BOOLEAN) TO service_role;
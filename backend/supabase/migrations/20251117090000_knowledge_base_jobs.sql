@@ -0,0 +1,48 @@
+-- Background processing of knowledge base uploads.
+--
+-- Uploads are stored and recorded here, then extracted, summarized and
+-- indexed by a worker; the entry in knowledge_base_entries is created when
+-- the job completes (with the entry_id reserved here).
+
+CREATE TABLE IF NOT EXISTS knowledge_base_jobs (
+    job_id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    account_id UUID NOT NULL REFERENCES basejump.accounts(id) ON DELETE CASCADE,
+    folder_id UUID NOT NULL REFERENCES knowledge_base_folders(folder_id) ON DELETE CASCADE,
+    entry_id UUID NOT NULL,
+
+    filename VARCHAR(255) NOT NULL,
+    file_path TEXT NOT NULL,
+    file_size BIGINT NOT NULL,
+    mime_type VARCHAR(255),
+
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'processing', 'completed', 'failed')),
+    error TEXT,
+    chunk_count INTEGER,
+
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    completed_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_kb_jobs_account_status ON knowledge_base_jobs(account_id, status);
+CREATE INDEX IF NOT EXISTS idx_kb_jobs_folder_id ON knowledge_base_jobs(folder_id);
+
+ALTER TABLE knowledge_base_jobs ENABLE ROW LEVEL SECURITY;
+
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_policies WHERE policyname = 'kb_jobs_account_access' AND tablename = 'knowledge_base_jobs') THEN
+        CREATE POLICY kb_jobs_account_access ON knowledge_base_jobs
+            FOR ALL USING (basejump.has_role_on_account(account_id) = true);
+    END IF;
+END $$;
+
+GRANT ALL ON knowledge_base_jobs TO authenticated, service_role;
+
+DO $$ BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'kb_jobs_updated_at') THEN
+        CREATE TRIGGER kb_jobs_updated_at
+            BEFORE UPDATE ON knowledge_base_jobs
+            FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+    END IF;
+END $$;
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from core.agentpress.message_cache import ThreadMessageCache
+
+
+class _FakeQuery:
+    def __init__(self, rows, log):
+        self._rows = rows
+        self._log = log
+        self._filters = []
+        self._since = None
+
+    def select(self, _columns):
+        return self
+
+    def eq(self, column, value):
+        self._filters.append((column, value))
+        return self
+
+    def gte(self, column, value):
+        self._since = value
+        return self
+
+    def order(self, _column):
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    async def execute(self):
+        rows = [r for r in self._rows if all(r.get(c) == v for c, v in self._filters)]
+        if self._since is not None:
+            since = datetime.fromisoformat(self._since)
+            rows = [r for r in rows if datetime.fromisoformat(r["created_at"]) >= since]
+        rows = sorted(rows, key=lambda r: r["created_at"])
+        start, end = self._range
+        page = rows[start:end + 1]
+        self._log.append(len(page))
+        return SimpleNamespace(data=page)
+
+
+class _FakeClient:
+    def __init__(self):
+        self.rows = []
+        self.log = []
+        self._clock = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def add(self, text, is_llm_message=True):
+        self._clock += timedelta(seconds=30)
+        row = {
+            "message_id": f"m{len(self.rows)}",
+            "thread_id": "t1",
+            "type": "user",
+            "is_llm_message": is_llm_message,
+            "content": f'{{"role": "user", "content": "{text}"}}',
+            "created_at": self._clock.isoformat(),
+        }
+        self.rows.append(row)
+        return row
+
+    def table(self, _name):
+        return _FakeQuery(self.rows, self.log)
+
+
+async def test_incremental_fetch_only_reads_new_rows():
+    client = _FakeClient()
+    for i in range(50):
+        client.add(f"msg {i}")
+    client.add("status", is_llm_message=False)
+    cache = ThreadMessageCache(use_redis_version=False)
+
+    first = await cache.get_messages(client, "t1")
+    client.add("new message")
+    second = await cache.get_messages(client, "t1")
+
+    assert len(first) == 50
+    assert [m["content"] for m in second[-2:]] == ["msg 49", "new message"]
+    assert client.log == [50, 2]
+    assert cache.stats()["incremental_fetches"] == 1
+
+
+async def test_returned_messages_are_copies():
+    client = _FakeClient()
+    client.add("original")
+    cache = ThreadMessageCache(use_redis_version=False)
+
+    messages = await cache.get_messages(client, "t1")
+    messages[0]["content"] = "compressed"
+
+    again = await cache.get_messages(client, "t1")
+    assert again[0]["content"] == "original"
+
+
+async def test_recorded_and_invalidated_messages():
+    client = _FakeClient()
+    client.add("first")
+    cache = ThreadMessageCache(use_redis_version=False)
+    await cache.get_messages(client, "t1")
+
+    saved = client.add("from add_message")
+    cache.record_message("t1", saved)
+    messages = await cache.get_messages(client, "t1")
+    assert [m["content"] for m in messages] == ["first", "from add_message"]
+
+    client.rows.pop(0)
+    cache.invalidate("t1")
+    messages = await cache.get_messages(client, "t1")
+    assert [m["content"] for m in messages] == ["from add_message"]
+    assert cache.stats()["full_fetches"] == 2
@@ -0,0 +1,44 @@
+from core.agentpress.prompt_artifacts import (
+    PromptArtifactCache,
+    agent_version_key,
+    mcp_config_hash,
+)
+
+
+def test_artifact_key_tracks_every_prefix_input():
+    config = {"current_version_id": "v1", "configured_mcps": [{"name": "exa"}]}
+    key = PromptArtifactCache.artifact_key(
+        agent_version_key(config), "tools-1", mcp_config_hash(config, ["search"]), "gemini",
+    )
+
+    assert key == PromptArtifactCache.artifact_key(
+        agent_version_key(config), "tools-1", mcp_config_hash(config, ["search"]), "gemini",
+    )
+    assert key != PromptArtifactCache.artifact_key(
+        agent_version_key({**config, "current_version_id": "v2"}), "tools-1",
+        mcp_config_hash(config, ["search"]), "gemini",
+    )
+    assert key != PromptArtifactCache.artifact_key(
+        agent_version_key(config), "tools-1",
+        mcp_config_hash({**config, "custom_mcps": [{"name": "x"}]}, ["search"]), "gemini",
+    )
+    assert key != PromptArtifactCache.artifact_key(
+        agent_version_key(config), "tools-2", mcp_config_hash(config, ["search"]), "gemini",
+    )
+    assert agent_version_key({"system_prompt": "a"}) != agent_version_key({"system_prompt": "b"})
+
+
+def test_cache_reuses_prefix_and_counts_hits_per_agent():
+    cache = PromptArtifactCache(max_entries=2)
+
+    assert cache.get("k1", "agent-1") is None
+    built = cache.put("k1", "static prefix")
+    assert cache.get("k1", "agent-1") is built
+    assert built.prefix_hash == cache.put("k1", "static prefix").prefix_hash
+
+    cache.put("k2", "other")
+    cache.put("k3", "third")
+    assert cache.get("k1", "agent-2") is None
+
+    assert cache.stats("agent-1") == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 2, "hit_rate": round(1 / 3, 4)}
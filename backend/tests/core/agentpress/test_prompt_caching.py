@@ -0,0 +1,82 @@
+from core.agentpress.prompt_caching import CacheBlockLayout, GeminiPromptCachePlanner
+
+MODEL = "gemini/gemini-2.5-flash"
+SYSTEM_PROMPT = {"role": "system", "content": "system " * 600}
+
+
+def _turn(i: int):
+    return [
+        {"role": "user", "content": f"question {i} " + "word " * 50, "message_id": f"u{i}"},
+        {"role": "assistant", "content": f"answer {i} " + "word " * 1500, "message_id": f"a{i}"},
+    ]
+
+
+def _fingerprints(prepared):
+    return [chunk.fingerprint for chunk in prepared.report.chunks]
+
+
+def test_stable_layout_keeps_existing_block_fingerprints():
+    planner = GeminiPromptCachePlanner(MODEL, 1_000_000)
+    layout = CacheBlockLayout(model=MODEL)
+    conversation = []
+    history = []
+
+    for i in range(30):
+        conversation.extend(_turn(i))
+        prepared = planner.assemble(SYSTEM_PROMPT, conversation, layout=layout)
+        history.append(_fingerprints(prepared))
+
+    # Once a block is emitted, later turns append blocks or rewrite at most the two newest ones
+    for previous, current in zip(history, history[1:]):
+        if previous and current:
+            stable_prefix = previous[:-2] if len(previous) == planner.MAX_CONVERSATION_CACHE_BLOCKS else previous
+            assert current[: len(stable_prefix)] == stable_prefix
+    assert len(layout.blocks) <= planner.MAX_CONVERSATION_CACHE_BLOCKS
+    assert prepared.report.reused_blocks >= 1
+
+
+def test_blocks_after_the_oldest_stay_bounded_in_a_long_thread():
+    planner = GeminiPromptCachePlanner(MODEL, 128_000)
+    layout = CacheBlockLayout(model=MODEL)
+    conversation = []
+    previous = []
+    rolled = 0
+
+    for i in range(200):
+        conversation.extend(_turn(i))
+        planner.assemble(SYSTEM_PROMPT, conversation, layout=layout)
+        current = [block.fingerprint for block in layout.blocks]
+        assert all(block.token_count <= planner.max_block_tokens for block in layout.blocks[1:])
+        if len(previous) == planner.MAX_CONVERSATION_CACHE_BLOCKS and current != previous:
+            # Either the newest block grew, or the two oldest were merged and the rest kept their bytes
+            if current[:-1] != previous[:-1]:
+                assert current[1:-1] == previous[2:]
+                rolled += 1
+        previous = current
+
+    assert len(layout.blocks) == planner.MAX_CONVERSATION_CACHE_BLOCKS
+    assert rolled >= 2
+
+
+def test_layout_resets_when_history_changes():
+    planner = GeminiPromptCachePlanner(MODEL, 1_000_000)
+    layout = CacheBlockLayout(model=MODEL)
+    conversation = [m for i in range(20) for m in _turn(i)]
+    planner.assemble(SYSTEM_PROMPT, conversation, layout=layout)
+    revision = layout.revision
+
+    conversation[0] = {**conversation[0], "content": "edited"}
+    prepared = planner.assemble(SYSTEM_PROMPT, conversation, layout=layout)
+
+    assert prepared.report.reused_blocks == 0
+    assert layout.revision == revision + 1
+
+
+def test_layout_round_trip():
+    layout = CacheBlockLayout(model=MODEL)
+    planner = GeminiPromptCachePlanner(MODEL, 1_000_000)
+    planner.assemble(SYSTEM_PROMPT, [m for i in range(20) for m in _turn(i)], layout=layout)
+
+    restored = CacheBlockLayout.from_dict(layout.to_dict())
+
+    assert restored == layout
@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.agentpress import context_manager, summary_cache
+from core.agentpress.context_manager import ContextManager
+from core.agentpress.summary_cache import SummaryCache
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.mgets = 0
+
+    async def mget(self, keys):
+        self.mgets += 1
+        return [self.values.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+def _install(monkeypatch, fake_redis):
+    monkeypatch.setattr(summary_cache, "redis", SimpleNamespace(mget=fake_redis.mget, set=fake_redis.set))
+    cache = SummaryCache(ttl=60)
+    monkeypatch.setattr(context_manager, "summary_cache", cache)
+    return cache
+
+
+def _install_llm(monkeypatch, latency=0.01):
+    state = SimpleNamespace(calls=0, in_flight=0, peak=0)
+
+    async def fake_request_summary(self, role, text, max_summary_tokens):
+        state.calls += 1
+        state.in_flight += 1
+        state.peak = max(state.peak, state.in_flight)
+        await asyncio.sleep(latency)
+        state.in_flight -= 1
+        return f"summary of {text[:12]}"
+
+    monkeypatch.setattr(ContextManager, "_request_summary", fake_request_summary)
+    return state
+
+
+def _message(i):
+    return {"role": "user", "content": f"message number {i} " + "lorem ipsum " * 10}
+
+
+async def test_summaries_fan_out_with_bounded_concurrency(monkeypatch):
+    _install(monkeypatch, _FakeRedis())
+    state = _install_llm(monkeypatch)
+    manager = ContextManager.__new__(ContextManager)
+
+    messages = [_message(i) for i in range(20)] + [_message(0)]
+    summaries = await manager.summarize_messages(messages, concurrency=4)
+
+    assert state.calls == 20  # the duplicate shares one call
+    assert state.peak == 4
+    assert summaries[0] == summaries[-1] == "summary of message numb"
+
+
+async def test_cached_summaries_are_reused_across_managers(monkeypatch):
+    fake_redis = _FakeRedis()
+    _install(monkeypatch, fake_redis)
+    state = _install_llm(monkeypatch)
+    messages = [_message(i) for i in range(5)]
+
+    first = await ContextManager.__new__(ContextManager).summarize_messages(messages)
+
+    # A new process: empty local cache, summaries come back from Redis in one read
+    _install(monkeypatch, fake_redis)
+    second = await ContextManager.__new__(ContextManager).summarize_messages(messages)
+
+    assert first == second
+    assert state.calls == 5
+    assert fake_redis.mgets == 2
+
+
+async def test_failed_summaries_are_not_cached(monkeypatch):
+    fake_redis = _FakeRedis()
+    _install(monkeypatch, fake_redis)
+
+    async def failing_request_summary(self, role, text, max_summary_tokens):
+        return None
+
+    monkeypatch.setattr(ContextManager, "_request_summary", failing_request_summary)
+    summaries = await ContextManager.__new__(ContextManager).summarize_messages([_message(1)])
+
+    assert summaries == [None]
+    assert fake_redis.values == {}
@@ -0,0 +1,53 @@
+from core.agentpress import token_cache
+from core.agentpress.token_cache import TokenCountCache
+
+
+def _install_counter(monkeypatch):
+    calls = []
+
+    def fake_token_counter(model, messages=None, text=None):
+        calls.append((model, messages, text))
+        source = text if text is not None else " ".join(str(m.get("content", "")) for m in messages)
+        return len(source.split())
+
+    monkeypatch.setattr(token_cache, "token_counter", fake_token_counter)
+    return calls
+
+
+def test_repeated_counts_hit_the_cache(monkeypatch):
+    calls = _install_counter(monkeypatch)
+    cache = TokenCountCache()
+    messages = [{"role": "user", "content": f"hello world {i}", "message_id": f"m{i}"} for i in range(20)]
+
+    first = cache.count_messages("gemini/gemini-2.5-flash", messages)
+    second = cache.count_messages("gemini/gemini-2.5-flash", messages)
+
+    assert first == second == 60
+    assert len(calls) == 20
+    assert cache.stats()["hits"] == 20
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_key_ignores_message_id_and_markers_but_not_content(monkeypatch):
+    calls = _install_counter(monkeypatch)
+    cache = TokenCountCache()
+
+    cache.count_message("m", {"role": "user", "content": "a b c", "message_id": "1"})
+    cache.count_message("m", {"role": "user", "content": "a b c", "message_id": "2", "_compression_ops": ["x"]})
+    assert len(calls) == 1
+
+    assert cache.count_message("m", {"role": "user", "content": "a b c d"}) == 4
+    assert cache.count_message("other-model", {"role": "user", "content": "a b c"}) == 3
+    assert len(calls) == 3
+
+
+def test_lru_eviction(monkeypatch):
+    _install_counter(monkeypatch)
+    cache = TokenCountCache(max_entries=2)
+
+    for text in ("one", "two", "three"):
+        cache.count_text("m", text)
+
+    assert cache.stats()["entries"] == 2
+    cache.count_text("m", "one")
+    assert cache.misses == 4
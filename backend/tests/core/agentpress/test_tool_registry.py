@@ -0,0 +1,56 @@
+from core.agentpress.tool import Tool, ToolResult, ToolSchema, SchemaType, openapi_schema
+from core.agentpress.tool_registry import ToolRegistry
+
+
+def _schema(name):
+    return {"type": "function", "function": {"name": name, "description": name, "parameters": {}}}
+
+
+class _SearchTool(Tool):
+    @openapi_schema(_schema("web_search"))
+    async def web_search(self) -> ToolResult:
+        return self.success_response("ok")
+
+    @openapi_schema(_schema("scrape_page"))
+    async def scrape_page(self) -> ToolResult:
+        return self.success_response("ok")
+
+
+class _DynamicTool(Tool):
+    """Resolves functions dynamically, like the MCP wrapper."""
+
+    def __getattr__(self, name):
+        if name.startswith("mcp_"):
+            return lambda: name
+        raise AttributeError(name)
+
+
+def test_views_are_reused_until_the_registry_changes():
+    registry = ToolRegistry()
+    registry.register_tool(_SearchTool)
+
+    functions = registry.get_available_functions()
+    schema_hash = registry.get_schema_hash()
+    assert registry.get_available_functions() is functions
+    assert registry.get_xml_tag_names() == ("scrape-page", "web-search")
+    assert [s["function"]["name"] for s in registry.get_openapi_schemas()] == ["scrape_page", "web_search"]
+
+    registry.register_instance(_DynamicTool(), schemas={
+        "mcp_lookup": [ToolSchema(schema_type=SchemaType.OPENAPI, schema=_schema("mcp_lookup"))],
+    })
+    assert registry.get_available_functions() is not functions
+    assert registry.get_available_functions()["mcp_lookup"]() == "mcp_lookup"
+    assert registry.get_schema_hash() != schema_hash
+
+    assert registry.remove("mcp_lookup", "missing") == 1
+    assert "mcp_lookup" not in registry.get_available_functions()
+    assert registry.get_schema_hash() == schema_hash
+
+
+def test_returned_schema_list_does_not_alias_the_view():
+    registry = ToolRegistry()
+    registry.register_tool(_SearchTool, function_names=["web_search"])
+
+    registry.get_openapi_schemas().append(_schema("injected"))
+    assert len(registry.get_openapi_schemas()) == 1
+    assert list(registry.tools) == ["web_search"]
@@ -0,0 +1,84 @@
+import random
+
+from core.agentpress.xml_stream_scanner import XMLToolCallScanner
+
+
+def _block(name: str, payload: str) -> str:
+    return (
+        "<function_calls>\n"
+        f'<invoke name="{name}">\n'
+        f'<parameter name="file_contents">{payload}</parameter>\n'
+        "</invoke>\n"
+        "</function_calls>"
+    )
+
+
+def _replay(content: str, chunk_sizes, initial_content: str = ""):
+    scanner = XMLToolCallScanner(initial_content)
+    blocks = []
+    pos = 0
+    sizes = iter(chunk_sizes)
+    while pos < len(content):
+        size = next(sizes)
+        blocks.extend(scanner.feed(content[pos:pos + size]))
+        pos += size
+    return scanner, blocks
+
+
+def _random_sizes(seed: int):
+    rng = random.Random(seed)
+    while True:
+        yield rng.randint(1, 5)
+
+
+def test_emits_each_block_once_across_split_tags():
+    first = _block("create_file", "a" * 200)
+    second = _block("execute_command", "ls -la")
+    content = f"Let me create it.\n{first}\nNow run it.\n{second}\nDone."
+
+    _, blocks = _replay(content, _random_sizes(1))
+
+    assert blocks == [first, second]
+
+
+def test_single_character_deltas():
+    block = _block("create_file", "<div>x</div>")
+    content = f"prefix <function_calls text {block} suffix"
+
+    _, blocks = _replay(content, iter(lambda: 1, None))
+
+    assert blocks == [block]
+
+
+def test_unterminated_block_is_not_emitted():
+    content = "intro <function_calls>\n<invoke name=\"create_file\">\n<parameter name=\"x\">partial"
+
+    scanner, blocks = _replay(content, _random_sizes(2))
+
+    assert blocks == []
+    assert scanner.in_block
+
+
+def test_initial_content_is_scanned_with_first_delta():
+    block = _block("create_file", "body")
+    split = len(block) // 2
+
+    scanner = XMLToolCallScanner(block[:split])
+
+    assert scanner.feed(block[split:]) == [block]
+
+
+def test_scan_work_is_linear_in_response_length():
+    payload = "x" * 2000
+    ratios = []
+    for total_blocks in (5, 80):
+        content = "\n".join(f"step {i}\n{_block('create_file', payload)}" for i in range(total_blocks))
+        scanner, blocks = _replay(content, _random_sizes(3))
+
+        assert len(blocks) == total_blocks
+        assert scanner.chars_fed == len(content)
+        ratios.append(scanner.chars_scanned / len(content))
+
+    # Work per character stays constant as the response grows 16x
+    assert max(ratios) < 10
+    assert abs(ratios[0] - ratios[1]) < 0.5
@@ -0,0 +1,146 @@
+import asyncio
+from decimal import Decimal
+from types import SimpleNamespace
+
+from redis.exceptions import WatchError
+
+from core.billing import balance_cache as cache_module
+from core.billing.balance_cache import BalanceGate, STATS_KEY
+from core.billing.usage_ledger import BALANCE_SNAPSHOT_KEY, PENDING_KEY, to_micros
+
+
+class _FakePipeline:
+    """Runs commands immediately until ``multi()``, then queues them; ``execute`` honours WATCH."""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._watched = {}
+        self._ops = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def watch(self, *keys):
+        for key in keys:
+            self._watched[key] = self._redis.versions.get(key, 0)
+
+    def multi(self):
+        self._ops = []
+
+    def __getattr__(self, name):
+        method = getattr(self._redis, "_" + name)
+        if self._ops is None:
+            async def immediate(*args, **kwargs):
+                await asyncio.sleep(0)
+                return method(*args, **kwargs)
+            return immediate
+
+        def queue(*args, **kwargs):
+            self._ops.append((method, args, kwargs))
+        return queue
+
+    async def execute(self):
+        # The round trip lets concurrent checks run in between
+        await asyncio.sleep(0)
+        if any(self._redis.versions.get(key, 0) != version for key, version in self._watched.items()):
+            raise WatchError("watched key changed")
+        return [method(*args, **kwargs) for method, args, kwargs in self._ops]
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.hashes = {}
+        self.versions = {}
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def _touch(self, key):
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def _mget(self, keys):
+        return [None if self.values.get(key) is None else str(self.values[key]) for key in keys]
+
+    def _hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def _hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+        self._touch(key)
+
+    def _hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+        self._touch(key)
+
+    def _hincrby(self, key, field, amount):
+        bucket = self.hashes.setdefault(key, {})
+        bucket[field] = str(int(bucket.get(field, 0)) + amount)
+        self._touch(key)
+
+    def _expire(self, key, ttl):
+        return True
+
+    async def hdel(self, key, *fields):
+        self._hdel(key, *fields)
+
+
+def _install(monkeypatch, balance):
+    fake_redis = _FakeRedis()
+    db_reads = []
+
+    async def get_client():
+        return fake_redis
+
+    async def get_running_balance(account_id):
+        db_reads.append(account_id)
+        fake_redis.values[BALANCE_SNAPSHOT_KEY.format(account_id=account_id)] = to_micros(Decimal(balance))
+        return Decimal(balance)
+
+    monkeypatch.setattr(cache_module, "redis", SimpleNamespace(get_client=get_client))
+    monkeypatch.setattr(cache_module, "usage_ledger", SimpleNamespace(get_running_balance=get_running_balance))
+    return BalanceGate(), fake_redis, db_reads
+
+
+async def test_checks_are_served_from_the_cached_balance(monkeypatch):
+    gate, fake_redis, db_reads = _install(monkeypatch, balance="5")
+
+    for _ in range(10):
+        allowed, available, _ = await gate.check_and_reserve("acct", Decimal("0.10"), reserve=False)
+        assert allowed and available == Decimal("5")
+
+    # Unflushed usage lowers the balance without a database read
+    fake_redis.values[PENDING_KEY.format(account_id="acct")] = to_micros(Decimal("4.95"))
+    allowed, available, _ = await gate.check_and_reserve("acct", Decimal("0.10"), reserve=False)
+
+    assert not allowed and available == Decimal("0.05")
+    assert db_reads == ["acct"]
+    assert gate.stats() == {"hits": 10, "misses": 1, "hit_rate": round(10 / 11, 4)}
+    assert fake_redis.hashes[STATS_KEY] == {"misses": "1", "hits": "10"}
+
+
+async def test_reservations_hold_credit_until_released(monkeypatch):
+    gate, fake_redis, _ = _install(monkeypatch, balance="0.25")
+
+    first = await gate.check_and_reserve("acct", Decimal("0.10"))
+    second = await gate.check_and_reserve("acct", Decimal("0.10"))
+    third = await gate.check_and_reserve("acct", Decimal("0.10"))
+
+    assert first[0] and second[0] and not third[0]
+    assert third[1] == Decimal("0.05") and third[2] is None
+    await gate.release("acct", first[2])
+    assert list(fake_redis.hashes["credit_reservations:acct"]) == [second[2]]
+
+
+async def test_concurrent_checks_cannot_share_the_same_credit(monkeypatch):
+    gate, fake_redis, _ = _install(monkeypatch, balance="0.15")
+    await gate.check_and_reserve("acct", Decimal("0.10"), reserve=False)  # cache the snapshot
+
+    results = await asyncio.gather(*(gate.check_and_reserve("acct", Decimal("0.10")) for _ in range(2)))
+
+    assert sorted(allowed for allowed, _, _ in results) == [False, True]
+    assert len(fake_redis.hashes["credit_reservations:acct"]) == 1
@@ -0,0 +1,277 @@
+import asyncio
+import random
+from decimal import Decimal
+from types import SimpleNamespace
+
+from redis.exceptions import WatchError
+
+from core.billing import usage_ledger as ledger_module
+from core.billing.usage_ledger import UsageLedger, to_micros
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+        self._ops = []
+        self._watched = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def watch(self, *keys):
+        self._watched = {key: self._redis.versions.get(key, 0) for key in keys}
+
+    def multi(self):
+        pass
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._ops.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        # Nothing awaits between queued commands, so the batch is atomic like MULTI/EXEC
+        await asyncio.sleep(0)
+        if any(self._redis.versions.get(key, 0) != version for key, version in self._watched.items()):
+            raise WatchError("Watched variable changed.")
+        return [getattr(self._redis, "_" + name)(*args, **kwargs) for name, args, kwargs in self._ops]
+
+
+class _FakeRedis:
+    """In-memory subset of the Redis commands the ledger uses."""
+
+    def __init__(self):
+        self.values = {}
+        self.versions = {}  # modification count per key, for WATCH
+        self.stream = []
+        self.pending_entries = {}
+        self.delivered = 0
+        self._seq = 0
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def _xadd(self, key, fields):
+        self._seq += 1
+        entry_id = f"1-{self._seq}"
+        self.stream.append((entry_id, dict(fields)))
+        return entry_id
+
+    def _incrby(self, key, amount):
+        self.values[key] = int(self.values.get(key, 0)) + amount
+        self.versions[key] = self.versions.get(key, 0) + 1
+        return self.values[key]
+
+    def _incr(self, key):
+        return self._incrby(key, 1)
+
+    def _expire(self, key, seconds):
+        return key in self.values
+
+    def _delete(self, key):
+        return 1 if self.values.pop(key, None) is not None else 0
+
+    def _decrby(self, key, amount):
+        return self._incrby(key, -amount)
+
+    def _get(self, key):
+        value = self.values.get(key)
+        return None if value is None else str(value)
+
+    def _set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def _eval(self, script, numkeys, snapshot_key, version_key, version, micros, ttl, version_ttl):
+        assert script == ledger_module._STORE_SNAPSHOT
+        stored = self.values.get(version_key)
+        if stored is not None and (version < stored or (version == stored and snapshot_key in self.values)):
+            return 0
+        self.values[snapshot_key] = micros
+        self.values[version_key] = version
+        return 1
+
+    def _xack(self, key, group, *ids):
+        for entry_id in ids:
+            self.pending_entries.pop(entry_id, None)
+
+    def _xdel(self, key, *ids):
+        self.stream = [e for e in self.stream if e[0] not in ids]
+
+    async def mget(self, keys):
+        return [self._get(key) for key in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        return self._set(key, value, ex=ex, nx=nx)
+
+    async def eval(self, *args):
+        return self._eval(*args)
+
+    async def delete(self, key):
+        return self._delete(key)
+
+    async def xgroup_create(self, *args, **kwargs):
+        return True
+
+    async def xautoclaim(self, *args, **kwargs):
+        return ["0-0", [], []]
+
+    async def xreadgroup(self, group, consumer, streams, count=None):
+        fresh = [e for e in self.stream if int(e[0].split("-")[1]) > self.delivered][:count]
+        if not fresh:
+            return []
+        self.delivered = int(fresh[-1][0].split("-")[1])
+        for entry_id, _ in fresh:
+            self.pending_entries[entry_id] = consumer
+        return [[ledger_module.USAGE_STREAM_KEY, fresh]]
+
+    async def xack(self, key, group, *ids):
+        self._xack(key, group, *ids)
+
+
+class _FakeCreditDB:
+    """Implements apply_credit_usage the way the SQL function does (row lock + event dedupe)."""
+
+    def __init__(self, balance):
+        self.balance = Decimal(balance)
+        self.applied_events = set()
+        self.ledger_rows = []
+        self.version = 0
+        self.calls = 0
+
+    async def apply(self, account_id, events, description, allow_partial=True):
+        self.calls += 1
+        await asyncio.sleep(random.random() / 1000)
+        amount = sum(Decimal(e["amount"]) for e in events if e["id"] not in self.applied_events)
+        self.applied_events.update(e["id"] for e in events)
+        charged = min(amount, self.balance)
+        self.balance -= charged
+        if charged:
+            self.version += 1
+        self.ledger_rows.append(-charged)
+        return {"success": True, "amount_deducted": charged, "new_total": float(self.balance), "balance_version": self.version}
+
+
+def _install(monkeypatch, balance="100"):
+    fake_redis = _FakeRedis()
+    db = _FakeCreditDB(balance)
+
+    async def get_client():
+        return fake_redis
+
+    async def invalidate(_key):
+        return None
+
+    monkeypatch.setattr(ledger_module, "redis", SimpleNamespace(get_client=get_client))
+    monkeypatch.setattr(ledger_module, "Cache", SimpleNamespace(invalidate=invalidate))
+    monkeypatch.setattr(ledger_module, "DBConnection", lambda: None)
+    ledger = UsageLedger(flush_interval=0.001, batch_size=50)
+    ledger.apply_usage = db.apply
+
+    async def load_balance(_account_id):
+        return db.balance, db.version
+
+    ledger._load_balance = load_balance
+    return ledger, fake_redis, db
+
+
+async def test_concurrent_deductions_lose_no_updates(monkeypatch):
+    ledger, fake_redis, db = _install(monkeypatch, balance="100")
+    costs = [Decimal(f"0.0{random.randint(1, 999):03d}17") for _ in range(300)]
+
+    await ledger.get_running_balance("acct")
+    await asyncio.gather(*(ledger.record("acct", cost, "model usage", f"m{i}") for i, cost in enumerate(costs)))
+    await ledger.stop()
+
+    expected = Decimal("100") - sum(costs)
+    assert db.balance == expected
+    assert -sum(db.ledger_rows) == sum(costs)
+    assert len(db.applied_events) == 300
+    assert db.calls < 300  # usage was aggregated per account
+    assert fake_redis.values[ledger_module.PENDING_KEY.format(account_id="acct")] == 0
+    assert fake_redis.stream == [] and fake_redis.pending_entries == {}
+    assert to_micros(await ledger.get_running_balance("acct")) == to_micros(expected)
+
+
+async def test_running_balance_includes_unflushed_usage(monkeypatch):
+    ledger, _, db = _install(monkeypatch, balance="10")
+    monkeypatch.setattr(ledger, "start", lambda: None)
+
+    assert await ledger.get_running_balance("acct") == Decimal("10")
+    assert await ledger.record("acct", Decimal("2.5")) == Decimal("7.5")
+    assert db.balance == Decimal("10")
+
+    await ledger.flush()
+    assert db.balance == Decimal("7.5")
+    assert await ledger.get_running_balance("acct") == Decimal("7.5")
+
+
+async def test_redelivered_batch_is_not_charged_twice(monkeypatch):
+    ledger, fake_redis, db = _install(monkeypatch, balance="10")
+    monkeypatch.setattr(ledger, "start", lambda: None)
+    await ledger.record("acct", Decimal("1"))
+
+    # Worker dies after the RPC but before acknowledging the batch
+    entries = await ledger._read_entries(fake_redis)
+    await db.apply("acct", [{"id": e[0], "amount": e[1]["amount"]} for e in entries], "usage")
+    fake_redis.delivered = 0
+
+    await ledger.flush()
+    assert db.balance == Decimal("9")
+    assert fake_redis.values[ledger_module.PENDING_KEY.format(account_id="acct")] == 0
+
+
+async def test_stale_balance_read_is_not_cached(monkeypatch):
+    ledger, fake_redis, db = _install(monkeypatch, balance="10")
+
+    async def load_balance(_account_id):
+        balance, version = db.balance, db.version
+        if version == 0:
+            # Credits are used directly (credit_manager.use_credits) while the balance is read
+            await db.apply("acct", [{"id": "direct", "amount": "4"}], "usage")
+            await ledger.invalidate_balance("acct")
+        return balance, version
+
+    ledger._load_balance = load_balance
+
+    assert await ledger.get_running_balance("acct") == Decimal("6")
+    assert fake_redis.values[ledger_module.BALANCE_SNAPSHOT_KEY.format(account_id="acct")] == to_micros(Decimal("6"))
+
+
+async def test_late_settle_does_not_overwrite_a_newer_balance(monkeypatch):
+    ledger, fake_redis, db = _install(monkeypatch, balance="10")
+    other_worker = UsageLedger()
+    monkeypatch.setattr(ledger, "start", lambda: None)
+    monkeypatch.setattr(other_worker, "start", lambda: None)
+    first_applied = asyncio.Event()
+
+    async def slow_apply(account_id, events, description, allow_partial=True):
+        result = await db.apply(account_id, events, description, allow_partial)
+        first_applied.set()
+        await asyncio.sleep(0.01)  # the response arrives after the other worker settled
+        return result
+
+    async def apply_after_first(account_id, events, description, allow_partial=True):
+        await first_applied.wait()
+        return await db.apply(account_id, events, description, allow_partial)
+
+    ledger.apply_usage = slow_apply
+    other_worker.apply_usage = apply_after_first
+    await ledger.record("acct", Decimal("1"))
+    first = await ledger._read_entries(fake_redis)
+    await ledger.record("acct", Decimal("2"))
+    second = await ledger._read_entries(fake_redis)
+
+    await asyncio.gather(
+        ledger._apply_account(fake_redis, "acct", first),
+        other_worker._apply_account(fake_redis, "acct", second),
+    )
+
+    assert db.balance == Decimal("7")
+    assert fake_redis.values[ledger_module.BALANCE_SNAPSHOT_KEY.format(account_id="acct")] == to_micros(Decimal("7"))
+    assert await ledger.get_running_balance("acct") == Decimal("7")
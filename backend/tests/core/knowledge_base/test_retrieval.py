@@ -0,0 +1,194 @@
+import re
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+
+from core.knowledge_base import retrieval
+from core.knowledge_base.retrieval import KnowledgeBaseRetriever, chunk_text, estimate_tokens
+
+
+class _HashingEmbeddings:
+    """Deterministic bag-of-words embeddings; ``primary_down`` switches to a smaller fallback model."""
+
+    model = "hashing-64"
+    fallback_model = "hashing-16"
+
+    def __init__(self):
+        self.batches = []
+        self.primary_down = False
+
+    def _vector(self, text):
+        size = 16 if self.primary_down else 64
+        vector = np.zeros(size, dtype=np.float32)
+        for word in re.findall(r"[a-z]+", text.lower()):
+            vector[zlib.crc32(word.encode()) % size] += 1
+        return (vector / (np.linalg.norm(vector) or 1)).tolist(), self.fallback_model if self.primary_down else self.model
+
+    async def embed_text_with_model(self, text):
+        return self._vector(text)
+
+    async def embed_batch_with_models(self, texts):
+        self.batches.append(list(texts))
+        return [self._vector(t) for t in texts]
+
+
+class _Query:
+    def __init__(self, db, table=None, rows=None):
+        self.db, self.table, self.rows = db, table, rows
+
+    def __getattr__(self, name):
+        def chain(*args, **kwargs):
+            if name in ("insert", "upsert"):
+                keys = {(c["entry_id"], c["chunk_index"]) for c in args[0]}
+                self.db.chunks = [c for c in self.db.chunks if (c["entry_id"], c["chunk_index"]) not in keys] + list(args[0])
+            return self
+        return chain
+
+    async def execute(self):
+        return SimpleNamespace(data=self.rows)
+
+
+class _FakeClient:
+    def __init__(self, entries):
+        self.entries = entries
+        self.chunks = []
+        self.rpc_calls = 0
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params):
+        if name == "replace_knowledge_base_chunks":
+            self.chunks = [
+                c for c in self.chunks
+                if c["entry_id"] != params["p_entry_id"] or (params["p_summary_only"] and c["chunk_index"] != 0)
+            ] + list(params["p_chunks"])
+            return _Query(self)
+        self.rpc_calls += 1
+        rows = []
+        for entry in self.entries:
+            base = {"entry_id": entry["entry_id"], "folder_name": "Docs", "filename": entry["filename"], "summary": entry["summary"]}
+            chunks = [c for c in self.chunks if c["entry_id"] == entry["entry_id"]]
+            rows.extend({**base, **c} for c in chunks) if chunks else rows.append({**base, "chunk_index": None})
+        return _Query(self, rows=rows)
+
+
+def _install(monkeypatch):
+    versions = {}
+
+    async def get(key):
+        return versions.get(key)
+
+    async def get_client():
+        async def incr(key):
+            versions[key] = str(int(versions.get(key, 0)) + 1)
+        return SimpleNamespace(incr=incr)
+
+    monkeypatch.setattr(retrieval, "redis", SimpleNamespace(get=get, get_client=get_client))
+    return KnowledgeBaseRetriever(embedding_client=_HashingEmbeddings(), index_ttl=600)
+
+
+def test_chunks_respect_size_and_overlap():
+    text = "\n\n".join(f"Paragraph {i} " + "word " * 120 for i in range(10))
+    chunks = chunk_text(text, max_tokens=200, overlap_tokens=20)
+
+    assert len(chunks) > 3
+    assert all(estimate_tokens(c) <= 200 + 20 + 5 for c in chunks)
+    assert all(any(f"Paragraph {i} " in c for c in chunks) for i in range(10))
+    assert chunks[1].split()[0] == "word"  # starts with the tail of the previous chunk
+
+
+async def test_injects_only_relevant_chunks_within_budget(monkeypatch):
+    retriever = _install(monkeypatch)
+    client = _FakeClient([
+        {"entry_id": "e1", "filename": "pricing.md", "summary": "Pricing plans and invoices."},
+        {"entry_id": "e2", "filename": "onboarding.md", "summary": "Employee onboarding checklist."},
+    ])
+    await retriever.index_entry(client, "e1", "acct", "Pricing plans and invoices.",
+                                "The enterprise plan costs 400 dollars per seat.\n\nRefunds are issued within 30 days.")
+
+    context = await retriever.get_context(client, "agent", "acct", "how much does the enterprise plan cost per seat",
+                                          top_k=2, token_budget=40)
+
+    assert "## Docs/pricing.md" in context
+    assert "enterprise plan costs 400 dollars" in context
+    assert "onboarding" not in context.lower()
+    # The unchunked entry was backfilled from its summary during the index build
+    assert {c["entry_id"] for c in client.chunks} == {"e1", "e2"}
+
+
+async def test_index_is_reused_until_the_knowledge_base_changes(monkeypatch):
+    retriever = _install(monkeypatch)
+    client = _FakeClient([{"entry_id": "e1", "filename": "a.md", "summary": "Alpha summary."}])
+
+    await retriever.get_context(client, "agent", "acct", "alpha")
+    await retriever.get_context(client, "agent", "acct", "beta")
+    assert client.rpc_calls == 1
+
+    await retriever.invalidate("acct")
+    await retriever.get_context(client, "agent", "acct", "alpha")
+    assert client.rpc_calls == 2
+
+    assert await retriever.get_context(_FakeClient([]), "empty-agent", "acct", "alpha") == ""
+
+
+async def test_least_recently_used_agent_index_is_evicted(monkeypatch):
+    retriever = _install(monkeypatch)
+    retriever.max_indexes = 2
+    client = _FakeClient([{"entry_id": "e1", "filename": "a.md", "summary": "Alpha summary."}])
+
+    for agent in ("a", "b", "a", "c"):
+        await retriever.get_context(client, agent, "acct", "alpha")
+    assert list(retriever._indexes) == ["a", "c"]
+    assert client.rpc_calls == 3
+
+    await retriever.get_context(client, "b", "acct", "alpha")
+    assert client.rpc_calls == 4
+    assert len(retriever._indexes) == 2
+
+
+async def test_failed_re_embed_keeps_the_existing_chunks(monkeypatch):
+    retriever = _install(monkeypatch)
+    client = _FakeClient([])
+    await retriever.index_entry(client, "e1", "acct", "Pricing plans.", "Enterprise costs 400.\n\nRefunds in 30 days.")
+    before = list(client.chunks)
+
+    async def embedding_unavailable(texts):
+        return [(None, None)] * len(texts)
+
+    monkeypatch.setattr(retriever.embeddings, "embed_batch_with_models", embedding_unavailable)
+    assert await retriever.index_entry(client, "e1", "acct", "New summary.") == 0
+    assert client.chunks == before
+
+
+async def test_summary_reindex_replaces_only_chunk_zero(monkeypatch):
+    retriever = _install(monkeypatch)
+    client = _FakeClient([])
+    await retriever.index_entry(client, "e1", "acct", "Pricing plans.", "Enterprise costs 400.")
+
+    await retriever.index_entry(client, "e1", "acct", "Updated pricing summary.")
+
+    assert sorted((c["chunk_index"], c["content"]) for c in client.chunks) == [
+        (0, "Updated pricing summary."), (1, "Enterprise costs 400."),
+    ]
+
+
+async def test_fallback_vectors_are_labelled_and_re_embedded_with_the_primary_model(monkeypatch):
+    retriever = _install(monkeypatch)
+    embeddings = retriever.embeddings
+    client = _FakeClient([{"entry_id": "e1", "filename": "pricing.md", "summary": "Pricing plans."}])
+
+    embeddings.primary_down = True
+    await retriever.index_entry(client, "e1", "acct", "Pricing plans.", "The enterprise plan costs 400 dollars per seat.")
+    assert {c["embedding_model"] for c in client.chunks} == {"hashing-16"}
+    # A fallback query vector is never scored against the index
+    assert await retriever.get_context(client, "agent", "acct", "enterprise plan cost") is None
+
+    embeddings.primary_down = False
+    await retriever.invalidate("acct")
+    context = await retriever.get_context(client, "agent", "acct", "enterprise plan cost", top_k=1)
+
+    assert "enterprise plan costs 400 dollars" in context
+    assert {c["embedding_model"] for c in client.chunks} == {"hashing-64"}
+    assert {len(c["embedding"]) for c in client.chunks} == {64}
@@ -0,0 +1,375 @@
+import asyncio
+import io
+import time
+from types import SimpleNamespace
+
+import docx
+import pytest
+import httpx
+from fastapi import FastAPI
+
+from core.knowledge_base import api, file_processor, jobs
+from core.knowledge_base.file_processor import FileProcessor
+from core.utils.auth_utils import verify_and_get_user_id_from_jwt
+
+ACCOUNT_ID = "acct-1"
+FOLDER_ID = "folder-1"
+
+
+class _Query:
+    def __init__(self, db, table):
+        self.db, self.table, self.filters, self.op, self.payload = db, table, {}, "select", None
+
+    def select(self, *args, **kwargs):
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def upsert(self, payload, **kwargs):
+        self.op, self.payload = "upsert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = lambda v, value=value: v == value
+        return self
+
+    def in_(self, column, values):
+        self.filters[column] = lambda v, values=values: v in values
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    def _matches(self, row):
+        return all(match(row.get(column)) for column, match in self.filters.items())
+
+    async def execute(self):
+        rows = self.db.tables.setdefault(self.table, [])
+        if self.op == "insert":
+            row = {"job_id": f"job-{len(rows)}", "created_at": "now", **self.payload}
+            rows.append(row)
+            return SimpleNamespace(data=[row])
+        if self.op == "upsert":
+            rows.append(dict(self.payload))
+            return SimpleNamespace(data=[self.payload])
+        matched = [row for row in rows if self._matches(row)]
+        if self.op == "update":
+            for row in matched:
+                row.update(self.payload)
+        if self.op == "delete":
+            self.db.tables[self.table] = [row for row in rows if not self._matches(row)]
+        return SimpleNamespace(data=matched)
+
+
+class _FakeDB:
+    def __init__(self):
+        self.tables = {"knowledge_base_folders": [{"folder_id": FOLDER_ID, "account_id": ACCOUNT_ID}]}
+        self.files = {}
+        bucket = SimpleNamespace(upload=self._upload, download=self._download, remove=self._remove)
+        self.storage = SimpleNamespace(from_=lambda name: bucket)
+
+    def table(self, name):
+        return _Query(self, name)
+
+    async def _upload(self, path, content, options):
+        self.files[path] = content
+
+    async def _download(self, path):
+        return self.files[path]
+
+    async def _remove(self, paths):
+        for path in paths:
+            self.files.pop(path, None)
+
+    @property
+    def client(self):
+        async def client():
+            return self
+        return client()
+
+
+class _FakeSlotsRedis:
+    """Sorted-set subset used by jobs.acquire_slot / release_slot."""
+
+    def __init__(self):
+        self.sets = {}
+
+    async def get_client(self):
+        return self
+
+    def pipeline(self, transaction=False):
+        calls = []
+
+        class _Pipeline:
+            def __getattr__(pipe, name):
+                return lambda *args, **kwargs: calls.append((name, args, kwargs))
+
+            async def execute(pipe):
+                return [getattr(self, "_" + name)(*args, **kwargs) for name, args, kwargs in calls]
+
+        return _Pipeline()
+
+    def _zremrangebyscore(self, key, low, high):
+        members = self.sets.setdefault(key, {})
+        for member in [m for m, score in members.items() if score <= high]:
+            del members[member]
+
+    def _zadd(self, key, mapping, nx=False):
+        for member, score in mapping.items():
+            self.sets.setdefault(key, {}).setdefault(member, score)
+
+    def _zrank(self, key, member):
+        ordered = sorted(self.sets.get(key, {}).items(), key=lambda item: item[1])
+        return [m for m, _ in ordered].index(member) if member in dict(ordered) else None
+
+    def _expire(self, key, seconds):
+        pass
+
+    async def zrem(self, key, member):
+        self.sets.get(key, {}).pop(member, None)
+
+
+async def _measure_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+def _write_large_files(tmp_path, count=4, size_mb=8):
+    paths = []
+    for i in range(count):
+        path = tmp_path / f"handbook-{i}.md"
+        paragraph = f"Section {i}: the retention period for project {i} is documented here. " * 20
+        path.write_text("\n\n".join(paragraph for _ in range(size_mb * 1024 * 1024 // len(paragraph))))
+        paths.append(path)
+    return paths
+
+
+def _install(monkeypatch, fake_db, sent):
+    monkeypatch.setattr(api, "db", fake_db)
+    monkeypatch.setattr(api.file_processor, "db", fake_db)
+    monkeypatch.setattr(api, "DBConnection", lambda: fake_db)
+    monkeypatch.setattr("core.services.supabase.DBConnection", lambda: fake_db)
+    monkeypatch.setattr(api, "process_knowledge_base_file", SimpleNamespace(send=sent.append))
+    monkeypatch.setattr(jobs, "redis", _FakeSlotsRedis())
+    monkeypatch.setattr(jobs, "config", SimpleNamespace(
+        KB_EXTRACTION_ACCOUNT_CONCURRENCY=2, KB_EXTRACTION_PROCESSES=2, KB_EXTRACTION_MAX_CHARS=4_000_000,
+    ))
+
+
+async def test_concurrent_large_uploads_return_immediately_and_api_stays_responsive(tmp_path, monkeypatch):
+    fake_db, sent = _FakeDB(), []
+    _install(monkeypatch, fake_db, sent)
+
+    app = FastAPI()
+    app.include_router(api.router)
+    app.dependency_overrides[verify_and_get_user_id_from_jwt] = lambda: ACCOUNT_ID
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    paths = _write_large_files(tmp_path)
+    ping_latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        async def upload(path):
+            with open(path, "rb") as f:
+                return await client.post(
+                    f"/knowledge-base/folders/{FOLDER_ID}/upload",
+                    files={"file": (path.name, f.read(), "text/markdown")},
+                )
+
+        async def ping_while_uploading(uploads):
+            while not uploads.done():
+                started = time.perf_counter()
+                assert (await client.get("/ping")).status_code == 200
+                ping_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        uploads = asyncio.ensure_future(asyncio.gather(*(upload(p) for p in paths)))
+        started = time.perf_counter()
+        await ping_while_uploading(uploads)
+        responses = await uploads
+        elapsed = time.perf_counter() - started
+
+    assert [r.status_code for r in responses] == [202] * len(paths)
+    assert {r.json()["status"] for r in responses} == {"queued"}
+    assert sorted(sent) == sorted(r.json()["job_id"] for r in responses)
+    assert not fake_db.tables.get("knowledge_base_entries")  # nothing was extracted or summarized inline
+    assert elapsed < 5
+    assert ping_latencies and max(ping_latencies) < 1.0
+
+
+async def test_worker_extracts_off_the_event_loop_within_account_limit(tmp_path, monkeypatch):
+    fake_db, sent = _FakeDB(), []
+    _install(monkeypatch, fake_db, sent)
+    processor = FileProcessor()
+    processor.db = fake_db
+
+    running = SimpleNamespace(now=0, peak=0)
+    real_extraction = jobs.run_extraction
+
+    async def tracked_extraction(*args):
+        running.now += 1
+        running.peak = max(running.peak, running.now)
+        try:
+            return await real_extraction(*args)
+        finally:
+            running.now -= 1
+
+    async def fake_summary(content, filename):
+        return f"Summary of {filename}"
+
+    async def fake_index(client, entry_id, account_id, summary, content):
+        return len(content) // 1000
+
+    monkeypatch.setattr(jobs, "run_extraction", tracked_extraction)
+    monkeypatch.setattr(processor, "_generate_summary", fake_summary)
+    monkeypatch.setattr(file_processor.kb_retriever, "index_entry", fake_index)
+
+    # Parsing this takes ~0.5s of CPU: inline, it would stall the event loop that long
+    document = docx.Document()
+    for i in range(8000):
+        document.add_paragraph(f"Paragraph {i}: the retention period for project {i} is reviewed quarterly.")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    docx_mime = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    uploads = [(f"policy-{i}.docx", buffer.getvalue(), docx_mime) for i in range(2)]
+    uploads += [(p.name, p.read_bytes(), "text/markdown") for p in _write_large_files(tmp_path, count=2, size_mb=4)]
+
+    job_ids = []
+    for filename, content, mime_type in uploads:
+        staged = await processor.stage_file(ACCOUNT_ID, FOLDER_ID, content, filename, mime_type)
+        job_ids.append(staged["job_id"])
+
+    async def run_until_done(job_id):
+        while not await processor.run_job(job_id):
+            await asyncio.sleep(0.05)  # deferred: the actor re-enqueues with a delay
+
+    stop = asyncio.Event()
+    lag = asyncio.ensure_future(_measure_loop_lag(stop))
+    try:
+        await asyncio.gather(*(run_until_done(job_id) for job_id in job_ids))
+    finally:
+        stop.set()
+        jobs._get_pool().shutdown()
+        jobs._pool = None
+
+    job_rows = fake_db.tables["knowledge_base_jobs"]
+    assert [row["status"] for row in job_rows] == ["completed"] * 4
+    assert all(row["chunk_count"] > 0 for row in job_rows)
+    assert len(fake_db.tables["knowledge_base_entries"]) == 4
+    assert running.peak == 2
+    assert await lag < 0.25
+
+
+async def _staged_job(monkeypatch, fake_db, processor):
+    _install(monkeypatch, fake_db, [])
+    processor.db = fake_db
+
+    async def fake_summary(content, filename):
+        return f"Summary of {filename}"
+
+    async def fake_index(client, entry_id, account_id, summary, content):
+        return 1
+
+    monkeypatch.setattr(processor, "_generate_summary", fake_summary)
+    monkeypatch.setattr(file_processor.kb_retriever, "index_entry", fake_index)
+    staged = await processor.stage_file(ACCOUNT_ID, FOLDER_ID, b"Retention is seven years.", "policy.txt", "text/plain")
+    return staged["job_id"]
+
+
+async def test_transient_failure_is_retried_without_losing_the_upload(monkeypatch):
+    fake_db, processor = _FakeDB(), FileProcessor()
+    job_id = await _staged_job(monkeypatch, fake_db, processor)
+    attempts = []
+
+    async def flaky_extraction(file_content, filename, mime_type):
+        attempts.append(filename)
+        if len(attempts) == 1:
+            raise file_processor.BrokenProcessPool("extraction worker died")
+        return file_content.decode(), False
+
+    monkeypatch.setattr(jobs, "run_extraction", flaky_extraction)
+
+    with pytest.raises(file_processor.BrokenProcessPool):
+        await processor.run_job(job_id, final_attempt=False)
+    job = fake_db.tables["knowledge_base_jobs"][0]
+    assert job["status"] == "processing"
+    assert fake_db.files
+
+    assert await processor.run_job(job_id, final_attempt=False)
+    assert job["status"] == "completed"
+
+
+async def test_last_attempt_marks_the_job_failed_and_deletes_the_file(monkeypatch):
+    fake_db, processor = _FakeDB(), FileProcessor()
+    job_id = await _staged_job(monkeypatch, fake_db, processor)
+
+    async def storage_down(path):
+        raise ConnectionError("storage unavailable")
+
+    fake_db.storage.from_("file-uploads").download = storage_down
+
+    assert await processor.run_job(job_id, final_attempt=True)
+    job = fake_db.tables["knowledge_base_jobs"][0]
+    assert job["status"] == "failed"
+    assert "storage unavailable" in job["error"]
+    assert not fake_db.files
+
+
+async def test_unreadable_file_fails_without_retrying(monkeypatch):
+    fake_db, processor = _FakeDB(), FileProcessor()
+    job_id = await _staged_job(monkeypatch, fake_db, processor)
+
+    async def corrupt(file_content, filename, mime_type):
+        raise ValueError("not a valid PDF")
+
+    monkeypatch.setattr(jobs, "run_extraction", corrupt)
+
+    assert await processor.run_job(job_id, final_attempt=False)
+    assert fake_db.tables["knowledge_base_jobs"][0]["status"] == "failed"
+    assert not fake_db.files
+
+
+async def test_folder_listing_shows_processing_and_failed_uploads(monkeypatch):
+    fake_db, processor = _FakeDB(), FileProcessor()
+    job_id = await _staged_job(monkeypatch, fake_db, processor)
+
+    async def corrupt(file_content, filename, mime_type):
+        raise ValueError("not a valid PDF")
+
+    monkeypatch.setattr(jobs, "run_extraction", corrupt)
+    app = FastAPI()
+    app.include_router(api.router)
+    app.dependency_overrides[verify_and_get_user_id_from_jwt] = lambda: ACCOUNT_ID
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        entries_url = f"/knowledge-base/folders/{FOLDER_ID}/entries"
+        [queued] = (await client.get(entries_url)).json()
+        assert (queued["filename"], queued["status"], queued["job_id"]) == ("policy.txt", "queued", job_id)
+
+        await processor.run_job(job_id)
+        [failed] = (await client.get(entries_url)).json()
+        assert failed["status"] == "failed" and "not a valid PDF" in failed["error"]
+
+        # Deleting the failed upload dismisses it
+        assert (await client.delete(f"/knowledge-base/entries/{failed['entry_id']}")).status_code == 200
+        assert (await client.get(entries_url)).json() == []
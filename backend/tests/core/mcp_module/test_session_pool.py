@@ -0,0 +1,200 @@
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import anyio
+import pytest
+
+from core.mcp_module.session_pool import MCPSessionPool
+
+
+class _FakeServer:
+    """Stand-in MCP server that counts handshakes and can drop connections."""
+
+    def __init__(self):
+        self.handshakes = 0
+        self.closed = 0
+        self.fail_next_call = False
+        self.fail_next_list = False
+        self.tool_error: Exception | None = None
+        self.calls = 0
+        self.pings = 0
+        self.dropped = set()  # sessions whose connection the server closed
+
+    @asynccontextmanager
+    async def connect(self, transport, url, headers):
+        self.handshakes += 1
+        try:
+            yield _FakeSession(self)
+        finally:
+            self.closed += 1
+
+
+class _FakeSession:
+    def __init__(self, server):
+        self._server = server
+
+    async def call_tool(self, name, arguments):
+        if self in self._server.dropped:
+            raise anyio.ClosedResourceError()
+        self._server.calls += 1
+        if self._server.fail_next_call:
+            self._server.fail_next_call = False
+            raise ConnectionError("connection reset")
+        if self._server.tool_error is not None:
+            raise self._server.tool_error
+        return SimpleNamespace(content=[SimpleNamespace(text=f"{name}:{arguments['x']}")])
+
+    async def list_tools(self):
+        if self._server.fail_next_list:
+            self._server.fail_next_list = False
+            raise ConnectionError("connection reset")
+        return SimpleNamespace(tools=[SimpleNamespace(name="echo")])
+
+    async def send_ping(self):
+        self._server.pings += 1
+        if self in self._server.dropped:
+            raise anyio.ClosedResourceError()
+        return None
+
+
+async def test_reuses_session_across_calls_and_discovery():
+    server = _FakeServer()
+    pool = MCPSessionPool(session_factory=server.connect)
+
+    tools = await pool.list_tools("http", "http://mcp.local", {"Authorization": "a"})
+    for i in range(30):
+        result = await pool.call_tool("http", "http://mcp.local", {"Authorization": "a"}, "echo", {"x": i})
+
+    assert [t.name for t in tools.tools] == ["echo"]
+    assert result.content[0].text == "echo:29"
+    assert server.handshakes == 1
+    assert pool.stats()["reuses"] == 30
+
+    await pool.close_all()
+    assert server.closed == 1
+
+
+async def test_headers_are_part_of_the_key():
+    server = _FakeServer()
+    pool = MCPSessionPool(session_factory=server.connect)
+
+    await pool.call_tool("sse", "http://mcp.local", {"Authorization": "a"}, "echo", {"x": 1})
+    await pool.call_tool("sse", "http://mcp.local", {"Authorization": "b"}, "echo", {"x": 1})
+
+    assert server.handshakes == 2
+    await pool.close_all()
+
+
+async def test_discovery_reconnects_once_after_transport_failure():
+    server = _FakeServer()
+    pool = MCPSessionPool(session_factory=server.connect)
+    await pool.list_tools("http", "http://mcp.local")
+
+    server.fail_next_list = True
+    tools = await pool.list_tools("http", "http://mcp.local")
+
+    assert [t.name for t in tools.tools] == ["echo"]
+    assert server.handshakes == 2
+    assert pool.stats()["reconnects"] == 1
+    await pool.close_all()
+
+
+async def test_tool_call_is_not_retried_after_transport_failure():
+    server = _FakeServer()
+    pool = MCPSessionPool(session_factory=server.connect)
+    await pool.call_tool("http", "http://mcp.local", None, "echo", {"x": 1})
+
+    server.fail_next_call = True
+    with pytest.raises(ConnectionError):
+        await pool.call_tool("http", "http://mcp.local", None, "echo", {"x": 2})
+
+    assert server.calls == 2
+    assert pool.stats()["reconnects"] == 0
+    assert pool.stats()["open_sessions"] == 0
+
+    result = await pool.call_tool("http", "http://mcp.local", None, "echo", {"x": 3})
+    assert result.content[0].text == "echo:3"
+    assert server.handshakes == 2
+    await pool.close_all()
+
+
+async def test_tool_call_on_a_connection_dropped_since_last_use_reconnects():
+    server = _FakeServer()
+    pool = MCPSessionPool(session_factory=server.connect)
+    await pool.call_tool("http", "http://mcp.local", None, "echo", {"x": 1})
+
+    # The server closes the idle connection well within the health check interval
+    server.dropped.add(pool._sessions[next(iter(pool._sessions))].session)
+    result = await pool.call_tool("http", "http://mcp.local", None, "echo", {"x": 2})
+
+    assert result.content[0].text == "echo:2"
+    assert server.calls == 2
+    assert server.handshakes == 2
+    assert server.pings == 1
+    await pool.close_all()
+
+
+async def test_tool_error_runs_once_and_keeps_session():
+    server = _FakeServer()
+    pool = MCPSessionPool(session_factory=server.connect)
+
+    server.tool_error = RuntimeError("tool failed")
+    with pytest.raises(RuntimeError, match="tool failed"):
+        await pool.call_tool("http", "http://mcp.local", None, "charge_card", {"x": 1})
+
+    assert server.calls == 1
+    assert server.handshakes == 1
+    assert pool.stats()["open_sessions"] == 1
+    await pool.close_all()
+
+
+async def test_evicts_least_recently_used_when_full():
+    server = _FakeServer()
+    pool = MCPSessionPool(max_sessions=2, session_factory=server.connect)
+
+    for url in ("http://a", "http://b", "http://a", "http://c"):
+        await pool.call_tool("http", url, None, "echo", {"x": 0})
+
+    assert pool.stats()["open_sessions"] == 2
+    assert pool.stats()["evictions"] == 1
+    await pool.call_tool("http", "http://a", None, "echo", {"x": 0})
+    assert server.handshakes == 3
+    await pool.close_all()
+
+
+async def test_key_locks_are_dropped_with_their_sessions():
+    server = _FakeServer()
+    pool = MCPSessionPool(max_sessions=2, session_factory=server.connect)
+
+    for i in range(20):
+        await pool.call_tool("http", f"http://mcp-{i}.local", None, "echo", {"x": i})
+    assert len(pool._key_locks) == pool.stats()["open_sessions"] == 2
+
+    await pool.close("http", "http://mcp-19.local")
+    assert len(pool._key_locks) == 1
+    await pool.close_all()
+    assert pool._key_locks == {}
+
+
+async def test_idle_sessions_expire():
+    server = _FakeServer()
+    pool = MCPSessionPool(idle_ttl=0, session_factory=server.connect)
+
+    await pool.call_tool("http", "http://mcp.local", None, "echo", {"x": 0})
+    await pool.call_tool("http", "http://mcp.local", None, "echo", {"x": 0})
+
+    assert server.handshakes == 2
+    assert server.closed == 1
+    await pool.close_all()
+
+
+async def test_connect_failure_is_raised():
+    @asynccontextmanager
+    async def refuse(transport, url, headers):
+        raise ConnectionRefusedError("no server")
+        yield
+
+    pool = MCPSessionPool(session_factory=refuse)
+    with pytest.raises(ConnectionRefusedError):
+        await pool.call_tool("http", "http://down", None, "echo", {"x": 0})
+    assert pool.stats()["open_sessions"] == 0
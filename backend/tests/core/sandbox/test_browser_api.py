@@ -0,0 +1,173 @@
+import asyncio
+import base64
+import io
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from core.sandbox import browser_api
+from core.sandbox.browser_api import (
+    BINARY_RESULT_TYPE,
+    BrowserApiClient,
+    BrowserApiUnavailable,
+    ExecBrowserTransport,
+    HttpBrowserTransport,
+    ScreenshotStore,
+)
+
+
+def _png(width=1024, height=768, color=(30, 90, 200)):
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(output, format="PNG")
+    return output.getvalue()
+
+
+def _photo(width, height):
+    output = io.BytesIO()
+    noise = Image.merge("RGB", [Image.effect_noise((width // 16, height // 16), 60) for _ in range(3)])
+    noise.resize((width, height), Image.BICUBIC).save(output, format="PNG")
+    return output.getvalue()
+
+
+class _FakeBrowserApi:
+    """Keep-alive HTTP server answering like browserApi.ts, with or without binary results."""
+
+    def __init__(self, screenshot, binary=True):
+        self.screenshot = screenshot
+        self.binary = binary
+        self.requests = []
+        self.connections = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests.append((method, path, json.loads(body or b"null"), headers))
+
+                result = {"success": True, "message": f"{method} {path}", "url": "https://example.com", "title": "Example"}
+                if self.binary and BINARY_RESULT_TYPE in headers.get("accept", ""):
+                    content_type, data = BINARY_RESULT_TYPE, json.dumps(result).encode() + b"\n" + self.screenshot
+                else:
+                    result["screenshot_base64"] = base64.b64encode(self.screenshot).decode()
+                    content_type, data = "application/json", json.dumps(result).encode()
+                writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+@asynccontextmanager
+async def _browser_api(monkeypatch, **kwargs):
+    monkeypatch.setattr(browser_api, "config", SimpleNamespace(
+        BROWSER_API_MAX_CONNECTIONS=10, BROWSER_SCREENSHOT_MAX_DIMENSION=1280, BROWSER_SCREENSHOT_JPEG_QUALITY=80,
+    ))
+    server = _FakeBrowserApi(_png(), **kwargs)
+    base_url = await server.start()
+    client = BrowserApiClient()
+    try:
+        yield server, HttpBrowserTransport(base_url, "preview-token", client)
+    finally:
+        await client.aclose()
+        await server.stop()
+
+
+async def test_http_transport_reuses_connection_and_receives_binary_screenshots(monkeypatch):
+    async with _browser_api(monkeypatch) as (server, transport):
+        for i in range(5):
+            response = await transport.request("POST", "/act", {"action": f"click {i}"})
+            assert response.status_code == 200
+            assert response.result["message"] == "POST /api/act"
+            assert response.screenshot == server.screenshot
+
+        assert server.connections == 1
+        method, path, payload, headers = server.requests[-1]
+        assert payload == {"action": "click 4"}
+        assert headers["x-daytona-preview-token"] == "preview-token"
+
+
+async def test_http_transport_reads_base64_results_from_older_sandboxes(monkeypatch):
+    async with _browser_api(monkeypatch, binary=False) as (server, transport):
+        response = await transport.request("GET", "")
+        assert response.screenshot == server.screenshot
+        assert "screenshot_base64" not in response.result
+
+    with pytest.raises(BrowserApiUnavailable):
+        await transport.request("POST", "/navigate", {"url": "https://example.com"})
+
+
+async def test_exec_transport_passes_payload_through_environment():
+    calls = []
+
+    async def exec(command, timeout=None, env=None):
+        calls.append((command, env))
+        body = json.dumps({"success": False, "message": "Failed to act", "screenshot_base64": ""})
+        return SimpleNamespace(exit_code=0, result=f"{body}\n500")
+
+    transport = ExecBrowserTransport(SimpleNamespace(process=SimpleNamespace(exec=exec)))
+    response = await transport.request("POST", "/act", {"action": "type 'it''s'"})
+
+    assert response.status_code == 500
+    assert response.result == {"success": False, "message": "Failed to act"}
+    assert response.screenshot is None and response.screenshot_error
+    command, env = calls[0]
+    assert "type" not in command
+    assert json.loads(env["BROWSER_API_PAYLOAD"]) == {"action": "type 'it''s'"}
+
+
+async def test_screenshots_are_downsized_and_uploaded_once(monkeypatch):
+    monkeypatch.setattr(browser_api, "config", SimpleNamespace(BROWSER_SCREENSHOT_MAX_DIMENSION=1280, BROWSER_SCREENSHOT_JPEG_QUALITY=80))
+    uploads = []
+
+    async def upload_image_bytes(data, content_type, bucket_name, prefix):
+        uploads.append(data)
+        return f"https://storage.example.com/{bucket_name}/{len(uploads)}.jpg"
+
+    class _Redis:
+        async def get(self, key):
+            return None
+
+        async def set(self, key, value, ex=None):
+            pass
+
+    monkeypatch.setattr(browser_api, "upload_image_bytes", upload_image_bytes)
+    monkeypatch.setattr(browser_api, "redis", _Redis())
+    store = ScreenshotStore()
+
+    full_page = _photo(1920, 3000)
+    first = await store.upload(full_page)
+    assert await store.upload(full_page) == first
+    assert await store.upload(_png(color=(0, 0, 0))) != first
+    assert store.stats() == {"hits": 1, "uploads": 2}
+
+    with Image.open(io.BytesIO(uploads[0])) as image:
+        assert image.format == "JPEG"
+        assert max(image.size) == 1280
+    assert len(uploads[0]) < len(full_page)
+    # A flat page that is already small enough is uploaded as it is
+    with Image.open(io.BytesIO(uploads[1])) as image:
+        assert image.format == "PNG"
+
+    with pytest.raises(ValueError):
+        await store.upload(b"not an image")
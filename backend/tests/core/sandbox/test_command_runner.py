@@ -0,0 +1,127 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.sandbox import command_runner
+from core.sandbox.command_runner import CommandNotFound, CommandRunner, slice_output
+
+
+class _LocalProcess:
+    """Stand-in for ``sandbox.process`` running session commands as local subprocesses."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.calls = []
+
+    async def create_session(self, session_id):
+        self.calls.append("create_session")
+        self.sessions[session_id] = []
+
+    async def get_session(self, session_id):
+        self.calls.append("get_session")
+        return SimpleNamespace(session_id=session_id, commands=[c["info"] for c in self._commands(session_id)])
+
+    def _commands(self, session_id):
+        if session_id not in self.sessions:
+            raise Exception(f"session {session_id} not found")
+        return self.sessions[session_id]
+
+    async def execute_session_command(self, session_id, req, timeout=None):
+        self.calls.append("execute_session_command")
+        commands = self._commands(session_id)
+        process = await asyncio.create_subprocess_exec(
+            "bash", "-c", req.command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+        )
+        command = {"info": SimpleNamespace(id=f"cmd-{len(commands)}", command=req.command, exit_code=None), "logs": b"", "process": process}
+        commands.append(command)
+        done = asyncio.ensure_future(self._collect(command))
+        if req.run_async:
+            return SimpleNamespace(cmd_id=command["info"].id, output=None, exit_code=None)
+        await asyncio.shield(done)  # the sandbox keeps running it when the caller gives up
+        return SimpleNamespace(cmd_id=command["info"].id, output=command["logs"].decode(), exit_code=command["info"].exit_code)
+
+    async def _collect(self, command):
+        while chunk := await command["process"].stdout.read(64):
+            command["logs"] += chunk
+        command["info"].exit_code = await command["process"].wait()
+
+    async def get_session_command(self, session_id, command_id):
+        self.calls.append("get_session_command")
+        return next(c["info"] for c in self._commands(session_id) if c["info"].id == command_id)
+
+    async def get_session_command_logs(self, session_id, command_id):
+        self.calls.append("get_session_command_logs")
+        return next(c["logs"] for c in self._commands(session_id) if c["info"].id == command_id).decode()
+
+    async def delete_session(self, session_id):
+        for command in self.sessions.pop(session_id):
+            if command["info"].exit_code is None:
+                command["process"].kill()
+
+    async def list_sessions(self):
+        return [await self.get_session(session_id) for session_id in self.sessions]
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    monkeypatch.setattr(command_runner, "config", SimpleNamespace(SHELL_OUTPUT_MAX_BYTES=64 * 1024))
+    return CommandRunner(_LocalProcess())
+
+
+async def test_blocking_commands_return_when_they_exit(runner, tmp_path):
+    start = time.perf_counter()
+    result = await runner.run("build", "pwd && echo done && exit 3", cwd=str(tmp_path), new_session=True)
+
+    assert time.perf_counter() - start < 0.4
+    assert result.output == f"{tmp_path}\ndone\n"
+    assert result.exit_code == 3 and result.completed and not result.truncated
+    assert runner.process.calls == ["create_session", "execute_session_command"]
+
+    # An existing session keeps its directory unless asked to change it
+    await runner.run("build", "true", cwd="/elsewhere")
+    assert runner.process.sessions["build"][-1]["info"].command == "true"
+    assert runner.process.calls.count("create_session") == 1
+
+
+async def test_output_of_running_commands_is_read_incrementally_by_offset(runner):
+    command_id = await runner.start("server", "for i in 1 2 3; do echo line $i; sleep 0.1; done", cwd="/")
+
+    seen, offset = "", 0
+    while True:
+        result = await runner.read("server", offset=offset)
+        assert result.command_id == command_id and result.offset == offset
+        seen += result.output
+        offset = result.next_offset
+        if result.completed:
+            break
+        await asyncio.sleep(0.05)
+    assert seen == "line 1\nline 2\nline 3\n"
+    assert result.exit_code == 0 and result.output == ""
+
+    await runner.terminate("server")
+    with pytest.raises(CommandNotFound):
+        await runner.read("server")
+
+
+async def test_blocking_timeout_leaves_command_running(runner):
+    result = await runner.run("slow", "echo started; sleep 0.5; echo finished", timeout=0.2, new_session=True)
+    assert result.output == "started\n" and not result.completed
+
+    sessions = await runner.list()
+    assert sessions == [{"session_name": "slow", "command": "echo started; sleep 0.5; echo finished", "running": True, "exit_code": None}]
+
+    await asyncio.sleep(0.5)
+    result = await runner.read("slow", offset=result.next_offset)
+    assert result.output == "finished\n" and result.exit_code == 0
+    await runner.close()
+    assert runner.process.sessions == {}
+
+
+def test_output_slices_are_paged_without_splitting_characters():
+    logs = "héllo wörld"  # é and ö are two bytes each
+    assert slice_output(logs, 0, 2) == ("h", 0, 1, 13)
+    assert slice_output(logs, 2, 4) == ("éll", 1, 5, 13)
+    assert slice_output(logs, -6, 100) == ("wörld", 7, 13, 13)
+    assert slice_output(logs, 50, 10) == ("", 13, 13, 13)
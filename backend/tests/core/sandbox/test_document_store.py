@@ -0,0 +1,209 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core.sandbox import document_store
+from core.sandbox.document_store import SandboxDocumentStore
+
+
+class _MemoryFS:
+    """``sandbox.fs`` stand-in over a dict, counting API calls."""
+
+    def __init__(self):
+        self.files = {}
+        self.calls = []
+        self.fail_uploads = False
+        self.upload_gate = None
+
+    async def download_file(self, path):
+        self.calls.append(("download", path))
+        if path not in self.files:
+            raise Exception(f"File not found: {path}")
+        return self.files[path]
+
+    async def upload_files(self, files):
+        self.calls.append(("upload", [f.destination for f in files]))
+        if self.fail_uploads:
+            raise Exception("Upload failed")
+        if self.upload_gate is not None:
+            await self.upload_gate.wait()
+        for f in files:
+            self.files[f.destination] = f.source
+
+
+class _FakeRedis:
+    """Redis stand-in with key expiry."""
+
+    def __init__(self):
+        self.values = {}
+        self.expires = {}
+
+    def _live(self, key):
+        if key in self.expires and self.expires[key] <= time.monotonic():
+            self.values.pop(key, None)
+            self.expires.pop(key)
+        return self.values.get(key)
+
+    async def compare_and_set(self, key, expected, value, ex):
+        current = self._live(key)
+        if current is not None and current != (expected or ""):
+            return False
+        self.values[key], self.expires[key] = value, time.monotonic() + ex
+        return True
+
+    async def compare_and_delete(self, key, expected):
+        if self._live(key) != expected:
+            return False
+        del self.values[key]
+        return True
+
+    async def get(self, key):
+        return self._live(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+class _Tool:
+    def __init__(self, fs):
+        self.sandbox = SimpleNamespace(fs=fs)
+        self.sandbox_id = "sandbox"
+
+    async def _ensure_sandbox(self):
+        return self.sandbox
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr(document_store, "redis", fake)
+    monkeypatch.setattr(document_store, "CLAIM_WAIT_SECONDS", 0.2)
+    return fake
+
+
+@pytest.fixture
+def fs(redis):
+    return _MemoryFS()
+
+
+def _add(name):
+    def change(index):
+        index.setdefault("items", {})[name] = True
+    return change
+
+
+async def test_writes_are_batched_into_one_upload_per_flush(fs):
+    store = SandboxDocumentStore(_Tool(fs))
+    for i in range(5):
+        store.write_file(f"/workspace/deck/slide_{i}.html", b"<html/>")
+        await store.update_json("/workspace/deck/index.json", _add(str(i)))
+    assert store.read_pending("/workspace/deck/slide_0.html") == b"<html/>"
+    await store.flush()
+    await store.flush()
+
+    assert [call[0] for call in fs.calls] == ["download", "upload"]
+    assert len(fs.calls[1][1]) == 6
+    index = json.loads(fs.files["/workspace/deck/index.json"])
+    assert sorted(index["items"]) == ["0", "1", "2", "3", "4"]
+    assert index["store_version"]
+    assert (await store.read_json("/workspace/deck/index.json"))["items"]["4"] is True
+    assert store.round_trips == 2
+
+    store.forget("/workspace/deck")
+    assert await store.read_json("/workspace/deck/index.json") is not None
+    assert fs.calls[-1] == ("download", "/workspace/deck/index.json")
+
+
+async def test_concurrent_edits_of_one_index_are_merged(fs):
+    first, second = SandboxDocumentStore(_Tool(fs)), SandboxDocumentStore(_Tool(fs))
+    await first.update_json("/workspace/index.json", _add("first"))
+    await second.update_json("/workspace/index.json", _add("second"))
+
+    await first.flush()
+    await second.flush()
+    assert json.loads(fs.files["/workspace/index.json"])["items"] == {"first": True, "second": True}
+
+    # The first store's copy is stale now: its next write is replayed on the merged file
+    await first.update_json("/workspace/index.json", _add("third"))
+    await first.flush()
+    assert json.loads(fs.files["/workspace/index.json"])["items"] == {"first": True, "second": True, "third": True}
+
+
+async def test_a_failed_upload_hands_its_version_back(fs):
+    first, second = SandboxDocumentStore(_Tool(fs)), SandboxDocumentStore(_Tool(fs))
+    await first.update_json("/workspace/index.json", _add("first"))
+    fs.fail_uploads = True
+    with pytest.raises(Exception, match="Upload failed"):
+        await first.flush()
+    assert first.dirty
+
+    fs.fail_uploads = False
+    await second.update_json("/workspace/index.json", _add("second"))
+    await second.flush()
+    assert [call[0] for call in fs.calls].count("download") == 2  # no replay was needed
+    await first.flush()
+    assert json.loads(fs.files["/workspace/index.json"])["items"] == {"first": True, "second": True}
+
+
+async def test_a_slow_upload_is_not_taken_over(fs):
+    first, second = SandboxDocumentStore(_Tool(fs)), SandboxDocumentStore(_Tool(fs))
+    await first.update_json("/workspace/index.json", _add("first"))
+    await second.update_json("/workspace/index.json", _add("second"))
+
+    fs.upload_gate = asyncio.Event()
+    slow_flush = asyncio.create_task(first.flush())
+    await asyncio.sleep(0)
+    with pytest.raises(document_store.DocumentConflictError):
+        await second.flush()
+
+    fs.upload_gate.set()
+    await slow_flush
+    assert json.loads(fs.files["/workspace/index.json"])["items"] == {"first": True}
+
+    await second.flush()
+    assert json.loads(fs.files["/workspace/index.json"])["items"] == {"first": True, "second": True}
+
+
+async def test_an_expired_claim_is_taken_over(fs, redis):
+    redis.values["sandbox_document_claim:sandbox:/workspace/index.json"] = "abandoned"
+    redis.expires["sandbox_document_claim:sandbox:/workspace/index.json"] = time.monotonic() - 1
+
+    store = SandboxDocumentStore(_Tool(fs))
+    await store.update_json("/workspace/index.json", _add("first"))
+    await store.flush()
+    assert json.loads(fs.files["/workspace/index.json"])["items"] == {"first": True}
+
+
+async def test_refresh_picks_up_edits_made_outside_the_store(fs):
+    store = SandboxDocumentStore(_Tool(fs))
+    await store.update_json("/workspace/index.json", _add("first"))
+    await store.flush()
+
+    # Edited through the files tool or the editor: no store version is recorded
+    edited = json.loads(fs.files["/workspace/index.json"])
+    edited["title"] = "Edited by hand"
+    fs.files["/workspace/index.json"] = json.dumps(edited).encode()
+
+    store.refresh()
+    await store.update_json("/workspace/index.json", _add("second"))
+    await store.flush()
+    index = json.loads(fs.files["/workspace/index.json"])
+    assert index["title"] == "Edited by hand"
+    assert index["items"] == {"first": True, "second": True}
+
+
+async def test_refresh_replays_unflushed_changes_on_the_reloaded_file(fs):
+    store = SandboxDocumentStore(_Tool(fs))
+    await store.update_json("/workspace/index.json", _add("first"))
+    fs.fail_uploads = True
+    with pytest.raises(Exception, match="Upload failed"):
+        await store.flush()
+    fs.fail_uploads = False
+
+    fs.files["/workspace/index.json"] = json.dumps({"items": {"edited": True}}).encode()
+    store.refresh()
+    await store.flush()
+    assert json.loads(fs.files["/workspace/index.json"])["items"] == {"edited": True, "first": True}
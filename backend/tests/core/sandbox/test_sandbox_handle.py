@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+from core.sandbox import sandbox_handle
+from core.sandbox.sandbox_handle import get_sandbox_handle
+
+
+class _FakeQuery:
+    def __init__(self, db):
+        self._db = db
+        self._update = None
+
+    def select(self, _columns):
+        return self
+
+    def update(self, values):
+        self._update = values
+        return self
+
+    def eq(self, _column, _value):
+        return self
+
+    async def execute(self):
+        if self._update is not None:
+            self._db.sandbox = self._update["sandbox"]
+            return SimpleNamespace(data=[self._update])
+        self._db.project_reads += 1
+        return SimpleNamespace(data=[{"sandbox": self._db.sandbox}])
+
+
+class _FakeDB:
+    def __init__(self, sandbox=None):
+        self.sandbox = sandbox or {}
+        self.project_reads = 0
+
+    @property
+    def client(self):
+        async def _client():
+            return SimpleNamespace(table=lambda _name: _FakeQuery(self))
+        return _client()
+
+
+class _FakeThreadManager:
+    def __init__(self, db):
+        self.db = db
+
+
+def _install_daytona(monkeypatch, calls):
+    async def get_or_start(sandbox_id):
+        calls.append(("start", sandbox_id))
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(id=sandbox_id)
+
+    async def create(password, project_id):
+        calls.append(("create", project_id))
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(id="sb-new")
+
+    async def preview(sandbox, port):
+        calls.append(("preview", port))
+        return SimpleNamespace(url=f"https://{port}.preview", token="tok")
+
+    monkeypatch.setattr(sandbox_handle, "get_or_start_sandbox", get_or_start)
+    monkeypatch.setattr(sandbox_handle, "create_sandbox", create)
+    monkeypatch.setattr(sandbox_handle, "get_preview_link_info", preview)
+    monkeypatch.setattr(sandbox_handle.asyncio, "sleep", _no_sleep(asyncio.sleep))
+
+
+def _no_sleep(real_sleep):
+    async def sleep(delay):
+        await real_sleep(min(delay, 0.01))
+    return sleep
+
+
+async def test_parallel_tools_share_one_sandbox_lookup(monkeypatch):
+    calls = []
+    _install_daytona(monkeypatch, calls)
+    thread_manager = _FakeThreadManager(_FakeDB({"id": "sb-1", "pass": "pw"}))
+
+    handles = [get_sandbox_handle(thread_manager, "p1") for _ in range(8)]
+    sandboxes = await asyncio.gather(*(h.ensure() for h in handles))
+
+    assert all(h is handles[0] for h in handles)
+    assert {s.id for s in sandboxes} == {"sb-1"}
+    assert calls == [("start", "sb-1")]
+    assert thread_manager.db.project_reads == 1
+
+
+async def test_concurrent_first_use_creates_a_single_sandbox(monkeypatch):
+    calls = []
+    _install_daytona(monkeypatch, calls)
+    thread_manager = _FakeThreadManager(_FakeDB())
+    handle = get_sandbox_handle(thread_manager, "p1")
+
+    await asyncio.gather(*(handle.ensure() for _ in range(5)))
+    await handle.get_preview_link(8080)
+
+    assert [c for c in calls if c[0] == "create"] == [("create", "p1")]
+    assert thread_manager.db.sandbox["id"] == "sb-new"
+    assert calls.count(("preview", 8080)) == 1
+
+
+async def test_prewarm_uses_primed_row_and_never_creates(monkeypatch):
+    calls = []
+    _install_daytona(monkeypatch, calls)
+
+    empty = _FakeThreadManager(_FakeDB())
+    cold = get_sandbox_handle(empty, "p1")
+    cold.prime({})
+    await cold.prewarm()
+    assert calls == [] and cold.sandbox is None
+
+    existing = _FakeThreadManager(_FakeDB({"id": "sb-2"}))
+    warm = get_sandbox_handle(existing, "p1")
+    warm.prime({"id": "sb-2"})
+    await warm.prewarm()
+    await warm.ensure()
+    assert calls == [("start", "sb-2")]
+    assert existing.db.project_reads == 0
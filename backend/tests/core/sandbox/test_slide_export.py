@@ -0,0 +1,209 @@
+import importlib
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from PyPDF2 import PdfReader, PdfWriter
+
+SANDBOX_SERVER_DIR = Path(__file__).resolve().parents[3] / "core" / "sandbox" / "docker"
+
+
+@pytest.fixture
+def sandbox_modules(tmp_path, monkeypatch):
+    # The sandbox server imports its modules by file name and writes output dirs to the cwd
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(SANDBOX_SERVER_DIR))
+    modules = [importlib.import_module(name) for name in ("browser_pool", "slide_render_cache", "html_to_pdf_router")]
+    yield modules
+    for name in ("browser_pool", "slide_render_cache", "html_to_pdf_router"):
+        sys.modules.pop(name, None)
+
+
+class _FakePage:
+    def __init__(self, browser):
+        self.browser = browser
+
+    async def set_viewport_size(self, size):
+        pass
+
+    async def emulate_media(self, media):
+        pass
+
+    async def evaluate(self, script, *args):
+        pass
+
+    async def goto(self, url, **kwargs):
+        self.url = url
+
+    async def wait_for_timeout(self, ms):
+        pass
+
+    async def pdf(self, path, **kwargs):
+        if self.browser.crash_on_render:
+            self.browser.connected = False
+            raise RuntimeError("Target page, context or browser has been closed")
+        self.browser.rendered.append(self.url)
+        writer = PdfWriter()
+        writer.add_blank_page(width=1920, height=1080)
+        with open(path, "wb") as f:
+            writer.write(f)
+
+    async def close(self):
+        pass
+
+
+class _FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.listeners = []
+
+    def on(self, event, callback):
+        self.listeners.append(callback)
+
+    async def new_page(self):
+        page = _FakePage(self.browser)
+        for listener in self.listeners:
+            listener(page)
+        return page
+
+    async def close(self):
+        self.browser.open_contexts -= 1
+
+
+class _FakeBrowser:
+    def __init__(self, rendered):
+        self.rendered = rendered
+        self.connected = True
+        self.closed = False
+        self.crash_on_render = False
+        self.open_contexts = 0
+
+    def on(self, event, callback):
+        pass
+
+    def is_connected(self):
+        return self.connected and not self.closed
+
+    async def new_context(self, **options):
+        self.open_contexts += 1
+        return _FakeContext(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakePlaywright:
+    def __init__(self):
+        self.browsers = []
+        self.rendered = []
+        self.chromium = self
+
+    async def launch(self, **kwargs):
+        self.browsers.append(_FakeBrowser(self.rendered))
+        return self.browsers[-1]
+
+    async def stop(self):
+        pass
+
+
+def _write_deck(directory: Path, slides: int):
+    directory.mkdir()
+    (directory / "logo.svg").write_text("<svg/>")
+    metadata = {"presentation_name": "deck", "slides": {}}
+    for number in range(1, slides + 1):
+        path = directory / f"slide_{number:02d}.html"
+        path.write_text(f'<div class="slide-container"><img src="logo.svg"><h1>Slide {number}</h1></div>')
+        metadata["slides"][str(number)] = {"title": f"Slide {number}", "filename": path.name, "file_path": str(path)}
+    (directory / "metadata.json").write_text(json.dumps(metadata))
+
+
+def _converter(router, deck: Path):
+    converter = router.PresentationToPDFAPI(str(deck))
+
+    def load_metadata():
+        # Point the slides at the test deck instead of /workspace
+        converter.metadata = json.loads((deck / "metadata.json").read_text())
+        converter.slides_info = [
+            {"number": int(number), "title": slide["title"], "filename": slide["filename"], "path": Path(slide["file_path"])}
+            for number, slide in converter.metadata["slides"].items()
+        ]
+
+    converter.load_metadata = load_metadata
+    return converter
+
+
+def _pool(browser_pool, playwright, **kwargs):
+    pool = browser_pool.BrowserPool(**kwargs)
+
+    async def start_playwright():
+        return playwright
+
+    pool._start_playwright = start_playwright
+    return pool
+
+
+async def test_pdf_export_reuses_browser_and_renders_only_changed_slides(sandbox_modules, tmp_path, monkeypatch):
+    browser_pool, slide_render_cache, router = sandbox_modules
+    playwright = _FakePlaywright()
+    monkeypatch.setattr(router, "browser_pool", _pool(browser_pool, playwright))
+    monkeypatch.setattr(router, "render_cache", slide_render_cache.SlideRenderCache(tmp_path / "cache", max_bytes=10 * 1024 * 1024))
+
+    deck = tmp_path / "deck"
+    _write_deck(deck, slides=20)
+
+    async def export():
+        playwright.rendered.clear()
+        content, total, _ = await _converter(router, deck).convert_to_pdf(store_locally=False)
+        assert total == 20
+        assert len(PdfReader(io.BytesIO(content)).pages) == 20
+        return sorted(Path(url).name for url in playwright.rendered)
+
+    assert len(await export()) == 20
+    assert await export() == []
+
+    (deck / "slide_07.html").write_text('<div class="slide-container"><h1>Slide 7, revised</h1></div>')
+    assert await export() == ["slide_07.html"]
+
+    # A referenced asset changing invalidates every slide that uses it
+    (deck / "logo.svg").write_text("<svg><circle r='4'/></svg>")
+    assert len(await export()) == 19
+
+    assert len(playwright.browsers) == 1
+    assert playwright.browsers[0].open_contexts == 0
+
+
+async def test_pool_recycles_browser_after_render_budget_and_crash(sandbox_modules, tmp_path):
+    browser_pool, _, _ = sandbox_modules
+    playwright = _FakePlaywright()
+    pool = _pool(browser_pool, playwright, max_contexts=2, max_renders=3)
+
+    async def render(pages=1):
+        async with pool.context() as context:
+            for _ in range(pages):
+                page = await context.new_page()
+                page.url = "file:///slide.html"
+                await page.pdf(path=str(tmp_path / "out.pdf"))
+
+    await render(pages=3)
+    await render()
+    assert len(playwright.browsers) == 2
+    assert playwright.browsers[0].closed and not playwright.browsers[1].closed
+
+    # A browser past its budget stays open until the context using it is released
+    async with pool.context():
+        pool._renders = pool.max_renders
+        await render()
+        assert not playwright.browsers[1].closed
+    assert playwright.browsers[1].closed and len(playwright.browsers) == 3
+
+    playwright.browsers[2].crash_on_render = True
+    with pytest.raises(RuntimeError):
+        await render()
+    await render()
+    assert len(playwright.browsers) == 4
+    assert pool.stats()["active_contexts"] == 0
+
+    await pool.close()
+    assert playwright.browsers[3].closed
@@ -0,0 +1,117 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from core.sandbox import workspace_manifest
+from core.sandbox.workspace_manifest import WorkspaceManifest, WorkspaceManifests, changes_since
+
+
+class _LocalSandbox:
+    """Sandbox stand-in: ``process.exec`` runs locally, ``fs`` reads the local filesystem."""
+
+    def __init__(self):
+        self.downloads = []
+        self.process = SimpleNamespace(exec=self._exec)
+        self.fs = SimpleNamespace(download_file=self._download_file)
+
+    async def _exec(self, command, env=None, timeout=None):
+        result = subprocess.run(
+            command.replace("python3", sys.executable), shell=True, capture_output=True, text=True, env={**os.environ, **env},
+        )
+        return SimpleNamespace(exit_code=result.returncode, result=result.stdout + result.stderr)
+
+    async def _download_file(self, path):
+        self.downloads.append(path)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(workspace_manifest, "redis", _FakeRedis())
+    monkeypatch.setattr(workspace_manifest, "STAMPS_PATH", str(tmp_path / "stamps.json"))
+    root = tmp_path / "workspace"
+    for path, content in {
+        "index.html": "<h1>hi</h1>",
+        "src/app.py": "print('app')",
+        "src/copy.py": "print('app')",
+        "data/blob.bin": b"\xff\xfe\x00",
+        "node_modules/react/index.js": "module.exports = {}",
+        "logo.png": b"\x89PNG",
+        "package-lock.json": "{}",
+    }.items():
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_bytes(content if isinstance(content, bytes) else content.encode())
+    return root
+
+
+async def test_revisions_record_what_changed(workspace):
+    manifests, sandbox = WorkspaceManifests(), _LocalSandbox()
+
+    first = await manifests.refresh("project", sandbox, str(workspace))
+    assert first.revision == 1
+    assert sorted(first.files) == ["data/blob.bin", "index.html", "src/app.py", "src/copy.py"]
+    assert first.files["src/app.py"][2] == first.files["src/copy.py"][2]
+    assert (await manifests.refresh("project", sandbox, str(workspace))).revision == 1
+
+    (workspace / "index.html").write_text("<h1>hello</h1>")
+    (workspace / "src/new.py").write_text("x = 1")
+    (workspace / "src/copy.py").unlink()
+    second = await manifests.refresh("project", sandbox, str(workspace))
+    assert second.revision == 2
+
+    changes = changes_since(second, 1)
+    assert (changes.added, changes.modified, changes.deleted, changes.complete) == (["src/new.py"], ["index.html"], ["src/copy.py"], True)
+    assert changes_since(second, 2).added == []
+
+    # A file added and deleted between two revisions does not show up
+    (workspace / "tmp.txt").write_text("scratch")
+    await manifests.refresh("project", sandbox, str(workspace))
+    (workspace / "tmp.txt").unlink()
+    fourth = await manifests.refresh("project", sandbox, str(workspace))
+    assert fourth.revision == 4
+    changes = changes_since(fourth, 1)
+    assert (changes.added, changes.modified, changes.deleted) == (["src/new.py"], ["index.html"], ["src/copy.py"])
+
+    # Revision 0 and unknown revisions get every file
+    assert changes_since(fourth, 0).added == sorted(fourth.files)
+    assert not changes_since(fourth, 9).complete
+
+    # The manifest is shared through Redis
+    assert (await WorkspaceManifests().load("project")).revision == 4
+
+
+async def test_contents_are_downloaded_once_per_hash(workspace):
+    manifests, sandbox = WorkspaceManifests(), _LocalSandbox()
+    manifest = await manifests.refresh("project", sandbox, str(workspace))
+
+    contents = await manifests.read_contents(sandbox, str(workspace), manifest, manifest.files)
+    assert contents == {"data/blob.bin": None, "index.html": "<h1>hi</h1>", "src/app.py": "print('app')", "src/copy.py": "print('app')"}
+    assert len(sandbox.downloads) == 3
+
+    (workspace / "index.html").write_text("<h1>hello</h1>")
+    manifest = await manifests.refresh("project", sandbox, str(workspace))
+    contents = await manifests.read_contents(sandbox, str(workspace), manifest, manifest.files)
+    assert contents["index.html"] == "<h1>hello</h1>"
+    assert sandbox.downloads[3:] == [f"{workspace}/index.html"]
+
+
+def test_changes_from_an_older_revision_than_the_history_are_incomplete():
+    manifest = WorkspaceManifest(revision=7, files={"a.txt": [1, 0.0, "h"]}, history=[[6, [], [], ["b.txt"]], [7, [], ["a.txt"], []]])
+    assert changes_since(manifest, 5).deleted == ["b.txt"]
+    changes = changes_since(manifest, 4)
+    assert changes.added == ["a.txt"] and not changes.complete
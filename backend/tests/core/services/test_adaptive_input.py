@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from core.services.adaptive_input import AdaptiveInputMonitor
+
+
+class _FakeQuery:
+    def __init__(self, client):
+        self._client = client
+        self._ids = None
+        self._after = None
+
+    def select(self, _columns):
+        return self
+
+    def eq(self, _column, _value):
+        return self
+
+    def in_(self, _column, values):
+        self._ids = set(values)
+        return self
+
+    def gt(self, _column, value):
+        self._after = datetime.fromisoformat(value)
+        return self
+
+    def order(self, _column):
+        return self
+
+    def limit(self, _count):
+        return self
+
+    async def execute(self):
+        self._client.queries += 1
+        rows = self._client.rows
+        if self._ids is not None:
+            rows = [r for r in rows if r["message_id"] in self._ids]
+        if self._after is not None:
+            rows = [r for r in rows if datetime.fromisoformat(r["created_at"]) > self._after]
+        return SimpleNamespace(data=list(rows))
+
+
+class _FakeClient:
+    def __init__(self):
+        self.rows = []
+        self.queries = 0
+
+    def add(self, message_id):
+        created_at = datetime.now(timezone.utc) + timedelta(seconds=len(self.rows) + 1)
+        self.rows.append({
+            "message_id": message_id,
+            "type": "user",
+            "is_llm_message": True,
+            "content": {"role": "user", "content": message_id},
+            "created_at": created_at.isoformat(),
+        })
+
+    def table(self, _name):
+        return _FakeQuery(self)
+
+
+class _RecordingCache:
+    def __init__(self):
+        self.recorded = []
+
+    def record_message(self, thread_id, row):
+        self.recorded.append((thread_id, row["message_id"]))
+
+
+async def test_drain_is_free_until_input_is_announced():
+    client = _FakeClient()
+    monitor = AdaptiveInputMonitor("run")
+
+    assert await monitor.drain(client, "t1") == []
+    assert client.queries == 0
+
+    client.add("m1")
+    monitor.notify(b"m1")
+    cache = _RecordingCache()
+    rows = await monitor.drain(client, "t1", cache)
+
+    assert [r["message_id"] for r in rows] == ["m1"]
+    assert cache.recorded == [("t1", "m1")]
+    assert not monitor.pending
+    assert client.queries == 1
+
+
+async def test_legacy_notification_fetches_rows_after_last_seen():
+    client = _FakeClient()
+    monitor = AdaptiveInputMonitor("run")
+
+    client.add("m1")
+    monitor.notify("new_input")
+    assert [r["message_id"] for r in await monitor.drain(client, "t1")] == ["m1"]
+
+    client.add("m2")
+    monitor.notify("new_input")
+    assert [r["message_id"] for r in await monitor.drain(client, "t1")] == ["m2"]
@@ -0,0 +1,176 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from core.services import agent_run_stream
+from core.services.agent_run_stream import (
+    ResponseStreamWriter,
+    append_control,
+    append_response,
+    iter_sse_frames,
+    normalize_last_event_id,
+    read_all_responses,
+)
+
+
+class _FakeStreams:
+    """In-memory stand-in for the XADD / XREAD / XRANGE subset used by the transport."""
+
+    def __init__(self):
+        self.entries = {}
+        self.reads = 0
+        self.pipelines = 0
+
+    async def xadd(self, key, fields, maxlen=None, approximate=True):
+        stream = self.entries.setdefault(key, [])
+        entry_id = f"1-{int(stream[-1][0].split('-')[1]) + 1 if stream else 1}"
+        stream.append((entry_id, dict(fields)))
+        if maxlen is not None:
+            del stream[:-maxlen]
+        return entry_id
+
+    async def xadd_many(self, key, entries, maxlen=None, approximate=True):
+        self.pipelines += 1
+        return [await self.xadd(key, fields, maxlen=maxlen) for fields in entries]
+
+    async def xread(self, streams, count=None, block=None):
+        self.reads += 1
+        (key, last_id), = streams.items()
+        seq = 0 if last_id == "0" else int(last_id.split("-")[1])
+        entries = [e for e in self.entries.get(key, []) if int(e[0].split("-")[1]) > seq][:count]
+        return [[key, entries]] if entries else []
+
+    async def xrange(self, key, min="-", max="+", count=None):
+        return list(self.entries.get(key, []))[:count]
+
+    async def xrevrange(self, key, max="+", min="-", count=None):
+        return list(reversed(self.entries.get(key, [])))[:count]
+
+    async def xlen(self, key):
+        return len(self.entries.get(key, []))
+
+
+def _install(monkeypatch):
+    fake = _FakeStreams()
+    monkeypatch.setattr(agent_run_stream, "redis", SimpleNamespace(
+        xadd=fake.xadd, xadd_many=fake.xadd_many, xread=fake.xread, xrange=fake.xrange,
+        xrevrange=fake.xrevrange, xlen=fake.xlen,
+    ))
+    return fake
+
+
+async def _collect(*args, **kwargs):
+    return [frame async for frame in iter_sse_frames(*args, **kwargs)]
+
+
+async def test_frames_carry_ids_and_stop_on_terminal_status(monkeypatch):
+    fake = _install(monkeypatch)
+    for i in range(3):
+        await append_response("run", {"type": "assistant", "content": f"chunk {i}"})
+    await append_response("run", {"type": "status", "status": "completed"})
+
+    frames = await _collect("run")
+
+    assert frames[0] == 'id: 1-1\ndata: {"type": "assistant", "content": "chunk 0"}\n\n'
+    assert frames[-1].startswith("id: 1-4\n")
+    assert len(frames) == 4
+    assert fake.reads == 1
+
+
+async def test_resume_after_last_event_id(monkeypatch):
+    _install(monkeypatch)
+    for i in range(5):
+        await append_response("run", {"type": "assistant", "content": f"chunk {i}"})
+    await append_control("run", "STOP")
+
+    frames = await _collect("run", normalize_last_event_id("1-3"))
+
+    assert [f.split("\n")[0] for f in frames] == ["id: 1-4", "id: 1-5", "id: 1-6"]
+    assert frames[-1].endswith('data: {"type": "status", "status": "STOP"}\n\n')
+
+
+async def test_snapshot_read_skips_control_entries(monkeypatch):
+    _install(monkeypatch)
+    await append_response("run", {"type": "assistant", "content": "only"})
+    await append_control("run", "END_STREAM")
+
+    frames = await _collect("run", follow=False)
+
+    assert len(frames) == 1
+    assert await read_all_responses("run") == [{"type": "assistant", "content": "only"}]
+
+
+async def test_trimmed_stream_replays_persisted_messages(monkeypatch):
+    _install(monkeypatch)
+    monkeypatch.setattr(agent_run_stream, "RESPONSE_STREAM_MAXLEN", 5)
+    for i in range(8):
+        await append_response("run", {"type": "assistant", "content": f"message {i}", "message_id": f"m{i}"})
+
+    async def persisted():
+        return [{"type": "assistant", "content": f"message {i}", "message_id": f"m{i}"} for i in range(8)]
+
+    # The client last saw entry 1-2, but entries up to 1-3 are gone
+    frames = await _collect("run", "1-2", follow=False, replay_trimmed=persisted)
+
+    assert [json.loads(f.split("data: ")[1])["message_id"] for f in frames] == [f"m{i}" for i in range(8)] + ["m7"]
+    assert not frames[0].startswith("id:")
+    assert frames[-1].startswith("id: 1-8\n")
+
+    await append_response("run", {"type": "status", "status": "completed"})
+    frames = await _collect("run", "1-2", replay_trimmed=persisted)
+    assert json.loads(frames[-1].split("data: ")[1])["status"] == "completed"
+
+
+async def test_untrimmed_stream_does_not_replay(monkeypatch):
+    _install(monkeypatch)
+    for i in range(3):
+        await append_response("run", {"type": "assistant", "content": f"message {i}"})
+
+    async def persisted():
+        raise AssertionError("the stream still has every entry")
+
+    frames = await _collect("run", "0", follow=False, replay_trimmed=persisted)
+    assert len(frames) == 3
+
+
+def test_invalid_last_event_id_reads_from_start():
+    assert normalize_last_event_id("not-an-id") == "0"
+    assert normalize_last_event_id(None) == "0"
+
+
+def _chunk(sequence, text, run="r1"):
+    return {
+        "sequence": sequence,
+        "type": "assistant",
+        "content": json.dumps({"role": "assistant", "content": text}),
+        "metadata": json.dumps({"stream_status": "chunk", "thread_run_id": run}),
+    }
+
+
+async def test_writer_merges_chunks_and_preserves_order(monkeypatch):
+    fake = _install(monkeypatch)
+    writer = ResponseStreamWriter("run", coalesce_ms=1000, coalesce_bytes=8)
+
+    for i, text in enumerate(["Hel", "lo ", "wor", "ld"]):
+        await writer.write(_chunk(i, text))
+    await writer.write({"type": "tool", "content": "{}"})
+    await writer.close()
+
+    responses = await read_all_responses("run")
+    assert [r.get("sequence") for r in responses] == [0, 3, None]
+    assert [json.loads(r["content"]).get("content") for r in responses[:2]] == ["Hello wor", "ld"]
+    assert writer.round_trips == 2
+    assert fake.pipelines == 1
+
+
+async def test_writer_flushes_pending_chunk_after_window(monkeypatch):
+    _install(monkeypatch)
+    writer = ResponseStreamWriter("run", coalesce_ms=5)
+
+    await writer.write(_chunk(0, "a"))
+    await writer.write(_chunk(1, "b"))
+    await asyncio.sleep(0.05)
+
+    responses = await read_all_responses("run")
+    assert len(responses) == 1
+    assert json.loads(responses[0]["content"])["content"] == "ab"
@@ -0,0 +1,113 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from core.services import embedding_cache, embedding_client
+from core.services.embedding_cache import EmbeddingCache
+from core.services.embedding_client import EmbeddingClient
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    async def get_client(self):
+        values = self.values
+
+        class _Pipeline:
+            def __init__(self):
+                self.ops = []
+
+            def set(self, key, value, ex=None):
+                self.ops.append((key, value))
+
+            async def execute(self):
+                values.update(self.ops)
+
+        return SimpleNamespace(pipeline=lambda transaction=False: _Pipeline())
+
+
+class _FakeModel:
+    """Stands in for SentenceTransformer.encode; records every batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, normalize_embeddings=True, show_progress_bar=False):
+        self.batches.append(list(texts))
+        return np.asarray([[len(t), t.count("a") + 1, 1.0] for t in texts], dtype=np.float32)
+
+
+def _install(monkeypatch, fake_redis, batch_tokens=50, batch_size=4, concurrency=2):
+    monkeypatch.setattr(embedding_cache, "redis", fake_redis)
+    monkeypatch.setattr(embedding_client, "embedding_cache", EmbeddingCache(ttl=60))
+    monkeypatch.setattr(embedding_client, "config", SimpleNamespace(
+        EMBEDDING_BATCH_TOKENS=batch_tokens, EMBEDDING_BATCH_SIZE=batch_size, EMBEDDING_CONCURRENCY=concurrency,
+    ))
+    client = EmbeddingClient(provider="local")
+    client._local_model = _FakeModel()
+    return client
+
+
+async def test_batches_dedupe_and_keep_order(monkeypatch):
+    client = _install(monkeypatch, _FakeRedis())
+    texts = [f"text {i} " + "a" * i for i in range(10)] + ["text 3 aaa", "", "text 0 "]
+
+    vectors = await client.embed_batch(texts)
+
+    model = client._local_model
+    assert sum(len(b) for b in model.batches) == 10  # duplicates and blanks never reach the model
+    assert all(len(b) <= 4 and sum(len(t) // 4 for t in b) <= 50 for b in model.batches)
+    assert vectors[11] is None
+    assert vectors[10] == vectors[3] and vectors[12] == vectors[0]
+    assert [round(v[0] / v[2], 3) for v in vectors[:10]] == [float(len(t)) for t in texts[:10]]
+
+
+async def test_cached_vectors_skip_the_model_across_processes(monkeypatch):
+    fake_redis = _FakeRedis()
+    client = _install(monkeypatch, fake_redis)
+    first = await client.embed_batch(["alpha", "beta"])
+    assert len(fake_redis.values) == 2
+
+    # A fresh process: empty LRU, same Redis
+    client = _install(monkeypatch, fake_redis)
+    again = await client.embed_batch(["beta", "alpha", "gamma"])
+    query = await client.embed_text("alpha")
+
+    assert client._local_model.batches == [["gamma"]]
+    assert np.allclose(again[0], first[1]) and np.allclose(again[1], first[0])
+    assert np.allclose(query, first[0])
+
+
+async def test_fallback_vectors_report_their_model_and_are_not_cached(monkeypatch):
+    fake_redis = _FakeRedis()
+    monkeypatch.setattr(embedding_cache, "redis", fake_redis)
+    monkeypatch.setattr(embedding_client, "embedding_cache", EmbeddingCache(ttl=60))
+    monkeypatch.setattr(embedding_client, "config", SimpleNamespace(
+        EMBEDDING_BATCH_TOKENS=50, EMBEDDING_BATCH_SIZE=4, EMBEDDING_CONCURRENCY=2,
+    ))
+    client = EmbeddingClient(provider="gemini")
+    client._local_model = _FakeModel()
+
+    async def gemini_down(texts):
+        return None
+
+    monkeypatch.setattr(client, "_embed_gemini_batch", gemini_down)
+    embedded = await client.embed_batch_with_models(["alpha", "beta"])
+
+    assert [model for _, model in embedded] == [client.fallback_model] * 2
+    assert client.fallback_model == "all-MiniLM-L6-v2" != client.model
+    assert fake_redis.values == {}
+
+
+def test_plan_batches_respects_token_and_size_limits():
+    items = [(str(i), "x" * 40) for i in range(7)]  # 10 tokens each
+    batches = EmbeddingClient._plan_batches(items, max_tokens=30, max_size=2)
+    assert [len(b) for b in batches] == [2, 2, 2, 1]
+    assert [d for b in batches for d, _ in b] == [str(i) for i in range(7)]
+
+    # A single oversized text still gets its own batch
+    assert len(EmbeddingClient._plan_batches([("big", "x" * 1000)], max_tokens=30, max_size=2)) == 1
@@ -0,0 +1,162 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from core.services import result_cache, web_retrieval
+from core.services.web_retrieval import TavilyAPIError, TavilyRateLimitError, WebRetrieval
+
+
+class _FakeProviders:
+    """HTTP/1.1 keep-alive server answering like Tavily (/search) and Firecrawl (/v1/scrape)."""
+
+    def __init__(self):
+        self.requests = []
+        self.connections = 0
+        self.active = {"/search": 0, "/v1/scrape": 0}
+        self.peak = {"/search": 0, "/v1/scrape": 0}
+        self.statuses = []  # statuses to return before answering normally
+        self.delay = 0.0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                path = request_line.decode().split(" ")[1]
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = json.loads(await reader.readexactly(int(headers.get("content-length", 0))))
+                status, payload = await self._respond(path, headers, body)
+                data = json.dumps(payload).encode()
+                head = f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n"
+                writer.write(head.encode() + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, path, headers, body):
+        self.requests.append((path, body, headers.get("authorization")))
+        self.active[path] += 1
+        self.peak[path] = max(self.peak[path], self.active[path])
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active[path] -= 1
+        if self.statuses:
+            return self.statuses.pop(0), {"detail": {"error": "nope"}}
+        if path == "/search":
+            results = [] if "nothing" in body["query"] else [{"title": body["query"], "url": "https://example.com"}]
+            return 200, {"query": body["query"], "answer": "", "results": results[: body["max_results"]]}
+        return 200, {"success": True, "data": {"markdown": f"# {body['url']}", "metadata": {"title": body["url"]}}}
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+@asynccontextmanager
+async def _fake_providers(monkeypatch, **settings):
+    server = _FakeProviders()
+    base_url = await server.start()
+    monkeypatch.setattr(result_cache, "redis", _FakeRedis())
+    monkeypatch.setattr(web_retrieval, "SEARCH_BASE_DELAY", 0.01)
+    monkeypatch.setattr(web_retrieval, "config", SimpleNamespace(**{
+        "TAVILY_API_KEY": "tvly-test", "TAVILY_URL": base_url,
+        "FIRECRAWL_API_KEY": "fc-test", "FIRECRAWL_URL": base_url,
+        "WEB_SEARCH_CONCURRENCY": 8, "WEB_SCRAPE_CONCURRENCY": 10,
+        "WEB_SEARCH_CACHE_TTL": 3600, "WEB_SCRAPE_CACHE_TTL": 3600,
+        **settings,
+    }))
+    retrieval = WebRetrieval()
+    try:
+        yield server, retrieval
+    finally:
+        await retrieval.aclose()
+        await server.stop()
+
+
+async def test_searches_are_cached_by_normalized_query_and_deduplicated(monkeypatch):
+    async with _fake_providers(monkeypatch) as (server, retrieval):
+        server.delay = 0.05
+        results = await asyncio.gather(
+            *(retrieval.search("Latest  Python release", 5) for _ in range(6)),
+            retrieval.search("latest python release", 10),
+        )
+
+        assert results[0]["results"][0]["title"] == "Latest  Python release"
+        assert all(result == results[0] for result in results[:6])
+        assert len(server.requests) == 2  # the parallel identical calls shared one request
+        assert {auth for *_, auth in server.requests} == {"Bearer tvly-test"}
+        assert server.requests[0][1]["search_depth"] == "advanced"
+
+        assert await retrieval.search("  LATEST python release ", 5) == results[0]
+        assert len(server.requests) == 2
+
+        # Another worker reads the result through Redis; empty results are never cached
+        other_worker = WebRetrieval()
+        assert await other_worker.search("latest python release", 5) == results[0]
+        await other_worker.search("nothing here", 5)
+        await other_worker.search("nothing here", 5)
+        assert len(server.requests) == 4
+        await other_worker.aclose()
+
+
+async def test_scrapes_share_one_pool_respect_concurrency_limit_and_are_cached(monkeypatch):
+    async with _fake_providers(monkeypatch, WEB_SCRAPE_CONCURRENCY=3) as (server, retrieval):
+        server.delay = 0.05
+        urls = [f"https://example.com/page{i}" for i in range(12)]
+
+        pages = await asyncio.gather(*(retrieval.scrape(url, ["markdown"]) for url in urls))
+
+        assert [page["data"]["metadata"]["title"] for page in pages] == urls
+        assert server.peak["/v1/scrape"] == 3
+        assert server.connections <= 3
+        assert {auth for *_, auth in server.requests} == {"Bearer fc-test"}
+
+        assert await retrieval.scrape("HTTPS://Example.com:443/page3#intro", ["markdown"]) == pages[3]
+        assert len(server.requests) == 12
+        await retrieval.scrape(urls[3], ["markdown", "html"])
+        assert len(server.requests) == 13
+        assert retrieval.stats()["scrape"] == {"hits": 1, "misses": 13}
+
+
+async def test_search_errors_are_classified_and_not_cached(monkeypatch):
+    async with _fake_providers(monkeypatch) as (server, retrieval):
+        server.statuses = [429, 502]
+        assert (await retrieval.search("retry me", 5))["results"]
+        assert len(server.requests) == 3
+
+        server.statuses = [429] * 4
+        with pytest.raises(TavilyRateLimitError):
+            await retrieval.search("rate limited", 5)
+
+        server.statuses = [401]
+        with pytest.raises(TavilyAPIError) as error:
+            await retrieval.search("bad key", 5)
+        assert error.value.status_code == 401
+
+        assert (await retrieval.search("bad key", 5))["results"]
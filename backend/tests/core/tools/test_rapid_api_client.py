@@ -0,0 +1,210 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from core.services import result_cache
+from core.services.result_cache import FetchCancelledError, SingleFlight
+from core.tools.data_providers import rapid_api_client
+from core.tools.data_providers.RapidDataProviderBase import RapidDataProviderBase
+from core.tools.data_providers.rapid_api_client import RapidApiClient
+
+
+class _FakeRapidApi:
+    """Minimal HTTP/1.1 keep-alive server answering like a RapidAPI endpoint."""
+
+    def __init__(self):
+        self.requests = []
+        self.connections = 0
+        self.failures = {}  # path -> statuses to return before succeeding
+        self.delay = 0.0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, value = line.decode().split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload, extra = await self._respond(method, target, headers, body)
+                data = json.dumps(payload).encode()
+                head = [f"HTTP/1.1 {status} X", "Content-Type: application/json", f"Content-Length: {len(data)}", *extra]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + data)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method, target, headers, body):
+        url = urlsplit(target)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()} if method == "GET" else json.loads(body or b"{}")
+        self.requests.append((method, url.path, params, headers.get("x-rapidapi-key")))
+        await asyncio.sleep(self.delay)
+        pending = self.failures.get(url.path)
+        if pending:
+            return pending.pop(0), {"message": "Too many requests"}, ["Retry-After: 0"]
+        return 200, {"path": url.path, "params": params}, []
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.values[key] = value
+
+
+@asynccontextmanager
+async def _fake_api(monkeypatch):
+    server = _FakeRapidApi()
+    base_url = await server.start()
+    monkeypatch.setenv("RAPID_API_KEY", "test-key")
+    monkeypatch.setattr(result_cache, "redis", _FakeRedis())
+    monkeypatch.setattr(rapid_api_client, "RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(rapid_api_client, "config", SimpleNamespace(
+        RAPID_API_MAX_CONNECTIONS=4, RAPID_API_REQUESTS_PER_SECOND=1000, RAPID_API_MAX_RETRIES=3,
+        RAPID_API_TIMEOUT=5, RAPID_API_CACHE_TTL=900,
+    ))
+    client = RapidApiClient()
+    monkeypatch.setattr("core.tools.data_providers.RapidDataProviderBase.rapid_api_client", client)
+    try:
+        yield server, base_url, client
+    finally:
+        await client.aclose()
+        await server.stop()
+
+
+def _provider(base_url, **attributes):
+    class _Provider(RapidDataProviderBase):
+        pass
+
+    for name, value in attributes.items():
+        setattr(_Provider, name, value)
+    return _Provider(base_url, {
+        "quote": {"route": "/quote", "method": "GET", "name": "Quote", "description": "", "payload": {}},
+        "search": {"route": "/search", "method": "POST", "name": "Search", "description": "", "payload": {}},
+    })
+
+
+async def test_concurrent_calls_share_pooled_connections_and_cache(monkeypatch):
+    async with _fake_api(monkeypatch) as (server, base_url, client):
+        server.delay = 0.05
+        provider = _provider(base_url)
+
+        results = await asyncio.gather(
+            *(provider.call_endpoint("quote", {"symbol": "AAPL", "page": 1}) for _ in range(10)),
+            *(provider.call_endpoint("search", {"query": f"phone {i}"}) for i in range(12)),
+        )
+
+        assert results[0] == {"path": "/quote", "params": {"symbol": "AAPL", "page": "1"}}
+        assert [r["params"]["query"] for r in results[10:]] == [f"phone {i}" for i in range(12)]
+        assert len(server.requests) == 13  # identical in-flight calls were coalesced
+        assert {key for *_, key in server.requests} == {"test-key"}
+        assert server.connections <= 4
+
+        # Same call with reordered / stringified / None parameters: served from cache
+        assert await provider.call_endpoint("/quote", {"page": "1", "symbol": "AAPL", "region": None}) == results[0]
+        assert len(server.requests) == 13
+
+        # ...in this process and, through Redis, in another one
+        other_process = RapidApiClient()
+        assert await other_process.request("GET", f"{base_url}/quote", {"symbol": "AAPL", "page": 1}) == results[0]
+        assert len(server.requests) == 13
+        await other_process.aclose()
+
+
+async def test_retries_rate_limited_calls_and_does_not_cache_failures(monkeypatch):
+    async with _fake_api(monkeypatch) as (server, base_url, client):
+        provider = _provider(base_url, cache_ttl=60)
+
+        server.failures["/quote"] = [429, 503]
+        assert (await provider.call_endpoint("quote", {"symbol": "MSFT"}))["params"] == {"symbol": "MSFT"}
+        assert len(server.requests) == 3
+
+        server.failures["/search"] = [500] * 4
+        assert await provider.call_endpoint("search", {"query": "tv"}) == {"message": "Too many requests"}
+        assert len(server.requests) == 7  # first attempt + RAPID_API_MAX_RETRIES
+        assert (await provider.call_endpoint("search", {"query": "tv"}))["params"] == {"query": "tv"}
+        assert len(server.requests) == 8
+
+
+async def test_requests_are_rate_limited_per_provider(monkeypatch):
+    async with _fake_api(monkeypatch) as (server, base_url, client):
+        slow = _provider(base_url, requests_per_second=20, cache_ttl=0)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(slow.call_endpoint("quote", {"symbol": f"T{i}"}) for i in range(30)))
+        elapsed = time.perf_counter() - started
+
+        # A burst of 20, then 10 more at 20/s
+        assert 0.45 < elapsed < 2
+        assert len(server.requests) == 30
+
+
+async def test_rates_below_one_request_per_second_still_allow_requests():
+    limiter = rapid_api_client.RateLimiter(0.5)
+
+    await asyncio.wait_for(limiter.acquire(), timeout=0.1)  # the first request is not delayed
+    started = time.perf_counter()
+    await asyncio.wait_for(limiter.acquire(), timeout=5)
+
+    assert 1.5 < time.perf_counter() - started < 3
+
+
+async def test_cancelling_the_first_caller_does_not_cancel_identical_waiting_calls(monkeypatch):
+    async with _fake_api(monkeypatch) as (server, base_url, client):
+        server.delay = 0.2
+        provider = _provider(base_url)
+
+        leader = asyncio.create_task(provider.call_endpoint("quote", {"symbol": "NVDA"}))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(provider.call_endpoint("quote", {"symbol": "NVDA"}))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        assert (await follower)["params"] == {"symbol": "NVDA"}
+        assert leader.cancelled()
+        assert len(server.requests) == 1
+
+
+async def test_a_cancelled_shared_call_is_reported_as_retryable():
+    flights = SingleFlight()
+    started = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        await asyncio.sleep(10)
+
+    waiter = asyncio.create_task(flights.run("key", fetch))
+    await started.wait()
+    flights._inflight["key"].task.cancel()
+
+    with pytest.raises(FetchCancelledError):
+        await waiter
+
+    async def fresh():
+        return "fresh"
+
+    assert await flights.run("key", fresh) == "fresh"
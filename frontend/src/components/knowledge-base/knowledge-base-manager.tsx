@@ -41,12 +41,15 @@ import { UnifiedKbEntryModal } from './unified-kb-entry-modal';
 import { KBFilePreviewModal } from './kb-file-preview-modal';
 import { EditSummaryModal } from './edit-summary-modal';
 import { KBDeleteConfirmDialog } from './kb-delete-confirm-dialog';
-import { useKnowledgeFolders, type Folder, type Entry } from '@/hooks/react-query/knowledge-base/use-folders';
+import { useKnowledgeFolders, isEntryProcessing, type Folder, type Entry } from '@/hooks/react-query/knowledge-base/use-folders';
 import { FileNameValidator } from '@/lib/validation';
 import { createClient } from '@/lib/supabase/client';
 
 const API_URL = process.env.NEXT_PUBLIC_BACKEND_URL || '';
 
+// Folders with uploads that are still being processed are re-fetched this often
+const PROCESSING_POLL_INTERVAL_MS = 3000;
+
 interface TreeItem {
     id: string;
     type: 'folder' | 'file';
@@ -100,6 +103,8 @@ export function KnowledgeBaseManager({
     const [validationError, setValidationError] = useState<string | null>(null);
     const [activeId, setActiveId] = useState<string | null>(null);
     const editInputRef = useRef<HTMLInputElement>(null);
+    // Upload jobs seen processing, so their failure is reported once when it happens
+    const processingJobsRef = useRef<Set<string>>(new Set());
 
     // Assignment state for agent mode
     const [selectedEntries, setSelectedEntries] = useState<Set<string>>(new Set());
@@ -266,8 +271,10 @@ export function KnowledgeBaseManager({
         }
     };
 
-    const fetchFolderEntries = async (folderId: string) => {
-        setLoadingFolders(prev => ({ ...prev, [folderId]: true }));
+    const fetchFolderEntries = async (folderId: string, showLoading = true) => {
+        if (showLoading) {
+            setLoadingFolders(prev => ({ ...prev, [folderId]: true }));
+        }
 
         try {
             const supabase = createClient();
@@ -285,16 +292,43 @@ export function KnowledgeBaseManager({
             });
 
             if (response.ok) {
-                const data = await response.json();
+                const data: Entry[] = await response.json();
+                for (const entry of data) {
+                    if (!entry.job_id) continue;
+                    if (isEntryProcessing(entry)) {
+                        processingJobsRef.current.add(entry.job_id);
+                    } else if (entry.status === 'failed' && processingJobsRef.current.delete(entry.job_id)) {
+                        toast.error(`Failed to process ${entry.filename}${entry.error ? `: ${entry.error}` : ''}`);
+                    }
+                }
                 setFolderEntries(prev => ({ ...prev, [folderId]: data }));
             }
         } catch (error) {
             console.error('Failed to fetch entries:', error);
         } finally {
-            setLoadingFolders(prev => ({ ...prev, [folderId]: false }));
+            if (showLoading) {
+                setLoadingFolders(prev => ({ ...prev, [folderId]: false }));
+            }
         }
     };
 
+    const refreshLoadedFolders = () => {
+        Object.keys(folderEntries).forEach(folderId => fetchFolderEntries(folderId, false));
+    };
+
+    // Uploads are processed in the background; keep re-fetching folders until they finish
+    React.useEffect(() => {
+        const processingFolders = Object.entries(folderEntries)
+            .filter(([, entries]) => entries.some(isEntryProcessing))
+            .map(([folderId]) => folderId);
+        if (processingFolders.length === 0) return;
+
+        const timer = setTimeout(() => {
+            processingFolders.forEach(folderId => fetchFolderEntries(folderId, false));
+        }, PROCESSING_POLL_INTERVAL_MS);
+        return () => clearTimeout(timer);
+    }, [folderEntries]);
+
     const handleExpand = async (folderId: string) => {
         const folder = treeData.find(item => item.id === folderId);
         const isCurrentlyExpanded = folder?.expanded;
@@ -764,9 +798,9 @@ export function KnowledgeBaseManager({
             }, 3000);
 
             if (successCount === totalFiles) {
-                toast.success(`Successfully uploaded ${successCount} file(s)`);
+                toast.success(`Uploaded ${successCount} file(s), processing...`);
             } else if (successCount > 0) {
-                toast.success(`Uploaded ${successCount} of ${totalFiles} files`);
+                toast.success(`Uploaded ${successCount} of ${totalFiles} files, processing...`);
             }
 
             refetchFolders();
@@ -923,6 +957,7 @@ export function KnowledgeBaseManager({
                         folders={folders}
                         onUploadComplete={() => {
                             refetchFolders();
+                            refreshLoadedFolders();
                             if (enableAssignments) {
                                 loadAssignments();
                             }
@@ -1012,6 +1047,7 @@ export function KnowledgeBaseManager({
                                 folders={folders}
                                 onUploadComplete={() => {
                                     refetchFolders();
+                                    refreshLoadedFolders();
                                     if (enableAssignments) {
                                         loadAssignments();
                                     }
@@ -14,7 +14,8 @@ import {
     Pen,
     GripVerticalIcon,
     Loader2,
-    FileTextIcon
+    FileTextIcon,
+    AlertCircleIcon
 } from 'lucide-react';
 import {
     DropdownMenu,
@@ -22,6 +23,7 @@ import {
     DropdownMenuItem,
     DropdownMenuTrigger,
 } from '@/components/ui/dropdown-menu';
+import { isEntryProcessing } from '@/hooks/react-query/knowledge-base/use-folders';
 import {
     useDroppable,
     DragOverlay,
@@ -120,13 +122,17 @@ export function SharedTreeItem({
 
     // Determine if this specific item is moving
     const itemIsMoving = isMoving || (movingFiles && movingFiles[item.id]);
+    // Uploads that are still processing or failed have no entry to open, assign or move yet
+    const itemIsProcessing = item.type === 'file' && isEntryProcessing(item.data);
+    const itemFailed = item.type === 'file' && item.data?.status === 'failed';
+    const itemIsReady = !itemIsProcessing && !itemFailed;
 
     const isEditingJustStarted = useRef(false);
 
     // Only files are draggable, folders are only drop targets
     const fileDragHooks = useDraggable({
         id: item.id,
-        disabled: !enableDnd || item.type !== 'file'
+        disabled: !enableDnd || item.type !== 'file' || !itemIsReady
     });
 
     // Folders are droppable but NOT sortable
@@ -399,7 +405,7 @@ export function SharedTreeItem({
                 /* File Row - Using div instead of button to avoid nesting */
                 <div
                     ref={combinedRef}
-                    className={`group flex items-center w-full text-sm h-auto px-4 py-3 rounded-lg transition-all duration-200 border border-transparent ${itemIsMoving
+                    className={`group flex items-center w-full text-sm h-auto px-4 py-3 rounded-lg transition-all duration-200 border border-transparent ${itemIsMoving || !itemIsReady
                             ? 'opacity-60 cursor-not-allowed bg-muted/30'
                             : 'hover:bg-muted/30 hover:border-border/50 cursor-pointer'
                         } ${isDragging ? 'opacity-50' : ''}`}
@@ -408,15 +414,15 @@ export function SharedTreeItem({
                         ...style
                     }}
                     onClick={() => {
-                        // Don't allow clicks when moving
-                        if (itemIsMoving) return;
+                        // Don't allow clicks when moving or before the upload was processed
+                        if (itemIsMoving || !itemIsReady) return;
 
                         // Trigger file preview on file click
                         onSelect(item);
                     }}
                 >
                     {/* Drag Handle - Only visible on hover and only when DND is enabled for files */}
-                    {enableDnd && item.type === 'file' && !itemIsMoving && (
+                    {enableDnd && item.type === 'file' && !itemIsMoving && itemIsReady && (
                         <div
                             className="opacity-0 group-hover:opacity-100 transition-opacity cursor-grab active:cursor-grabbing p-1 ml-1"
                             {...attributes}
@@ -440,6 +446,18 @@ export function SharedTreeItem({
                                     <Loader2 className="h-3 w-3 animate-spin text-primary" />
                                     <span className="text-xs text-muted-foreground">Moving...</span>
                                 </div>
+                            ) : itemIsProcessing ? (
+                                <div className="flex items-center gap-1.5">
+                                    <Loader2 className="h-3 w-3 animate-spin text-primary" />
+                                    <span className="text-xs text-muted-foreground">Processing...</span>
+                                </div>
+                            ) : itemFailed ? (
+                                <div className="flex items-center gap-1.5 min-w-0">
+                                    <AlertCircleIcon className="h-3 w-3 shrink-0 text-destructive" />
+                                    <span className="text-xs text-destructive truncate">
+                                        {item.data?.error || 'Processing failed'}
+                                    </span>
+                                </div>
                             ) : (
                                 <>
                                     <span className="text-xs text-muted-foreground">
@@ -455,7 +473,7 @@ export function SharedTreeItem({
                     </div>
 
                     {/* Assignment Switch for Files */}
-                    {enableAssignment && (
+                    {enableAssignment && itemIsReady && (
                         <Switch
                             checked={assignments?.[item.id] || false}
                             onCheckedChange={() => onToggleAssignment?.(item.id)}
@@ -467,7 +485,7 @@ export function SharedTreeItem({
 
 
                     {/* File Actions */}
-                    {enableActions && !itemIsMoving && (
+                    {enableActions && !itemIsMoving && !itemIsProcessing && (
                         <DropdownMenu>
                             <DropdownMenuTrigger asChild>
                                 <button
@@ -478,15 +496,17 @@ export function SharedTreeItem({
                                 </button>
                             </DropdownMenuTrigger>
                             <DropdownMenuContent align="end">
-                                <DropdownMenuItem
-                                    onClick={(e) => {
-                                        e.stopPropagation();
-                                        onEditSummary?.(item.id, item.name, item.data?.summary || '');
-                                    }}
-                                >
-                                    <FileTextIcon className="h-3 w-3 mr-2" />
-                                    Edit Summary
-                                </DropdownMenuItem>
+                                {itemIsReady && (
+                                    <DropdownMenuItem
+                                        onClick={(e) => {
+                                            e.stopPropagation();
+                                            onEditSummary?.(item.id, item.name, item.data?.summary || '');
+                                        }}
+                                    >
+                                        <FileTextIcon className="h-3 w-3 mr-2" />
+                                        Edit Summary
+                                    </DropdownMenuItem>
+                                )}
                                 <DropdownMenuItem
                                     onClick={(e) => {
                                         e.stopPropagation();
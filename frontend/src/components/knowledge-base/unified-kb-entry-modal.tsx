@@ -264,10 +264,10 @@ export function UnifiedKbEntryModal({
             }
 
             if (completedFiles === selectedFiles.length) {
-                toast.success(`Successfully uploaded ${completedFiles} file(s)`);
+                toast.success(`Uploaded ${completedFiles} file(s), processing...`);
                 resetAndClose();
             } else if (completedFiles > 0) {
-                toast.success(`Uploaded ${completedFiles} of ${selectedFiles.length} files`);
+                toast.success(`Uploaded ${completedFiles} of ${selectedFiles.length} files, processing...`);
             } else {
                 toast.error('Failed to upload files');
             }
@@ -325,7 +325,7 @@ export function UnifiedKbEntryModal({
 
             if (response.ok) {
                 const result = await response.json();
-                toast.success('Text entry created successfully');
+                toast.success('Text entry added, processing...');
 
                 if (result.filename_changed) {
                     toast.info(`File was renamed to "${result.final_filename}" to avoid conflicts`);
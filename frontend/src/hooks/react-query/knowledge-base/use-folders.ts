@@ -9,6 +9,8 @@ export interface Folder {
     created_at: string;
 }
 
+export type EntryStatus = 'queued' | 'processing' | 'completed' | 'failed';
+
 export interface Entry {
     entry_id: string;
     filename: string;
@@ -16,8 +18,15 @@ export interface Entry {
     file_size: number;
     created_at: string;
     folder_id: string;
+    // Uploads are listed while they are processed; a failed upload stays until it is deleted
+    status?: EntryStatus;
+    job_id?: string | null;
+    error?: string | null;
 }
 
+export const isEntryProcessing = (entry?: Pick<Entry, 'status'> | null) =>
+    entry?.status === 'queued' || entry?.status === 'processing';
+
 export const useKnowledgeFolders = () => {
     const [folders, setFolders] = useState<Folder[]>([]);
     const [recentFiles, setRecentFiles] = useState<Entry[]>([]);